@@ -21,6 +21,16 @@ import { Plus, Edit, Trash2, Package, Lock, Clock, Glasses, Search, ShoppingBag,
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from '@/components/ui/dialog';
 import { Badge } from '@/components/ui/badge';
 import { formatPrice } from '@/lib/utils';
+import { ORDER_TRANSITIONS } from '@/lib/orderStatus';
+
+const ORDER_STATUS_LABELS = {
+  pending: 'Beklemede',
+  awaiting_transfer: 'Havale Bekleniyor',
+  paid: 'Ödendi',
+  shipped: 'Kargoda',
+  delivered: 'Teslim Edildi',
+  cancelled: 'İptal Edildi'
+};
 
 // Saat kategorileri
 const WATCH_CATEGORIES = ['Lüks', 'Spor', 'Klasik', 'Dijital', 'Akıllı Saat'];
@@ -28,6 +38,21 @@ const WATCH_CATEGORIES = ['Lüks', 'Spor', 'Klasik', 'Dijital', 'Akıllı Saat']
 const EYEWEAR_CATEGORIES = ['Güneş Gözlüğü', 'Optik', 'Spor Gözlük', 'Moda'];
 // ETA kategorileri
 const ETA_CATEGORIES = ['Premium', 'Limited Edition', 'Classic', 'Modern'];
+// Admin sipariş/üye listeleri sayfa boyutu
+const PAGE_SIZE = 50;
+
+// Admin rotalarına girişte alınan token ile gidilir; token reddedilirse (süresi doldu) panel oturumu kapanır
+async function adminFetch(url, options = {}) {
+  const token = localStorage.getItem('adminToken');
+  const headers = token ? { ...options.headers, Authorization: `Bearer ${token}` } : options.headers;
+  const response = await fetch(url, { ...options, headers });
+  if (response.status === 401) {
+    localStorage.removeItem('adminToken');
+    localStorage.removeItem('adminLoggedIn');
+    window.location.reload();
+  }
+  return response;
+}
 
 export default function AdminPage() {
   const router = useRouter();
@@ -35,8 +60,11 @@ export default function AdminPage() {
   const [loginForm, setLoginForm] = useState({ username: '', password: '' });
   const [products, setProducts] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [ordersCursor, setOrdersCursor] = useState(null);
   const [users, setUsers] = useState([]);
+  const [usersCursor, setUsersCursor] = useState(null);
   const [selectedUser, setSelectedUser] = useState(null);
+  const [stats, setStats] = useState(null);
   const [isDialogOpen, setIsDialogOpen] = useState(false);
   const [isUserDialogOpen, setIsUserDialogOpen] = useState(false);
   const [editingProduct, setEditingProduct] = useState(null);
@@ -68,6 +96,7 @@ export default function AdminPage() {
   const [searchQuery, setSearchQuery] = useState('');
   const [orderFilter, setOrderFilter] = useState('all');
   const [orderSearchQuery, setOrderSearchQuery] = useState('');
+  const [orderDateRange, setOrderDateRange] = useState({ from: '', to: '' });
   const [userSearchQuery, setUserSearchQuery] = useState('');
 
   useEffect(() => {
@@ -75,11 +104,18 @@ export default function AdminPage() {
     if (loggedIn === 'true') {
       setIsLoggedIn(true);
       fetchProducts();
-      fetchOrders();
       fetchUsers();
+      fetchStats();
     }
   }, []);
 
+  // Durum ve tarih filtreleri sunucuda uygulanır; değişince ilk sayfa yeniden çekilir
+  useEffect(() => {
+    if (isLoggedIn) {
+      fetchOrders();
+    }
+  }, [isLoggedIn, orderFilter, orderDateRange]);
+
   const handleLogin = async (e) => {
     e.preventDefault();
     try {
@@ -92,10 +128,11 @@ export default function AdminPage() {
       const data = await response.json();
       if (data.success) {
         localStorage.setItem('adminLoggedIn', 'true');
+        localStorage.setItem('adminToken', data.token);
         setIsLoggedIn(true);
         fetchProducts();
-        fetchOrders();
         fetchUsers();
+        fetchStats();
       } else {
         alert(data.error);
       }
@@ -106,13 +143,15 @@ export default function AdminPage() {
 
   const handleLogout = () => {
     localStorage.removeItem('adminLoggedIn');
+    localStorage.removeItem('adminToken');
     setIsLoggedIn(false);
     router.push('/');
   };
 
   const fetchProducts = async () => {
     try {
-      const response = await fetch('/api/products');
+      // Katalog yanıtları önbellekli; admin her seferinde ETag ile doğrular (değişmediyse 304)
+      const response = await fetch('/api/products', { cache: 'no-cache' });
       const data = await response.json();
       setProducts(Array.isArray(data) ? data : []);
     } catch (error) {
@@ -120,21 +159,44 @@ export default function AdminPage() {
     }
   };
 
-  const fetchOrders = async () => {
+  // Ciro, durum sayıları ve en çok satanlar sunucuda tutulan özetten gelir
+  const fetchStats = async () => {
     try {
-      const response = await fetch('/api/admin/orders');
+      const response = await adminFetch('/api/admin/stats?days=30&top=5');
       const data = await response.json();
-      setOrders(Array.isArray(data) ? data : []);
+      setStats(data.totals ? data : null);
+    } catch (error) {
+      console.error('Özetler yüklenemedi:', error);
+    }
+  };
+
+  // cursor verilirse sonraki sayfa mevcut listeye eklenir, verilmezse ilk sayfa yüklenir
+  const fetchOrders = async (cursor = null) => {
+    try {
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (orderFilter !== 'all') params.set('status', orderFilter);
+      if (orderDateRange.from) params.set('from', orderDateRange.from);
+      if (orderDateRange.to) params.set('to', orderDateRange.to);
+      if (cursor) params.set('cursor', cursor);
+      const response = await adminFetch(`/api/admin/orders?${params}`);
+      const data = await response.json();
+      const items = Array.isArray(data.items) ? data.items : [];
+      setOrders(prev => cursor ? [...prev, ...items] : items);
+      setOrdersCursor(data.nextCursor || null);
     } catch (error) {
       console.error('Siparişler yüklenemedi:', error);
     }
   };
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (cursor = null) => {
     try {
-      const response = await fetch('/api/users');
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (cursor) params.set('cursor', cursor);
+      const response = await adminFetch(`/api/users?${params}`);
       const data = await response.json();
-      setUsers(Array.isArray(data) ? data : []);
+      const items = Array.isArray(data.items) ? data.items : [];
+      setUsers(prev => cursor ? [...prev, ...items] : items);
+      setUsersCursor(data.nextCursor || null);
     } catch (error) {
       console.error('Kullanıcılar yüklenemedi:', error);
     }
@@ -142,7 +204,7 @@ export default function AdminPage() {
 
   const fetchUserDetail = async (userId) => {
     try {
-      const response = await fetch(`/api/users/${userId}`);
+      const response = await adminFetch(`/api/users/${userId}`);
       const data = await response.json();
       setSelectedUser(data);
       setIsUserDialogOpen(true);
@@ -152,9 +214,24 @@ export default function AdminPage() {
     }
   };
 
+  const fetchMoreUserOrders = async () => {
+    try {
+      const params = new URLSearchParams({ cursor: selectedUser.ordersNextCursor });
+      const response = await adminFetch(`/api/users/${selectedUser.id}/orders?${params}`);
+      const data = await response.json();
+      setSelectedUser(prev => ({
+        ...prev,
+        orders: [...(prev.orders || []), ...(data.items || [])],
+        ordersNextCursor: data.nextCursor || null
+      }));
+    } catch (error) {
+      console.error('Sipariş geçmişi yüklenemedi:', error);
+    }
+  };
+
   const updateOrderStatus = async (orderId, newStatus) => {
     try {
-      const response = await fetch(`/api/admin/orders/${orderId}`, {
+      const response = await adminFetch(`/api/admin/orders/${orderId}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ status: newStatus })
@@ -164,6 +241,9 @@ export default function AdminPage() {
       if (data.success) {
         alert('Sipariş durumu güncellendi!');
         fetchOrders();
+        fetchStats();
+      } else {
+        alert('Güncelleme hatası: ' + data.error);
       }
     } catch (error) {
       alert('Güncelleme hatası: ' + error.message);
@@ -228,7 +308,7 @@ export default function AdminPage() {
         const formDataUpload = new FormData();
         formDataUpload.append('file', file);
 
-        const response = await fetch('/api/upload', {
+        const response = await adminFetch('/api/upload', {
           method: 'POST',
           body: formDataUpload
         });
@@ -290,7 +370,7 @@ export default function AdminPage() {
       };
 
       if (editingProduct) {
-        const response = await fetch(`/api/products/${editingProduct.id}`, {
+        const response = await adminFetch(`/api/products/${editingProduct.id}`, {
           method: 'PUT',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(submitData)
@@ -300,7 +380,7 @@ export default function AdminPage() {
           alert('Ürün güncellendi!');
         }
       } else {
-        const response = await fetch('/api/products', {
+        const response = await adminFetch('/api/products', {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(submitData)
@@ -381,7 +461,7 @@ export default function AdminPage() {
     if (!confirm('Ürünü silmek istediğinize emin misiniz?')) return;
 
     try {
-      const response = await fetch(`/api/products/${id}`, {
+      const response = await adminFetch(`/api/products/${id}`, {
         method: 'DELETE'
       });
 
@@ -567,6 +647,39 @@ export default function AdminPage() {
           </Button>
         </div>
 
+        {stats && (
+          <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-8">
+            {[
+              { label: 'Toplam Ciro', value: `${formatPrice(stats.totals.revenue)} ₺` },
+              { label: 'Son 30 Gün Ciro', value: `${formatPrice(stats.daily.reduce((sum, d) => sum + d.revenue, 0))} ₺` },
+              { label: 'Bugünkü Siparişler', value: stats.daily[stats.daily.length - 1]?.orders || 0 },
+              { label: 'Bugün Kayıt Olan Üyeler', value: stats.daily[stats.daily.length - 1]?.users || 0 },
+            ].map(card => (
+              <Card key={card.label} className="bg-gray-900 border-white/10">
+                <CardContent className="p-4">
+                  <p className="text-sm text-gray-400">{card.label}</p>
+                  <p className="text-2xl font-bold text-[#006039]">{card.value}</p>
+                </CardContent>
+              </Card>
+            ))}
+            {stats.topProducts.length > 0 && (
+              <Card className="bg-gray-900 border-white/10 col-span-2 md:col-span-4">
+                <CardContent className="p-4">
+                  <p className="text-sm text-gray-400 mb-2">En Çok Satanlar</p>
+                  <div className="space-y-1">
+                    {stats.topProducts.map(product => (
+                      <div key={product.productId} className="flex justify-between text-sm text-gray-300">
+                        <span>{product.name} x {product.quantity}</span>
+                        <span>{formatPrice(product.revenue)} ₺</span>
+                      </div>
+                    ))}
+                  </div>
+                </CardContent>
+              </Card>
+            )}
+          </div>
+        )}
+
         <Tabs defaultValue="products" className="w-full">
           <TabsList className="grid w-full grid-cols-3 bg-gray-800 mb-8">
             <TabsTrigger value="products" className="data-[state=active]:bg-[#006039] data-[state=active]:text-black">
@@ -575,11 +688,11 @@ export default function AdminPage() {
             </TabsTrigger>
             <TabsTrigger value="orders" className="data-[state=active]:bg-[#006039] data-[state=active]:text-black">
               <ShoppingBag className="h-4 w-4 mr-2" />
-              Siparişler ({orders.length})
+              Siparişler ({stats ? stats.totals.orders : orders.length})
             </TabsTrigger>
             <TabsTrigger value="users" className="data-[state=active]:bg-[#006039] data-[state=active]:text-black">
               <User className="h-4 w-4 mr-2" />
-              Üyeler ({users.length})
+              Üyeler ({stats ? stats.totals.users : users.length})
             </TabsTrigger>
           </TabsList>
 
@@ -1023,14 +1136,15 @@ export default function AdminPage() {
               </div>
             </div>
 
-            <div className="mb-6 flex gap-2 bg-gray-800/50 p-1 rounded-lg flex-wrap">
+            <div className="mb-4 flex gap-2 bg-gray-800/50 p-1 rounded-lg flex-wrap">
               {[
-                { value: 'all', label: 'Tümü', count: orders.length },
-                { value: 'pending', label: 'Beklemede', count: orders.filter(o => o.status === 'pending').length },
-                { value: 'awaiting_transfer', label: 'Havale Bekleniyor', count: orders.filter(o => o.status === 'awaiting_transfer').length },
-                { value: 'paid', label: 'Ödendi', count: orders.filter(o => o.status === 'paid').length },
-                { value: 'shipped', label: 'Kargoda', count: orders.filter(o => o.status === 'shipped').length },
-                { value: 'delivered', label: 'Teslim Edildi', count: orders.filter(o => o.status === 'delivered').length },
+                { value: 'all', label: 'Tümü', count: stats?.totals.orders },
+                { value: 'pending', label: 'Beklemede', count: stats?.ordersByStatus.pending },
+                { value: 'awaiting_transfer', label: 'Havale Bekleniyor', count: stats?.ordersByStatus.awaiting_transfer },
+                { value: 'paid', label: 'Ödendi', count: stats?.ordersByStatus.paid },
+                { value: 'shipped', label: 'Kargoda', count: stats?.ordersByStatus.shipped },
+                { value: 'delivered', label: 'Teslim Edildi', count: stats?.ordersByStatus.delivered },
+                { value: 'cancelled', label: 'İptal Edildi', count: stats?.ordersByStatus.cancelled },
               ].map(filter => (
                 <Button
                   key={filter.value}
@@ -1039,11 +1153,29 @@ export default function AdminPage() {
                   onClick={() => setOrderFilter(filter.value)}
                   className={orderFilter === filter.value ? 'bg-[#006039] text-white' : 'bg-gray-700 text-white'}
                 >
-                  {filter.label} ({filter.count})
+                  {filter.label}{filter.count !== undefined ? ` (${filter.count})` : ''}
                 </Button>
               ))}
             </div>
 
+            {/* Tarih Aralığı */}
+            <div className="mb-6 flex items-center gap-2 text-sm text-gray-400">
+              <Calendar className="h-4 w-4" />
+              <Input
+                type="date"
+                value={orderDateRange.from}
+                onChange={(e) => setOrderDateRange(prev => ({ ...prev, from: e.target.value }))}
+                className="w-[170px] bg-gray-800 border-gray-700 text-white"
+              />
+              <span>-</span>
+              <Input
+                type="date"
+                value={orderDateRange.to}
+                onChange={(e) => setOrderDateRange(prev => ({ ...prev, to: e.target.value }))}
+                className="w-[170px] bg-gray-800 border-gray-700 text-white"
+              />
+            </div>
+
             {filteredOrders.length === 0 ? (
               <Card className="bg-gray-900 border-white/10 p-12 text-center">
                 <ShoppingBag className="h-16 w-16 mx-auto text-gray-600 mb-4" />
@@ -1125,17 +1257,19 @@ export default function AdminPage() {
                           )}
                         </div>
                         
-                        <Select value={order.status} onValueChange={(newStatus) => updateOrderStatus(order.id, newStatus)}>
+                        {/* Yalnızca sunucunun kabul ettiği geçişler listelenir; son durumlar (teslim/iptal) değiştirilemez */}
+                        <Select
+                          value={order.status}
+                          onValueChange={(newStatus) => updateOrderStatus(order.id, newStatus)}
+                          disabled={!ORDER_TRANSITIONS[order.status]?.length}
+                        >
                           <SelectTrigger className="w-[200px] bg-gray-800 border-gray-700 text-white">
                             <SelectValue />
                           </SelectTrigger>
                           <SelectContent>
-                            <SelectItem value="pending">Beklemede</SelectItem>
-                            <SelectItem value="awaiting_transfer">Havale Bekleniyor</SelectItem>
-                            <SelectItem value="paid">Ödendi</SelectItem>
-                            <SelectItem value="shipped">Kargoda</SelectItem>
-                            <SelectItem value="delivered">Teslim Edildi</SelectItem>
-                            <SelectItem value="cancelled">İptal Edildi</SelectItem>
+                            {[order.status, ...(ORDER_TRANSITIONS[order.status] || [])].map(status => (
+                              <SelectItem key={status} value={status}>{ORDER_STATUS_LABELS[status] || status}</SelectItem>
+                            ))}
                           </SelectContent>
                         </Select>
                       </div>
@@ -1144,6 +1278,14 @@ export default function AdminPage() {
                 ))}
               </div>
             )}
+
+            {ordersCursor && (
+              <div className="mt-6 text-center">
+                <Button onClick={() => fetchOrders(ordersCursor)} className="bg-gray-700 text-white">
+                  Daha Fazla Yükle
+                </Button>
+              </div>
+            )}
           </TabsContent>
 
           {/* ÜYE YÖNETİMİ */}
@@ -1206,6 +1348,14 @@ export default function AdminPage() {
               )}
             </div>
 
+            {usersCursor && (
+              <div className="mt-6 text-center">
+                <Button onClick={() => fetchUsers(usersCursor)} className="bg-gray-700 text-white">
+                  Daha Fazla Yükle
+                </Button>
+              </div>
+            )}
+
             {/* User Detail Dialog */}
             <Dialog open={isUserDialogOpen} onOpenChange={setIsUserDialogOpen}>
               <DialogContent className="max-w-2xl max-h-[90vh] overflow-y-auto bg-gray-900 border-white/10 text-white">
@@ -1241,7 +1391,7 @@ export default function AdminPage() {
                     </div>
 
                     <div>
-                      <h4 className="font-semibold text-[#006039] mb-3">Sipariş Geçmişi ({selectedUser.orders?.length || 0})</h4>
+                      <h4 className="font-semibold text-[#006039] mb-3">Sipariş Geçmişi ({selectedUser.orders?.length || 0}{selectedUser.ordersNextCursor ? '+' : ''})</h4>
                       {!selectedUser.orders || selectedUser.orders.length === 0 ? (
                         <p className="text-gray-400 text-center py-4">Henüz sipariş yok</p>
                       ) : (
@@ -1258,6 +1408,11 @@ export default function AdminPage() {
                               </div>
                             </div>
                           ))}
+                          {selectedUser.ordersNextCursor && (
+                            <Button onClick={fetchMoreUserOrders} size="sm" className="w-full bg-gray-700 text-white">
+                              Daha Fazla Yükle
+                            </Button>
+                          )}
                         </div>
                       )}
                     </div>
@@ -1,13 +1,53 @@
-import { MongoClient } from 'mongodb';
 import { NextResponse } from 'next/server';
 import { v4 as uuidv4 } from 'uuid';
 import { writeFile } from 'fs/promises';
 import { join } from 'path';
-import bcrypt from 'bcryptjs';
 import jwt from 'jsonwebtoken';
 import { Resend } from 'resend';
+import {
+  ORDER_LIST_PROJECTION, USER_LIST_PROJECTION, findAdminPage, parseAdminListQuery, parseOrderHistoryQuery,
+  parseOrderListQuery
+} from '@/lib/adminLists';
+import {
+  STATS_DAYS, TOP_PRODUCTS, backfillAdminStats, getAdminStats, rebuildAdminStats, recordOrderCreated,
+  recordUserRegistered
+} from '@/lib/adminStats';
+import {
+  checkLogin, clientIp, optionalUser, recordLoginFailure, recordLoginSuccess, requireAdmin, requireOperator, requireUser,
+  sessionCacheStats, signAdminToken
+} from '@/lib/auth';
+import { MAX_PAGE_SIZE, parseProductQuery, productPage, productSpecs } from '@/lib/catalog';
+import { DB_NAME, POOL_OPTIONS, connectToDatabase } from '@/lib/db';
+import { operationStats, poolStats } from '@/lib/dbMetrics';
+import { withDbOps } from '@/lib/dbOps';
+import {
+  IMAGE_CACHE_CONTROL, derivativeCacheStats, derivativeEtag, etagMatches, getDerivative, imageEtag,
+  migrateBase64Images, parseDerivativeParams, parseRange, storeImage, streamImage
+} from '@/lib/images';
+import {
+  ORDER_RESERVATION_MS, TRANSFER_RESERVATION_MS, cancelReservation, expireReservations, parseOrderItems,
+  reservationDeadline, reserveStock, startReservationSweeper
+} from '@/lib/inventory';
+import { getInvoices } from '@/lib/invoice';
+import { transitionOrder } from '@/lib/orders';
+import { hashPassword, needsRehash, passwordPoolStats, tunePasswordCost, verifyPassword } from '@/lib/passwords';
+import { enqueueEmail, startOutboxWorker } from '@/lib/outbox';
+import {
+  PRODUCT_FILE_TYPES, exportProducts, importProducts, productFileFormat, productRows
+} from '@/lib/productImport';
+import {
+  PRODUCT_LIST_SCOPES, cachedJson, invalidateCatalog, invalidateProduct, productScopes, responseCacheStats
+} from '@/lib/responseCache';
+import { migrateEmbeddedReviews, parseReviewQuery, ratingUpdate, reviewPage } from '@/lib/reviews';
+import { Router } from '@/lib/router';
+import {
+  markCatalogChanged, markProductChanged, parseSearchQuery, searchIndexStats, searchProducts
+} from '@/lib/search';
+import { chromeTraceEvents, findTrace, recentTraces, span, withTracing } from '@/lib/tracing';
+import {
+  getFavoriteProducts, getUserProfile, invalidateFavoriteSummaries, invalidateUser, userCacheStats
+} from '@/lib/userCache';
 
-const uri = process.env.MONGO_URL;
 const JWT_SECRET = process.env.JWT_SECRET;
 const SENDER_EMAIL = process.env.SENDER_EMAIL;
 
@@ -20,16 +60,35 @@ function getResendClient() {
   return resendClient;
 }
 
-let cachedClient = null;
-
-async function connectToDatabase() {
-  if (cachedClient) {
-    return cachedClient;
+// Helper: Run catalog/review/image data migrations once per process (indexes: lib/db.js)
+let catalogReady = null;
+function ensureCatalogSetup(db) {
+  if (!catalogReady) {
+    catalogReady = (async () => {
+      const products = db.collection('products');
+      // Eski ürünlerde productType yok: vitrin sayfalarının kuralıyla bir kez doldur (lib/catalog.js productTypeOf)
+      await products.updateMany(
+        { productType: { $exists: false } },
+        [{ $set: { productType: { $cond: [{ $eq: ['$category', 'Gözlük'] }, 'eyewear', 'watch'] } } }]
+      );
+      // Stoğu olmayan ya da sayı olmayan eski ürünler rezervasyonun { stock: { $gte } } koşuluna hiç uymaz
+      // ve satılamaz; oluşturma varsayılanıyla bir kez doldur
+      await products.updateMany(
+        { $or: [{ stock: { $not: { $type: 'number' } } }, { stock: NaN }] },
+        { $set: { stock: 100 } }
+      );
+      // Ürün içine gömülü değerlendirmeleri reviews koleksiyonuna taşı
+      await migrateEmbeddedReviews(db);
+      // base64 görselleri GridFS'e taşı
+      await migrateBase64Images(db);
+      // Admin özetleri hiç oluşturulmadıysa mevcut siparişlerden bir kez hesapla
+      await backfillAdminStats(db);
+    })().catch(error => {
+      console.error('Catalog setup failed:', error);
+      catalogReady = null;
+    });
   }
-  const client = new MongoClient(uri);
-  await client.connect();
-  cachedClient = client;
-  return client;
+  return catalogReady;
 }
 
 // Admin credentials (basit auth) - env'den al veya varsayılan kullan
@@ -39,762 +98,867 @@ const ADMIN_PASSWORD = process.env.ADMIN_PASSWORD || 'Zion157359_-_.?';
 // Helper: Get DB
 async function getDB() {
   const client = await connectToDatabase();
-  return client.db(process.env.DB_NAME || 'ecommerce');
+  const db = client.db(DB_NAME);
+  await ensureCatalogSetup(db);
+  // Fatura e-postaları arka planda outbox işçisi tarafından gönderilir
+  startOutboxWorker(db, { invoice: deliverInvoiceEmails });
+  // Ödenmeyen siparişlerin stok rezervasyonları süresi dolunca geri alınır
+  startReservationSweeper(db);
+  // bcrypt maliyeti ilk istekte arka planda ölçülür
+  tunePasswordCost();
+  return db;
 }
 
-// Helper: Verify JWT Token
-function verifyToken(request) {
-  const authHeader = request.headers.get('authorization');
-  if (!authHeader || !authHeader.startsWith('Bearer ')) {
-    return null;
-  }
-  const token = authHeader.split(' ')[1];
-  try {
-    return jwt.verify(token, JWT_SECRET);
-  } catch (error) {
-    return null;
+// Helper: Outbox handler - send a batch of invoice emails with one Resend batch call
+async function deliverInvoiceEmails(db, jobs) {
+  const resend = getResendClient();
+  if (!resend) {
+    console.error('Resend client not configured');
+    return jobs.map(() => ({ success: false, error: 'Email service not configured' }));
   }
-}
-
-// Helper: Generate Invoice HTML
-function generateInvoiceHTML(order, user) {
-  const totalAmount = order.totalAmount || 0;
-  const itemsHTML = order.items.map(item => `
-    <tr style="border-bottom: 1px solid #e5e7eb;">
-      <td style="padding: 12px; text-align: left;">${item.name}</td>
-      <td style="padding: 12px; text-align: center;">${item.quantity}</td>
-      <td style="padding: 12px; text-align: right;">${item.price?.toFixed(2) || '0.00'} ₺</td>
-      <td style="padding: 12px; text-align: right; font-weight: bold;">${((item.price || 0) * (item.quantity || 0)).toFixed(2)} ₺</td>
-    </tr>
-  `).join('');
-
-  return `
-    <!DOCTYPE html>
-    <html>
-    <head>
-      <meta charset="utf-8">
-      <style>
-        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-        .container { max-width: 650px; margin: 0 auto; padding: 20px; }
-        .header { background: linear-gradient(135deg, #f59e0b 0%, #eab308 100%); color: #000; padding: 30px; text-align: center; border-radius: 8px 8px 0 0; }
-        .content { background: #fff; padding: 30px; border: 1px solid #e5e7eb; }
-        .invoice-details { background: #f9fafb; padding: 20px; border-radius: 8px; margin: 20px 0; }
-        table { width: 100%; border-collapse: collapse; margin: 20px 0; }
-        th { background: #f3f4f6; padding: 12px; text-align: left; font-weight: bold; }
-        .total { background: #fef3c7; padding: 15px; text-align: right; font-size: 18px; font-weight: bold; border-radius: 8px; margin-top: 20px; }
-        .footer { background: #1f2937; color: #9ca3af; padding: 20px; text-align: center; border-radius: 0 0 8px 8px; font-size: 12px; }
-      </style>
-    </head>
-    <body>
-      <div class="container">
-        <div class="header">
-          <h1 style="margin: 0; font-size: 32px;">🕐 Cyprus Watch</h1>
-          <p style="margin: 5px 0 0 0;">Lüks Saat ve Gözlük</p>
-        </div>
-        
-        <div class="content">
-          <h2 style="color: #f59e0b; margin-top: 0;">Fatura</h2>
-          
-          <div class="invoice-details">
-            <p><strong>Sipariş No:</strong> ${order.id}</p>
-            <p><strong>Tarih:</strong> ${new Date(order.createdAt).toLocaleDateString('tr-TR', { year: 'numeric', month: 'long', day: 'numeric', hour: '2-digit', minute: '2-digit' })}</p>
-            <p><strong>Müşteri:</strong> ${order.customerInfo?.fullName || user?.fullName || 'N/A'}</p>
-            <p><strong>E-posta:</strong> ${order.customerInfo?.email || user?.email || 'N/A'}</p>
-            <p><strong>Telefon:</strong> ${order.customerInfo?.phone || user?.phone || 'N/A'}</p>
-            <p><strong>Adres:</strong> ${order.customerInfo?.address || user?.address || 'N/A'}</p>
-            <p><strong>Ödeme Yöntemi:</strong> ${order.paymentMethod === 'bank' ? 'Kredi/Banka Kartı' : 'IBAN/Havale'}</p>
-            <p><strong>Durum:</strong> ${order.status === 'paid' ? '✅ Ödendi' : order.status === 'awaiting_transfer' ? '⏳ Havale Bekleniyor' : '📦 Beklemede'}</p>
-          </div>
-
-          <h3>Sipariş Detayları</h3>
-          <table>
-            <thead>
-              <tr style="background: #f3f4f6;">
-                <th>Ürün</th>
-                <th style="text-align: center;">Adet</th>
-                <th style="text-align: right;">Birim Fiyat</th>
-                <th style="text-align: right;">Toplam</th>
-              </tr>
-            </thead>
-            <tbody>
-              ${itemsHTML}
-            </tbody>
-          </table>
-
-          <div class="total">
-            Toplam Tutar: ${totalAmount.toFixed(2)} ₺
-          </div>
-
-          ${order.paymentMethod === 'transfer' ? `
-            <div style="background: #fef3c7; padding: 15px; border-radius: 8px; margin-top: 20px; border-left: 4px solid #f59e0b;">
-              <h4 style="margin-top: 0; color: #92400e;">Havale Bilgileri</h4>
-              <p><strong>IBAN:</strong> TR33 0006 1005 1978 6457 8413 26</p>
-              <p><strong>Hesap Adı:</strong> E-Ticaret Şirketi A.Ş.</p>
-              <p><strong>Banka:</strong> Ziraat Bankası</p>
-              <p style="font-size: 12px; color: #92400e; margin-bottom: 0;">⚠️ Lütfen açıklama kısmına sipariş numaranızı yazınız: <strong>${order.id}</strong></p>
-            </div>
-          ` : ''}
-        </div>
-
-        <div class="footer">
-          <p><strong>Cyprus Watch</strong> | info@cypruswatch.com | +90 533 123 4123</p>
-          <p>Kıbrıs, Lefkoşa | www.cypruswatch.com</p>
-          <p style="margin-top: 10px;">Teşekkür ederiz! 🎉</p>
-        </div>
-      </div>
-    </body>
-    </html>
-  `;
-}
 
-// Helper: Send Invoice Email
-async function sendInvoiceEmail(order, user) {
-  try {
-    const invoiceHTML = generateInvoiceHTML(order, user);
+  // Siparişler ve kullanıcılar tek sorguda yüklenir
+  const orders = await db.collection('orders')
+    .find({ id: { $in: jobs.map(job => job.orderId) } }, { projection: { _id: 0 } })
+    .toArray();
+  const ordersById = new Map(orders.map(order => [order.id, order]));
+  const userIds = [...new Set(orders.map(order => order.userId).filter(Boolean))];
+  const users = userIds.length > 0
+    ? await db.collection('users').find({ id: { $in: userIds } }, { projection: { _id: 0, password: 0 } }).toArray()
+    : [];
+  const usersById = new Map(users.map(user => [user.id, user]));
+  // Fatura sipariş başına bir kez üretilir; tekrar gönderimler saklanan HTML'i kullanır
+  const invoices = await getInvoices(db, orders, usersById);
+
+  const results = new Array(jobs.length);
+  const emails = [];
+  const emailJobs = [];
+  jobs.forEach((job, index) => {
+    const order = ordersById.get(job.orderId);
+    if (!order) {
+      results[index] = { success: false, permanent: true, error: 'Order not found' };
+      return;
+    }
+    const user = usersById.get(order.userId) || null;
     const recipientEmail = order.customerInfo?.email || user?.email;
-    
     if (!recipientEmail) {
       console.error('No recipient email found for order:', order.id);
-      return { success: false, error: 'No recipient email' };
+      results[index] = { success: false, permanent: true, error: 'No recipient email' };
+      return;
     }
-
-    const resend = getResendClient();
-    if (!resend) {
-      console.error('Resend client not configured');
-      return { success: false, error: 'Email service not configured' };
-    }
-
-    const { data, error } = await resend.emails.send({
+    emails.push({
       from: SENDER_EMAIL,
       to: [recipientEmail],
       subject: `🎉 Cyprus Watch - Siparişiniz Alındı! (${order.id})`,
-      html: invoiceHTML,
+      html: invoices.get(order.id).html,
     });
+    emailJobs.push(index);
+  });
 
+  if (emails.length > 0) {
+    const { data, error } = await span('email.send', () => resend.batch.send(emails), { count: emails.length });
     if (error) {
       console.error('Resend error:', error);
-      return { success: false, error };
+      emailJobs.forEach(index => { results[index] = { success: false, error }; });
+    } else {
+      emailJobs.forEach((index, i) => { results[index] = { success: true, emailId: data.data[i]?.id }; });
     }
+  }
 
-    console.log('Email sent successfully:', data);
-    return { success: true, emailId: data.id };
-  } catch (error) {
-    console.error('Failed to send invoice email:', error);
-    return { success: false, error: error.message };
+  const sent = jobs
+    .map((job, index) => ({ job, result: results[index] }))
+    .filter(({ result }) => result.success);
+  if (sent.length > 0) {
+    await db.collection('orders').bulkWrite(sent.map(({ job, result }) => ({
+      updateOne: {
+        filter: { id: job.orderId },
+        update: { $set: { emailSent: true, invoiceEmailId: result.emailId } }
+      }
+    })), { ordered: false });
   }
+  return results;
 }
+// Rota tablosu (lib/router.js): eşleşen istekler için DB handler'dan önce hazırlanır,
+// eşleşmeyen istekler DB'ye gitmeden 404 alır
+const router = new Router({
+  base: '/api',
+  prepare: async ctx => {
+    ctx.db = await getDB();
+  }
+});
 
-// GET handler
-export async function GET(request) {
-  const url = new URL(request.url);
-  const path = url.pathname.replace('/api/', '');
-
+// GET /api/health - Canlılık kontrolü: DB ping süresi ve havuz doluluğu; DB yoksa 503 (yük dengeleyici için, prepare yok)
+router.get('health', { prepare: false }, async () => {
+  const { open, inUse, waiting } = poolStats();
+  const pool = { open, inUse, waiting, max: POOL_OPTIONS.maxPoolSize ?? null };
+  const uptimeS = Math.round(process.uptime());
   try {
-    const db = await getDB();
-
-    // GET /api/images/:id - MongoDB'den görsel getir
-    if (path.startsWith('images/') && path.split('/').length === 2) {
-      const imageId = path.split('/')[1];
-      const image = await db.collection('images').findOne({ id: imageId });
-      
-      if (!image) {
-        return new NextResponse('Image not found', { status: 404 });
-      }
-      
-      // Base64'ü binary'ye çevir
-      const base64Data = image.data.replace(/^data:image\/\w+;base64,/, '');
-      const imageBuffer = Buffer.from(base64Data, 'base64');
-      
-      return new NextResponse(imageBuffer, {
-        headers: {
-          'Content-Type': image.mimeType || 'image/jpeg',
-          'Cache-Control': 'public, max-age=31536000, immutable',
-        },
-      });
+    const client = await connectToDatabase();
+    const started = performance.now();
+    await client.db(DB_NAME).command({ ping: 1 });
+    const pingMs = Math.round((performance.now() - started) * 1000) / 1000;
+    return NextResponse.json({ status: 'ok', uptimeS, db: { ok: true, pingMs }, pool });
+  } catch (error) {
+    return NextResponse.json(
+      { status: 'unavailable', uptimeS, db: { ok: false, error: error.message }, pool },
+      { status: 503 }
+    );
+  }
+});
+
+// GET /api/metrics - Havuz baskısı, koleksiyon başına komut gecikmeleri ve önbellek sayaçları (Admin veya METRICS_TOKEN)
+router.get('metrics', { prepare: false }, requireOperator, () => {
+  const memory = process.memoryUsage();
+  return NextResponse.json({
+    uptimeS: Math.round(process.uptime()),
+    process: {
+      rssMb: Math.round(memory.rss / 1048576),
+      heapUsedMb: Math.round(memory.heapUsed / 1048576)
+    },
+    pool: { options: POOL_OPTIONS, ...poolStats() },
+    operations: operationStats(),
+    caches: {
+      response: responseCacheStats(),
+      users: userCacheStats(),
+      sessions: sessionCacheStats(),
+      images: derivativeCacheStats(),
+      search: searchIndexStats(),
+      passwords: passwordPoolStats()
     }
-
-    // GET /api/products - Tüm ürünleri listele
-    if (path === 'products' || path === 'products/') {
-      const products = await db.collection('products').find({}).toArray();
-      return NextResponse.json(products);
+  }, { headers: { 'Cache-Control': 'no-store' } });
+});
+
+// GET /api/traces - Son isteklerin izleri, Chrome Trace Event biçiminde (?minMs=250 yalnızca yavaşlar)
+// İzler istek yollarını ve kimliklerini içerir: /api/metrics gibi admin token'ı veya METRICS_TOKEN ister
+router.get('traces', { prepare: false }, requireOperator, ({ query }) => {
+  const traces = recentTraces({ minMs: parseFloat(query.get('minMs')) || 0 });
+  return NextResponse.json(chromeTraceEvents(traces), {
+    headers: {
+      'Cache-Control': 'no-store',
+      'Content-Disposition': 'attachment; filename="traces.json"'
     }
+  });
+});
+
+// GET /api/traces/:id - Tek isteğin span dökümü, X-Request-Id ile (Admin veya METRICS_TOKEN)
+router.get('traces/:id', { prepare: false }, requireOperator, ({ params: { id } }) => {
+  const trace = findTrace(id);
+  if (!trace) {
+    return NextResponse.json({ error: 'İz bulunamadı' }, { status: 404 });
+  }
+  return NextResponse.json(trace, { headers: { 'Cache-Control': 'no-store' } });
+});
+
+// GET /api/images/:id - GridFS'ten görseli akış olarak getir (ETag, Range, ?w=&q=&format= türevleri)
+router.get('images/:id', async ({ request, query, params, db }) => {
+  const image = await db.collection('images').findOne(
+    { id: params.id },
+    { projection: { _id: 0, sha256: 1, mimeType: 1, size: 1, data: 1 } }
+  );
+
+  if (!image) {
+    return new NextResponse('Image not found', { status: 404 });
+  }
 
-    // GET /api/products/:id - Tek ürün detayı
-    if (path.startsWith('products/') && path.split('/').length === 2) {
-      const id = path.split('/')[1];
-      const product = await db.collection('products').findOne({ id });
-      if (!product) {
-        return NextResponse.json({ error: 'Ürün bulunamadı' }, { status: 404 });
-      }
-      return NextResponse.json(product);
-    }
+  // Henüz taşınmamış base64 görsel
+  if (image.data) {
+    const imageBuffer = Buffer.from(image.data.replace(/^data:image\/\w+;base64,/, ''), 'base64');
+    return new NextResponse(imageBuffer, {
+      headers: { 'Content-Type': image.mimeType || 'image/jpeg', 'Cache-Control': IMAGE_CACHE_CONTROL },
+    });
+  }
 
-    // GET /api/orders - Tüm siparişleri listele
-    if (path === 'orders' || path === 'orders/') {
-      const orders = await db.collection('orders').find({}).toArray();
-      return NextResponse.json(orders);
+  // Küçültülmüş / dönüştürülmüş türev: bir kez üretilir, LRU önbellekten sunulur
+  const derivativeParams = parseDerivativeParams(query, request.headers.get('accept'));
+  if (derivativeParams) {
+    const derivativeHeaders = {
+      'Content-Type': derivativeParams.mimeType,
+      'Cache-Control': IMAGE_CACHE_CONTROL,
+      'ETag': derivativeEtag(image.sha256, derivativeParams),
+      ...(derivativeParams.negotiated ? { 'Vary': 'Accept' } : {}),
+    };
+    if (etagMatches(request.headers.get('if-none-match'), derivativeHeaders.ETag)) {
+      return new NextResponse(null, { status: 304, headers: derivativeHeaders });
     }
+    const derivative = await getDerivative(db, image.sha256, derivativeParams);
+    return new NextResponse(derivative.buffer, {
+      headers: { ...derivativeHeaders, 'Content-Length': String(derivative.buffer.length) },
+    });
+  }
 
-    // GET /api/auth/me - Kullanıcı bilgilerini getir (JWT gerekli)
-    if (path === 'auth/me') {
-      const userData = verifyToken(request);
-      if (!userData) {
-        return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
-      }
-      const user = await db.collection('users').findOne({ id: userData.userId });
-      if (!user) {
-        return NextResponse.json({ error: 'User not found' }, { status: 404 });
-      }
-      const { password, ...userWithoutPassword } = user;
-      return NextResponse.json(userWithoutPassword);
-    }
+  const headers = {
+    'Content-Type': image.mimeType || 'image/jpeg',
+    'Cache-Control': IMAGE_CACHE_CONTROL,
+    'ETag': imageEtag(image.sha256),
+    'Accept-Ranges': 'bytes',
+  };
+  if (etagMatches(request.headers.get('if-none-match'), headers.ETag)) {
+    return new NextResponse(null, { status: 304, headers });
+  }
 
-    // GET /api/favorites - Favori ürünleri getir (JWT gerekli)
-    if (path === 'favorites' || path === 'favorites/') {
-      const userData = verifyToken(request);
-      if (!userData) {
-        return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
-      }
-      const user = await db.collection('users').findOne({ id: userData.userId });
-      if (!user) {
-        return NextResponse.json({ error: 'User not found' }, { status: 404 });
-      }
-      
-      // Favori ürünlerin detaylarını çek
-      const favoriteIds = user.favoriteProducts || [];
-      const favoriteProducts = await db.collection('products')
-        .find({ id: { $in: favoriteIds } })
-        .toArray();
-      
-      return NextResponse.json(favoriteProducts);
+  // If-Range eşleşmezse aralık yok sayılır ve tüm dosya gönderilir
+  const ifRange = request.headers.get('if-range');
+  const range = !ifRange || ifRange === headers.ETag ? parseRange(request.headers.get('range'), image.size) : null;
+  if (range === false) {
+    return new NextResponse(null, { status: 416, headers: { ...headers, 'Content-Range': `bytes */${image.size}` } });
+  }
+  if (range) {
+    return new NextResponse(streamImage(db, image.sha256, range), {
+      status: 206,
+      headers: {
+        ...headers,
+        'Content-Range': `bytes ${range.start}-${range.end}/${image.size}`,
+        'Content-Length': String(range.end - range.start + 1),
+      },
+    });
+  }
+  return new NextResponse(streamImage(db, image.sha256), {
+    headers: { ...headers, 'Content-Length': String(image.size) },
+  });
+});
+
+// GET /api/products - Ürünleri listele (filtre, sıralama, cursor sayfalama, alan seçimi)
+// limit veya cursor verilirse { items, nextCursor }, verilmezse eskisi gibi dizi döner
+// Yanıt önbellekten gelir (lib/responseCache), ürün yazımlarında yenilenir; ETag/304 destekli
+router.get('products', ({ request, query: searchParams, db }) => {
+  const query = parseProductQuery(searchParams);
+  return cachedJson(request, db, { scopes: PRODUCT_LIST_SCOPES }, async () => {
+    const cursor = db.collection('products').find(query.filter, { projection: query.projection });
+    if (query.sort) {
+      cursor.sort(query.sort);
     }
-
-    // GET /api/orders/my - Kullanıcının siparişleri (JWT gerekli)
-    if (path === 'orders/my') {
-      const userData = verifyToken(request);
-      if (!userData) {
-        return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
-      }
-      const orders = await db.collection('orders')
-        .find({ userId: userData.userId })
-        .sort({ createdAt: -1 })
-        .toArray();
-      return NextResponse.json(orders);
+    if (!query.paginate) {
+      return cursor.toArray();
     }
-
-    // GET /api/admin/orders - Tüm siparişler (Admin için)
-    if (path === 'admin/orders') {
-      const orders = await db.collection('orders')
-        .find({})
-        .sort({ createdAt: -1 })
-        .toArray();
-      return NextResponse.json(orders);
+    const items = await cursor.limit(query.limit + 1).toArray();
+    return productPage(items, query);
+  });
+});
+
+// GET /api/search - Katalog araması (yazım hatası toleranslı, TR/EN normalize) ve facet sayıları
+// { items, total, page, pages, facets: { productType, brand, gender, category, price }, corrections }
+router.get('search', ({ request, query: searchParams, db }) => {
+  const query = parseSearchQuery(searchParams);
+  return cachedJson(request, db, { scopes: PRODUCT_LIST_SCOPES }, () => searchProducts(db, query));
+});
+
+// GET /api/products/export - Ürünleri NDJSON/CSV olarak akış halinde indir (liste filtreleri geçerli, Admin)
+router.get('products/export', requireAdmin, ({ query, db }) => {
+  const format = productFileFormat(query);
+  const { filter } = parseProductQuery(query);
+  return new NextResponse(exportProducts(db, filter, format), {
+    headers: {
+      'Content-Type': PRODUCT_FILE_TYPES[format],
+      'Content-Disposition': `attachment; filename="products.${format}"`
     }
+  });
+});
+
+// GET /api/products/:id - Tek ürün detayı (önbellekli)
+router.get('products/:id', ({ request, params: { id }, db }) => {
+  return cachedJson(request, db, { scopes: productScopes(id), notFound: 'Ürün bulunamadı' },
+    () => db.collection('products').findOne({ id }, { projection: { ratingSum: 0 } }));
+});
+
+// GET /api/orders - Tüm siparişleri listele (Admin)
+router.get('orders', requireAdmin, async ({ db }) => {
+  const orders = await db.collection('orders').find({}).toArray();
+  return NextResponse.json(orders);
+});
+
+// GET /api/auth/me - Kullanıcı bilgilerini getir (JWT gerekli)
+router.get('auth/me', requireUser(), async ({ user: userData, db }) => {
+  // Profil kısa süre önbellekte tutulur (lib/userCache)
+  const user = await getUserProfile(db, userData.userId);
+  if (!user) {
+    return NextResponse.json({ error: 'User not found' }, { status: 404 });
+  }
+  return NextResponse.json(user);
+});
+
+// GET /api/favorites - Favori ürünleri getir (JWT gerekli)
+router.get('favorites', requireUser(), async ({ user: userData, db }) => {
+  // Favori ürünlerin kart bilgileri (önbellekten veya tek $in sorgusuyla)
+  const favoriteProducts = await getFavoriteProducts(db, userData.userId);
+  if (!favoriteProducts) {
+    return NextResponse.json({ error: 'User not found' }, { status: 404 });
+  }
 
-    // GET /api/users - Tüm kullanıcıları listele (Admin)
-    if (path === 'users' || path === 'users/') {
-      const users = await db.collection('users')
-        .find({})
-        .sort({ createdAt: -1 })
-        .toArray();
-      // Şifreleri kaldır
-      const usersWithoutPasswords = users.map(({ password, ...user }) => user);
-      return NextResponse.json(usersWithoutPasswords);
-    }
+  return NextResponse.json(favoriteProducts);
+});
+
+// GET /api/orders/my - Kullanıcının siparişleri (JWT gerekli)
+router.get('orders/my', requireUser(), async ({ user: userData, db }) => {
+  const orders = await db.collection('orders')
+    .find({ userId: userData.userId })
+    .sort({ createdAt: -1 })
+    .toArray();
+  return NextResponse.json(orders);
+});
+
+// GET /api/admin/orders/:id/invoice - Saklanan faturayı indir (Admin)
+router.get('admin/orders/:id/invoice', requireAdmin, async ({ params: { id: orderId }, db }) => {
+  const order = await db.collection('orders').findOne({ id: orderId }, { projection: { _id: 0 } });
+  if (!order) {
+    return NextResponse.json({ error: 'Sipariş bulunamadı' }, { status: 404 });
+  }
+  const user = order.userId
+    ? await db.collection('users').findOne({ id: order.userId }, { projection: { _id: 0, password: 0 } })
+    : null;
+  const invoices = await getInvoices(db, [order], new Map(user ? [[user.id, user]] : []));
+  return new NextResponse(invoices.get(orderId).html, {
+    headers: {
+      'Content-Type': 'text/html; charset=utf-8',
+      'Content-Disposition': `attachment; filename="fatura-${orderId}.html"`,
+    },
+  });
+});
+
+// GET /api/admin/stats - Panel özetleri (ciro, durum sayıları, en çok satanlar), ?days=30&top=10
+router.get('admin/stats', requireAdmin, async ({ query, db }) => {
+  const days = parseInt(query.get('days'));
+  const top = parseInt(query.get('top'));
+  const stats = await getAdminStats(db, {
+    days: isNaN(days) ? STATS_DAYS : days,
+    top: isNaN(top) ? TOP_PRODUCTS : Math.min(Math.max(top, 1), MAX_PAGE_SIZE)
+  });
+  return NextResponse.json(stats);
+});
+
+// GET /api/admin/orders - Siparişler (Admin için), en yeniden eskiye
+// ?status=paid,shipped&from=&to= filtreleri, ?limit=&cursor= ile sayfalı
+router.get('admin/orders', requireAdmin, async ({ query: searchParams, db }) => {
+  const query = parseOrderListQuery(searchParams);
+  return NextResponse.json(await findAdminPage(db.collection('orders'), query, ORDER_LIST_PROJECTION));
+});
+
+// GET /api/users - Kullanıcıları listele (Admin), şifre alanı okunmaz
+router.get('users', requireAdmin, async ({ query: searchParams, db }) => {
+  const query = parseAdminListQuery(searchParams);
+  return NextResponse.json(await findAdminPage(db.collection('users'), query, USER_LIST_PROJECTION));
+});
+
+// GET /api/users/:id/orders - Kullanıcının sipariş geçmişi (Admin), ?cursor= ile sonraki sayfalar
+router.get('users/:id/orders', requireAdmin, async ({ query: searchParams, params: { id }, db }) => {
+  const query = parseOrderHistoryQuery(id, searchParams);
+  return NextResponse.json(await findAdminPage(db.collection('orders'), query, ORDER_LIST_PROJECTION));
+});
+
+// GET /api/users/:id - Kullanıcı detayı (Admin)
+router.get('users/:id', requireAdmin, async ({ query, params: { id }, db }) => {
+  const [user, orders] = await Promise.all([
+    db.collection('users').findOne({ id }, { projection: USER_LIST_PROJECTION }),
+    // Sipariş geçmişinin ilk sayfası; devamı GET /api/users/:id/orders?cursor=
+    findAdminPage(db.collection('orders'), parseOrderHistoryQuery(id, query), ORDER_LIST_PROJECTION)
+  ]);
+  if (!user) {
+    return NextResponse.json({ error: 'Kullanıcı bulunamadı' }, { status: 404 });
+  }
 
-    // GET /api/users/:id - Kullanıcı detayı (Admin)
-    if (path.startsWith('users/') && path.split('/').length === 2) {
-      const id = path.split('/')[1];
-      const user = await db.collection('users').findOne({ id });
-      if (!user) {
-        return NextResponse.json({ error: 'Kullanıcı bulunamadı' }, { status: 404 });
-      }
-      const { password, ...userWithoutPassword } = user;
-      
-      // Kullanıcının siparişlerini de getir
-      const userOrders = await db.collection('orders')
-        .find({ userId: id })
-        .sort({ createdAt: -1 })
-        .toArray();
-      
-      return NextResponse.json({
-        ...userWithoutPassword,
-        orders: userOrders
-      });
+  return NextResponse.json({
+    ...user,
+    orders: orders.items,
+    ordersNextCursor: orders.nextCursor
+  });
+});
+
+// GET /api/reviews/:productId - Ürün değerlendirmelerini getir (önbellekli)
+router.get('reviews/:productId', ({ request, query: searchParams, params: { productId }, db }) => {
+  const query = parseReviewQuery(productId, searchParams);
+  return cachedJson(request, db, { scopes: productScopes(productId), notFound: 'Ürün bulunamadı' }, async () => {
+    const product = await db.collection('products').findOne({ id: productId }, { projection: { _id: 1 } });
+    if (!product) {
+      return null;
     }
+    const reviews = await db.collection('reviews')
+      .find(query.filter, { projection: query.projection })
+      .sort(query.sort)
+      .limit(query.paginate ? query.limit + 1 : query.limit)
+      .toArray();
+    return query.paginate ? reviewPage(reviews, query) : reviews;
+  });
+});
+
+// POST /api/upload - Dosya yükleme (GridFS'e ham bayt olarak, içerik adresli kaydeder, Admin)
+router.post('upload', requireAdmin, async ({ request, db }) => {
+  try {
+    const formData = await request.formData();
+    const file = formData.get('file');
 
-    // GET /api/reviews/:productId - Ürün değerlendirmelerini getir
-    if (path.startsWith('reviews/') && path.split('/').length === 2) {
-      const productId = path.split('/')[1];
-      const product = await db.collection('products').findOne({ id: productId });
-      if (!product) {
-        return NextResponse.json({ error: 'Ürün bulunamadı' }, { status: 404 });
-      }
-      return NextResponse.json(product.reviews || []);
+    if (!file) {
+      return NextResponse.json({ error: 'Dosya bulunamadı' }, { status: 400 });
     }
 
-    return NextResponse.json({ error: 'Endpoint bulunamadı' }, { status: 404 });
-  } catch (error) {
-    console.error('GET Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
-  }
-}
-
-// POST handler
-export async function POST(request) {
-  const url = new URL(request.url);
-  const path = url.pathname.replace('/api/', '');
+    // Dosya uzantısını kontrol et
+    const allowedTypes = ['image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'image/gif'];
+    if (!allowedTypes.includes(file.type)) {
+      return NextResponse.json({ error: 'Sadece resim dosyaları yüklenebilir (jpg, png, webp, gif)' }, { status: 400 });
+    }
 
-  try {
-    // POST /api/upload - Dosya yükleme (MongoDB'ye base64 olarak kaydeder)
-    if (path === 'upload' || path === 'upload/') {
-      try {
-        const formData = await request.formData();
-        const file = formData.get('file');
-
-        if (!file) {
-          return NextResponse.json({ error: 'Dosya bulunamadı' }, { status: 400 });
-        }
-
-        // Dosya uzantısını kontrol et
-        const allowedTypes = ['image/jpeg', 'image/jpg', 'image/png', 'image/webp', 'image/gif'];
-        if (!allowedTypes.includes(file.type)) {
-          return NextResponse.json({ error: 'Sadece resim dosyaları yüklenebilir (jpg, png, webp, gif)' }, { status: 400 });
-        }
-
-        // Dosya boyutunu kontrol et (5MB max)
-        if (file.size > 5 * 1024 * 1024) {
-          return NextResponse.json({ error: 'Dosya boyutu 5MB\'dan küçük olmalıdır' }, { status: 400 });
-        }
-
-        // Dosyayı base64'e çevir
-        const bytes = await file.arrayBuffer();
-        const buffer = Buffer.from(bytes);
-        const base64Data = `data:${file.type};base64,${buffer.toString('base64')}`;
-
-        // MongoDB'ye kaydet
-        const db = await getDB();
-        const imageId = uuidv4();
-        const imageDoc = {
-          id: imageId,
-          filename: file.name,
-          mimeType: file.type,
-          size: file.size,
-          data: base64Data,
-          createdAt: new Date().toISOString()
-        };
-        
-        await db.collection('images').insertOne(imageDoc);
-
-        // API URL'i döndür (artık /api/images/id formatında)
-        const fileUrl = `/api/images/${imageId}`;
-        return NextResponse.json({ url: fileUrl, success: true });
-      } catch (error) {
-        console.error('Upload Error:', error);
-        return NextResponse.json({ error: 'Dosya yüklenirken hata oluştu: ' + error.message }, { status: 500 });
-      }
+    // Dosya boyutunu kontrol et (5MB max)
+    if (file.size > 5 * 1024 * 1024) {
+      return NextResponse.json({ error: 'Dosya boyutu 5MB\'dan küçük olmalıdır' }, { status: 400 });
     }
 
-    const db = await getDB();
-    const body = await request.json();
+    const buffer = Buffer.from(await file.arrayBuffer());
 
-    // POST /api/auth/register - Kullanıcı kaydı
-    if (path === 'auth/register') {
-      const { email, password, fullName, phone, address } = body;
+    // Aynı içerik tekrar yüklenirse yeni kayıt açılmaz, aynı URL döner
+    const image = await storeImage(db, buffer, { filename: file.name, mimeType: file.type });
 
-      // Email kontrolü
-      const existingUser = await db.collection('users').findOne({ email });
-      if (existingUser) {
-        return NextResponse.json({ error: 'Bu email zaten kayıtlı' }, { status: 400 });
-      }
+    const fileUrl = `/api/images/${image.id}`;
+    return NextResponse.json({ url: fileUrl, success: true, id: image.id, deduplicated: image.deduplicated });
+  } catch (error) {
+    console.error('Upload Error:', error);
+    return NextResponse.json({ error: 'Dosya yüklenirken hata oluştu: ' + error.message }, { status: 500 });
+  }
+});
 
-      // Password hash
-      const hashedPassword = await bcrypt.hash(password, 10);
+// POST /api/products/import - Toplu ürün içe aktarma (NDJSON/CSV akışı, id'ye göre upsert, Admin)
+// Gövde JSON değildir ve tamamı belleğe alınmaz; satırlar parça parça yazılır
+router.post('products/import', requireAdmin, async ({ request, query, db }) => {
+  if (!request.body) {
+    return NextResponse.json({ error: 'Boş gövde' }, { status: 400 });
+  }
+  const format = productFileFormat(query, request.headers.get('content-type') || '');
+  const summary = await importProducts(db, productRows(request.body, format));
+  if (summary.valid > 0) {
+    invalidateFavoriteSummaries();
+    markCatalogChanged();
+    await invalidateCatalog(db);
+  }
+  return NextResponse.json(summary);
+});
 
-      // Yeni kullanıcı
-      const newUser = {
-        id: uuidv4(),
-        email,
-        password: hashedPassword,
-        fullName,
-        phone: phone || '',
-        address: address || '',
-        favoriteProducts: [],
-        createdAt: new Date().toISOString()
-      };
+// POST /api/auth/register - Kullanıcı kaydı
+router.post('auth/register', async ({ json, db }) => {
+  const { email, password, fullName, phone, address } = await json();
 
-      await db.collection('users').insertOne(newUser);
+  // Email kontrolü
+  const existingUser = await db.collection('users').findOne({ email });
+  if (existingUser) {
+    return NextResponse.json({ error: 'Bu email zaten kayıtlı' }, { status: 400 });
+  }
 
-      // JWT token oluştur
-      const token = jwt.sign({ userId: newUser.id, email: newUser.email }, JWT_SECRET, { expiresIn: '30d' });
+  // Password hash (worker thread havuzunda)
+  const hashedPassword = await hashPassword(password);
+
+  // Yeni kullanıcı
+  const newUser = {
+    id: uuidv4(),
+    email,
+    password: hashedPassword,
+    fullName,
+    phone: phone || '',
+    address: address || '',
+    favoriteProducts: [],
+    createdAt: new Date().toISOString()
+  };
 
-      const { password: _, ...userWithoutPassword } = newUser;
-      return NextResponse.json({ success: true, token, user: userWithoutPassword });
+  try {
+    await db.collection('users').insertOne(newUser);
+  } catch (error) {
+    // Eşzamanlı aynı e-posta kaydı: benzersiz email indeksi ikincisini reddeder
+    if (error.code === 11000) {
+      return NextResponse.json({ error: 'Bu email zaten kayıtlı' }, { status: 400 });
     }
+    throw error;
+  }
+  await recordUserRegistered(db, newUser);
+
+  // JWT token oluştur
+  const token = jwt.sign({ userId: newUser.id, email: newUser.email }, JWT_SECRET, { expiresIn: '30d' });
+
+  const { password: _, ...userWithoutPassword } = newUser;
+  return NextResponse.json({ success: true, token, user: userWithoutPassword });
+});
+
+// POST /api/auth/login - Kullanıcı girişi
+router.post('auth/login', async ({ request, json, db }) => {
+  const { email, password } = await json();
+  const ip = clientIp(request);
+
+  // Çok fazla hatalı denemeden sonra pencere bitene kadar bcrypt'e hiç gidilmez
+  const limit = checkLogin(email, ip);
+  if (!limit.allowed) {
+    return NextResponse.json(
+      { error: 'Çok fazla hatalı giriş denemesi, lütfen daha sonra tekrar deneyin' },
+      { status: 429, headers: { 'Retry-After': String(Math.ceil(limit.retryAfterMs / 1000)) } }
+    );
+  }
+  // İstemci IP'si bilinmiyorsa hesap kilitlenmez, denemeler yavaşlatılır
+  if (limit.delayMs > 0) {
+    await new Promise(resolve => setTimeout(resolve, limit.delayMs));
+  }
 
-    // POST /api/auth/login - Kullanıcı girişi
-    if (path === 'auth/login') {
-      const { email, password } = body;
+  const user = await db.collection('users').findOne({ email });
+  if (!user) {
+    recordLoginFailure(email, ip);
+    return NextResponse.json({ error: 'Email veya şifre hatalı' }, { status: 401 });
+  }
 
-      const user = await db.collection('users').findOne({ email });
-      if (!user) {
-        return NextResponse.json({ error: 'Email veya şifre hatalı' }, { status: 401 });
-      }
+  const isValidPassword = await verifyPassword(password, user.password);
+  if (!isValidPassword) {
+    recordLoginFailure(email, ip);
+    return NextResponse.json({ error: 'Email veya şifre hatalı' }, { status: 401 });
+  }
+  recordLoginSuccess(email, ip);
 
-      const isValidPassword = await bcrypt.compare(password, user.password);
-      if (!isValidPassword) {
-        return NextResponse.json({ error: 'Email veya şifre hatalı' }, { status: 401 });
-      }
+  // Eski maliyetle hash'lenmiş şifreyi yanıtı bekletmeden güncelle
+  if (await needsRehash(user.password)) {
+    hashPassword(password)
+      .then(hash => db.collection('users').updateOne({ id: user.id, password: user.password }, { $set: { password: hash } }))
+      .catch(error => console.error('Password rehash failed:', error));
+  }
 
-      // JWT token oluştur
-      const token = jwt.sign({ userId: user.id, email: user.email }, JWT_SECRET, { expiresIn: '30d' });
+  // JWT token oluştur
+  const token = jwt.sign({ userId: user.id, email: user.email }, JWT_SECRET, { expiresIn: '30d' });
 
-      const { password: _, ...userWithoutPassword } = user;
-      return NextResponse.json({ success: true, token, user: userWithoutPassword });
-    }
+  const { password: _, ...userWithoutPassword } = user;
+  return NextResponse.json({ success: true, token, user: userWithoutPassword });
+});
 
-    // POST /api/login/login - Admin girişi
-    if (path === 'login/login') {
-      const { username, password } = body;
-      if (username === ADMIN_USERNAME && password === ADMIN_PASSWORD) {
-        return NextResponse.json({ success: true, message: 'Giriş başarılı' });
-      }
-      return NextResponse.json({ error: 'Kullanıcı adı veya şifre hatalı' }, { status: 401 });
-    }
+// POST /api/login/login - Admin girişi; admin rotaları için token döner
+router.post('login/login', async ({ json }) => {
+  const { username, password } = await json();
+  if (username === ADMIN_USERNAME && password === ADMIN_PASSWORD) {
+    return NextResponse.json({ success: true, message: 'Giriş başarılı', token: signAdminToken(username) });
+  }
+  return NextResponse.json({ error: 'Kullanıcı adı veya şifre hatalı' }, { status: 401 });
+});
+
+// POST /api/products - Yeni ürün ekle (Admin)
+router.post('products', requireAdmin, async ({ json, db }) => {
+  const body = await json();
+  // images array'ini oluştur
+  let imagesArray = body.images || [];
+  // Eğer images boşsa ama image varsa, onu array'e ekle
+  if (imagesArray.length === 0 && body.image) {
+    imagesArray = [body.image];
+  }
 
-    // POST /api/products - Yeni ürün ekle
-    if (path === 'products' || path === 'products/') {
-      // images array'ini oluştur
-      let imagesArray = body.images || [];
-      // Eğer images boşsa ama image varsa, onu array'e ekle
-      if (imagesArray.length === 0 && body.image) {
-        imagesArray = [body.image];
-      }
-      
-      const product = {
-        id: uuidv4(),
-        name: body.name,
-        description: body.description,
-        price: parseFloat(body.price),
-        image: body.image || (imagesArray.length > 0 ? imagesArray[0] : 'https://via.placeholder.com/400x300?text=Ürün+Görseli'),
-        images: imagesArray, // Çoklu görsel desteği
-        stock: parseInt(body.stock) || 100,
-        category: body.category || 'Genel',
-        productType: body.productType || 'watch', // 'watch', 'eyewear', 'eta'
-        gender: body.gender || 'unisex', // 'male', 'female', 'unisex'
-        brand: body.brand || '',
-        specs: {
-          glassType: body.specs?.glassType || '',
-          machineType: body.specs?.machineType || '',
-          dialColor: body.specs?.dialColor || '',
-          strapType: body.specs?.strapType || '',
-          caseSize: body.specs?.caseSize || '',
-          caseMaterial: body.specs?.caseMaterial || '',
-          functions: body.specs?.functions || '',
-          calendar: body.specs?.calendar || '',
-          features: body.specs?.features || '',
-          warranty: body.specs?.warranty || ''
-        },
-        reviews: [],
-        createdAt: new Date().toISOString()
-      };
-      await db.collection('products').insertOne(product);
-      return NextResponse.json(product);
-    }
+  const product = {
+    id: uuidv4(),
+    name: body.name,
+    description: body.description,
+    price: parseFloat(body.price),
+    image: body.image || (imagesArray.length > 0 ? imagesArray[0] : 'https://via.placeholder.com/400x300?text=Ürün+Görseli'),
+    images: imagesArray, // Çoklu görsel desteği
+    stock: parseInt(body.stock) || 100,
+    category: body.category || 'Genel',
+    productType: body.productType || 'watch', // 'watch', 'eyewear', 'eta'
+    gender: body.gender || 'unisex', // 'male', 'female', 'unisex'
+    brand: body.brand || '',
+    specs: productSpecs(body.specs),
+    ratingCount: 0,
+    ratingSum: 0,
+    ratingAverage: 0,
+    createdAt: new Date().toISOString()
+  };
+  await db.collection('products').insertOne(product);
+  markProductChanged(product.id);
+  await invalidateProduct(db, product.id);
+  return NextResponse.json(product);
+});
+
+// POST /api/orders - Sipariş oluştur (token varsa sipariş kullanıcıya bağlanır)
+// Stok atomik olarak rezerve edilir; fiyat ve toplam sunucuda hesaplanır (istemcinin gönderdiği yok sayılır)
+router.post('orders', optionalUser, async ({ user: userData, json, db }) => {
+  const body = await json();
+  const userId = userData ? userData.userId : null;
+
+  const reservation = await reserveStock(db, parseOrderItems(body.items));
+  if (reservation.unavailable) {
+    return NextResponse.json({ error: 'Yetersiz stok', unavailable: reservation.unavailable }, { status: 409 });
+  }
 
-    // POST /api/orders - Sipariş oluştur
-    if (path === 'orders' || path === 'orders/') {
-      const userData = verifyToken(request);
-      const userId = userData ? userData.userId : null;
-
-      const order = {
-        id: uuidv4(),
-        userId: userId,
-        items: body.items,
-        totalAmount: parseFloat(body.totalAmount),
-        customerInfo: body.customerInfo,
-        paymentMethod: body.paymentMethod,
-        status: 'pending',
-        emailSent: false,
-        createdAt: new Date().toISOString()
-      };
-      await db.collection('orders').insertOne(order);
-      return NextResponse.json(order);
+  const order = {
+    id: uuidv4(),
+    userId: userId,
+    items: reservation.items,
+    totalAmount: reservation.totalAmount,
+    customerInfo: body.customerInfo,
+    paymentMethod: body.paymentMethod,
+    status: 'pending',
+    emailSent: false,
+    stockReserved: true,
+    reservedUntil: reservationDeadline(ORDER_RESERVATION_MS),
+    createdAt: new Date().toISOString()
+  };
+  try {
+    await db.collection('orders').insertOne(order);
+  } catch (error) {
+    await cancelReservation(db, order.items);
+    throw error;
+  }
+  await recordOrderCreated(db, order);
+  return NextResponse.json(order);
+});
+
+// POST /api/payment/bank - Mock banka ödemesi
+router.post('payment/bank', async ({ json, db }) => {
+  const { orderId, amount, cardInfo } = await json();
+
+  // Simüle edilmiş ödeme işlemi
+  const success = Math.random() > 0.2; // %80 başarı oranı
+
+  if (success) {
+    // pending/awaiting_transfer -> paid; eşzamanlı veya tekrar gönderimlerde sadece biri geçer
+    // Ödenen siparişin rezervasyonu artık süresiz
+    const { order, changed } = await transitionOrder(db, orderId, 'paid', {
+      paidAt: new Date().toISOString(),
+      transactionId: uuidv4(),
+      reservedUntil: null
+    });
+    if (!order) {
+      return NextResponse.json({ success: false, message: 'Sipariş bulunamadı' }, { status: 404 });
     }
-
-    // POST /api/payment/bank - Mock banka ödemesi
-    if (path === 'payment/bank') {
-      const { orderId, amount, cardInfo } = body;
-
-      // Simüle edilmiş ödeme işlemi
-      const success = Math.random() > 0.2; // %80 başarı oranı
-
-      if (success) {
-        // Sipariş durumunu güncelle
-        const order = await db.collection('orders').findOne({ id: orderId });
-        await db.collection('orders').updateOne(
-          { id: orderId },
-          { $set: { status: 'paid', paidAt: new Date().toISOString() } }
-        );
-
-        // Fatura emaili gönder
-        const updatedOrder = await db.collection('orders').findOne({ id: orderId });
-        let user = null;
-        if (updatedOrder.userId) {
-          user = await db.collection('users').findOne({ id: updatedOrder.userId });
-        }
-        
-        const emailResult = await sendInvoiceEmail(updatedOrder, user);
-        if (emailResult.success) {
-          await db.collection('orders').updateOne(
-            { id: orderId },
-            { $set: { emailSent: true, invoiceEmailId: emailResult.emailId } }
-          );
-        }
-
-        return NextResponse.json({
-          success: true,
-          transactionId: uuidv4(),
-          message: 'Ödeme başarılı! Fatura email adresinize gönderildi.'
-        });
-      } else {
-        return NextResponse.json({
-          success: false,
-          message: 'Ödeme reddedildi (Demo)'
-        }, { status: 400 });
-      }
+    if (changed) {
+      // Fatura emaili kuyruğa alınır, yanıt gönderimi beklemez; anahtar hedef durumu içerir,
+      // böylece havale aşamasında kuyruğa giren fatura ödeme faturasını engellemez
+      await enqueueEmail(db, 'invoice', orderId, `invoice:${orderId}:paid`);
+    } else if (order.status !== 'paid') {
+      return NextResponse.json({ success: false, message: 'Bu sipariş için ödeme alınamaz' }, { status: 409 });
     }
 
-    // POST /api/payment/transfer - IBAN/Havale ödemesi
-    if (path === 'payment/transfer') {
-      const { orderId } = body;
-
-      // Havale bekliyor durumuna al
-      const order = await db.collection('orders').findOne({ id: orderId });
-      await db.collection('orders').updateOne(
-        { id: orderId },
-        { $set: { status: 'awaiting_transfer', requestedAt: new Date().toISOString() } }
-      );
-
-      // Fatura emaili gönder
-      const updatedOrder = await db.collection('orders').findOne({ id: orderId });
-      let user = null;
-      if (updatedOrder.userId) {
-        user = await db.collection('users').findOne({ id: updatedOrder.userId });
-      }
-      
-      const emailResult = await sendInvoiceEmail(updatedOrder, user);
-      if (emailResult.success) {
-        await db.collection('orders').updateOne(
-          { id: orderId },
-          { $set: { emailSent: true, invoiceEmailId: emailResult.emailId } }
-        );
-      }
-
+    return NextResponse.json({
+      success: true,
+      transactionId: order.transactionId,
+      alreadyProcessed: !changed,
+      message: changed
+        ? 'Ödeme başarılı! Fatura email adresinize gönderilecek.'
+        : 'Bu sipariş zaten ödendi.'
+    });
+  } else {
+    // Zaten ödenmiş bir siparişin tekrar gönderimi reddedilmiş gibi görünmemeli
+    const order = await db.collection('orders').findOne(
+      { id: orderId },
+      { projection: { _id: 0, status: 1, transactionId: 1 } }
+    );
+    if (order?.status === 'paid') {
       return NextResponse.json({
         success: true,
-        iban: 'TR33 0006 1005 1978 6457 8413 26',
-        accountName: 'E-Ticaret Şirketi A.Ş.',
-        message: 'Havale bilgileri email adresinize gönderildi.'
+        transactionId: order.transactionId,
+        alreadyProcessed: true,
+        message: 'Bu sipariş zaten ödendi.'
       });
     }
+    return NextResponse.json({
+      success: false,
+      message: 'Ödeme reddedildi (Demo)'
+    }, { status: 400 });
+  }
+});
+
+// POST /api/payment/transfer - IBAN/Havale ödemesi
+router.post('payment/transfer', async ({ json, db }) => {
+  const { orderId } = await json();
+
+  // Havale bekliyor durumuna al (sadece bekleyen siparişler); rezervasyon havale süresi kadar uzar
+  const { order, changed } = await transitionOrder(db, orderId, 'awaiting_transfer', {
+    requestedAt: new Date().toISOString(),
+    reservedUntil: reservationDeadline(TRANSFER_RESERVATION_MS)
+  });
+  if (!order) {
+    return NextResponse.json({ success: false, message: 'Sipariş bulunamadı' }, { status: 404 });
+  }
+  if (changed) {
+    // Fatura emaili kuyruğa alınır, yanıt gönderimi beklemez
+    await enqueueEmail(db, 'invoice', orderId, `invoice:${orderId}:awaiting_transfer`);
+  } else if (order.status !== 'awaiting_transfer') {
+    return NextResponse.json({ success: false, message: 'Bu sipariş için havale başlatılamaz' }, { status: 409 });
+  }
 
-    // POST /api/favorites/add - Favorilere ekle (JWT gerekli)
-    if (path === 'favorites/add') {
-      const userData = verifyToken(request);
-      if (!userData) {
-        return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
-      }
-
-      const { productId } = body;
-      await db.collection('users').updateOne(
-        { id: userData.userId },
-        { $addToSet: { favoriteProducts: productId } }
-      );
-
-      return NextResponse.json({ success: true, message: 'Favorilere eklendi' });
+  return NextResponse.json({
+    success: true,
+    iban: 'TR33 0006 1005 1978 6457 8413 26',
+    accountName: 'E-Ticaret Şirketi A.Ş.',
+    message: 'Havale bilgileri email adresinize gönderildi.'
+  });
+});
+
+// POST /api/admin/stats/rebuild - Panel özetlerini siparişlerden baştan hesapla (Admin, backfill)
+router.post('admin/stats/rebuild', requireAdmin, async ({ db }) => {
+  const result = await rebuildAdminStats(db);
+  return NextResponse.json({ success: true, ...result });
+});
+
+// POST /api/admin/reservations/expire - Süresi dolan stok rezervasyonlarını hemen düşür (Admin)
+router.post('admin/reservations/expire', requireAdmin, async ({ db }) => {
+  const expired = await expireReservations(db);
+  return NextResponse.json({ success: true, expired });
+});
+
+// POST /api/admin/orders/:id/invoice/resend - Faturayı tekrar gönder (Admin)
+router.post('admin/orders/:id/invoice/resend', requireAdmin, async ({ params: { id: orderId }, db }) => {
+  const order = await db.collection('orders').findOne({ id: orderId }, { projection: { _id: 1 } });
+  if (!order) {
+    return NextResponse.json({ error: 'Sipariş bulunamadı' }, { status: 404 });
+  }
+  // Her tekrar gönderim ayrı bir iş; fatura yeniden üretilmez
+  await enqueueEmail(db, 'invoice', orderId, `invoice:${orderId}:resend:${uuidv4()}`);
+  return NextResponse.json({ success: true, message: 'Fatura tekrar gönderim kuyruğuna alındı' });
+});
+
+// POST /api/favorites/add - Favorilere ekle (JWT gerekli)
+router.post('favorites/add', requireUser(), async ({ user: userData, json, db }) => {
+  const { productId } = await json();
+  await db.collection('users').updateOne(
+    { id: userData.userId },
+    { $addToSet: { favoriteProducts: productId } }
+  );
+  invalidateUser(userData.userId);
+
+  return NextResponse.json({ success: true, message: 'Favorilere eklendi' });
+});
+
+// POST /api/reviews/:productId - Değerlendirme ekle (JWT gerekli)
+router.post('reviews/:productId', requireUser('Değerlendirme yapmak için giriş yapmalısınız'),
+  async ({ user: userData, params: { productId }, json, db }) => {
+    const { rating, comment } = await json();
+
+    if (!rating || rating < 1 || rating > 5) {
+      return NextResponse.json({ error: 'Geçersiz puan (1-5 arası)' }, { status: 400 });
     }
 
-    // POST /api/reviews/:productId - Değerlendirme ekle
-    if (path.startsWith('reviews/') && path.split('/').length === 2) {
-      const productId = path.split('/')[1];
-      const userData = verifyToken(request);
-      
-      if (!userData) {
-        return NextResponse.json({ error: 'Değerlendirme yapmak için giriş yapmalısınız' }, { status: 401 });
-      }
-
-      const { rating, comment } = body;
-      
-      if (!rating || rating < 1 || rating > 5) {
-        return NextResponse.json({ error: 'Geçersiz puan (1-5 arası)' }, { status: 400 });
-      }
-
-      const user = await db.collection('users').findOne({ id: userData.userId });
-      
-      const review = {
-        id: uuidv4(),
-        userId: userData.userId,
-        userName: user.fullName || user.email,
-        rating: parseInt(rating),
-        comment: comment || '',
-        createdAt: new Date().toISOString()
-      };
-
-      await db.collection('products').updateOne(
-        { id: productId },
-        { $push: { reviews: review } }
-      );
-
-      return NextResponse.json({ success: true, review });
+    const user = await getUserProfile(db, userData.userId);
+    if (!user) {
+      return NextResponse.json({ error: 'Kullanıcı bulunamadı' }, { status: 404 });
     }
 
-    return NextResponse.json({ error: 'Endpoint bulunamadı' }, { status: 404 });
-  } catch (error) {
-    console.error('POST Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
-  }
-}
-
-// PUT handler
-export async function PUT(request) {
-  const url = new URL(request.url);
-  const path = url.pathname.replace('/api/', '');
-
-  try {
-    const db = await getDB();
-    const body = await request.json();
-
-    // PUT /api/auth/profile - Profil güncelleme (JWT gerekli)
-    if (path === 'auth/profile') {
-      const userData = verifyToken(request);
-      if (!userData) {
-        return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
-      }
-
-      const { fullName, phone, address } = body;
-      await db.collection('users').updateOne(
-        { id: userData.userId },
-        { $set: { fullName, phone, address, updatedAt: new Date().toISOString() } }
-      );
-
-      return NextResponse.json({ success: true, message: 'Profil güncellendi' });
+    const review = {
+      id: uuidv4(),
+      productId,
+      userId: userData.userId,
+      userName: user.fullName || user.email,
+      rating: parseInt(rating),
+      comment: comment || '',
+      createdAt: new Date().toISOString()
+    };
+
+    // Önce değerlendirme yazılır (id benzersiz indeksli), sonra ortalama ve sayı ürün üzerinde artımlı güncellenir;
+    // ürün yoksa ya da güncelleme başarısız olursa değerlendirme geri alınır, böylece özet kayıtlardan sapmaz
+    await db.collection('reviews').insertOne({ ...review });
+    let result;
+    try {
+      result = await db.collection('products').updateOne({ id: productId }, ratingUpdate(review.rating));
+    } catch (error) {
+      await db.collection('reviews').deleteOne({ id: review.id });
+      throw error;
     }
-
-    // PUT /api/products/:id - Ürün güncelle
-    if (path.startsWith('products/') && path.split('/').length === 2) {
-      const id = path.split('/')[1];
-      
-      // images array'ini oluştur
-      let imagesArray = body.images || [];
-      // Eğer images boşsa ama image varsa, onu array'e ekle
-      if (imagesArray.length === 0 && body.image) {
-        imagesArray = [body.image];
-      }
-      
-      const updateData = {
-        name: body.name,
-        description: body.description,
-        price: parseFloat(body.price),
-        image: body.image || (imagesArray.length > 0 ? imagesArray[0] : ''),
-        images: imagesArray, // Çoklu görsel desteği
-        stock: parseInt(body.stock),
-        category: body.category,
-        productType: body.productType || 'watch',
-        gender: body.gender || 'unisex',
-        brand: body.brand || '',
-        specs: {
-          glassType: body.specs?.glassType || '',
-          machineType: body.specs?.machineType || '',
-          dialColor: body.specs?.dialColor || '',
-          strapType: body.specs?.strapType || '',
-          caseSize: body.specs?.caseSize || '',
-          caseMaterial: body.specs?.caseMaterial || '',
-          functions: body.specs?.functions || '',
-          calendar: body.specs?.calendar || '',
-          features: body.specs?.features || '',
-          warranty: body.specs?.warranty || ''
-        },
-        updatedAt: new Date().toISOString()
-      };
-
-      const result = await db.collection('products').updateOne(
-        { id },
-        { $set: updateData }
-      );
-
-      if (result.matchedCount === 0) {
-        return NextResponse.json({ error: 'Ürün bulunamadı' }, { status: 404 });
-      }
-
-      return NextResponse.json({ success: true, message: 'Ürün güncellendi' });
+    if (result.matchedCount === 0) {
+      await db.collection('reviews').deleteOne({ id: review.id });
+      return NextResponse.json({ error: 'Ürün bulunamadı' }, { status: 404 });
     }
+    await invalidateProduct(db, productId);
+
+    return NextResponse.json({ success: true, review });
+  });
+
+// PUT /api/auth/profile - Profil güncelleme (JWT gerekli)
+router.put('auth/profile', requireUser(), async ({ user: userData, json, db }) => {
+  const { fullName, phone, address } = await json();
+  await db.collection('users').updateOne(
+    { id: userData.userId },
+    { $set: { fullName, phone, address, updatedAt: new Date().toISOString() } }
+  );
+  invalidateUser(userData.userId);
+
+  return NextResponse.json({ success: true, message: 'Profil güncellendi' });
+});
+
+// PUT /api/products/:id - Ürün güncelle (Admin)
+router.put('products/:id', requireAdmin, async ({ params: { id }, json, db }) => {
+  const body = await json();
+  // Stok verilmezse mevcut değer korunur; geçersiz değer rezervasyonları bozacağı için reddedilir
+  const stockGiven = body.stock !== undefined && body.stock !== null && body.stock !== '';
+  const stock = Number(body.stock);
+  if (stockGiven && (!Number.isInteger(stock) || stock < 0)) {
+    return NextResponse.json({ error: 'Geçersiz stok' }, { status: 400 });
+  }
+  // images array'ini oluştur
+  let imagesArray = body.images || [];
+  // Eğer images boşsa ama image varsa, onu array'e ekle
+  if (imagesArray.length === 0 && body.image) {
+    imagesArray = [body.image];
+  }
 
-    // PUT /api/admin/orders/:id - Sipariş durumu güncelleme (Admin)
-    if (path.startsWith('admin/orders/') && path.split('/').length === 3) {
-      const id = path.split('/')[2];
-      const { status } = body;
+  const updateData = {
+    name: body.name,
+    description: body.description,
+    price: parseFloat(body.price),
+    image: body.image || (imagesArray.length > 0 ? imagesArray[0] : ''),
+    images: imagesArray, // Çoklu görsel desteği
+    ...(stockGiven && { stock }),
+    category: body.category,
+    productType: body.productType || 'watch',
+    gender: body.gender || 'unisex',
+    brand: body.brand || '',
+    specs: productSpecs(body.specs),
+    updatedAt: new Date().toISOString()
+  };
+
+  const result = await db.collection('products').updateOne(
+    { id },
+    { $set: updateData }
+  );
+
+  if (result.matchedCount === 0) {
+    return NextResponse.json({ error: 'Ürün bulunamadı' }, { status: 404 });
+  }
+  invalidateFavoriteSummaries();
+  markProductChanged(id);
+  await invalidateProduct(db, id);
 
-      const result = await db.collection('orders').updateOne(
-        { id },
-        { $set: { status, updatedAt: new Date().toISOString() } }
-      );
+  return NextResponse.json({ success: true, message: 'Ürün güncellendi' });
+});
 
-      if (result.matchedCount === 0) {
-        return NextResponse.json({ error: 'Sipariş bulunamadı' }, { status: 404 });
-      }
+// PUT /api/admin/orders/:id - Sipariş durumu güncelleme (Admin)
+router.put('admin/orders/:id', requireAdmin, async ({ params: { id }, json, db }) => {
+  const { status } = await json();
 
-      return NextResponse.json({ success: true, message: 'Sipariş durumu güncellendi' });
-    }
+  const { order, changed, from } = await transitionOrder(db, id, status);
 
-    return NextResponse.json({ error: 'Endpoint bulunamadı' }, { status: 404 });
-  } catch (error) {
-    console.error('PUT Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
+  if (!order) {
+    return NextResponse.json({ error: 'Sipariş bulunamadı' }, { status: 404 });
+  }
+  if (!changed && order.status !== status) {
+    return NextResponse.json({ error: `Sipariş durumu ${from} -> ${status} olarak değiştirilemez` }, { status: 409 });
   }
-}
-
-// DELETE handler
-export async function DELETE(request) {
-  const url = new URL(request.url);
-  const path = url.pathname.replace('/api/', '');
 
-  try {
-    const db = await getDB();
+  return NextResponse.json({ success: true, message: 'Sipariş durumu güncellendi' });
+});
 
-    // DELETE /api/products/:id - Ürün sil
-    if (path.startsWith('products/') && path.split('/').length === 2) {
-      const id = path.split('/')[1];
-      const result = await db.collection('products').deleteOne({ id });
+// DELETE /api/products/:id - Ürün sil (Admin)
+router.delete('products/:id', requireAdmin, async ({ params: { id }, db }) => {
+  const result = await db.collection('products').deleteOne({ id });
 
-      if (result.deletedCount === 0) {
-        return NextResponse.json({ error: 'Ürün bulunamadı' }, { status: 404 });
-      }
+  if (result.deletedCount === 0) {
+    return NextResponse.json({ error: 'Ürün bulunamadı' }, { status: 404 });
+  }
+  await db.collection('reviews').deleteMany({ productId: id });
+  invalidateFavoriteSummaries();
+  markProductChanged(id);
+  await invalidateProduct(db, id);
 
-      return NextResponse.json({ success: true, message: 'Ürün silindi' });
-    }
+  return NextResponse.json({ success: true, message: 'Ürün silindi' });
+});
 
-    // DELETE /api/favorites/remove - Favorilerden çıkar (JWT gerekli)
-    if (path === 'favorites/remove') {
-      const userData = verifyToken(request);
-      if (!userData) {
-        return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
-      }
+// DELETE /api/favorites/remove - Favorilerden çıkar (JWT gerekli)
+router.delete('favorites/remove', requireUser(), async ({ user: userData, json, db }) => {
+  const { productId } = await json();
 
-      const body = await request.json();
-      const { productId } = body;
+  await db.collection('users').updateOne(
+    { id: userData.userId },
+    { $pull: { favoriteProducts: productId } }
+  );
+  invalidateUser(userData.userId);
 
-      await db.collection('users').updateOne(
-        { id: userData.userId },
-        { $pull: { favoriteProducts: productId } }
-      );
+  return NextResponse.json({ success: true, message: 'Favorilerden çıkarıldı' });
+});
 
-      return NextResponse.json({ success: true, message: 'Favorilerden çıkarıldı' });
-    }
+const handleRequest = withTracing(withDbOps(router.handler()));
 
-    return NextResponse.json({ error: 'Endpoint bulunamadı' }, { status: 404 });
-  } catch (error) {
-    console.error('DELETE Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
-  }
-}
+export const GET = handleRequest;
+export const POST = handleRequest;
+export const PUT = handleRequest;
+export const DELETE = handleRequest;
@@ -6,7 +6,7 @@ import Navbar from '@/components/Navbar';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent } from '@/components/ui/card';
 import { ArrowLeft, ShoppingCart, Trash2, Minus, Plus } from 'lucide-react';
-import { formatPrice } from '@/lib/utils';
+import { formatPrice, imageSrc } from '@/lib/utils';
 
 export default function CartPage() {
   const router = useRouter();
@@ -79,7 +79,7 @@ export default function CartPage() {
                   <CardContent className="p-4">
                     <div className="flex items-center space-x-4">
                       <img
-                        src={item.image}
+                        src={imageSrc(item.image, 256)}
                         alt={item.name}
                         className="w-24 h-24 object-cover rounded"
                       />
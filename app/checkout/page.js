@@ -88,13 +88,12 @@ export default function CheckoutPage() {
         headers['Authorization'] = `Bearer ${token}`;
       }
 
-      // Sipariş oluştur
+      // Sipariş oluştur - fiyat ve toplamı sunucu hesaplar, stok sipariş anında ayrılır
       const orderResponse = await fetch('/api/orders', {
         method: 'POST',
         headers,
         body: JSON.stringify({
-          items: cart,
-          totalAmount,
+          items: cart.map(item => ({ id: item.id, quantity: item.quantity })),
           customerInfo: {
             fullName: formData.fullName,
             email: formData.email,
@@ -107,6 +106,14 @@ export default function CheckoutPage() {
 
       const order = await orderResponse.json();
 
+      if (!orderResponse.ok) {
+        const missing = (order.unavailable || [])
+          .map(item => `${item.name || item.id}: ${item.available} adet kaldı`)
+          .join('\n');
+        alert((order.error || 'Sipariş oluşturulamadı') + (missing ? '\n' + missing : ''));
+        return;
+      }
+
       if (paymentMethod === 'bank') {
         // Banka API ile ödeme (Mock)
         const paymentResponse = await fetch('/api/payment/bank', {
@@ -114,7 +121,7 @@ export default function CheckoutPage() {
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({
             orderId: order.id,
-            amount: totalAmount,
+            amount: order.totalAmount,
             cardInfo: {
               number: formData.cardNumber,
               expiry: formData.cardExpiry,
@@ -10,7 +10,7 @@ import { Label } from '@/components/ui/label';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Badge } from '@/components/ui/badge';
 import { User, Package, Heart, Settings, LogOut, ShoppingBag, Mail, Phone, MapPin, Calendar, CreditCard } from 'lucide-react';
-import { formatPrice } from '@/lib/utils';
+import { formatPrice, imageSrc } from '@/lib/utils';
 import { Alert, AlertDescription } from '@/components/ui/alert';
 
 export default function DashboardPage() {
@@ -271,7 +271,7 @@ export default function DashboardPage() {
                     <Card key={product.id} className="bg-white border-gray-200 hover:border-[#006039]/50 transition-colors overflow-hidden group shadow-sm">
                       <div className="relative h-48 bg-gray-100">
                         <img
-                          src={product.image}
+                          src={imageSrc(product.image, 640)}
                           alt={product.name}
                           className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-300"
                         />
@@ -1,13 +1,14 @@
 'use client';
 
-import { useState, useEffect, useMemo, Suspense } from 'react';
+import { useState, useEffect, Suspense } from 'react';
 import { useRouter, useSearchParams } from 'next/navigation';
 import Navbar from '@/components/Navbar';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardFooter, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
 import { Input } from '@/components/ui/input';
-import { formatPrice } from '@/lib/utils';
+import { formatPrice, imageSrc } from '@/lib/utils';
+import { useProductSearch } from '@/lib/useProductSearch';
 import {
   Select,
   SelectContent,
@@ -31,8 +32,6 @@ const ITEMS_PER_PAGE = 10;
 function EyewearPageContent() {
   const router = useRouter();
   const searchParams = useSearchParams();
-  const [products, setProducts] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [cart, setCart] = useState([]);
 
   const [searchQuery, setSearchQuery] = useState('');
@@ -49,78 +48,25 @@ function EyewearPageContent() {
   }, [searchParams]);
 
   useEffect(() => {
-    fetchProducts();
     const savedCart = localStorage.getItem('cart');
     if (savedCart) {
       setCart(JSON.parse(savedCart));
     }
   }, []);
 
-  const fetchProducts = async () => {
-    try {
-      const response = await fetch('/api/products');
-      const data = await response.json();
-      // Filter only eyewear products using productType
-      const eyewearProducts = (Array.isArray(data) ? data : []).filter(
-        p => p.productType === 'eyewear' || p.category === 'Gözlük'
-      );
-      setProducts(eyewearProducts);
-    } catch (error) {
-      console.error('Ürünler yüklenemedi:', error);
-      setProducts([]);
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  const filteredProducts = useMemo(() => {
-    let result = products.filter(p => 
-      p.productType === 'eyewear' || p.category === 'Gözlük'
-    );
-
-    if (searchQuery.trim()) {
-      const query = searchQuery.toLowerCase();
-      result = result.filter(
-        p =>
-          p.name?.toLowerCase().includes(query) ||
-          p.description?.toLowerCase().includes(query) ||
-          p.brand?.toLowerCase().includes(query)
-      );
-    }
-
-    if (genderFilter !== 'all') {
-      result = result.filter(p => p.gender === genderFilter || p.gender === 'unisex');
-    }
-
-    switch (sortBy) {
-      case 'price-asc':
-        result.sort((a, b) => (a.price || 0) - (b.price || 0));
-        break;
-      case 'price-desc':
-        result.sort((a, b) => (b.price || 0) - (a.price || 0));
-        break;
-      case 'name-asc':
-        result.sort((a, b) => (a.name || '').localeCompare(b.name || ''));
-        break;
-      case 'name-desc':
-        result.sort((a, b) => (b.name || '').localeCompare(a.name || ''));
-        break;
-      default:
-        break;
-    }
-
-    return result;
-  }, [products, searchQuery, genderFilter, sortBy]);
-
-  const totalPages = Math.ceil(filteredProducts.length / ITEMS_PER_PAGE);
-  const paginatedProducts = useMemo(() => {
-    const start = (currentPage - 1) * ITEMS_PER_PAGE;
-    return filteredProducts.slice(start, start + ITEMS_PER_PAGE);
-  }, [filteredProducts, currentPage]);
+  // Arama, filtre, sıralama ve sayfalama sunucuda yapılır (GET /api/search); yalnızca görüntülenen sayfa gelir
+  const { items: paginatedProducts, total, pages: totalPages, loading } = useProductSearch({
+    productType: 'eyewear',
+    query: searchQuery,
+    gender: genderFilter,
+    sort: sortBy,
+    page: currentPage,
+    limit: ITEMS_PER_PAGE
+  });
 
   useEffect(() => {
     setCurrentPage(1);
-  }, [searchQuery, sortBy]);
+  }, [searchQuery, genderFilter, sortBy]);
 
   const addToCart = (product) => {
     const existingItem = cart.find(item => item.id === product.id);
@@ -245,7 +191,7 @@ function EyewearPageContent() {
           </div>
 
           <div className="mt-4 pt-4 border-t border-gray-200 flex items-center justify-between text-sm text-gray-600">
-            <span>{filteredProducts.length} ürün bulundu</span>
+            <span>{total} ürün bulundu</span>
             <span>Sayfa {currentPage} / {totalPages || 1}</span>
           </div>
         </div>
@@ -279,7 +225,7 @@ function EyewearPageContent() {
                       className="relative h-44 bg-gray-100 rounded-t-lg overflow-hidden"
                     >
                       <img
-                        src={product.image}
+                        src={imageSrc(product.image, 640)}
                         alt={product.name}
                         className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-500"
                       />
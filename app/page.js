@@ -6,7 +6,8 @@ import Navbar from '@/components/Navbar';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardFooter, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
-import { formatPrice } from '@/lib/utils';
+import { formatPrice, imageSrc } from '@/lib/utils';
+import { PRODUCT_CARD_FIELDS } from '@/lib/catalog';
 import { useLanguage } from '@/lib/LanguageContext';
 import {
   Carousel,
@@ -80,7 +81,7 @@ export default function Home() {
 
   const fetchProducts = async () => {
     try {
-      const response = await fetch('/api/products');
+      const response = await fetch(`/api/products?fields=${PRODUCT_CARD_FIELDS.join(',')}`);
       const data = await response.json();
       const productsArray = Array.isArray(data) ? data : [];
       // Shuffle products
@@ -274,7 +275,7 @@ export default function Home() {
                       className="relative h-52 bg-gray-100 overflow-hidden"
                     >
                       <img
-                        src={product.image}
+                        src={imageSrc(product.image, 640)}
                         alt={product.name}
                         className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-500"
                       />
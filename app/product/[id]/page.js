@@ -10,7 +10,7 @@ import { Badge } from '@/components/ui/badge';
 import { Label } from '@/components/ui/label';
 import { Textarea } from '@/components/ui/textarea';
 import { ArrowLeft, ShoppingCart, Package, Minus, Plus, Clock, Glasses, Heart, Star, Truck, RefreshCw, CreditCard, Shield, Gem, ChevronLeft, ChevronRight } from 'lucide-react';
-import { formatPrice } from '@/lib/utils';
+import { formatPrice, imageSrc } from '@/lib/utils';
 
 export default function ProductDetail() {
   const router = useRouter();
@@ -21,6 +21,7 @@ export default function ProductDetail() {
   const [isFavorite, setIsFavorite] = useState(false);
   const [isLoggedIn, setIsLoggedIn] = useState(false);
   const [reviews, setReviews] = useState([]);
+  const [reviewsCursor, setReviewsCursor] = useState(null);
   const [newReview, setNewReview] = useState({ rating: 5, comment: '' });
   const [currentImageIndex, setCurrentImageIndex] = useState(0);
 
@@ -32,9 +33,10 @@ export default function ProductDetail() {
     checkFavoriteStatus();
   }, [params.id]);
 
-  const fetchProduct = async (id) => {
+  // fresh: yazımdan sonra tarayıcı önbelleğini atlayıp ETag ile doğrula
+  const fetchProduct = async (id, fresh = false) => {
     try {
-      const response = await fetch(`/api/products/${id}`);
+      const response = await fetch(`/api/products/${id}`, fresh ? { cache: 'no-cache' } : undefined);
       const data = await response.json();
       setProduct(data);
     } catch (error) {
@@ -44,11 +46,15 @@ export default function ProductDetail() {
     }
   };
 
-  const fetchReviews = async (id) => {
+  // Değerlendirmeler sayfa sayfa gelir; cursor verilirse listeye eklenir
+  const fetchReviews = async (id, cursor = null, fresh = false) => {
     try {
-      const response = await fetch(`/api/reviews/${id}`);
+      const response = await fetch(`/api/reviews/${id}?limit=20${cursor ? `&cursor=${cursor}` : ''}`,
+        fresh ? { cache: 'no-cache' } : undefined);
       const data = await response.json();
-      setReviews(Array.isArray(data) ? data : []);
+      const items = Array.isArray(data.items) ? data.items : [];
+      setReviews(prev => cursor ? [...prev, ...items] : items);
+      setReviewsCursor(data.nextCursor || null);
     } catch (error) {
       console.error('Değerlendirmeler yüklenemedi:', error);
     }
@@ -143,7 +149,8 @@ export default function ProductDetail() {
       if (response.ok) {
         alert('Değerlendirmeniz kaydedildi!');
         setNewReview({ rating: 5, comment: '' });
-        fetchReviews(product.id);
+        fetchReviews(product.id, null, true);
+        fetchProduct(product.id, true);
       } else {
         alert('Değerlendirme eklenemedi!');
       }
@@ -230,9 +237,9 @@ export default function ProductDetail() {
 
   const isEyewear = product.productType === 'eyewear' || product.category === 'Gözlük';
   const isETA = product.productType === 'eta';
-  const avgRating = reviews.length > 0 
-    ? (reviews.reduce((acc, r) => acc + r.rating, 0) / reviews.length).toFixed(1)
-    : 0;
+  // Ortalama ve toplam sayı ürün üzerinde tutulur, tüm yorumları indirmeye gerek yok
+  const reviewCount = product.ratingCount || 0;
+  const avgRating = reviewCount > 0 ? Number(product.ratingAverage || 0).toFixed(1) : 0;
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -254,7 +261,7 @@ export default function ProductDetail() {
             {/* Ana Görsel */}
             <div className="relative aspect-square rounded-2xl overflow-hidden bg-white border border-gray-200 shadow-sm group">
               <img
-                src={productImages[currentImageIndex] || product.image}
+                src={imageSrc(productImages[currentImageIndex] || product.image, 1280)}
                 alt={product.name}
                 className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-105"
               />
@@ -309,7 +316,7 @@ export default function ProductDetail() {
                     }`}
                   >
                     <img
-                      src={img}
+                      src={imageSrc(img, 256)}
                       alt={`${product.name} - ${index + 1}`}
                       className="w-full h-full object-cover"
                     />
@@ -363,7 +370,7 @@ export default function ProductDetail() {
                   />
                 ))}
               </div>
-              <span className="text-gray-600">({reviews.length} değerlendirme)</span>
+              <span className="text-gray-600">({reviewCount} değerlendirme)</span>
             </div>
 
             <p className="text-gray-600 text-lg mb-6">{product.description}</p>
@@ -509,7 +516,7 @@ export default function ProductDetail() {
               <Star className="h-4 w-4 flex-shrink-0" />
               <span className="hidden sm:inline">DEĞERLENDİRME</span>
               <span className="sm:hidden">YORUM</span>
-              <span className="text-xs">({reviews.length})</span>
+              <span className="text-xs">({reviewCount})</span>
             </TabsTrigger>
             <TabsTrigger value="payment" className="data-[state=active]:bg-[#006039] data-[state=active]:text-white flex items-center justify-center gap-1 py-2 px-2 text-xs md:text-sm">
               <CreditCard className="h-4 w-4 flex-shrink-0" />
@@ -617,6 +624,15 @@ export default function ProductDetail() {
                         <p className="text-gray-600">{review.comment}</p>
                       </div>
                     ))}
+                    {reviewsCursor && (
+                      <Button
+                        variant="outline"
+                        onClick={() => fetchReviews(product.id, reviewsCursor)}
+                        className="w-full border-[#006039] text-[#006039]"
+                      >
+                        Daha Fazla Değerlendirme
+                      </Button>
+                    )}
                   </div>
                 )}
               </CardContent>
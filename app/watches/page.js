@@ -7,7 +7,8 @@ import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardFooter, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
 import { Input } from '@/components/ui/input';
-import { formatPrice } from '@/lib/utils';
+import { formatPrice, imageSrc } from '@/lib/utils';
+import { useProductSearch } from '@/lib/useProductSearch';
 import {
   Select,
   SelectContent,
@@ -31,8 +32,6 @@ const ITEMS_PER_PAGE = 10;
 function WatchesPageContent() {
   const router = useRouter();
   const searchParams = useSearchParams();
-  const [products, setProducts] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [cart, setCart] = useState([]);
 
   const [searchQuery, setSearchQuery] = useState('');
@@ -50,92 +49,39 @@ function WatchesPageContent() {
   }, [searchParams]);
 
   useEffect(() => {
-    fetchProducts();
     const savedCart = localStorage.getItem('cart');
     if (savedCart) {
       setCart(JSON.parse(savedCart));
     }
   }, []);
 
-  const fetchProducts = async () => {
-    try {
-      const response = await fetch('/api/products');
-      const data = await response.json();
-      // Filter only watch products using productType
-      const watchProducts = (Array.isArray(data) ? data : []).filter(
-        p => p.productType === 'watch' || (!p.productType && p.category !== 'Gözlük')
-      );
-      setProducts(watchProducts);
-    } catch (error) {
-      console.error('Ürünler yüklenemedi:', error);
-      setProducts([]);
-    } finally {
-      setLoading(false);
-    }
-  };
-
+  // Arama, filtre, sıralama ve sayfalama sunucuda yapılır (GET /api/search); yalnızca görüntülenen sayfa gelir
+  const { items: paginatedProducts, total, pages: totalPages, facets, loading } = useProductSearch({
+    productType: 'watch',
+    query: searchQuery,
+    category: selectedCategory,
+    gender: genderFilter,
+    sort: sortBy,
+    page: currentPage,
+    limit: ITEMS_PER_PAGE
+  });
+
+  // Kategori seçenekleri ve sayıları facet'lerden gelir (kategori dışındaki filtrelere göre sayılır)
+  const categoryCounts = useMemo(
+    () => new Map((facets.category || []).map(facet => [facet.value, facet.count])),
+    [facets]
+  );
   const categories = useMemo(() => {
-    const cats = [...new Set(products.map(p => p.category).filter(Boolean))];
-    return ['all', ...cats];
-  }, [products]);
-
-  const filteredProducts = useMemo(() => {
-    // Saatleri filtrele
-    let result = products.filter(p => 
-      p.productType === 'watch' || (!p.productType && p.category !== 'Gözlük')
-    );
-
-    if (searchQuery.trim()) {
-      const query = searchQuery.toLowerCase();
-      result = result.filter(
-        p =>
-          p.name?.toLowerCase().includes(query) ||
-          p.description?.toLowerCase().includes(query) ||
-          p.brand?.toLowerCase().includes(query) ||
-          p.category?.toLowerCase().includes(query)
-      );
+    const cats = [...categoryCounts.keys()];
+    if (selectedCategory !== 'all' && !categoryCounts.has(selectedCategory)) {
+      cats.push(selectedCategory);
     }
-
-    if (selectedCategory !== 'all') {
-      result = result.filter(p => p.category === selectedCategory);
-    }
-
-    if (genderFilter !== 'all') {
-      result = result.filter(p => p.gender === genderFilter || p.gender === 'unisex');
-    }
-
-    switch (sortBy) {
-      case 'price-asc':
-        result.sort((a, b) => (a.price || 0) - (b.price || 0));
-        break;
-      case 'price-desc':
-        result.sort((a, b) => (b.price || 0) - (a.price || 0));
-        break;
-      case 'name-asc':
-        result.sort((a, b) => (a.name || '').localeCompare(b.name || ''));
-        break;
-      case 'name-desc':
-        result.sort((a, b) => (b.name || '').localeCompare(a.name || ''));
-        break;
-      case 'newest':
-        result.sort((a, b) => new Date(b.createdAt || 0) - new Date(a.createdAt || 0));
-        break;
-      default:
-        break;
-    }
-
-    return result;
-  }, [products, searchQuery, selectedCategory, genderFilter, sortBy]);
-
-  const totalPages = Math.ceil(filteredProducts.length / ITEMS_PER_PAGE);
-  const paginatedProducts = useMemo(() => {
-    const start = (currentPage - 1) * ITEMS_PER_PAGE;
-    return filteredProducts.slice(start, start + ITEMS_PER_PAGE);
-  }, [filteredProducts, currentPage]);
+    return ['all', ...cats];
+  }, [categoryCounts, selectedCategory]);
 
   useEffect(() => {
     setCurrentPage(1);
-  }, [searchQuery, selectedCategory, sortBy]);
+  }, [searchQuery, selectedCategory, genderFilter, sortBy]);
 
   const addToCart = (product) => {
     const existingItem = cart.find(item => item.id === product.id);
@@ -226,7 +172,7 @@ function WatchesPageContent() {
                 <SelectContent className="bg-white border-gray-200">
                   {categories.map((cat) => (
                     <SelectItem key={cat} value={cat} className="text-gray-900 font-medium">
-                      {cat === 'all' ? 'Tüm Kategoriler' : cat}
+                      {cat === 'all' ? 'Tüm Kategoriler' : `${cat} (${categoryCounts.get(cat) ?? 0})`}
                     </SelectItem>
                   ))}
                 </SelectContent>
@@ -279,7 +225,7 @@ function WatchesPageContent() {
 
           <div className="mt-4 pt-4 border-t border-gray-200 flex items-center justify-between text-sm text-gray-600">
             <span>
-              {filteredProducts.length} ürün bulundu
+              {total} ürün bulundu
               {hasActiveFilters && ' (filtrelendi)'}
             </span>
             <span>
@@ -317,7 +263,7 @@ function WatchesPageContent() {
                       className="relative h-44 bg-gray-100 rounded-t-lg overflow-hidden"
                     >
                       <img
-                        src={product.image}
+                        src={imageSrc(product.image, 640)}
                         alt={product.name}
                         className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-500"
                       />
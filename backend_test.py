@@ -4,21 +4,72 @@ Comprehensive Backend API Test Suite for Cyprus Watch E-commerce Platform
 Tests all authentication, favorites, orders, payment, and product endpoints
 """
 
-import requests
 import json
+import os
 import uuid
 from datetime import datetime
 import time
-import urllib3
+import argparse
+import itertools
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlencode
 
-# Suppress SSL warnings for testing
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from benchmarks import BENCHMARKS, BenchmarkRunner, parse_sizes
+from harness_http import PooledSession
+from local_server import ADMIN_PASSWORD, ADMIN_USERNAME, LocalCyprusWatchServer
+from harness_metrics import (MetricsRecorder, ServerMetricsScraper, compare_to_baseline, is_admin_route,
+                             route_template, server_spans, write_csv_report, write_json_report)
+
+# Functional suite default only; load tests and benchmarks must name their target (admin login: ADMIN_USERNAME/ADMIN_PASSWORD)
+DEFAULT_BASE_URL = "https://cypruswatch.com"
+
+WaitResult = namedtuple("WaitResult", ["value", "elapsed", "attempts"])
+
+
+def wait_until(probe, timeout=30.0, initial_delay=0.05, backoff=2.0, max_delay=2.0):
+    """Poll `probe` with exponential backoff until it returns a truthy value
+
+    Returns as soon as the condition holds, with the value, the seconds it
+    took and the number of polls. `value` is None when the deadline passes.
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    delay = initial_delay
+    attempts = 0
+    while True:
+        attempts += 1
+        value = probe()
+        now = time.perf_counter()
+        if value:
+            return WaitResult(value, now - start, attempts)
+        if now >= deadline:
+            return WaitResult(None, now - start, attempts)
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * backoff, max_delay)
+
+
+def suite_step(needs=(), provides=(), after=()):
+    """Declare a suite test's inputs so the scheduler can run independent tests concurrently
+
+    needs    - resources ("user", "product", "order") the test reads
+    provides - resources the test creates for later tests
+    after    - tests that must finish first because they change shared state
+    """
+    def decorate(fn):
+        fn.suite_step = {"needs": tuple(needs), "provides": tuple(provides), "after": tuple(after)}
+        return fn
+    return decorate
 
 
 class CyprusWatchAPITester:
-    def __init__(self, base_url):
+    def __init__(self, base_url, session=None):
         self.base_url = base_url.rstrip('/')
         self.api_base = f"{self.base_url}/api"
+        self.session = session or PooledSession()
+        self.metrics = MetricsRecorder()
         self.jwt_token = None
         self.user_id = None
         self.test_user_email = f"testuser_{uuid.uuid4().hex[:8]}@cypruswatch.com"
@@ -29,7 +80,21 @@ class CyprusWatchAPITester:
             "failed": 0,
             "tests": []
         }
-        
+        self.results_lock = threading.Lock()
+        # Every request carries X-Request-Id "<run>-<n>"; the server's span breakdown of the requests a
+        # test made on its thread is attached to that test's log_test record
+        self.run_id = uuid.uuid4().hex[:8]
+        self.request_ids = itertools.count(1)
+        self.traced = threading.local()
+        # Admin JWT from /login/login, fetched on the first admin route and reused for the rest of the run
+        self.admin_token = None
+        self.admin_lock = threading.Lock()
+
+    def take_server_spans(self):
+        """Return the traced requests made on this thread since the last call"""
+        requests, self.traced.requests = getattr(self.traced, "requests", []), []
+        return requests
+
     def log_test(self, test_name, success, message, details=None):
         """Log test result"""
         result = {
@@ -37,48 +102,80 @@ class CyprusWatchAPITester:
             "success": success,
             "message": message,
             "timestamp": datetime.now().isoformat(),
-            "details": details
+            "details": details,
+            "server_spans": self.take_server_spans()
         }
-        self.results["tests"].append(result)
-        if success:
-            self.results["passed"] += 1
-            print(f"✅ {test_name}: {message}")
-        else:
-            self.results["failed"] += 1
-            print(f"❌ {test_name}: {message}")
-        if details:
-            print(f"   Details: {details}")
+        with self.results_lock:
+            self.results["tests"].append(result)
+            if success:
+                self.results["passed"] += 1
+                print(f"✅ {test_name}: {message}")
+            else:
+                self.results["failed"] += 1
+                print(f"❌ {test_name}: {message}")
+            if details:
+                print(f"   Details: {details}")
+            if not success and result["server_spans"]:
+                last = result["server_spans"][-1]
+                breakdown = ", ".join(f"{kind} {data['ms']:.1f}ms" for kind, data in last["spans"].items()
+                                      if data.get("ms") is not None)
+                print(f"   Server spans ({last['request_id']} {last['endpoint']} → {last['status']}): {breakdown}")
     
-    def make_request(self, method, endpoint, data=None, headers=None):
-        """Make HTTP request with error handling"""
+    def admin_headers(self):
+        """Authorization header for admin routes, logging in through /login/login once per run
+
+        Empty when the login is refused (e.g. no ADMIN_PASSWORD for a remote API), so admin
+        requests go out without a token as before and fail only where the server requires one.
+        """
+        with self.admin_lock:
+            if self.admin_token is None:
+                response = self.make_request("POST", "/login/login",
+                                             {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+                ok = response is not None and response.status_code == 200
+                self.admin_token = (response.json().get("token") if ok else None) or ""
+        return {"Authorization": f"Bearer {self.admin_token}"} if self.admin_token else {}
+
+    def make_request(self, method, endpoint, data=None, headers=None, files=None, raw=None):
+        """Make HTTP request with error handling
+
+        `data` is sent as JSON; `raw` bytes are sent as-is (set Content-Type in `headers`).
+        Admin routes carry the admin token unless `headers` sets its own Authorization.
+        """
         url = f"{self.api_base}/{endpoint.lstrip('/')}"
-        default_headers = {"Content-Type": "application/json"}
+        # Multipart uploads set their own Content-Type boundary
+        default_headers = {} if files else {"Content-Type": "application/json"}
+        default_headers["X-Request-Id"] = f"{self.run_id}-{next(self.request_ids)}"
+        if is_admin_route(method, endpoint) and "Authorization" not in (headers or {}):
+            default_headers.update(self.admin_headers())
         if headers:
             default_headers.update(headers)
             
+        start = time.perf_counter()
         try:
-            # Disable SSL verification and add timeout
-            kwargs = {
-                "headers": default_headers,
-                "timeout": 30,
-                "verify": False  # Disable SSL verification for testing
-            }
-            
-            if method.upper() == "GET":
-                response = requests.get(url, **kwargs)
-            elif method.upper() == "POST":
-                response = requests.post(url, json=data, **kwargs)
-            elif method.upper() == "PUT":
-                response = requests.put(url, json=data, **kwargs)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, json=data, **kwargs)
-            else:
+            if method.upper() not in ("GET", "POST", "PUT", "DELETE"):
                 raise ValueError(f"Unsupported HTTP method: {method}")
+            # Pooled keep-alive session; SSL verification disabled for testing
+            response = self.session.request(method.upper(), url,
+                                            json=data if method.upper() != "GET" else None,
+                                            headers=default_headers, files=files, data=raw)
+            self.metrics.record(method, endpoint, response)
+            spans = server_spans(response)
+            if spans:
+                if not hasattr(self.traced, "requests"):
+                    self.traced.requests = []
+                self.traced.requests.append({
+                    "request_id": response.headers.get("X-Request-Id", default_headers["X-Request-Id"]),
+                    "endpoint": f"{method.upper()} {endpoint}",
+                    "status": response.status_code,
+                    "spans": spans,
+                })
             return response
         except Exception as e:
             print(f"Request failed for {url}: {e}")
+            self.metrics.record(method, endpoint, None, (time.perf_counter() - start) * 1000)
             return None
 
+    @suite_step(provides=("user",))
     def test_user_registration(self):
         """Test POST /api/auth/register"""
         test_data = {
@@ -106,6 +203,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("User Registration", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user",))
     def test_user_login(self):
         """Test POST /api/auth/login"""
         test_data = {
@@ -126,9 +224,87 @@ class CyprusWatchAPITester:
                             f"Token matches: {login_token == self.jwt_token}")
             else:
                 self.log_test("User Login", False, "Missing required response fields", data)
+                return
         else:
             self.log_test("User Login", False, f"HTTP {response.status_code}: {response.text}")
+            return
+
+        self.login_burst(test_data)
+
+    def login_burst(self, credentials, logins=48, concurrency=16, probes=10):
+        """Concurrent logins while probing GET /products: logins/sec and the probe slowdown"""
+        def probe_ms():
+            probe = self.make_request("GET", "/products?limit=24")
+            return probe.timings["total_ms"] if probe is not None else None
+
+        def p50(values):
+            values = sorted(v for v in values if v is not None)
+            return values[len(values) // 2] if values else 0.0
+
+        idle_ms = p50([probe_ms() for _ in range(probes)])
+        burst_probes = []
+        done = threading.Event()
+
+        def keep_probing():
+            while not done.is_set():
+                burst_probes.append(probe_ms())
+
+        prober = threading.Thread(target=keep_probing, daemon=True)
+        start = time.perf_counter()
+        prober.start()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            responses = list(pool.map(lambda _: self.make_request("POST", "/auth/login", credentials), range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        prober.join()
+
+        ok = sum(1 for r in responses if r is not None and r.status_code == 200)
+        burst_ms = p50(burst_probes)
+        slowdown = (burst_ms / idle_ms - 1) * 100 if idle_ms else 0.0
+        self.log_test("Concurrent Logins", ok == logins,
+                      f"{ok}/{logins} logins at concurrency {concurrency}: {ok / elapsed:.0f} logins/sec",
+                      f"GET /products p50 {idle_ms:.1f}ms idle → {burst_ms:.1f}ms during the burst "
+                      f"({slowdown:+.0f}%, {len(burst_probes)} probes)")
+
+    @suite_step()
+    def test_login_rate_limit(self):
+        """Test that repeated failed POST /api/auth/login attempts are answered with 429 + Retry-After, spoofed IPs or not
+
+        A server that cannot see the client address (no TRUST_PROXY) must not lock the account
+        for everyone; it slows the attempts down instead and still accepts the right password.
+        """
+        email = f"ratelimit_{uuid.uuid4().hex[:8]}@cypruswatch.com"
+        register = self.make_request("POST", "/auth/register",
+                                     {"email": email, "password": "RightPass123!", "fullName": "Rate Limit"})
+        if not register or register.status_code != 200:
+            self.log_test("Login Rate Limit", False, "Failed to register rate limit user")
+            return
+        statuses = []
+        durations_ms = []
+        # A made-up X-Forwarded-For per attempt must not start a fresh bucket
+        for attempt in range(8):
+            started = time.perf_counter()
+            response = self.make_request("POST", "/auth/login", {"email": email, "password": "WrongPass!"},
+                                         headers={"X-Forwarded-For": f"203.0.113.{attempt + 1}"})
+            durations_ms.append((time.perf_counter() - started) * 1000)
+            statuses.append(response.status_code if response is not None else None)
+        limited = self.make_request("POST", "/auth/login", {"email": email, "password": "RightPass123!"})
+        retry_after = limited.headers.get("Retry-After") if limited is not None else None
+        if 429 in statuses:
+            ok = (statuses[0] == 401 and limited is not None
+                  and limited.status_code == 429 and bool(retry_after))
+            outcome = f"Correct password while limited: HTTP {limited.status_code if limited is not None else 'n/a'}, " \
+                      f"Retry-After {retry_after}s"
+        else:
+            slowed = min(durations_ms[-2:]) - max(durations_ms[:3])
+            ok = (set(statuses) == {401} and slowed >= 400
+                  and limited is not None and limited.status_code == 200)
+            outcome = f"No lockout: last attempts {slowed:+.0f}ms slower, correct password " \
+                      f"HTTP {limited.status_code if limited is not None else 'n/a'}"
+        self.log_test("Login Rate Limit", ok,
+                      f"Failed attempts answered {', '.join(str(status) for status in statuses)}", outcome)
 
+    @suite_step(needs=("user",))
     def test_user_profile_get(self):
         """Test GET /api/auth/me"""
         if not self.jwt_token:
@@ -152,6 +328,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Get User Profile", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user",))
     def test_user_profile_update(self):
         """Test PUT /api/auth/profile"""
         if not self.jwt_token:
@@ -180,6 +357,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Update User Profile", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(provides=("product",))
     def test_create_product(self):
         """Test POST /api/products - Create a test product with NEW FIELDS for favorites/orders"""
         product_data = {
@@ -229,6 +407,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Create Product with NEW FIELDS", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step()
     def test_get_products(self):
         """Test GET /api/products"""
         response = self.make_request("GET", "/products")
@@ -246,6 +425,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Get Products", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user", "product"))
     def test_add_to_favorites(self):
         """Test POST /api/favorites/add"""
         if not self.jwt_token or not self.test_product_id:
@@ -269,6 +449,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Add to Favorites", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user",), after=("test_add_to_favorites",))
     def test_get_favorites(self):
         """Test GET /api/favorites"""
         if not self.jwt_token:
@@ -294,6 +475,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Get Favorites", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user", "product"), provides=("order",))
     def test_create_order(self):
         """Test POST /api/orders"""
         if not self.test_product_id:
@@ -337,6 +519,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Create Order", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user", "order"))
     def test_get_user_orders(self):
         """Test GET /api/orders/my"""
         if not self.jwt_token:
@@ -362,6 +545,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Get User Orders", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step()
     def test_admin_get_orders(self):
         """Test GET /api/admin/orders"""
         response = self.make_request("GET", "/admin/orders")
@@ -380,6 +564,311 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Admin Get Orders", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step()
+    def test_route_templates(self):
+        """Test that report keys group concrete endpoints under their route, and static routes stay static"""
+        cases = [
+            ("/products", "/products"),
+            ("/products/import?format=csv", "/products/import"),
+            ("/products/export?format=ndjson", "/products/export"),
+            ("/products/3f2b6c1e-8f4a-4c1d-9a7e-2b5c6d7e8f90", "/products/:id"),
+            ("/products/bench-dispatch-1a2b", "/products/:id"),
+            ("/reviews/abc-123?limit=20", "/reviews/:productId"),
+            ("/images/abc?w=256", "/images/:id"),
+            ("/users/u-1/orders", "/users/:id/orders"),
+            ("/users/u-1", "/users/:id"),
+            ("/admin/orders/o-1/invoice/resend", "/admin/orders/:id/invoice/resend"),
+            ("/admin/orders/o-1/invoice", "/admin/orders/:id/invoice"),
+            ("/admin/orders/o-1", "/admin/orders/:id"),
+            ("/admin/orders", "/admin/orders"),
+            ("/traces/37f4b09e-trace-check", "/traces/:id"),
+            ("/traces?minMs=100", "/traces"),
+            ("/orders/my", "/orders/my"),
+        ]
+        wrong = [f"{endpoint} → {route_template(endpoint)} (expected {expected})"
+                 for endpoint, expected in cases if route_template(endpoint) != expected]
+        self.log_test("Route Templates", not wrong,
+                      "; ".join(wrong) if wrong else f"{len(cases)} endpoints map to their report keys")
+
+    @suite_step(needs=("user",))
+    def test_admin_auth_and_routing(self):
+        """Test the route table: admin token middleware, trailing slashes, 404s that never read the body"""
+        admin = self.admin_headers()
+        if not admin:
+            self.log_test("Admin Auth & Routing", False, "Admin login returned no token")
+            return
+        customer = {"Authorization": f"Bearer {self.jwt_token}"}
+        checks = [
+            ("admin token", "GET", "/admin/stats?days=1&top=1", admin, None, 200, "GET admin/stats"),
+            ("customer token on admin route", "GET", "/admin/stats?days=1&top=1", customer, None, 403, "GET admin/stats"),
+            ("forged token on admin route", "GET", "/users?limit=1", {"Authorization": "Bearer forged"}, None, 401,
+             "GET users"),
+            ("no token on user route", "GET", "/auth/me", None, None, 401, "GET auth/me"),
+            ("trailing slash", "GET", "/auth/me/", customer, None, 200, "GET auth/me"),
+            ("typed param", "GET", f"/users/{self.user_id}/orders?limit=1", admin, None, 200, "GET users/:id/orders"),
+            ("unknown route", "GET", "/no/such/route", None, None, 404, "unmatched"),
+            ("unknown route with unparsable body", "POST", "/no/such/route", {"Content-Type": "application/json"},
+             b"{not json", 404, "unmatched"),
+            ("method without route", "DELETE", "/search", None, None, 404, "unmatched"),
+        ]
+        failures = []
+        for label, method, endpoint, headers, raw, status, route_name in checks:
+            response = self.make_request(method, endpoint, headers=headers, raw=raw)
+            if response is None:
+                failures.append(f"{label}: request failed")
+                continue
+            timing = response.headers.get("Server-Timing", "")
+            if response.status_code != status:
+                failures.append(f"{label}: HTTP {response.status_code}, expected {status}")
+            elif not timing.startswith(f'route;desc="{route_name}"'):
+                failures.append(f"{label}: Server-Timing {timing!r}, expected route {route_name}")
+        if failures:
+            self.log_test("Admin Auth & Routing", False, "; ".join(failures))
+        else:
+            self.log_test("Admin Auth & Routing", True,
+                          f"{len(checks)} routing checks passed: admin token accepted, customer 403, forged 401, "
+                          "404 without reading the body")
+
+    @suite_step(needs=("user",))
+    def test_health_and_metrics(self):
+        """Test GET /api/health and GET /api/metrics - DB ping, pool pressure and per-collection latencies"""
+        response = self.make_request("GET", "/health")
+        if not response or response.status_code != 200 or response.json().get("status") != "ok":
+            self.log_test("Health & Metrics", False, "Health check failed", response.text if response else None)
+            return
+        health = response.json()
+
+        # Always gated, whether or not ADMIN_AUTH_REQUIRED lets token-less admin requests through
+        response = self.make_request("GET", "/metrics")
+        if response is None or response.status_code != 401:
+            self.log_test("Health & Metrics", False, "/metrics answered a request without a token",
+                          response.status_code if response is not None else None)
+            return
+        response = self.make_request("GET", "/metrics", headers={"Authorization": f"Bearer {self.jwt_token}"})
+        if response is None or response.status_code != 403:
+            self.log_test("Health & Metrics", False, "Customer token was not refused on /metrics",
+                          response.status_code if response is not None else None)
+            return
+        response = self.make_request("GET", "/metrics", headers=self.admin_headers())
+        if not response or response.status_code != 200:
+            self.log_test("Health & Metrics", False, "Metrics request failed", response.text if response else None)
+            return
+        metrics = response.json()
+        pool, operations = metrics.get("pool", {}), metrics.get("operations", {})
+        problems = []
+        if not pool.get("checkouts") or "p95" not in pool.get("checkoutWaitMs", {}):
+            problems.append(f"pool reports no checkouts: {pool}")
+        if not any(name.startswith("users.") for name in operations):
+            problems.append(f"no users.* operation latencies after registration: {sorted(operations)}")
+        if "response" not in metrics.get("caches", {}):
+            problems.append("response cache stats missing")
+        if problems:
+            self.log_test("Health & Metrics", False, "; ".join(problems))
+        else:
+            self.log_test("Health & Metrics", True,
+                          f"DB ping {health['db']['pingMs']}ms, {pool['checkouts']} pool checkouts "
+                          f"(wait p95 {pool['checkoutWaitMs']['p95']}ms), {len(operations)} operations timed")
+
+    @suite_step(needs=("user",))
+    def test_request_tracing(self):
+        """Test X-Request-Id propagation, the Server-Timing span breakdown and GET /api/traces export"""
+        request_id = f"{self.run_id}-trace-check"
+        credentials = {"email": self.test_user_email, "password": "SecurePass123!"}
+        response = self.make_request("POST", "/auth/login", credentials, headers={"X-Request-Id": request_id})
+        if response is None or response.status_code != 200:
+            self.log_test("Request Tracing", False, "Login failed", response.text if response is not None else None)
+            return
+        problems = []
+        if response.headers.get("X-Request-Id") != request_id:
+            problems.append(f"X-Request-Id not echoed: {response.headers.get('X-Request-Id')!r}")
+        spans = server_spans(response)
+        for kind in ("route", "body", "db", "bcrypt", "total"):
+            if kind not in spans:
+                problems.append(f"no {kind} timing in Server-Timing {response.headers.get('Server-Timing')!r}")
+
+        admin = self.admin_headers()
+        # Traces expose request paths and ids, so they are never served without a token
+        for endpoint in ("/traces", f"/traces/{request_id}"):
+            response = self.make_request("GET", endpoint)
+            if response is None or response.status_code != 401:
+                problems.append(f"GET {endpoint} without a token returned {getattr(response, 'status_code', 'n/a')}")
+        response = self.make_request("GET", f"/traces/{request_id}", headers=admin)
+        if response is None or response.status_code != 200:
+            status = response.status_code if response is not None else "n/a"
+            problems.append(f"GET /traces/{request_id} returned {status}")
+        else:
+            trace = response.json()
+            names = [span["name"] for span in trace.get("spans", [])]
+            if trace.get("name") != "POST auth/login" or not any(name.startswith("db users.") for name in names):
+                problems.append(f"unexpected trace {trace.get('name')!r} with spans {names}")
+        response = self.make_request("GET", "/traces", headers=admin)
+        events = response.json().get("traceEvents", []) if response is not None and response.status_code == 200 else []
+        if not any(event.get("args", {}).get("requestId") == request_id for event in events):
+            problems.append("exported Chrome trace does not contain the login request")
+        if problems:
+            self.log_test("Request Tracing", False, "; ".join(problems))
+        else:
+            self.log_test("Request Tracing", True,
+                          f"{request_id} echoed; login spent {spans['bcrypt']['ms']:.1f}ms in bcrypt and "
+                          f"{spans['db']['ms']:.2f}ms over {spans['db']['count']} DB ops of "
+                          f"{spans['total']['ms']:.1f}ms; {len(events)} events exported")
+
+    @suite_step(needs=("user", "order"))
+    def test_admin_list_pagination(self, page_size=2, max_pages=5):
+        """Test GET /api/admin/orders, /api/users and /api/users/:id/orders - bounded keyset pages and filters"""
+        problems = []
+
+        response = self.make_request("GET", "/admin/orders")
+        if not response or response.status_code != 200:
+            self.log_test("Admin List Pagination", False, "Unpaginated order list failed",
+                          response.text if response else None)
+            return
+        if len(response.json()) > 100:
+            problems.append(f"unpaginated order list returned {len(response.json())} orders (cap is 100)")
+
+        # Walk a few pages: each bounded, newest first, no order repeated across pages
+        seen, previous, endpoint = set(), None, f"/admin/orders?limit={page_size}"
+        for _ in range(max_pages):
+            response = self.make_request("GET", endpoint)
+            if not response or response.status_code != 200:
+                problems.append(f"{endpoint} failed")
+                break
+            page = response.json()
+            keys = [(o["createdAt"], o["id"]) for o in page["items"]]
+            if len(keys) > page_size:
+                problems.append(f"page of {len(keys)} orders for limit={page_size}")
+            if keys != sorted(keys, reverse=True) or (previous and keys and keys[0] >= previous):
+                problems.append("orders not newest first across pages")
+            if seen & {key[1] for key in keys}:
+                problems.append("order repeated across pages")
+            seen |= {key[1] for key in keys}
+            previous = keys[-1] if keys else previous
+            if not page["nextCursor"]:
+                break
+            endpoint = f"/admin/orders?limit={page_size}&cursor={page['nextCursor']}"
+
+        response = self.make_request("GET", "/admin/orders?status=pending,paid&limit=20")
+        if not response or response.status_code != 200 or \
+                any(o.get("status") not in ("pending", "paid") for o in response.json()["items"]):
+            problems.append("status filter returned other statuses")
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        response = self.make_request("GET", f"/admin/orders?from={today}&to={today}&limit=20")
+        if not response or response.status_code != 200 or \
+                any(not o["createdAt"].startswith(today) for o in response.json()["items"]):
+            problems.append("date range filter returned orders from other days")
+        response = self.make_request("GET", "/admin/orders?status=bogus&limit=5")
+        if response is None or response.status_code != 400:
+            problems.append(f"unknown status gave HTTP {getattr(response, 'status_code', None)}, expected 400")
+
+        response = self.make_request("GET", f"/users?limit={page_size}")
+        if not response or response.status_code != 200:
+            problems.append("user page failed")
+        else:
+            users = response.json()["items"]
+            if len(users) > page_size or any("password" in u for u in users):
+                problems.append("user page unbounded or exposes passwords")
+
+        # The test user's order history, one order per page, must reach the test order
+        history, endpoint = [], f"/users/{self.user_id}/orders?limit=1"
+        for _ in range(max_pages * 4):
+            response = self.make_request("GET", endpoint)
+            if not response or response.status_code != 200:
+                problems.append("order history page failed")
+                break
+            page = response.json()
+            if len(page["items"]) > 1:
+                problems.append(f"history page of {len(page['items'])} orders for limit=1")
+            history += [o["id"] for o in page["items"]]
+            if self.test_order_id in history or not page["nextCursor"]:
+                break
+            endpoint = f"/users/{self.user_id}/orders?limit=1&cursor={page['nextCursor']}"
+        if self.test_order_id not in history:
+            problems.append("test order not found in the user's order history")
+
+        if problems:
+            self.log_test("Admin List Pagination", False, "; ".join(problems))
+        else:
+            self.log_test("Admin List Pagination", True,
+                          f"Walked {len(seen)} orders in pages of {page_size}, filters and history paging OK",
+                          f"Test order reached after {len(history)} history page(s)")
+
+    @suite_step()
+    def test_admin_stats(self, quantity=100000, price=7):
+        """Test GET /api/admin/stats and POST /api/admin/stats/rebuild - incremental aggregates match a rebuild"""
+        def stats():
+            response = self.make_request("GET", "/admin/stats?days=7&top=100")
+            return response.json() if response is not None and response.status_code == 200 else None
+
+        def product_sales(data):
+            return next((p for p in data["topProducts"] if p["productId"] == product_id), None) if data else None
+
+        # A product no other test orders, sold in a quantity that puts it at the top of the best sellers
+        response = self.make_request("POST", "/products", {
+            "name": "Stats Test Watch", "description": "Admin stats test", "price": price, "stock": quantity,
+            "category": "Test", "productType": "watch", "gender": "unisex", "brand": "StatsTest"
+        })
+        if response is None or response.status_code != 200:
+            self.log_test("Admin Stats", False, "Could not create product")
+            return
+        product_id = response.json()["id"]
+        try:
+            self.check_admin_stats(stats, product_sales, product_id, quantity, price)
+        finally:
+            self.make_request("DELETE", f"/products/{product_id}")
+
+    def check_admin_stats(self, stats, product_sales, product_id, quantity, price):
+        """Create, pay, cancel and rebuild around one order of `product_id`, comparing the aggregates each time"""
+        order_data = {
+            "items": [{"id": product_id, "quantity": quantity}],
+            "customerInfo": {"fullName": "Stats Test", "email": "stats@cypruswatch.com",
+                             "phone": "+90 533 000 0000", "address": "Lefkoşa"},
+            "paymentMethod": "transfer",
+        }
+        before = stats()
+        response = self.make_request("POST", "/orders", order_data)
+        if before is None or response is None or response.status_code != 200:
+            self.log_test("Admin Stats", False, "Could not read stats or create the order")
+            return
+        order_id = response.json()["id"]
+        problems = []
+
+        created = stats()
+        if created["totals"]["orders"] <= before["totals"]["orders"] or \
+                created["daily"][-1]["orders"] <= before["daily"][-1]["orders"]:
+            problems.append("order count did not grow on create")
+        if product_sales(created):
+            problems.append("pending order counted as sold")
+
+        self.make_request("PUT", f"/admin/orders/{order_id}", {"status": "paid"})
+        sales = product_sales(stats())
+        if not sales or sales["quantity"] != quantity or sales["revenue"] != price * quantity:
+            problems.append(f"paid order not counted as sold: {sales}")
+
+        self.make_request("PUT", f"/admin/orders/{order_id}", {"status": "cancelled"})
+        cancelled = stats()
+        if product_sales(cancelled):
+            problems.append("cancelled order still counted as sold")
+
+        response = self.make_request("POST", "/admin/stats/rebuild")
+        rebuilt = stats()
+        if response is None or response.status_code != 200 or rebuilt is None:
+            problems.append("rebuild failed")
+        else:
+            if sum(rebuilt["ordersByStatus"].values()) != rebuilt["totals"]["orders"]:
+                problems.append("rebuilt status counts do not add up to the order total")
+            if product_sales(rebuilt):
+                problems.append("rebuild counted the cancelled order as sold")
+
+        if problems:
+            self.log_test("Admin Stats", False, "; ".join(problems))
+        else:
+            ops = response.headers.get("X-DB-Ops", "?") if response is not None else "?"
+            self.log_test("Admin Stats", True,
+                          f"Create, pay and cancel kept the aggregates in step; rebuilt "
+                          f"{rebuilt['totals']['orders']} orders / {rebuilt['totals']['users']} users",
+                          f"Rebuild took {ops} DB ops")
+
+    @suite_step(needs=("order",))
     def test_payment_bank(self):
         """Test POST /api/payment/bank with email invoice"""
         if not self.test_order_id:
@@ -400,19 +889,23 @@ class CyprusWatchAPITester:
         
         response = self.make_request("POST", "/payment/bank", payment_data)
         
-        if not response:
+        # A declined payment is a falsy 400 response, so compare against None
+        if response is None:
             self.log_test("Bank Payment", False, "Request failed")
             return
+        # The invoice email is queued, so the payment response must not include email delivery time
+        payment_ms = response.timings["total_ms"]
+        self.metrics.record_side_effect("payment_response", payment_ms)
+        responded_at = time.perf_counter()
             
         if response.status_code == 200:
             data = response.json()
             if data.get("success") and data.get("transactionId"):
-                self.log_test("Bank Payment", True, "Payment processed successfully with email invoice", 
+                self.log_test("Bank Payment", True, f"Payment processed in {payment_ms:.0f}ms, invoice email queued", 
                             f"Transaction ID: {data['transactionId']}, Message: {data.get('message')}")
                 
-                # Check if email was sent by verifying order status
-                time.sleep(2)  # Wait for email processing
-                self.verify_email_sent()
+                # Poll the order until the outbox worker marks the invoice email as sent
+                self.verify_email_sent(responded_at)
                 
             else:
                 self.log_test("Bank Payment", False, "Payment failed", data)
@@ -424,6 +917,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Bank Payment", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user", "product"))
     def test_payment_transfer(self):
         """Test POST /api/payment/transfer with email invoice"""
         # Create a new order for transfer test
@@ -468,28 +962,192 @@ class CyprusWatchAPITester:
             if data.get("success") and data.get("iban"):
                 self.log_test("Transfer Payment", True, "Transfer payment processed with IBAN details", 
                             f"IBAN: {data['iban']}, Message: {data.get('message')}")
+                self.verify_paid_invoice_after_transfer(transfer_order_id)
             else:
                 self.log_test("Transfer Payment", False, "Transfer payment failed", data)
         else:
             self.log_test("Transfer Payment", False, f"HTTP {response.status_code}: {response.text}")
 
-    def verify_email_sent(self):
-        """Verify that email was sent by checking order emailSent field"""
+    def verify_paid_invoice_after_transfer(self, order_id, timeout=10.0, max_attempts=10):
+        """The transfer-time invoice must not swallow the invoice sent once the same order is paid"""
+        def invoice_email_id():
+            response = self.make_request("GET", "/admin/orders")
+            if response is None or response.status_code != 200:
+                return None
+            order = next((o for o in response.json() if o.get("id") == order_id), None)
+            return order.get("invoiceEmailId") if order and order.get("emailSent") else None
+
+        transfer_email = wait_until(invoice_email_id, timeout=timeout).value
+        invoice_path = f"/admin/orders/{order_id}/invoice"
+        before = self.make_request("GET", invoice_path)
+        # The demo bank declines about one payment in five
+        paid = None
+        for _ in range(max_attempts):
+            paid = self.make_request("POST", "/payment/bank", {"orderId": order_id, "amount": 50000})
+            if paid is None or paid.status_code != 400:
+                break
+        if paid is None or paid.status_code != 200:
+            self.log_test("Paid Invoice After Transfer", False,
+                          f"Payment failed: {paid.status_code if paid is not None else 'no response'}")
+            return
+        paid_email = wait_until(lambda: (invoice_email_id() or transfer_email) != transfer_email,
+                                timeout=timeout)
+        self.log_test("Paid Invoice After Transfer", bool(transfer_email and paid_email.value),
+                      "Transfer and paid invoices were each emailed" if paid_email.value
+                      else f"Only the transfer invoice was sent (email {transfer_email})")
+
+        # The stored invoice prints the order status, so the download is re-rendered once the order is paid
+        after = self.make_request("GET", invoice_path)
+        awaiting, paid_label = "Havale Bekleniyor", "Ödendi"
+        ok = (before is not None and after is not None and awaiting in before.text
+              and paid_label in after.text and awaiting not in after.text)
+        self.log_test("Invoice Follows Order Status", ok,
+                      "Stored invoice re-rendered from awaiting transfer to paid" if ok
+                      else f"before paid: {getattr(before, 'status_code', None)}, after paid: "
+                           f"{getattr(after, 'status_code', None)}, shows paid: {after is not None and paid_label in after.text}")
+
+    @suite_step(needs=("user", "product"))
+    def test_concurrent_payments(self, attempts=50):
+        """Fire concurrent POST /api/payment/bank at one order: exactly one paid transition, one transaction id"""
+        headers = {"Authorization": f"Bearer {self.jwt_token}"} if self.jwt_token else {}
+        create_response = self.make_request("POST", "/orders", {
+            "items": [{"id": self.test_product_id, "name": "Concurrent Payment Order", "price": 1000, "quantity": 1}],
+            "totalAmount": 1000,
+            "customerInfo": {"fullName": "Race Cyprus", "email": f"race_{uuid.uuid4().hex[:8]}@cypruswatch.com"},
+            "paymentMethod": "bank",
+        }, headers)
+        if not create_response or create_response.status_code != 200:
+            self.log_test("Concurrent Payments", False, "Failed to create order")
+            return
+        order_id = create_response.json()["id"]
+
+        barrier = threading.Barrier(attempts)
+
+        def pay(_):
+            barrier.wait()
+            return self.make_request("POST", "/payment/bank", {"orderId": order_id, "amount": 1000})
+
+        with ThreadPoolExecutor(max_workers=attempts) as pool:
+            responses = list(pool.map(pay, range(attempts)))
+
+        answered = [r for r in responses if r is not None]
+        paid = [r.json() for r in answered if r.status_code == 200]
+        transitions = [data for data in paid if not data.get("alreadyProcessed")]
+        transaction_ids = {data.get("transactionId") for data in paid}
+        declined = sum(r.status_code == 400 for r in answered)
+        db_ops = [int(r.headers["X-DB-Ops"]) for r in answered if r.headers.get("X-DB-Ops", "").isdigit()]
+        # Before the state machine a successful payment took findOne, updateOne, findOne, findOne(users), updateOne
+        ops_note = (f"{sum(db_ops) / len(db_ops):.1f} avg / {max(db_ops)} max DB round trips per payment (was 5)"
+                    if db_ops else "server sent no X-DB-Ops header")
+        ok = (len(answered) == attempts and len(transitions) == 1 and len(transaction_ids) == 1
+              and (not db_ops or max(db_ops) < 5))
+        self.log_test("Concurrent Payments", ok,
+                      f"{attempts} concurrent payments: {len(transitions)} transition, "
+                      f"{len(paid) - len(transitions)} duplicates, {declined} declined",
+                      f"{len(transaction_ids)} transaction id(s), {ops_note}")
+
+    @suite_step()
+    def test_order_stock_reservation(self, stock=3, price=250):
+        """Test POST /api/orders stock reservation: server pricing, 409 on short stock, rollback and release on cancel"""
+        response = self.make_request("POST", "/products", {
+            "name": f"Reservation Watch {uuid.uuid4().hex[:8]}", "description": "Stock reservation test",
+            "price": price, "stock": stock, "category": "Test", "productType": "watch", "gender": "unisex",
+            "brand": "ReservationTest"
+        })
+        if response is None or response.status_code != 200:
+            self.log_test("Order Stock Reservation", False, "Could not create product")
+            return
+        product_id = response.json()["id"]
+        customer = {"fullName": "Stock Cyprus", "email": f"stock_{uuid.uuid4().hex[:8]}@cypruswatch.com"}
+        problems = []
+
+        def current_stock():
+            response = self.make_request("GET", f"/products/{product_id}", headers={"Cache-Control": "no-cache"})
+            return response.json().get("stock") if response is not None and response.status_code == 200 else None
+
+        def order(items):
+            return self.make_request("POST", "/orders", {"items": items, "totalAmount": 1, "customerInfo": customer,
+                                                         "paymentMethod": "bank"})
+
+        try:
+            # The client's price and total are ignored
+            response = order([{"id": product_id, "price": 1, "quantity": 1}, {"id": product_id, "quantity": 1}])
+            created = response.json() if response is not None and response.status_code == 200 else None
+            if not created:
+                problems.append(f"order rejected: {getattr(response, 'text', None)}")
+            elif created["totalAmount"] != price * 2 or [(i["price"], i["quantity"]) for i in created["items"]] != \
+                    [(price, 2)] or not created.get("reservedUntil"):
+                problems.append(f"order not priced by the server: {created['items']} total {created['totalAmount']}")
+            if current_stock() != stock - 2:
+                problems.append(f"stock {current_stock()} after reserving 2 of {stock}")
+
+            response = order([{"id": product_id, "quantity": 2}])
+            short = response.json() if response is not None and response.status_code == 409 else None
+            if not short or [(i["id"], i["requested"], i["available"]) for i in short.get("unavailable", [])] != \
+                    [(product_id, 2, stock - 2)]:
+                problems.append(f"short stock answered {getattr(response, 'status_code', None)}: "
+                                f"{getattr(response, 'text', None)}")
+
+            # One missing line rolls back the lines already reserved
+            response = order([{"id": product_id, "quantity": 1}, {"id": f"missing-{uuid.uuid4()}", "quantity": 1}])
+            if response is None or response.status_code != 409:
+                problems.append(f"cart with a missing product answered {getattr(response, 'status_code', None)}")
+            if current_stock() != stock - 2:
+                problems.append(f"stock {current_stock()} after rejected orders (expected {stock - 2})")
+
+            response = order([])
+            if response is None or response.status_code != 400:
+                problems.append(f"empty cart answered {getattr(response, 'status_code', None)}")
+
+            if created:
+                for _ in range(2):
+                    self.make_request("PUT", f"/admin/orders/{created['id']}", {"status": "cancelled"})
+                if current_stock() != stock:
+                    problems.append(f"stock {current_stock()} after cancelling twice (expected {stock})")
+
+            response = self.make_request("POST", "/admin/reservations/expire")
+            if response is None or response.status_code != 200 or not isinstance(response.json().get("expired"), int):
+                problems.append("reservation sweep endpoint failed")
+        finally:
+            self.make_request("DELETE", f"/products/{product_id}")
+
+        if problems:
+            self.log_test("Order Stock Reservation", False, "; ".join(problems))
+        else:
+            self.log_test("Order Stock Reservation", True,
+                          "Server-side pricing, 409 with availability on short stock, all-or-nothing carts, "
+                          "stock released once on cancel")
+
+    def fetch_test_order(self):
+        """Fetch the test order via /orders/my, or /admin/orders without a JWT"""
+        if self.jwt_token:
+            headers = {"Authorization": f"Bearer {self.jwt_token}"}
+            response = self.make_request("GET", "/orders/my", headers=headers)
+        else:
+            response = self.make_request("GET", "/admin/orders")
+        if not response or response.status_code != 200:
+            return None
+        return next((o for o in response.json() if o.get("id") == self.test_order_id), None)
+
+    def verify_email_sent(self, responded_at=None, timeout=10.0):
+        """Verify that email was sent by polling the order's emailSent field"""
         if not self.test_order_id:
             return
             
-        # Get all admin orders to find our test order
-        response = self.make_request("GET", "/admin/orders")
-        if response and response.status_code == 200:
-            orders = response.json()
-            test_order = next((o for o in orders if o.get("id") == self.test_order_id), None)
-            if test_order and test_order.get("emailSent") == True:
-                self.log_test("Email Invoice Verification", True, 
-                            f"Email sent successfully for order {self.test_order_id}")
-            else:
-                self.log_test("Email Invoice Verification", False, 
-                            f"Email not sent or not confirmed for order {self.test_order_id}")
+        result = wait_until(lambda: (self.fetch_test_order() or {}).get("emailSent") is True, timeout=timeout)
+        # Delivery latency is measured from the payment response, separately from the payment itself
+        latency_ms = ((time.perf_counter() - responded_at) if responded_at else result.elapsed) * 1000
+        if result.value:
+            self.metrics.record_side_effect("invoice_email", latency_ms)
+            self.log_test("Email Invoice Verification", True, 
+                        f"Email sent successfully for order {self.test_order_id}",
+                        f"Invoice email delivered {latency_ms:.0f}ms after the payment response "
+                        f"({result.attempts} polls)")
+        else:
+            self.log_test("Email Invoice Verification", False, 
+                        f"Email not sent or not confirmed for order {self.test_order_id} within {timeout:.0f}s")
 
+    @suite_step(needs=("order",), after=("test_payment_bank",))
     def test_admin_update_order(self):
         """Test PUT /api/admin/orders/:id"""
         if not self.test_order_id:
@@ -512,6 +1170,36 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Admin Update Order", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("order",), after=("test_admin_update_order",))
+    def test_admin_order_invoice(self):
+        """Test GET /api/admin/orders/:id/invoice and POST .../invoice/resend - stored, re-rendered only on status change"""
+        if not self.test_order_id:
+            self.log_test("Admin Order Invoice", False, "No test order available")
+            return
+
+        invoice_path = f"/admin/orders/{self.test_order_id}/invoice"
+        first = self.make_request("GET", invoice_path)
+        if not first or first.status_code != 200:
+            self.log_test("Admin Order Invoice", False,
+                          f"HTTP {first.status_code if first else 'n/a'}: {first.text if first else 'Request failed'}")
+            return
+        second = self.make_request("GET", invoice_path)
+        ok = (bool(second) and second.status_code == 200 and second.content == first.content
+              and self.test_order_id in first.text and first.headers.get("Content-Type", "").startswith("text/html"))
+        self.log_test("Admin Order Invoice", ok,
+                      f"{len(first.content)} bytes, second download identical: {bool(second) and second.content == first.content}")
+
+        response = self.make_request("POST", f"{invoice_path}/resend")
+        if not response or response.status_code != 200:
+            self.log_test("Resend Invoice", False,
+                          f"HTTP {response.status_code if response else 'n/a'}: {response.text if response else 'Request failed'}")
+            return
+        # The resend is queued and delivered from the stored artifact, so the download stays byte-identical
+        third = self.make_request("GET", invoice_path)
+        self.log_test("Resend Invoice", bool(third) and third.content == first.content,
+                      f"Resend queued: {response.json().get('message')}")
+
+    @suite_step(needs=("user", "product"), after=("test_get_favorites",))
     def test_remove_from_favorites(self):
         """Test DELETE /api/favorites/remove"""
         if not self.jwt_token or not self.test_product_id:
@@ -535,6 +1223,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Remove from Favorites", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("product",), after=("test_product_fields_verification",))
     def test_update_product(self):
         """Test PUT /api/products/:id"""
         if not self.test_product_id:
@@ -566,6 +1255,51 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Update Product", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step()
+    def test_update_product_stock(self):
+        """Test PUT /api/products/:id stock handling: invalid stock is rejected, a missing one is kept"""
+        response = self.make_request("POST", "/products", {
+            "name": f"Stock Edit Watch {uuid.uuid4().hex[:8]}", "description": "PUT stock test", "price": 400,
+            "stock": 4, "category": "Test", "productType": "watch"})
+        if response is None or response.status_code != 200:
+            self.log_test("Update Product Stock", False, "Could not create product")
+            return
+        product_id = response.json()["id"]
+        edit = {"name": "Stock Edit Watch", "description": "PUT stock test", "price": 400, "category": "Test"}
+        problems = []
+
+        def current_stock():
+            response = self.make_request("GET", f"/products/{product_id}", headers={"Cache-Control": "no-cache"})
+            return response.json().get("stock") if response is not None and response.status_code == 200 else None
+
+        try:
+            for bad in ("abc", -1, 2.5):
+                response = self.make_request("PUT", f"/products/{product_id}", {**edit, "stock": bad})
+                if response is None or response.status_code != 400:
+                    problems.append(f"stock {bad!r} answered {getattr(response, 'status_code', None)}")
+            response = self.make_request("PUT", f"/products/{product_id}", edit)
+            if response is None or response.status_code != 200:
+                problems.append(f"edit without stock answered {getattr(response, 'status_code', None)}")
+            if current_stock() != 4:
+                problems.append(f"stock after edits is {current_stock()}, expected 4")
+            # The reservation's { stock: { $gte } } filter still matches after the edits
+            response = self.make_request("POST", "/orders", {
+                "items": [{"id": product_id, "quantity": 1}], "totalAmount": 1, "paymentMethod": "bank",
+                "customerInfo": {"fullName": "Stock Edit", "email": f"stockedit_{uuid.uuid4().hex[:8]}@cypruswatch.com"}})
+            if response is None or response.status_code != 200:
+                problems.append(f"order after edits: {getattr(response, 'text', None)}")
+            elif current_stock() != 3:
+                problems.append(f"stock after ordering 1 is {current_stock()}, expected 3")
+        finally:
+            self.make_request("DELETE", f"/products/{product_id}")
+
+        self.log_test("Update Product Stock", not problems, "; ".join(problems) if problems else
+                      "Invalid stock answered 400, edits without stock kept it, orders still reserve")
+
+    @suite_step(needs=("product",), after=(
+        "test_product_fields_verification", "test_update_product", "test_remove_from_favorites",
+        "test_create_order", "test_payment_transfer", "test_concurrent_payments", "test_add_review",
+        "test_get_product_reviews", "test_product_rating_aggregates"))
     def test_delete_product(self):
         """Test DELETE /api/products/:id"""
         if not self.test_product_id:
@@ -587,6 +1321,190 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Delete Product", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step()
+    def test_bulk_product_import_export(self):
+        """Test POST /api/products/import (NDJSON + CSV upserts) and GET /api/products/export"""
+        brand = f"Bulk {uuid.uuid4().hex[:8]}"
+        ids = [f"bulk-{uuid.uuid4()}" for _ in range(3)]
+        ndjson = "\n".join(json.dumps(row) for row in [
+            {"id": ids[0], "name": "Bulk Diver", "price": 1200, "stock": 4, "brand": brand,
+             "specs": {"caseSize": "42mm"}},
+            {"id": ids[1], "name": "Bulk Pilot", "price": "980.5", "brand": brand, "productType": "watch"},
+            {"id": "bulk-invalid", "name": "", "price": 10},
+        ]) + "\nnot json\n"
+        csv_body = ("id,name,price,stock,brand,images,specs.caseSize\n"
+                    f'{ids[0]},"Bulk Diver, ""Pro""",1500,2,{brand},a.jpg|b.jpg,44mm\n'
+                    f"{ids[2]},Bulk Dress,700,,{brand},,\n"
+                    f"bulk-bad-price,Broken,abc,,{brand},,\n")
+        problems = []
+        try:
+            response = self.make_request("POST", "/products/import", headers={"Content-Type": "application/x-ndjson"},
+                                         raw=ndjson.encode())
+            first = response.json() if response is not None and response.status_code == 200 else None
+            if not first or (first["inserted"], first["valid"], first["failed"]) != (2, 2, 2):
+                problems.append(f"NDJSON import: {first or getattr(response, 'text', None)}")
+            elif sorted(e["line"] for e in first["errors"]) != [3, 4]:
+                problems.append(f"NDJSON error lines {first['errors']}")
+
+            response = self.make_request("POST", "/products/import?format=csv", headers={"Content-Type": "text/csv"},
+                                         raw=csv_body.encode())
+            second = response.json() if response is not None and response.status_code == 200 else None
+            if not second or (second["inserted"], second["updated"], second["failed"]) != (1, 1, 1):
+                problems.append(f"CSV import: {second or getattr(response, 'text', None)}")
+
+            response = self.make_request("GET", f"/products/export?format=ndjson&brand={brand.replace(' ', '%20')}")
+            exported = [json.loads(line) for line in response.text.splitlines() if line] \
+                if response is not None and response.status_code == 200 else []
+            by_id = {p["id"]: p for p in exported}
+            diver = by_id.get(ids[0], {})
+            if sorted(by_id) != sorted(ids):
+                problems.append(f"export returned {sorted(by_id)}")
+            elif diver.get("name") != 'Bulk Diver, "Pro"' or diver.get("price") != 1500 or \
+                    diver.get("images") != ["a.jpg", "b.jpg"] or diver.get("specs", {}).get("caseSize") != "44mm":
+                problems.append(f"CSV upsert not applied: {diver}")
+
+            response = self.make_request("GET", f"/products/export?format=csv&brand={brand.replace(' ', '%20')}")
+            if response is None or response.status_code != 200 or \
+                    not response.text.startswith("id,name,") or 'Bulk Diver, ""Pro""' not in response.text:
+                problems.append("CSV export malformed")
+        finally:
+            for product_id in ids:
+                self.make_request("DELETE", f"/products/{product_id}")
+
+        if problems:
+            self.log_test("Bulk Product Import/Export", False, "; ".join(problems))
+        else:
+            self.log_test("Bulk Product Import/Export", True,
+                          "NDJSON insert, CSV upsert and filtered NDJSON/CSV export round-trip",
+                          f"Rejected rows reported by line: {first['errors']}")
+
+    @suite_step()
+    def test_partial_reimport_keeps_fields(self):
+        """Test that re-importing a row with only some columns leaves the product's other fields alone"""
+        product_id = f"partial-{uuid.uuid4()}"
+        full = {"id": product_id, "name": "Partial Diver", "price": 1000, "stock": 5, "category": "Dalgıç",
+                "brand": "PartialTest", "images": ["x.jpg", "y.jpg"], "image": "x.jpg", "specs": {"caseSize": "40mm"}}
+        keep = ("stock", "category", "brand", "images", "image", "specs", "productType", "gender", "description")
+        problems = []
+
+        def fetch():
+            response = self.make_request("GET", f"/products/{product_id}", headers={"Cache-Control": "no-cache"})
+            return response.json() if response is not None and response.status_code == 200 else {}
+
+        try:
+            response = self.make_request("POST", "/products/import", headers={"Content-Type": "application/x-ndjson"},
+                                         raw=json.dumps(full).encode())
+            if response is None or response.status_code != 200 or response.json().get("inserted") != 1:
+                self.log_test("Partial Re-import", False, f"Could not import product: {getattr(response, 'text', None)}")
+                return
+            # Reserve stock so the product's stock is no longer the imported value
+            response = self.make_request("POST", "/orders", {
+                "items": [{"id": product_id, "quantity": 2}], "totalAmount": 1, "paymentMethod": "bank",
+                "customerInfo": {"fullName": "Partial Cyprus", "email": f"partial_{uuid.uuid4().hex[:8]}@cypruswatch.com"}})
+            if response is None or response.status_code != 200:
+                problems.append(f"order rejected: {getattr(response, 'text', None)}")
+            before = fetch()
+
+            for content_type, body, price in (
+                    ("application/x-ndjson", json.dumps({"id": product_id, "name": "Partial Diver II", "price": 1100}), 1100),
+                    ("text/csv", f"id,name,price,stock,category,images,specs.caseSize\n{product_id},Partial Diver III,1200,,,,\n",
+                     1200)):
+                response = self.make_request("POST", "/products/import", headers={"Content-Type": content_type},
+                                             raw=body.encode())
+                if response is None or response.status_code != 200 or response.json().get("updated") != 1:
+                    problems.append(f"{content_type} re-import: {getattr(response, 'text', None)}")
+                after = fetch()
+                changed = [field for field in keep if after.get(field) != before.get(field)]
+                if changed or after.get("price") != price:
+                    problems.append(f"{content_type} re-import changed {changed or ['price']}: "
+                                    f"{ {field: (before.get(field), after.get(field)) for field in changed} }")
+            if before.get("stock") != 3:
+                problems.append(f"stock after reserving 2 of 5 is {before.get('stock')}")
+        finally:
+            self.make_request("DELETE", f"/products/{product_id}")
+
+        self.log_test("Partial Re-import", not problems, "; ".join(problems) if problems else
+                      "Name/price-only NDJSON and blank-cell CSV rows kept reserved stock, category, images and specs")
+
+    @suite_step()
+    def test_catalog_search(self):
+        """Test GET /api/search - Turkish/English folding, typos, synonyms, prefixes and disjunctive facets"""
+        tag = f"srch{uuid.uuid4().hex[:8]}"
+        marin, pilot = f"Marin {tag}", f"Pilot {tag}"
+        ids = [f"search-{uuid.uuid4()}" for _ in range(4)]
+        rows = [
+            {"id": ids[0], "name": "Çelik Dalgıç Saati", "brand": marin, "gender": "male", "category": "Spor",
+             "price": 12000, "description": f"{tag} 300m"},
+            {"id": ids[1], "name": "Submariner Date", "brand": marin, "gender": "male", "category": "Dalgıç",
+             "price": 90000, "description": f"{tag} automatic diver watch"},
+            {"id": ids[2], "name": "Kadın Altın Saatler", "brand": pilot, "gender": "female", "category": "Klasik",
+             "price": 3000, "description": tag},
+            {"id": ids[3], "name": "Güneş Gözlüğü", "brand": pilot, "gender": "unisex", "category": "Güneş",
+             "productType": "eyewear", "price": 1500, "description": tag},
+        ]
+        problems = []
+
+        def search(query):
+            response = self.make_request("GET", f"/search?{urlencode(query)}")
+            if response is None or response.status_code != 200:
+                problems.append(f"{query}: HTTP {getattr(response, 'status_code', 'n/a')}")
+                return {"items": [], "total": 0, "facets": {}, "corrections": {}}
+            return response.json()
+
+        def expect(query, expected, label):
+            found = {item["id"] for item in search(query)["items"]}
+            if found != {ids[i] for i in expected}:
+                problems.append(f"{label}: got {sorted(ids.index(i) for i in found if i in ids)}, want {expected}")
+
+        try:
+            response = self.make_request("POST", "/products/import", headers={"Content-Type": "application/x-ndjson"},
+                                         raw="\n".join(json.dumps(row) for row in rows).encode())
+            if response is None or response.status_code != 200 or response.json().get("valid") != 4:
+                problems.append(f"import: {getattr(response, 'text', None)}")
+
+            expect({"q": f"celik dalgic {tag}"}, [0], "diacritic-free")
+            expect({"q": f"ÇELİK {tag}"}, [0], "upper-case Turkish")
+            expect({"q": f"diver {tag}"}, [0, 1], "TR/EN synonym")
+            expect({"q": f"saatler {tag}"}, [0, 1, 2], "plural + synonym")
+            expect({"q": f"{tag} gozl"}, [3], "prefix")
+            typo = search({"q": f"submarinr {tag}"})
+            if [item["id"] for item in typo["items"]] != [ids[1]] or "submarinr" not in typo["corrections"]:
+                problems.append(f"typo: {typo['items']} {typo['corrections']}")
+
+            by_price = search({"q": tag, "sort": "price-asc"})
+            if [item["id"] for item in by_price["items"]] != [ids[3], ids[2], ids[0], ids[1]]:
+                problems.append("price-asc order")
+
+            # Facets ignore their own filter: the brand facet still counts Pilot while brand=Marin is selected
+            faceted = search({"q": tag, "brand": marin, "gender": "male,unisex", "minPrice": 5000})
+            facets = {field: {f["value"]: f["count"] for f in faceted["facets"].get(field, [])}
+                      for field in ("brand", "gender")}
+            prices = {f["min"]: f["count"] for f in faceted["facets"].get("price", [])}
+            if faceted["total"] != 2 or facets["brand"] != {marin: 2} or facets["gender"] != {"male": 2} \
+                    or prices != {10000: 1, 50000: 1}:
+                problems.append(f"facets: total {faceted['total']} {facets} {prices}")
+            widened = search({"q": tag, "brand": marin, "gender": "male,unisex"})
+            if {f["value"]: f["count"] for f in widened["facets"].get("brand", [])} != {marin: 2, pilot: 1}:
+                problems.append(f"disjunctive brand facet: {widened['facets'].get('brand')}")
+
+            # Writes show up in the next search
+            updated = {**rows[2], "name": "Kadın Altın Kronograf", "image": "", "stock": 5, "productType": "watch"}
+            self.make_request("PUT", f"/products/{ids[2]}", updated)
+            expect({"q": f"chronograph {tag}"}, [2], "after update")
+            self.make_request("DELETE", f"/products/{ids[3]}")
+            expect({"q": f"{tag} gozl"}, [], "after delete")
+        finally:
+            for product_id in ids:
+                self.make_request("DELETE", f"/products/{product_id}")
+
+        if problems:
+            self.log_test("Catalog Search", False, "; ".join(problems))
+        else:
+            self.log_test("Catalog Search", True,
+                          "Folding, typo, synonym, prefix, plural, sort and disjunctive facets; writes reindexed",
+                          f"Typo corrections: {typo['corrections']}")
+
+    @suite_step()
     def test_create_eta_product(self):
         """Test creating ETA product type (NEW FEATURE)"""
         eta_product_data = {
@@ -628,6 +1546,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Create ETA Product", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user",))
     def test_get_all_users(self):
         """Test GET /api/users - Get all registered users (ADMIN NEW FEATURE)"""
         response = self.make_request("GET", "/users")
@@ -651,6 +1570,7 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Get All Users (ADMIN)", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user",))
     def test_get_user_detail(self):
         """Test GET /api/users/:id - Get specific user with orders (ADMIN NEW FEATURE)"""
         if not self.user_id:
@@ -670,13 +1590,15 @@ class CyprusWatchAPITester:
                 "orders" in data):
                 
                 orders_count = len(data.get("orders", []))
+                more = " (more pages)" if data.get("ordersNextCursor") else ""
                 self.log_test("Get User Detail (ADMIN)", True, 
-                            f"User detail retrieved - Email: {data.get('email')}, Orders: {orders_count}, Password hidden: True")
+                            f"User detail retrieved - Email: {data.get('email')}, Orders: {orders_count}{more}, Password hidden: True")
             else:
                 self.log_test("Get User Detail (ADMIN)", False, "Invalid user detail response", data)
         else:
             self.log_test("Get User Detail (ADMIN)", False, f"HTTP {response.status_code}: {response.text}")
 
+    @suite_step(needs=("user", "product"))
     def test_add_review(self):
         """Test POST /api/reviews/:productId - Add product review (NEW FEATURE)"""
         if not self.jwt_token or not self.test_product_id:
@@ -712,6 +1634,16 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Add Product Review", False, f"HTTP {response.status_code}: {response.text}")
 
+        # A review for a missing product is rolled back, not left behind without a rating on any product
+        missing_id = f"missing-{uuid.uuid4()}"
+        response = self.make_request("POST", f"/reviews/{missing_id}", review_data, headers)
+        listed = self.make_request("GET", f"/reviews/{missing_id}")
+        orphaned = listed is not None and listed.status_code == 200 and bool(listed.json())
+        self.log_test("Review For Missing Product", response is not None and response.status_code == 404 and not orphaned,
+                      f"POST → {response.status_code if response is not None else 'no response'}, "
+                      f"orphaned review listed: {orphaned}")
+
+    @suite_step(needs=("product",), after=("test_add_review",))
     def test_get_product_reviews(self):
         """Test GET /api/reviews/:productId - Get product reviews (NEW FEATURE)"""
         if not self.test_product_id:
@@ -738,6 +1670,150 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Get Product Reviews", False, f"HTTP {response.status_code}: {response.text}")
 
+        # Paginated reads return an {items, nextCursor} envelope
+        response = self.make_request("GET", f"/reviews/{self.test_product_id}?limit=1")
+        if response and response.status_code == 200 and isinstance(response.json().get("items"), list):
+            page = response.json()
+            self.log_test("Get Product Reviews Page", len(page["items"]) <= 1,
+                          f"{len(page['items'])} review(s), next cursor: {bool(page.get('nextCursor'))}")
+        else:
+            self.log_test("Get Product Reviews Page", False,
+                          f"HTTP {response.status_code}: {response.text}" if response else "Request failed")
+
+    @suite_step(needs=("product",), after=("test_add_review",))
+    def test_product_rating_aggregates(self):
+        """Test that POST /api/reviews keeps ratingCount/ratingAverage on the product up to date"""
+        if not self.test_product_id:
+            self.log_test("Product Rating Aggregates", False, "No test product ID available")
+            return
+
+        response = self.make_request("GET", f"/products/{self.test_product_id}")
+        if not response or response.status_code != 200:
+            self.log_test("Product Rating Aggregates", False, "Could not fetch test product")
+            return
+
+        product = response.json()
+        count = product.get("ratingCount")
+        average = product.get("ratingAverage")
+        # test_add_review posted a 5-star review (skipped without a JWT)
+        expected_count = 1 if self.jwt_token else 0
+        # ratingSum only feeds the average and is not part of the public product
+        if (count == expected_count and (average == 5 or count == 0) and "reviews" not in product
+                and "ratingSum" not in product):
+            self.log_test("Product Rating Aggregates", True, f"ratingCount={count}, ratingAverage={average}")
+        else:
+            self.log_test("Product Rating Aggregates", False,
+                          f"ratingCount={count}, ratingAverage={average}, embedded reviews: {'reviews' in product}, "
+                          f"ratingSum exposed: {'ratingSum' in product}")
+
+    @suite_step(needs=("user",))
+    def test_catalog_response_cache(self):
+        """Test catalog response caching: X-Cache hits, strong ETag/304, stale-while-revalidate header and invalidation"""
+        response = self.make_request("POST", "/products", {
+            "name": f"Cache Watch {uuid.uuid4().hex[:8]}", "description": "Response cache test", "price": 1000,
+            "stock": 5, "category": "Test", "productType": "watch", "gender": "unisex", "brand": "CacheTest"
+        })
+        if response is None or response.status_code != 200:
+            self.log_test("Catalog Response Cache", False, "Could not create product")
+            return
+        product = response.json()
+        product_id = product["id"]
+        detail, reviews = f"/products/{product_id}", f"/reviews/{product_id}?limit=5"
+        listing = f"/products?brand=CacheTest&search={product['name'].replace(' ', '%20')}&limit=5"
+        problems = []
+
+        def get(endpoint, **headers):
+            response = self.make_request("GET", endpoint, headers=headers or None)
+            if response is None:
+                problems.append(f"GET {endpoint} failed")
+            return response
+
+        try:
+            for endpoint in (detail, reviews, listing):
+                first, second = get(endpoint), get(endpoint)
+                # Product writes by concurrent suite tests bump the listing version; re-read before calling it a miss
+                for _ in range(3):
+                    if second is None or second.headers.get("X-Cache") in ("HIT", "STALE"):
+                        break
+                    second = get(endpoint)
+                if first is None or second is None:
+                    continue
+                etag = second.headers.get("ETag", "")
+                if second.headers.get("X-Cache") not in ("HIT", "STALE"):
+                    problems.append(f"{endpoint} second read X-Cache={second.headers.get('X-Cache')}")
+                if not etag.startswith('"') or first.headers.get("ETag") != etag:
+                    problems.append(f"{endpoint} ETag not strong/stable: {first.headers.get('ETag')} vs {etag}")
+                if "stale-while-revalidate" not in second.headers.get("Cache-Control", ""):
+                    problems.append(f"{endpoint} Cache-Control {second.headers.get('Cache-Control')}")
+                conditional = get(endpoint, **{"If-None-Match": etag})
+                if conditional is not None and (conditional.status_code != 304 or conditional.content):
+                    problems.append(f"{endpoint} If-None-Match answered {conditional.status_code}")
+                forced = get(endpoint, **{"Cache-Control": "no-cache"})
+                if forced is not None and forced.headers.get("X-Cache") != "BYPASS":
+                    problems.append(f"{endpoint} Cache-Control: no-cache was served from cache")
+
+            old = {endpoint: get(endpoint) for endpoint in (detail, reviews)}
+            self.make_request("PUT", detail, {**product, "name": product["name"], "price": 1234})
+            self.make_request("POST", f"/reviews/{product_id}", {"rating": 4, "comment": "Cache invalidation"},
+                              {"Authorization": f"Bearer {self.jwt_token}"})
+            fresh_detail = get(detail, **{"If-None-Match": old[detail].headers.get("ETag", "")})
+            if fresh_detail is not None and (fresh_detail.status_code != 200 or
+                                             fresh_detail.json().get("price") != 1234 or
+                                             fresh_detail.json().get("ratingCount") != 1):
+                problems.append(f"product detail stale after write: {fresh_detail.status_code}")
+            fresh_reviews = get(reviews)
+            if fresh_reviews is not None and len(fresh_reviews.json().get("items", [])) != 1:
+                problems.append("reviews stale after a new review")
+            fresh_list = get(listing)
+            if fresh_list is not None and [p.get("price") for p in fresh_list.json().get("items", [])] != [1234]:
+                problems.append("listing stale after product update")
+        finally:
+            self.make_request("DELETE", detail)
+        gone = get(detail)
+        if gone is not None and gone.status_code != 404:
+            problems.append(f"deleted product still served ({gone.status_code})")
+
+        if problems:
+            self.log_test("Catalog Response Cache", False, "; ".join(problems))
+        else:
+            self.log_test("Catalog Response Cache", True,
+                          "Repeat reads hit the cache, If-None-Match → 304, writes invalidate detail/reviews/listing")
+
+    @suite_step()
+    def test_upload_image(self):
+        """Test POST /api/upload + GET /api/images/:id - dedupe, ETag/304 and Range"""
+        # Random bytes behind a PNG signature; the API only checks the declared type
+        payload = b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes * 4096
+        files = {"file": ("harness.png", payload, "image/png")}
+        first = self.make_request("POST", "/upload", files=files)
+        second = self.make_request("POST", "/upload", files=files)
+        if not first or not second or first.status_code != 200 or second.status_code != 200:
+            self.log_test("Upload Image", False,
+                          f"HTTP {first.status_code if first else 'n/a'}: {first.text if first else 'Request failed'}")
+            return
+        url = first.json().get("url", "")
+        deduped = second.json().get("url") == url and second.json().get("deduplicated") is True
+        self.log_test("Upload Image", bool(url) and deduped, f"{url} - second upload deduplicated: {deduped}")
+
+        image_path = url.replace("/api", "", 1)
+        response = self.make_request("GET", image_path)
+        if not response or response.status_code != 200 or response.content != payload:
+            self.log_test("Get Image", False, f"HTTP {response.status_code if response else 'n/a'}")
+            return
+        etag = response.headers.get("ETag")
+        self.log_test("Get Image", bool(etag), f"{len(response.content)} bytes, ETag {etag}")
+
+        response = self.make_request("GET", image_path, headers={"If-None-Match": etag})
+        self.log_test("Get Image If-None-Match", bool(response) and response.status_code == 304,
+                      f"HTTP {response.status_code if response else 'n/a'}")
+
+        response = self.make_request("GET", image_path, headers={"Range": "bytes=0-1023"})
+        ok = (bool(response) and response.status_code == 206 and response.content == payload[:1024]
+              and response.headers.get("Content-Range") == f"bytes 0-1023/{len(payload)}")
+        self.log_test("Get Image Range", ok, f"HTTP {response.status_code if response else 'n/a'}, "
+                      f"{response.headers.get('Content-Range') if response else ''}")
+
+    @suite_step(needs=("product",))
     def test_product_fields_verification(self):
         """Test that products have all NEW FIELDS when retrieved"""
         if not self.test_product_id:
@@ -767,56 +1843,15 @@ class CyprusWatchAPITester:
         else:
             self.log_test("Verify Product NEW FIELDS", False, f"HTTP {response.status_code}: {response.text}")
 
-    def run_all_tests(self):
-        """Run all backend API tests in sequence including NEW FEATURES"""
+    def run_all_tests(self, workers=8):
+        """Run all backend API tests including NEW FEATURES, concurrently where dependencies allow"""
         print(f"\n🚀 Starting Cyprus Watch Backend API Tests - Including NEW FEATURES")
         print(f"Base URL: {self.base_url}")
         print(f"API Base: {self.api_base}")
         print(f"Test User Email: {self.test_user_email}")
         print("=" * 80)
         
-        # Test sequence following the requirements
-        self.test_user_registration()
-        self.test_user_login()
-        self.test_user_profile_get()
-        self.test_user_profile_update()
-        
-        # Product tests with NEW FIELDS
-        self.test_create_product()  # Now includes new fields
-        self.test_get_products()
-        self.test_product_fields_verification()  # NEW: Verify all new fields present
-        
-        # NEW: ETA product type test
-        self.test_create_eta_product()
-        
-        # NEW: Admin user management tests
-        self.test_get_all_users()
-        self.test_get_user_detail()
-        
-        # Favorites tests
-        self.test_add_to_favorites()
-        self.test_get_favorites()
-        
-        # Order tests
-        self.test_create_order()
-        self.test_get_user_orders()
-        self.test_admin_get_orders()
-        
-        # Payment tests with email verification
-        self.test_payment_bank()  # Includes email verification
-        self.test_payment_transfer()
-        
-        # NEW: Reviews system tests
-        self.test_add_review()
-        self.test_get_product_reviews()
-        
-        # Admin operations
-        self.test_admin_update_order()
-        
-        # Cleanup tests
-        self.test_update_product()
-        self.test_remove_from_favorites()
-        self.test_delete_product()
+        schedule = SuiteScheduler(self, workers).run()
         
         print("\n" + "=" * 80)
         print(f"🎯 Test Results Summary (Including NEW FEATURES):")
@@ -824,6 +1859,7 @@ class CyprusWatchAPITester:
         print(f"❌ Failed: {self.results['failed']}")
         print(f"📊 Total: {self.results['passed'] + self.results['failed']}")
         print(f"Success Rate: {(self.results['passed'] / (self.results['passed'] + self.results['failed']) * 100):.1f}%")
+        self.metrics.print_summary()
         
         if self.results['failed'] > 0:
             print(f"\n⚠️  Failed Tests:")
@@ -831,19 +1867,384 @@ class CyprusWatchAPITester:
                 if not test['success']:
                     print(f"   - {test['test']}: {test['message']}")
         
+        self.results["schedule"] = schedule
         return self.results
 
 
+class SuiteScheduler:
+    """Run @suite_step tests as soon as the resources and tests they depend on are done"""
+
+    def __init__(self, tester, workers=8):
+        self.tester = tester
+        self.workers = max(workers, 1)
+        self.steps = {}
+        for name in dir(type(tester)):
+            fn = getattr(type(tester), name)
+            if hasattr(fn, "suite_step"):
+                self.steps[name] = fn.suite_step
+        # Definition order decides which ready test starts first
+        self.order = sorted(self.steps, key=lambda name: getattr(type(tester), name).__code__.co_firstlineno)
+        self.providers = {}
+        for name, step in self.steps.items():
+            for resource in step["provides"]:
+                self.providers.setdefault(resource, set()).add(name)
+        for name, step in self.steps.items():
+            for resource in step["needs"]:
+                if resource not in self.providers:
+                    raise ValueError(f"{name} needs '{resource}' but no test provides it")
+            for dependency in step["after"]:
+                if dependency not in self.steps:
+                    raise ValueError(f"{name} runs after unknown test '{dependency}'")
+
+    def prerequisites(self, name):
+        step = self.steps[name]
+        required = set(step["after"])
+        for resource in step["needs"]:
+            required |= self.providers[resource]
+        return required
+
+    def run_step(self, name):
+        # Requests left over from the previous step on this worker thread belong to no test
+        self.tester.take_server_spans()
+        start = time.perf_counter()
+        try:
+            getattr(self.tester, name)()
+        except Exception as e:
+            self.tester.log_test(name, False, f"Test raised {type(e).__name__}: {e}")
+        return start, time.perf_counter()
+
+    def run(self):
+        """Run every step and return start/end offsets plus the wall and serial durations"""
+        prerequisites = {name: self.prerequisites(name) for name in self.order}
+        pending = list(self.order)
+        done = set()
+        timings = {}
+        running = {}
+        suite_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for name in [n for n in pending if prerequisites[n] <= done]:
+                    if len(running) >= self.workers:
+                        break
+                    pending.remove(name)
+                    running[pool.submit(self.run_step, name)] = name
+                if not running:
+                    raise RuntimeError(f"Dependency cycle between suite tests: {pending}")
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    start, end = future.result()
+                    timings[name] = {"start_s": start - suite_start, "end_s": end - suite_start}
+                    done.add(name)
+        wall = time.perf_counter() - suite_start
+        serial = sum(t["end_s"] - t["start_s"] for t in timings.values())
+        print(f"\n⏱️  Suite wall time: {wall:.2f}s with {self.workers} workers "
+              f"(serial sum of tests: {serial:.2f}s)")
+        return {"workers": self.workers, "wall_s": wall, "serial_s": serial, "steps": timings}
+
+
+def parse_duration(value):
+    """Parse a duration such as '60s', '2m' or '90' into seconds"""
+    value = str(value).strip().lower()
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    for suffix in ("ms", "s", "m", "h"):
+        if value.endswith(suffix):
+            return float(value[:-len(suffix)]) * units[suffix]
+    return float(value)
+
+
+class LoadTestRunner:
+    """Run the user journey (register → login → favorites → order → pay) as parallel virtual users"""
+
+    def __init__(self, base_url, concurrency, duration, session=None, scrape_interval=1.0):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.duration = duration
+        self.tester = CyprusWatchAPITester(base_url, session or PooledSession(pool_size=concurrency))
+        self.scrape_interval = scrape_interval
+        self.admin_headers = {}
+        self.scraper = None
+        self.product_id = None
+        self.lock = threading.Lock()
+        self.errors = {}
+        self.journeys = 0
+        self.elapsed = 0.0
+
+    def timed_request(self, method, endpoint, label, data=None, headers=None, expected=(200,)):
+        """Make a request through the tester, counting unexpected statuses against `label`"""
+        response = self.tester.make_request(method, endpoint, data, headers)
+        ok = response is not None and response.status_code in expected
+        if not ok:
+            with self.lock:
+                self.errors[label] = self.errors.get(label, 0) + 1
+        return response if ok else None
+
+    def setup(self):
+        """Log in as admin, then create the product every virtual user orders"""
+        # Creating and deleting the product and scraping /api/metrics all need the admin token
+        # once the server enforces it
+        self.admin_headers = self.tester.admin_headers()
+        response = self.tester.make_request("POST", "/products", {
+            "name": "Load Test Watch",
+            "description": "Product created by the load generator",
+            "price": 1000,
+            "stock": 1000000,
+            "category": "Load",
+            "productType": "watch",
+            "gender": "unisex",
+            "brand": "LoadTest"
+        }, headers=self.admin_headers)
+        if not response or response.status_code != 200:
+            raise RuntimeError("Could not create load test product")
+        self.product_id = response.json()["id"]
+        # Only the journeys belong in the report
+        self.tester.metrics = MetricsRecorder()
+
+    def fetch_server_metrics(self):
+        """GET /api/metrics straight through the session, so scrapes stay out of the endpoint report"""
+        try:
+            response = self.tester.session.request("GET", f"{self.tester.api_base}/metrics",
+                                                   headers=self.admin_headers)
+            return response.json() if response.status_code == 200 else None
+        except Exception:
+            return None
+
+    def teardown(self):
+        """Delete the load test product"""
+        if self.product_id:
+            self.tester.make_request("DELETE", f"/products/{self.product_id}", headers=self.admin_headers)
+
+    def run_journey(self):
+        """Run one register → login → favorites → order → pay journey"""
+        email = f"loaduser_{uuid.uuid4().hex[:12]}@cypruswatch.com"
+        password = "LoadTest123!"
+
+        self.timed_request("GET", "/products", "GET /products")
+        self.timed_request("GET", f"/products/{self.product_id}", "GET /products/:id")
+        self.timed_request("GET", f"/reviews/{self.product_id}?limit=20", "GET /reviews/:id")
+
+        response = self.timed_request("POST", "/auth/register", "POST /auth/register", {
+            "email": email,
+            "password": password,
+            "fullName": "Load Test User",
+            "phone": "+90 533 000 0000",
+            "address": "Lefkoşa, Kıbrıs"
+        })
+        if not response:
+            return
+
+        response = self.timed_request("POST", "/auth/login", "POST /auth/login",
+                                      {"email": email, "password": password})
+        if not response:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+        self.timed_request("POST", "/favorites/add", "POST /favorites/add",
+                           {"productId": self.product_id}, headers)
+        self.timed_request("GET", "/favorites", "GET /favorites", headers=headers)
+
+        response = self.timed_request("POST", "/orders", "POST /orders", {
+            "items": [{"id": self.product_id, "name": "Load Test Watch", "price": 1000, "quantity": 1}],
+            "totalAmount": 1000,
+            "customerInfo": {
+                "fullName": "Load Test User",
+                "email": email,
+                "phone": "+90 533 000 0000",
+                "address": "Lefkoşa, Kıbrıs"
+            },
+            "paymentMethod": "bank"
+        }, headers)
+        if not response:
+            return
+
+        # 400 is the simulated card decline, not a server failure
+        self.timed_request("POST", "/payment/bank", "POST /payment/bank", {
+            "orderId": response.json()["id"],
+            "amount": 1000,
+            "cardInfo": {
+                "cardNumber": "4111111111111111",
+                "expiryMonth": "12",
+                "expiryYear": "2030",
+                "cvv": "123",
+                "cardholderName": "LOAD TEST"
+            }
+        }, expected=(200, 400))
+
+        with self.lock:
+            self.journeys += 1
+
+    def virtual_user(self, deadline):
+        """Loop journeys until the deadline passes"""
+        while time.perf_counter() < deadline:
+            try:
+                self.run_journey()
+            except Exception as e:
+                print(f"Journey failed: {e}")
+
+    def run(self):
+        """Run the load test and return the per-endpoint report"""
+        print(f"\n🔥 Load test: {self.concurrency} virtual users for {self.duration:.0f}s against {self.base_url}")
+        self.setup()
+        try:
+            if self.scrape_interval > 0:
+                self.scraper = ServerMetricsScraper(self.fetch_server_metrics, self.tester.metrics,
+                                                    self.scrape_interval).start()
+            start = time.perf_counter()
+            deadline = start + self.duration
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for _ in range(self.concurrency):
+                    pool.submit(self.virtual_user, deadline)
+            self.elapsed = time.perf_counter() - start
+            if self.scraper:
+                self.scraper.stop()
+            report = self.report()
+        finally:
+            self.teardown()
+        return report
+
+    def report(self):
+        """Print and return throughput and p50/p95/p99 latency per endpoint"""
+        report = self.tester.metrics.report(mode="load", base_url=self.base_url,
+                                            concurrency=self.concurrency, duration_s=self.elapsed,
+                                            journeys=self.journeys)
+        if self.scraper and self.scraper.last:
+            report["server_metrics"] = self.scraper.summary()
+        print("\n" + "=" * 127)
+        print(f"{'Endpoint':<24}{'Requests':>10}{'Errors':>8}{'Req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'p99 ms':>10}{'max ms':>10}{'srv p95':>10}{'conns':>8}{'conn ms':>10}{'Hit %':>7}")
+        print("-" * 127)
+        total = 0
+        cache = {}
+        for label, data in report["endpoints"].items():
+            wall = data["wall_ms"]
+            data["errors"] = self.errors.get(label, 0)
+            data["throughput"] = data["count"] / self.elapsed if self.elapsed else 0.0
+            total += data["count"]
+            hit_ratio = f"{data['cache_hit_ratio'] * 100:.0f}" if data["cache"] else "-"
+            print(f"{label:<24}{data['count']:>10}{data['errors']:>8}{data['throughput']:>10.1f}"
+                  f"{wall['p50']:>10.1f}{wall['p95']:>10.1f}{wall['p99']:>10.1f}{wall['max']:>10.1f}"
+                  f"{data['server_ms']['p95']:>10.1f}{data['connect_ms']['count']:>8}"
+                  f"{data['connect_ms']['mean']:>10.1f}{hit_ratio:>7}")
+            for state, count in data["cache"].items():
+                cache[state] = cache.get(state, 0) + count
+        print("-" * 127)
+        print(f"Journeys completed: {self.journeys} in {self.elapsed:.1f}s "
+              f"({total / self.elapsed if self.elapsed else 0:.1f} req/s total)")
+        if cache:
+            served = sum(cache.values())
+            print(f"Response cache: {(cache.get('HIT', 0) + cache.get('STALE', 0)) / served * 100:.1f}% hit ratio over "
+                  f"{served} cacheable reads ({', '.join(f'{state} {count}' for state, count in sorted(cache.items()))})")
+        if "server_metrics" in report:
+            self.print_server_metrics(report["server_metrics"])
+        return report
+
+    def print_server_metrics(self, server):
+        """Print pool pressure over the run and the slowest collection operations"""
+        samples = server["samples"]
+        if not samples:
+            return
+        correlation = {name: "-" if r is None else f"{r:+.2f}" for name, r in server["correlation"].items()}
+        print(f"DB pool ({len(samples)} scrapes every {server['interval_s']:g}s): "
+              f"peak in use {server['pool']['peakInUse']}, peak waiting {server['pool']['peakWaiting']}, "
+              f"checkout wait p95 {server['pool']['checkoutWaitMs']['p95']:.2f}ms, "
+              f"checkout failures {samples[-1]['checkout_failures']}")
+        print(f"Client p95 vs pool pressure r={correlation['client_p95_vs_pool_pressure']}, "
+              f"vs checkout wait r={correlation['client_p95_vs_checkout_wait']}")
+        slowest = list(server["operations"].items())[:5]
+        if slowest:
+            print("Slowest DB operations (p95): " +
+                  ", ".join(f"{name} {stats['p95']:.2f}ms×{stats['count']}" for name, stats in slowest))
+
+
 def main():
-    # Use the base URL from .env file
-    base_url = "https://cypruswatch.com"
-    
-    print("🔍 Testing Cyprus Watch Backend APIs...")
-    tester = CyprusWatchAPITester(base_url)
-    results = tester.run_all_tests()
-    
-    return results
+    parser = argparse.ArgumentParser(description="Cyprus Watch backend API tests and load generator")
+    parser.add_argument("--base-url",
+                        help=f"API to test (suite default: {DEFAULT_BASE_URL}); load tests and benchmarks leave "
+                             "data behind, so they need this or --local")
+    parser.add_argument("--local", action="store_true",
+                        help="Run against the in-memory local stand-in instead of --base-url")
+    parser.add_argument("--local-email-delay", type=float, default=0.3,
+                        help="Seconds each fake Resend call takes on the local stand-in")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Run the load test with N virtual users instead of the functional suite")
+    parser.add_argument("--duration", type=parse_duration, default=parse_duration("60s"),
+                        help="Load test duration, e.g. 60s or 2m")
+    parser.add_argument("--scrape-interval", type=float, default=1.0,
+                        help="Seconds between /api/metrics scrapes during the load test (0 disables)")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="Keep-alive connection pool size (default: concurrency, or 10)")
+    parser.add_argument("--http2", action="store_true", help="Use HTTP/2 (requires httpx[http2])")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Suite tests to run at once once their dependencies are ready")
+    parser.add_argument("--serial", action="store_true", help="Run suite tests one at a time")
+    parser.add_argument("--bench", choices=sorted(BENCHMARKS),
+                        help="Run a growth benchmark instead of the functional suite")
+    parser.add_argument("--bench-sizes", type=parse_sizes,
+                        help="Comma-separated data sizes to benchmark, e.g. 100,1k,10k,100k "
+                             "(default depends on the benchmark)")
+    parser.add_argument("--mongo-url",
+                        help="MongoDB URL for benchmarks that query the database directly (--bench indexes)")
+    parser.add_argument("--report-json", help="Write the per-endpoint histogram report as JSON")
+    parser.add_argument("--report-csv", help="Write the per-endpoint summary as CSV")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare p95 latency against")
+    parser.add_argument("--max-p95-regression", type=float, default=0.2,
+                        help="Allowed p95 increase over the baseline as a fraction (default 0.2 = 20%%)")
+    args = parser.parse_args()
+    if not args.local and not args.base_url:
+        if args.bench or args.concurrency > 0:
+            parser.error("--bench and --concurrency create users, orders and products that cannot be deleted; "
+                         "pass --local or an explicit --base-url")
+        args.base_url = DEFAULT_BASE_URL
+    if not args.local and not os.environ.get("ADMIN_PASSWORD"):
+        print("⚠️ ADMIN_USERNAME/ADMIN_PASSWORD are not set; admin checks against the remote API will be refused")
+
+    local_server = None
+    if args.local:
+        local_server = LocalCyprusWatchServer(email_delay=args.local_email_delay).start()
+        args.base_url = local_server.base_url
+        print(f"🧪 Using local stand-in API at {args.base_url}")
+
+    session = PooledSession(pool_size=args.pool_size or max(args.concurrency, 10), http2=args.http2)
+
+    try:
+        if args.bench:
+            # The local stand-in is thrown away afterwards, so skip deleting seeded data
+            report = BenchmarkRunner(args.base_url, session, args.bench_sizes, cleanup=not args.local,
+                                     mongo_url=args.mongo_url,
+                                     admin_credentials=(ADMIN_USERNAME, ADMIN_PASSWORD)).run(args.bench)
+        elif args.concurrency > 0:
+            report = LoadTestRunner(args.base_url, args.concurrency, args.duration, session,
+                                    scrape_interval=args.scrape_interval).run()
+        else:
+            print("🔍 Testing Cyprus Watch Backend APIs...")
+            tester = CyprusWatchAPITester(args.base_url, session)
+            results = tester.run_all_tests(workers=1 if args.serial else args.workers)
+            report = tester.metrics.report(mode="suite", base_url=args.base_url,
+                                           passed=results["passed"], failed=results["failed"],
+                                           tests=results["tests"])
+    finally:
+        session.close()
+        if local_server:
+            local_server.stop()
+
+    if args.report_json:
+        write_json_report(report, args.report_json)
+    if args.report_csv:
+        write_csv_report(report, args.report_csv)
+    if args.baseline:
+        regressions = compare_to_baseline(report, args.baseline, args.max_p95_regression)
+        if regressions:
+            print(f"\n❌ p95 latency regressed past the baseline ({args.baseline}):")
+            for regression in regressions:
+                print(f"   - {regression['endpoint']}: {regression['baseline_p95_ms']:.1f}ms → "
+                      f"{regression['p95_ms']:.1f}ms (+{regression['change'] * 100:.0f}%)")
+            return 1
+        print(f"\n✅ p95 latency within {args.max_p95_regression * 100:.0f}% of the baseline")
+    # Non-zero for CI when any functional check failed
+    if report.get("mode") == "suite" and report.get("failed"):
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
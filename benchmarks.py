@@ -0,0 +1,1269 @@
+#!/usr/bin/env python3
+"""
+Growth benchmarks for the Cyprus Watch API
+Each benchmark seeds data at increasing sizes and measures how the endpoints
+it covers scale. Run with: python backend_test.py --bench catalog --local
+"""
+
+import json
+import os
+import random
+import resource
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from harness_metrics import MetricsRecorder, is_admin_route, route_timing
+
+try:
+    import pymongo
+except ImportError:  # only the direct-to-MongoDB benchmarks need it
+    pymongo = None
+
+BENCHMARKS = {}
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+CARD_FIELDS = "id,name,description,price,image,images,stock,category,productType,gender,brand,createdAt"
+
+BENCH_BRANDS = ["Rolex", "Omega", "Seiko", "Casio", "Tissot", "Ray-Ban", "Oakley", "Police"]
+
+
+def benchmark(name, sizes=DEFAULT_SIZES):
+    """Register a benchmark function under `name` for --bench
+
+    `sizes` are the data sizes used when --bench-sizes is not given.
+    """
+    def register(fn):
+        fn.default_sizes = tuple(sizes)
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (includes the local stand-in when --local)"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_sizes(value):
+    """Parse a comma-separated size list like 100,1k,10k,100k"""
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        multiplier = 1
+        if part.endswith("k"):
+            part, multiplier = part[:-1], 1000
+        elif part.endswith("m"):
+            part, multiplier = part[:-1], 1000000
+        sizes.append(int(float(part) * multiplier))
+    return sorted(set(sizes))
+
+
+class BenchmarkRunner:
+    """Shared plumbing for benchmarks: seeding, timed requests and the report
+
+    Every measured request is recorded under a "<benchmark> n=<size> <case>"
+    label, so the usual JSON/CSV reports and --baseline comparison apply.
+    """
+
+    def __init__(self, base_url, session, sizes=None, repeats=5, seed_workers=16, cleanup=True, mongo_url=None,
+                 admin_credentials=(None, None)):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.session = session
+        self.sizes = sorted(sizes) if sizes else None
+        self.repeats = repeats
+        self.seed_workers = seed_workers
+        self.cleanup_enabled = cleanup
+        self.mongo_url = mongo_url
+        self.admin_username, self.admin_password = admin_credentials
+        self.admin_token = None
+        self.admin_lock = threading.Lock()
+        self.metrics = MetricsRecorder()
+        self.rows = []
+        self.created = {}
+
+    def admin_headers(self):
+        """Authorization header for admin routes, logging in through /login/login on first use
+
+        Empty without admin credentials, so admin requests then go out without a token.
+        """
+        with self.admin_lock:
+            if self.admin_token is None:
+                self.admin_token = ""
+                if self.admin_password:
+                    response = self.session.request("POST", f"{self.api_url}/login/login", json={
+                        "username": self.admin_username, "password": self.admin_password})
+                    if response.status_code != 200:
+                        raise RuntimeError(f"Admin login failed: {response.status_code} {response.text[:200]}")
+                    self.admin_token = response.json()["token"]
+        return {"Authorization": f"Bearer {self.admin_token}"} if self.admin_token else {}
+
+    def request(self, method, endpoint, data=None, headers=None, files=None, raw=None):
+        """`data` is sent as JSON; `raw` bytes are sent as-is (set Content-Type in `headers`)
+
+        Admin routes carry the admin token unless `headers` sets its own Authorization.
+        """
+        if is_admin_route(method, endpoint) and "Authorization" not in (headers or {}):
+            headers = {**self.admin_headers(), **(headers or {})}
+        return self.session.request(method, f"{self.api_url}{endpoint}", json=data, headers=headers, files=files,
+                                    data=raw)
+
+    def seed(self, collection, endpoint, make_doc, count, headers=None, offset=0, track=True):
+        """Create `count` documents concurrently, returning how long it took
+
+        Tracked documents are deleted through DELETE /<collection>/:id on
+        cleanup; pass track=False for documents removed with their parent.
+        """
+        def create(index):
+            response = self.request("POST", endpoint, make_doc(index), headers)
+            if response.status_code != 200:
+                raise RuntimeError(f"Seeding {endpoint} failed: {response.status_code} {response.text[:200]}")
+            return response.json().get("id")
+
+        created = self.created.setdefault(collection, []) if track else []
+        offset = offset or len(created)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.seed_workers) as pool:
+            ids = list(pool.map(create, range(offset, offset + count)))
+        created.extend(ids)
+        elapsed = time.perf_counter() - start
+        print(f"   🌱 Seeded {count} {collection} in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f}/s)")
+        return ids
+
+    def register_user(self):
+        """Register a throwaway user and return its auth headers"""
+        response = self.request("POST", "/auth/register", {
+            "email": f"bench_{uuid.uuid4().hex[:12]}@cypruswatch.com",
+            "password": "BenchTest123!",
+            "fullName": "Benchmark User",
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"Could not register benchmark user: {response.status_code} {response.text[:200]}")
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def measure(self, name, size, case, method, endpoint, data=None, headers=None, repeats=None):
+        """Time the same request several times and add a report row"""
+        label = f"{name} n={size} {case}"
+        response = None
+        for _ in range(repeats or self.repeats):
+            response = self.request(method, endpoint, data, headers)
+            self.metrics.record(method, endpoint, response, label=label)
+        return self.add_row(name, size, case, label, response)
+
+    def walk(self, name, size, endpoint, pages=10, case="cursor walk"):
+        """Follow nextCursor for up to `pages` pages; later pages should cost the same as the first"""
+        label = f"{name} n={size} {case}"
+        separator = "&" if "?" in endpoint else "?"
+        response, walked, url = None, 0, endpoint
+        for _ in range(pages):
+            response = self.request("GET", url)
+            self.metrics.record("GET", url, response, label=label)
+            if response.status_code != 200:
+                break
+            walked += 1
+            next_cursor = response.json().get("nextCursor")
+            if not next_cursor:
+                break
+            url = f"{endpoint}{separator}cursor={next_cursor}"
+        return self.add_row(name, size, case, label, response, pages=walked)
+
+    def add_row(self, name, size, case, label, response=None, **extra):
+        data = self.metrics.endpoints[label].to_dict()
+        row = {
+            "benchmark": name,
+            "size": size,
+            "case": case,
+            "requests": data["count"],
+            "p50_ms": data["wall_ms"]["p50"],
+            "p95_ms": data["wall_ms"]["p95"],
+            "server_p95_ms": data["server_ms"]["p95"],
+            "mean_bytes": data["size_bytes"]["mean"],
+            "status": response.status_code if response is not None else None,
+            **extra,
+        }
+        self.rows.append(row)
+        notes = "  ".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                          for key, value in extra.items())
+        print(f"   {case:<28}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['mean_bytes'] / 1024:>12.1f}"
+              f"  {row['status']}  {notes}".rstrip())
+        return row
+
+    def print_header(self, name, size, unit="seeded"):
+        print(f"\n📏 {name}: {size} {unit}")
+        print(f"   {'Case':<28}{'p50 ms':>10}{'p95 ms':>10}{'avg KB':>12}  Status")
+
+    def cleanup(self):
+        """Delete everything the benchmark created"""
+        if not self.cleanup_enabled:
+            return
+        for collection, ids in self.created.items():
+            if not ids:
+                continue
+            with ThreadPoolExecutor(max_workers=self.seed_workers) as pool:
+                list(pool.map(lambda doc_id: self.request("DELETE", f"/{collection}/{doc_id}"), ids))
+            print(f"   🧹 Deleted {len(ids)} benchmark {collection}")
+        self.created = {}
+
+    def run(self, name):
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark '{name}' (available: {', '.join(sorted(BENCHMARKS))})")
+        self.sizes = self.sizes or list(BENCHMARKS[name].default_sizes)
+        print(f"\n⏱️  Benchmark '{name}' at sizes {', '.join(str(size) for size in self.sizes)} against {self.base_url}")
+        try:
+            BENCHMARKS[name](self)
+        finally:
+            self.cleanup()
+        return self.metrics.report(mode="bench", benchmark=name, base_url=self.base_url,
+                                   sizes=self.sizes, rows=self.rows)
+
+
+def bench_product(index):
+    product_type = ("watch", "eyewear", "eta")[index % 3]
+    rng = random.Random(index)
+    return {
+        "name": f"Bench {product_type.title()} {index:06d}",
+        "description": "Benchmark product " + "lorem ipsum " * 20,
+        "price": rng.randint(100, 100000),
+        "image": f"https://via.placeholder.com/400x300?text=Bench+{index}",
+        "stock": rng.randint(0, 50),
+        "category": "Gözlük" if product_type == "eyewear" else "Benchmark",
+        "productType": product_type,
+        "gender": ("male", "female", "unisex")[(index // 3) % 3],
+        "brand": BENCH_BRANDS[index % len(BENCH_BRANDS)],
+        "specs": {"caseSize": f"{38 + index % 8}mm", "warranty": "2 Years", "features": "Benchmark data"},
+    }
+
+
+@benchmark("catalog")
+def catalog_benchmark(runner, pages=10):
+    """Product listing as the catalog grows: full list vs filtered, projected and paginated reads"""
+    name = "catalog"
+    seeded = 0
+    for size in runner.sizes:
+        runner.seed("products", "/products", bench_product, size - seeded)
+        seeded = size
+        runner.print_header(name, size)
+
+        runner.measure(name, size, "full list", "GET", "/products", repeats=max(1, runner.repeats // 2))
+        runner.measure(name, size, "type + card fields", "GET",
+                       f"/products?productType=watch&fields={CARD_FIELDS}")
+        runner.measure(name, size, "page limit=24 price-asc", "GET",
+                       f"/products?productType=watch&limit=24&sort=price-asc&fields={CARD_FIELDS}")
+        runner.measure(name, size, "navbar search limit=5", "GET",
+                       "/products?search=bench%20watch%2000&limit=5&fields=id,name,image,category,price")
+        runner.walk(name, size, f"/products?limit=24&sort=newest&fields={CARD_FIELDS}", pages)
+
+
+def bench_review(index):
+    rng = random.Random(index)
+    return {
+        "rating": rng.randint(1, 5),
+        "comment": f"Benchmark review {index}: " + "great watch, fast delivery. " * rng.randint(1, 6),
+    }
+
+
+@benchmark("reviews")
+def reviews_benchmark(runner, pages=10):
+    """Product detail and review reads as one product collects thousands of reviews"""
+    name = "reviews"
+    headers = runner.register_user()
+    product_id = runner.seed("products", "/products", bench_product, 1)[0]
+    seeded = 0
+    for size in runner.sizes:
+        runner.seed("reviews", f"/reviews/{product_id}", bench_review, size - seeded,
+                    headers=headers, offset=seeded, track=False)
+        seeded = size
+        runner.print_header(name, size)
+
+        runner.measure(name, size, "product detail", "GET", f"/products/{product_id}")
+        runner.measure(name, size, "product list", "GET", f"/products?limit=24&fields={CARD_FIELDS}")
+        runner.measure(name, size, "reviews default", "GET", f"/reviews/{product_id}")
+        runner.measure(name, size, "reviews page limit=20", "GET", f"/reviews/{product_id}?limit=20")
+        runner.measure(name, size, "add review", "POST", f"/reviews/{product_id}", bench_review(size), headers,
+                       repeats=1)
+        seeded += 1
+        runner.walk(name, size, f"/reviews/{product_id}?limit=20", pages)
+
+        product = runner.request("GET", f"/products/{product_id}").json()
+        print(f"   ⭐ ratingCount={product.get('ratingCount')} ratingAverage={product.get('ratingAverage')}")
+
+
+def bench_image(size):
+    # JPEG markers around random bytes: incompressible, and every upload is unique
+    return b"\xff\xd8\xff\xe0" + os.urandom(max(size - 6, 0)) + b"\xff\xd9"
+
+
+@benchmark("images", sizes=(100_000, 500_000, 1_000_000, 2_000_000, 5_000_000))
+def images_benchmark(runner, count=16):
+    """Concurrent uploads and downloads of 100KB-5MB images: throughput, dedupe and memory"""
+    name = "images"
+    for size in runner.sizes:
+        runner.print_header(name, size, "bytes per image")
+        payloads = [bench_image(size) for _ in range(count)]
+        urls = [None] * count
+        rss_before = rss_mb()
+        peak = [rss_before]
+
+        def sample_memory(stop):
+            while not stop.wait(0.05):
+                peak[0] = max(peak[0], rss_mb())
+
+        def timed_phase(case, fn, method, endpoint_of):
+            """Run fn(i) for every payload concurrently and add one row with MB/s"""
+            label = f"{name} n={size} {case}"
+
+            def run(index):
+                response = fn(index)
+                runner.metrics.record(method, endpoint_of(index), response, label=label)
+                return response
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=runner.seed_workers) as pool:
+                responses = list(pool.map(run, range(count)))
+            elapsed = time.perf_counter() - start
+            moved = sum(len(payloads[i]) for i in range(count))
+            return responses, runner.add_row(name, size, case, label, responses[-1],
+                                             mb_per_s=moved / elapsed / 1e6 if elapsed else 0.0)
+
+        stop = threading.Event()
+        sampler = threading.Thread(target=sample_memory, args=(stop,), daemon=True)
+        sampler.start()
+        try:
+            responses, _ = timed_phase(
+                "upload", lambda i: runner.request("POST", "/upload",
+                                                   files={"file": (f"bench-{i}.jpg", payloads[i], "image/jpeg")}),
+                "POST", lambda i: "/upload")
+            for i, response in enumerate(responses):
+                if response.status_code == 200:
+                    urls[i] = response.json()["url"].replace("/api", "", 1)
+            if not all(urls):
+                print("   ❌ Some uploads failed; skipping downloads")
+                continue
+
+            responses, _ = timed_phase(
+                "re-upload (dedupe)", lambda i: runner.request("POST", "/upload",
+                                                               files={"file": (f"bench-{i}.jpg", payloads[i], "image/jpeg")}),
+                "POST", lambda i: "/upload")
+            deduped = sum(1 for r in responses if r.status_code == 200 and r.json().get("deduplicated"))
+            print(f"   ♻️  {deduped}/{count} re-uploads deduplicated")
+
+            responses, _ = timed_phase("download", lambda i: runner.request("GET", urls[i]), "GET", lambda i: urls[i])
+            intact = sum(1 for i, r in enumerate(responses) if r.content == payloads[i])
+            print(f"   ✔️  {intact}/{count} downloads byte-identical")
+
+            etags = [r.headers.get("ETag") for r in responses]
+            runner.measure(name, size, "conditional GET (304)", "GET", urls[0], headers={"If-None-Match": etags[0]})
+            runner.measure(name, size, "range GET 64KB", "GET", urls[0], headers={"Range": "bytes=0-65535"})
+        finally:
+            stop.set()
+            sampler.join()
+        print(f"   🧠 RSS {rss_before:.0f}MB → peak {peak[0]:.0f}MB (+{peak[0] - rss_before:.0f}MB), "
+              f"process peak {peak_rss_mb():.0f}MB")
+        runner.rows.append({"benchmark": name, "size": size, "case": "memory",
+                            "rss_before_mb": rss_before, "rss_peak_mb": peak[0]})
+
+
+def bench_png(width, seed=0):
+    """A valid width×width RGB PNG: gradient rows with a random third, ~0.6MB at 800px and ~4MB at 2000px"""
+    rng = random.Random(seed)
+    base = bytes(((x * 255 // width) + seed * 37) & 255 for x in range(width * 3))
+    span = width
+    rows = []
+    for y in range(width):
+        shift = (y * 3) % (width * 3)
+        row = bytearray(base[shift:] + base[:shift])
+        start = rng.randrange(0, width * 3 - span)
+        row[start:start + span] = os.urandom(span)
+        rows.append(b"\x00" + bytes(row))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, width, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) + chunk(b"IEND", b""))
+
+
+# What a modern browser sends for <img> requests
+BROWSER_IMAGE_ACCEPT = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+
+
+@benchmark("catalog-images", sizes=(800, 1600, 2000))
+def catalog_images_benchmark(runner, page_size=24, card_width=640):
+    """Bytes transferred for one catalog page of product cards: original uploads vs ?w=&format=auto derivatives"""
+    name = "catalog-images"
+    for size in runner.sizes:
+        runner.print_header(name, size, "px source images")
+        brand = f"BenchImages-{uuid.uuid4().hex[:8]}"
+
+        def upload(index):
+            response = runner.request("POST", "/upload", files={
+                "file": (f"card-{index}.png", bench_png(size, seed=index), "image/png")})
+            if response.status_code != 200:
+                raise RuntimeError(f"Upload failed: {response.status_code} {response.text[:200]}")
+            return response.json()["url"]
+
+        with ThreadPoolExecutor(max_workers=runner.seed_workers) as pool:
+            urls = list(pool.map(upload, range(page_size)))
+        runner.seed("products", "/products",
+                    lambda i: {**bench_product(i), "brand": brand, "image": urls[i % page_size], "images": []},
+                    page_size)
+
+        page = runner.request("GET", f"/products?brand={brand}&limit={page_size}&fields={CARD_FIELDS}")
+        images = [product["image"].replace("/api", "", 1) for product in page.json()["items"]]
+        page_bytes = len(page.content)
+
+        def fetch_all(case, suffix):
+            """Fetch every card image on the page like a browser would and add one row with the total bytes"""
+            label = f"{name} n={size} {case}"
+            headers = {"Accept": BROWSER_IMAGE_ACCEPT}
+
+            def fetch(path):
+                response = runner.request("GET", f"{path}{suffix}", headers=headers)
+                runner.metrics.record("GET", path, response, label=label)
+                return response
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=6) as pool:  # browsers open ~6 connections per host
+                responses = list(pool.map(fetch, images))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            image_bytes = sum(len(r.content) for r in responses)
+            types = sorted({r.headers.get("Content-Type", "?") for r in responses})
+            return runner.add_row(name, size, case, label, responses[-1], page_kb=(page_bytes + image_bytes) / 1024,
+                                  page_ms=elapsed_ms, types=",".join(types))
+
+        before = fetch_all("original images", "")
+        after = fetch_all(f"w={card_width} format=auto (cold)", f"?w={card_width}&format=auto")
+        fetch_all(f"w={card_width} format=auto (cached)", f"?w={card_width}&format=auto")
+        print(f"   📉 Bytes per catalog page: {before['page_kb']:.0f}KB → {after['page_kb']:.0f}KB "
+              f"({(1 - after['page_kb'] / before['page_kb']) * 100 if before['page_kb'] else 0:.0f}% smaller)")
+
+
+BENCH_ORDER_PRODUCTS = 200
+
+
+def import_products(runner, rows):
+    """Upsert `rows` through POST /products/import and track them for cleanup"""
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+    response = runner.request("POST", "/products/import", raw=body, headers={"Content-Type": "application/x-ndjson"})
+    if response.status_code != 200 or response.json()["failed"]:
+        raise RuntimeError(f"Importing benchmark products failed: {response.status_code} {response.text[:200]}")
+    runner.created.setdefault("products", []).extend(row["id"] for row in rows)
+
+
+def seed_order_products(runner, stock=10 ** 9):
+    """The bench-product-N catalog bench_order buys from; orders reserve stock, so it must never run out"""
+    if "bench-product-0" in runner.created.get("products", []):
+        return
+    import_products(runner, [{**bench_product(index), "id": f"bench-product-{index}", "stock": stock}
+                             for index in range(BENCH_ORDER_PRODUCTS)])
+
+
+def bench_order(index):
+    # 1-50 line items so row rendering dominates some invoices and the static shell others; the server prices them
+    rng = random.Random(index)
+    items = [{"id": f"bench-product-{rng.randrange(BENCH_ORDER_PRODUCTS)}", "quantity": rng.randint(1, 3)}
+             for _ in range(1 + index % 50)]
+    return {
+        "items": items,
+        "customerInfo": {
+            "fullName": f"Bench Customer {index}",
+            "email": f"bench_{index}@cypruswatch.com",
+            "phone": "+90 533 000 0000",
+            "address": "Lefkoşa, Kıbrıs",
+        },
+        "paymentMethod": "transfer" if index % 2 else "bank",
+    }
+
+
+# Renders synthetic orders of 1-50 items with lib/invoice.js and prints [ms, bytes, items] per render
+INVOICE_RENDER_SCRIPT = """
+import { renderInvoiceHTML } from './invoice.mjs';
+
+const count = Number(process.argv[2]);
+const orders = Array.from({ length: count }, (_, index) => {
+  const items = Array.from({ length: 1 + index % 50 }, (_, line) => ({
+    id: `bench-product-${line}`, name: `Bench Watch ${line} <Limited>`, price: 1000 + line, quantity: 1 + line % 3
+  }));
+  return {
+    id: `bench-order-${index}`,
+    createdAt: new Date(Date.UTC(2024, index % 12, 1 + index % 28)).toISOString(),
+    customerInfo: { fullName: `Bench Customer ${index}`, email: `bench_${index}@cypruswatch.com`,
+                    phone: '+90 533 000 0000', address: 'Lefkoşa, Kıbrıs' },
+    paymentMethod: index % 2 ? 'transfer' : 'bank',
+    status: index % 2 ? 'awaiting_transfer' : 'paid',
+    items,
+    totalAmount: items.reduce((sum, item) => sum + item.price * item.quantity, 0),
+  };
+});
+// Warm-up so the timed renders run JIT-compiled code
+for (const order of orders.slice(0, 1000)) renderInvoiceHTML(order, null);
+const samples = orders.map(order => {
+  const start = performance.now();
+  const html = renderInvoiceHTML(order, null);
+  return [performance.now() - start, html.length, order.items.length];
+});
+process.stdout.write(JSON.stringify(samples));
+"""
+
+
+@benchmark("invoices", sizes=(10000,))
+def invoices_benchmark(runner, item_bands=((1, 10), (11, 30), (31, 50))):
+    """renderInvoiceHTML alone on `size` orders of 1-50 items: no HTTP, database or artifact lookup
+
+    Runs lib/invoice.js in a local node process whatever the target, so
+    the numbers are the template cost only; invoice-downloads measures the
+    endpoint end to end.
+    """
+    node = shutil.which("node")
+    if node is None:
+        raise RuntimeError("The invoices benchmark renders with lib/invoice.js: node must be on PATH")
+    name = "invoices"
+    with tempfile.TemporaryDirectory() as workdir:
+        shutil.copyfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib", "invoice.js"),
+                        os.path.join(workdir, "invoice.mjs"))
+        script = os.path.join(workdir, "render.mjs")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(INVOICE_RENDER_SCRIPT)
+        for size in runner.sizes:
+            start = time.perf_counter()
+            result = subprocess.run([node, script, str(size)], capture_output=True, text=True, check=False)
+            if result.returncode != 0:
+                raise RuntimeError(f"Rendering invoices failed: {result.stderr.strip()[:500]}")
+            samples = json.loads(result.stdout)
+            print(f"   🖨️  node run took {time.perf_counter() - start:.1f}s including start-up and warm-up")
+            runner.print_header(name, size, "orders rendered")
+
+            for low, high in item_bands:
+                band = [(ms, size_bytes) for ms, size_bytes, items in samples if low <= items <= high]
+                label = f"{name} n={size} render {low}-{high} items"
+                for ms, _ in band:
+                    runner.metrics.record_duration(label, ms)
+                runner.add_row(name, size, f"render {low}-{high} items", label, renders=len(band),
+                               mean_kb=sum(size_bytes for _, size_bytes in band) / len(band) / 1024)
+            total_ms = sum(ms for ms, _, _ in samples)
+            print(f"   🧾 {len(samples) / total_ms * 1000:.0f} invoices/s rendered "
+                  f"({total_ms / len(samples) * 1000:.0f}µs mean)")
+
+
+@benchmark("invoice-downloads", sizes=(10000,))
+def invoice_downloads_benchmark(runner):
+    """Invoice downloads for orders of 1-50 items: first download renders and stores, later ones read the artifact
+
+    End to end over HTTP: the orders are created through POST /orders (not
+    timed) and each download includes routing, the order lookup and the
+    invoices collection; see the invoices benchmark for the render alone.
+    """
+    name = "invoice-downloads"
+    seeded = 0
+    order_ids = []
+    seed_order_products(runner)
+    for size in runner.sizes:
+        # Orders have no DELETE endpoint, so they are left in place
+        new_ids = runner.seed("orders", "/orders", bench_order, size - seeded, offset=seeded, track=False)
+        order_ids += new_ids
+        seeded = size
+        runner.print_header(name, size, "orders")
+
+        def download_all(case, ids):
+            label = f"{name} n={size} {case}"
+
+            def download(order_id):
+                endpoint = f"/admin/orders/{order_id}/invoice"
+                response = runner.request("GET", endpoint)
+                runner.metrics.record("GET", endpoint, response, label=label)
+                return response
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=runner.seed_workers) as pool:
+                responses = list(pool.map(download, ids))
+            elapsed = time.perf_counter() - start
+            return runner.add_row(name, size, case, label, responses[-1],
+                                  per_sec=len(ids) / elapsed if elapsed else 0.0,
+                                  ok=sum(r.status_code == 200 for r in responses))
+
+        rendered = download_all("first download (render)", new_ids)
+        stored = download_all("download (stored)", order_ids)
+        print(f"   🧾 {rendered['per_sec']:.0f} invoices/s rendered, {stored['per_sec']:.0f}/s from the stored artifact")
+
+
+@benchmark("logins", sizes=(1, 4, 16, 64))
+def logins_benchmark(runner, logins_per_worker=8, probe_endpoint="/products?limit=24"):
+    """Login throughput at increasing concurrency and how much a login burst slows an unrelated endpoint"""
+    name = "logins"
+    credentials = {"email": f"bench_login_{uuid.uuid4().hex[:12]}@cypruswatch.com", "password": "BenchTest123!"}
+    response = runner.request("POST", "/auth/register", {**credentials, "fullName": "Benchmark Login"})
+    if response.status_code != 200:
+        raise RuntimeError(f"Could not register benchmark user: {response.status_code} {response.text[:200]}")
+    runner.measure(name, 0, "probe idle", "GET", probe_endpoint, repeats=max(runner.repeats, 10))
+
+    for size in runner.sizes:
+        runner.print_header(name, size, "concurrent logins")
+        login_label = f"{name} n={size} login"
+        probe_label = f"{name} n={size} probe during burst"
+        done = threading.Event()
+        probes = []
+
+        def probe():
+            while not done.is_set():
+                probes.append(runner.request("GET", probe_endpoint))
+                runner.metrics.record("GET", probe_endpoint, probes[-1], label=probe_label)
+
+        def login(_):
+            response = runner.request("POST", "/auth/login", credentials)
+            runner.metrics.record("POST", "/auth/login", response, label=login_label)
+            return response
+
+        prober = threading.Thread(target=probe, daemon=True)
+        prober.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=size) as pool:
+            responses = list(pool.map(login, range(size * logins_per_worker)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        prober.join()
+
+        ok = sum(r.status_code == 200 for r in responses)
+        runner.add_row(name, size, "login", login_label, responses[-1],
+                       logins_per_sec=ok / elapsed if elapsed else 0.0, ok=ok)
+        runner.add_row(name, size, "probe during burst", probe_label, probes[-1] if probes else None)
+    idle = next(row for row in runner.rows if row["case"] == "probe idle")
+    for row in runner.rows:
+        if row["case"] == "probe during burst":
+            print(f"   🐢 n={row['size']}: {probe_endpoint} p50 {idle['p50_ms']:.1f}ms → {row['p50_ms']:.1f}ms "
+                  f"({(row['p50_ms'] / idle['p50_ms'] - 1) * 100 if idle['p50_ms'] else 0:+.0f}%)")
+
+
+DASHBOARD_ENDPOINTS = ("/auth/me", "/orders/my", "/favorites")
+
+
+@benchmark("dashboard", sizes=(1, 10, 50))
+def dashboard_benchmark(runner, users=20):
+    """DB round trips (X-DB-Ops) and latency per dashboard load: cold, warm and right after a favorites write"""
+    name = "dashboard"
+    seeded = 0
+    product_ids = []
+    for size in runner.sizes:
+        product_ids += runner.seed("products", "/products", bench_product, size - seeded, offset=seeded)
+        seeded = size
+        runner.print_header(name, size, "favorites per user")
+        accounts = [runner.register_user() for _ in range(users)]
+
+        def add_favorites(headers):
+            for product_id in product_ids[:size]:
+                runner.request("POST", "/favorites/add", {"productId": product_id}, headers)
+
+        with ThreadPoolExecutor(max_workers=runner.seed_workers) as pool:
+            list(pool.map(add_favorites, accounts))
+
+        def load_dashboards(case):
+            """Load the dashboard (profile, orders, favorites) once per user; the row reports DB ops per load"""
+            label = f"{name} n={size} {case}"
+            db_ops, response = [], None
+            for headers in accounts:
+                ops = 0
+                for endpoint in DASHBOARD_ENDPOINTS:
+                    response = runner.request("GET", endpoint, headers=headers)
+                    runner.metrics.record("GET", endpoint, response, label=label)
+                    ops += int(response.headers.get("X-DB-Ops", 0))
+                db_ops.append(ops)
+            return runner.add_row(name, size, case, label, response, db_ops_per_load=sum(db_ops) / len(db_ops))
+
+        # favorites/add above already invalidated every account, so the first pass is uncached
+        cold = load_dashboards("cold load")
+        warm = load_dashboards("warm load")
+        for headers in accounts:
+            runner.request("DELETE", "/favorites/remove", {"productId": product_ids[0]}, headers)
+        load_dashboards("load after favorites write")
+        # Without the cache every load ran users.findOne twice, the favorites $in and the orders query
+        print(f"   🗄️  DB round trips per dashboard load: 4 uncached → {cold['db_ops_per_load']:.1f} cold → "
+              f"{warm['db_ops_per_load']:.1f} warm")
+
+
+STOREFRONT_LISTINGS = tuple(f"/products?{query}fields={CARD_FIELDS}"
+                            for query in ("", "productType=watch&", "productType=eyewear&", "productType=eta&"))
+
+
+@benchmark("catalog-cache", sizes=(1, 16, 64))
+def catalog_cache_benchmark(runner, catalog_size=2000, hot_products=50, reads_per_worker=40, write_every_s=0.5):
+    """Storefront reads (listing pages, product detail, reviews) under concurrent load: uncached vs response cache"""
+    name = "catalog-cache"
+    product_ids = runner.seed("products", "/products", bench_product, catalog_size)
+    hot = product_ids[:hot_products]
+    rng = random.Random(0)
+    paths = list(STOREFRONT_LISTINGS) + [f"/products/{product_id}" for product_id in hot] + \
+        [f"/reviews/{product_id}?limit=20" for product_id in hot]
+
+    for size in runner.sizes:
+        runner.print_header(name, size, "concurrent readers")
+        rows = {}
+        # Every case replays the same requests
+        plan = [[rng.choice(paths) for _ in range(reads_per_worker)] for _ in range(size)]
+
+        def read_mix(case, headers_for=lambda endpoint, etags: None, writer=False):
+            """Every worker reads `reads_per_worker` random storefront endpoints; optionally a writer edits hot products"""
+            label = f"{name} n={size} {case}"
+            done = threading.Event()
+            writes = 0
+
+            def write_loop():
+                nonlocal writes
+                while not done.wait(write_every_s):
+                    product_id = rng.choice(hot)
+                    runner.request("PUT", f"/products/{product_id}", {**bench_product(writes), "price": 1000 + writes})
+                    writes += 1
+
+            def worker(endpoints):
+                etags, last = {}, None
+                for endpoint in endpoints:
+                    last = runner.request("GET", endpoint, headers=headers_for(endpoint, etags))
+                    runner.metrics.record("GET", endpoint, last, label=label)
+                    if last.headers.get("ETag"):
+                        etags[endpoint] = last.headers["ETag"]
+                return last
+
+            thread = threading.Thread(target=write_loop, daemon=True) if writer else None
+            if thread:
+                thread.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=size) as pool:
+                responses = list(pool.map(worker, plan))
+            elapsed = time.perf_counter() - start
+            done.set()
+            if thread:
+                thread.join()
+            hit_ratio = runner.metrics.endpoints[label].cache_hit_ratio or 0.0
+            rows[case] = runner.add_row(name, size, case, label, responses[-1], hit_ratio=hit_ratio,
+                                        reads_per_sec=size * reads_per_worker / elapsed if elapsed else 0.0,
+                                        **({"writes": writes} if writer else {}))
+
+        read_mix("no cache (no-cache)", lambda endpoint, etags: {"Cache-Control": "no-cache"})
+        # Steady state: the bypassing pass above already refilled every entry it read; warm the rest
+        with ThreadPoolExecutor(max_workers=runner.seed_workers) as pool:
+            list(pool.map(lambda endpoint: runner.request("GET", endpoint), paths))
+        read_mix("response cache")
+        read_mix("response cache + writes", writer=True)
+        read_mix("revalidate (If-None-Match)",
+                 lambda endpoint, etags: {"If-None-Match": etags[endpoint]} if endpoint in etags else None)
+
+        uncached, cached = rows["no cache (no-cache)"], rows["response cache"]
+        print(f"   ⚡ p95 {uncached['p95_ms']:.1f}ms uncached → {cached['p95_ms']:.1f}ms cached "
+              f"({uncached['p95_ms'] / cached['p95_ms'] if cached['p95_ms'] else 0:.1f}x), "
+              f"{uncached['reads_per_sec']:.0f} → {cached['reads_per_sec']:.0f} reads/s; hit ratio "
+              f"{cached['hit_ratio'] * 100:.0f}% ({rows['response cache + writes']['hit_ratio'] * 100:.0f}% "
+              f"with a product write every {write_every_s}s)")
+
+
+@benchmark("admin-lists", sizes=(1000, 10000, 50000))
+def admin_lists_benchmark(runner, page_size=50, pages=10):
+    """Admin order/user listings as orders pile up: each page must stay the same size whatever the total"""
+    name = "admin-lists"
+    seeded = 0
+    seed_order_products(runner)
+    headers = runner.register_user()
+    me = runner.request("GET", "/auth/me", headers=headers).json()
+    first_page = {}
+    for size in runner.sizes:
+        # Every order belongs to one customer so their order history grows with the total; orders are not deleted
+        runner.seed("orders", "/orders", bench_order, size - seeded, headers=headers, offset=seeded, track=False)
+        seeded = size
+        runner.print_header(name, size, "orders")
+
+        runner.measure(name, size, "orders (no limit, capped)", "GET", "/admin/orders")
+        first_page[size] = runner.measure(name, size, f"orders limit={page_size}", "GET",
+                                          f"/admin/orders?limit={page_size}")
+        runner.measure(name, size, f"orders pending limit={page_size}", "GET",
+                       f"/admin/orders?status=pending&limit={page_size}")
+        runner.measure(name, size, "orders today", "GET",
+                       f"/admin/orders?from={time.strftime('%Y-%m-%d', time.gmtime())}&limit={page_size}")
+        runner.walk(name, size, f"/admin/orders?limit={page_size}", pages, case="orders cursor walk")
+        runner.measure(name, size, f"users limit={page_size}", "GET", f"/users?limit={page_size}")
+        runner.measure(name, size, "user detail + history", "GET", f"/users/{me['id']}")
+        runner.walk(name, size, f"/users/{me['id']}/orders?limit=20", pages, case="history cursor walk")
+
+    smallest, largest = min(first_page), max(first_page)
+    growth = first_page[largest]["mean_bytes"] / first_page[smallest]["mean_bytes"] \
+        if first_page[smallest]["mean_bytes"] else 0.0
+    print(f"   📦 Order page bytes at n={largest} vs n={smallest}: {growth:.2f}x "
+          f"({'bounded' if growth < 1.5 else 'GROWS WITH DATA'})")
+
+
+REVENUE_STATUSES = ("paid", "shipped", "delivered")
+
+
+@benchmark("admin-stats", sizes=(1000, 10000, 50000))
+def admin_stats_benchmark(runner, paid_ratio=0.5, page_size=100):
+    """Admin dashboard figures: computed client-side from every order and product vs the precomputed /admin/stats"""
+    name = "admin-stats"
+    seeded = 0
+    seed_order_products(runner)
+    for size in runner.sizes:
+        # Orders have no DELETE endpoint, so they are left in place
+        new_ids = runner.seed("orders", "/orders", bench_order, size - seeded, offset=seeded, track=False)
+        paid = new_ids[:int(len(new_ids) * paid_ratio)]
+        with ThreadPoolExecutor(max_workers=runner.seed_workers) as pool:
+            list(pool.map(lambda order_id: runner.request("PUT", f"/admin/orders/{order_id}", {"status": "paid"}), paid))
+        seeded = size
+        runner.print_header(name, size, "orders")
+
+        # The old dashboard: download every order (now page by page) and the catalog, aggregate in the client
+        label = f"{name} n={size} client-side aggregation"
+        for _ in range(max(1, runner.repeats // 2)):
+            start = time.perf_counter()
+            orders, endpoint, response = [], f"/admin/orders?limit={page_size}", None
+            while endpoint:
+                response = runner.request("GET", endpoint)
+                runner.metrics.record("GET", endpoint, response, label=label)
+                page = response.json()
+                orders += page["items"]
+                endpoint = f"/admin/orders?limit={page_size}&cursor={page['nextCursor']}" if page["nextCursor"] else None
+            catalog = runner.request("GET", "/products")
+            runner.metrics.record("GET", "/products", catalog, label=label)
+            by_status, sold = {}, {}
+            revenue = 0
+            for order in orders:
+                status = order.get("status") or "pending"
+                by_status[status] = by_status.get(status, 0) + 1
+                if status in REVENUE_STATUSES:
+                    revenue += order.get("totalAmount") or 0
+                    for item in order.get("items") or []:
+                        sold[item["id"]] = sold.get(item["id"], 0) + item.get("quantity", 0)
+            top = sorted(sold.items(), key=lambda entry: entry[1], reverse=True)[:10]
+            client_ms = (time.perf_counter() - start) * 1000
+        client = runner.add_row(name, size, "client-side aggregation", label, response,
+                                load_ms=client_ms, orders_read=len(orders))
+
+        stats = runner.measure(name, size, "GET /admin/stats", "GET", "/admin/stats")
+        figures = runner.request("GET", "/admin/stats").json()
+        match = figures["totals"]["revenue"] == revenue and figures["totals"]["orders"] == len(orders) and \
+            all(figures["ordersByStatus"].get(status, 0) == count for status, count in by_status.items())
+        runner.measure(name, size, "rebuild (backfill job)", "POST", "/admin/stats/rebuild", repeats=1)
+        print(f"   📊 Dashboard load: {client_ms:.0f}ms reading {len(orders)} orders → {stats['p50_ms']:.1f}ms precomputed "
+              f"({client['mean_bytes'] / 1024:.0f}KB/request → {stats['mean_bytes'] / 1024:.1f}KB); "
+              f"figures {'match' if match else 'DIFFER (writes during the run?)'}, top seller {top[0][1] if top else 0} units")
+
+
+@benchmark("bulk-import", sizes=(1000, 10000, 50000))
+def bulk_import_benchmark(runner, batch_size=2000, single_sample=500):
+    """Catalog loading: one POST /products per row vs NDJSON batches to /products/import, then a streamed export"""
+    name = "bulk-import"
+    created = runner.created.setdefault("products", [])
+    for size in runner.sizes:
+        runner.print_header(name, size, "rows")
+
+        # One request per product, sampled and extrapolated for the larger sizes
+        sample = min(size, single_sample)
+        start = time.perf_counter()
+        runner.seed("products", "/products", bench_product, sample)
+        single_rate = sample / (time.perf_counter() - start)
+
+        rows = [{"id": f"bench-import-{size}-{index:06d}", **bench_product(index)} for index in range(size)]
+        batches = ["\n".join(json.dumps(row) for row in rows[i:i + batch_size]).encode()
+                   for i in range(0, size, batch_size)]
+        rates = {}
+        for case in ("import (insert)", "import (re-import, update)"):
+            label = f"{name} n={size} {case}"
+            totals = {"inserted": 0, "updated": 0, "failed": 0}
+            start = time.perf_counter()
+            for body in batches:
+                response = runner.request("POST", "/products/import", raw=body,
+                                          headers={"Content-Type": "application/x-ndjson"})
+                runner.metrics.record("POST", "/products/import", response, label=label)
+                if response.status_code != 200:
+                    raise RuntimeError(f"Import failed: {response.status_code} {response.text[:200]}")
+                result = response.json()
+                for key in totals:
+                    totals[key] += result[key]
+            rates[case] = size / (time.perf_counter() - start)
+            if case == "import (insert)":
+                created.extend(row["id"] for row in rows)
+            runner.add_row(name, size, case, label, response, rows_per_sec=rates[case], **totals)
+
+        label = f"{name} n={size} export ndjson"
+        start = time.perf_counter()
+        response = runner.request("GET", "/products/export?format=ndjson")
+        runner.metrics.record("GET", "/products/export", response, label=label)
+        exported = response.text.count("\n") if response.status_code == 200 else 0
+        runner.add_row(name, size, "export ndjson", label, response,
+                       rows_per_sec=exported / (time.perf_counter() - start), rows=exported)
+
+        insert_rate = rates["import (insert)"]
+        print(f"   🚚 {single_rate:.0f} rows/s one POST per product → {insert_rate:.0f} rows/s batched import "
+              f"({insert_rate / single_rate if single_rate else 0:.1f}x); {size} rows would take "
+              f"{size / single_rate:.1f}s vs {size / insert_rate:.1f}s")
+
+
+@benchmark("stock-race", sizes=(500,))
+def stock_race_benchmark(runner, units=10, price=1000):
+    """`size` buyers released at once against `units` of stock: order throughput and any oversell
+
+    A second case puts a scarcer product in every cart, so each rejected cart must hand back the unit it
+    reserved of the first one; finally every winning order is cancelled and the stock must come back whole.
+    """
+    name = "stock-race"
+    customer = {"fullName": "Race Buyer", "email": "race@cypruswatch.com"}
+
+    def stock_of(product_id):
+        response = runner.request("GET", f"/products/{product_id}", headers={"Cache-Control": "no-cache"})
+        return response.json().get("stock") if response.status_code == 200 else None
+
+    def race(size, case, cart):
+        label = f"{name} n={size} {case}"
+        barrier = threading.Barrier(size)
+
+        def buy(_):
+            barrier.wait()
+            try:
+                response = runner.request("POST", "/orders", {"items": cart, "customerInfo": customer,
+                                                              "paymentMethod": "bank"})
+            except Exception:
+                return None
+            runner.metrics.record("POST", "/orders", response, label=label)
+            return response
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=size) as pool:
+            responses = list(pool.map(buy, range(size)))
+        elapsed = time.perf_counter() - start
+        answered = [r for r in responses if r is not None]
+        won = [r.json()["id"] for r in answered if r.status_code == 200]
+        rejected = sum(r.status_code == 409 for r in answered)
+        row = runner.add_row(name, size, case, label, answered[-1] if answered else None,
+                             orders_per_sec=size / elapsed if elapsed else 0.0, sold=len(won), rejected=rejected,
+                             errors=size - len(won) - rejected)
+        return row, won
+
+    for size in runner.sizes:
+        runner.print_header(name, size, "buyers")
+        run = uuid.uuid4().hex[:8]
+        plenty, scarce = f"bench-race-{run}-a", f"bench-race-{run}-b"
+        import_products(runner, [
+            {"id": plenty, "name": "Race Watch", "price": price, "stock": units},
+            {"id": scarce, "name": "Race Strap", "price": price / 10, "stock": units // 2},
+        ])
+
+        single, won = race(size, f"{units} units, 1 line", [{"id": plenty, "quantity": 1}])
+        left = stock_of(plenty)
+        oversold = max(len(won) - units, 0) + max(-(left or 0), 0)
+        verdict = "no oversell" if not oversold and left == units - len(won) else f"OVERSOLD by {oversold}"
+        print(f"   🏁 {single['orders_per_sec']:.0f} orders/s, {len(won)} sold of {units}, {single['rejected']} "
+              f"turned away, stock left {left}: {verdict}")
+
+        for order_id in won:
+            runner.request("PUT", f"/admin/orders/{order_id}", {"status": "cancelled"})
+        restored = stock_of(plenty)
+
+        pair, won = race(size, f"{units}+{units // 2} units, 2 lines",
+                         [{"id": plenty, "quantity": 1}, {"id": scarce, "quantity": 1}])
+        left = (stock_of(plenty), stock_of(scarce))
+        consistent = len(won) <= units // 2 and left == (units - len(won), units // 2 - len(won))
+        print(f"   🧺 {pair['orders_per_sec']:.0f} orders/s, {len(won)} two-line carts sold, stock left {left}: "
+              f"{'rejected carts rolled back' if consistent else 'INCONSISTENT (lost or oversold units)'}; "
+              f"cancelling the first race restored {restored}/{units} units")
+
+
+# Mirror of USER_INDEXES / ORDER_INDEXES in lib/db.js: (keys, unique)
+SEARCH_MATERIALS = ["Çelik", "Altın", "Titanyum", "Seramik", "Deri", "Gümüş", "Steel", "Gold"]
+SEARCH_STYLES = ["Dalgıç", "Kronograf", "Pilot", "Klasik", "GMT", "Spor", "Diver", "Dress"]
+SEARCH_COLORS = ["Siyah", "Mavi", "Beyaz", "Yeşil", "Black", "Blue"]
+SEARCH_KINDS = {"watch": ["Saat", "Watch", "Saati"], "eyewear": ["Güneş Gözlüğü", "Optik Gözlük", "Sunglasses"],
+                "eta": ["Mekanizma", "Movement"]}
+SEARCH_IMPORT_BATCH = 2000
+
+
+def bench_search_product(index):
+    """A product with a realistic mixed Turkish/English name, e.g. 'Omega Çelik Dalgıç Saat Mavi OM0042'"""
+    rng = random.Random(index)
+    product_type = ("watch", "watch", "eyewear", "eta")[index % 4]
+    brand = BENCH_BRANDS[rng.randrange(len(BENCH_BRANDS))]
+    name = " ".join([brand, rng.choice(SEARCH_MATERIALS), rng.choice(SEARCH_STYLES),
+                     rng.choice(SEARCH_KINDS[product_type]), rng.choice(SEARCH_COLORS),
+                     f"{brand[:2].upper()}{rng.randrange(10000):04d}"])
+    return {
+        "id": f"bench-search-{index}",
+        "name": name,
+        "description": f"{name}. " + rng.choice(["Su geçirmez, safir cam.", "Automatic movement, sapphire glass.",
+                                                  "Deri kayış, kuvars mekanizma.", "Polarize cam, UV400."]),
+        "price": rng.randint(100, 150000),
+        "stock": rng.randint(0, 50),
+        "category": rng.choice(SEARCH_STYLES),
+        "productType": product_type,
+        "gender": ("male", "female", "unisex")[rng.randrange(3)],
+        "brand": brand,
+    }
+
+
+@benchmark("search", sizes=(10_000, 100_000))
+def search_benchmark(runner):
+    """GET /api/search over a synthetic catalog vs the regex ?search= listing and shipping the catalog to the browser"""
+    name = "search"
+    seeded = 0
+    bypass = {"Cache-Control": "no-cache"}
+    for size in runner.sizes:
+        for start in range(seeded, size, SEARCH_IMPORT_BATCH):
+            import_products(runner, [bench_search_product(index)
+                                     for index in range(start, min(start + SEARCH_IMPORT_BATCH, size))])
+        print(f"   🌱 Imported {size - seeded} products")
+        seeded = size
+        runner.print_header(name, size, "products")
+
+        def search(case, repeats=None, headers=bypass, **query):
+            return runner.measure(name, size, case, "GET", f"/search?{urlencode(query)}", headers=headers,
+                                  repeats=repeats)
+
+        # The import invalidated the index: the first search rebuilds it
+        search("cold (index build)", repeats=1, q="dalgic")
+        exact = search("exact 'dalgic saat'", q="dalgic saat")
+        search("Turkish upper 'ÇELİK DALGIÇ'", q="ÇELİK DALGIÇ")
+        typo = search("typo 'kronogrf'", q="kronogrf")
+        search("synonym 'steel diver'", q="steel diver")
+        search("prefix 'omega kro'", q="omega kro")
+        browse = search("facets only, type=watch", productType="watch")
+        search("q + brand/gender/price", q="celik saat", productType="watch", brand="Omega,Rolex",
+               gender="male,unisex", minPrice=1000, maxPrice=50000, sort="price-asc")
+        search("response cache hit", headers=None, q="dalgic saat")
+        regex = runner.measure(name, size, "regex /products?search=", "GET",
+                               f"/products?{urlencode({'search': 'dalgıç', 'productType': 'watch', 'limit': 24})}"
+                               f"&fields={CARD_FIELDS}", headers=bypass)
+        # What the storefront pages used to download before filtering in the browser
+        full = runner.measure(name, size, "full type list (client filter)", "GET",
+                              f"/products?productType=watch&fields={CARD_FIELDS}", headers=bypass,
+                              repeats=max(1, runner.repeats // 2))
+        print(f"   🔎 p50 {exact['p50_ms']:.1f}ms exact, {typo['p50_ms']:.1f}ms typo, {browse['p50_ms']:.1f}ms "
+              f"facet browse vs {regex['p50_ms']:.1f}ms regex (no typo/diacritic matching); a page is "
+              f"{exact['mean_bytes'] / 1024:.0f}KB vs {full['mean_bytes'] / 1024:.0f}KB for the client-side list")
+
+
+@benchmark("dispatch", sizes=(50,))
+def dispatch_benchmark(runner):
+    """Every route in the API route table, `size` requests each: wall time vs the router's own match + middleware time
+
+    The router reports its share in `Server-Timing: route;desc="<METHOD pattern>";dur=<ms>`, so the per-route
+    overhead is read from the server instead of being guessed from wall time. Writes that would pile up data
+    or send email (DELETE, invoice resend) target missing ids: routing still runs in full, the handler 404s.
+    """
+    name = "dispatch"
+    admin_username, admin_password = runner.admin_username, runner.admin_password
+    if not admin_password:
+        raise RuntimeError("The dispatch benchmark needs ADMIN_USERNAME and ADMIN_PASSWORD in the environment")
+    admin = runner.admin_headers()
+
+    email, password = f"bench_{uuid.uuid4().hex[:12]}@cypruswatch.com", "BenchTest123!"
+    response = runner.request("POST", "/auth/register", {"email": email, "password": password,
+                                                         "fullName": "Dispatch Benchmark"})
+    if response.status_code != 200:
+        raise RuntimeError(f"Could not register benchmark user: {response.status_code} {response.text[:200]}")
+    user = {"Authorization": f"Bearer {response.json()['token']}"}
+    user_id = response.json()["user"]["id"]
+
+    tag = uuid.uuid4().hex[:8]
+    product = {**bench_product(0), "id": f"bench-dispatch-{tag}", "brand": f"Dispatch-{tag}", "stock": 10 ** 9}
+    import_products(runner, [product])
+    png = bench_png(16)
+    image_id = runner.request("POST", "/upload", headers=admin,
+                              files={"file": ("dispatch.png", png, "image/png")}).json()["id"]
+    order_id = runner.request("POST", "/orders", {"items": [{"id": product["id"], "quantity": 1}],
+                                                  "customerInfo": {"email": email}}, user).json()["id"]
+    missing = f"missing-{tag}"
+    ndjson = {"Content-Type": "application/x-ndjson"}
+
+    # (route the server should report, method, endpoint, keyword arguments for runner.request)
+    cases = [
+        ("GET health", "GET", "/health", {}),
+        ("GET metrics", "GET", "/metrics", {"headers": admin}),
+        ("GET traces", "GET", "/traces?minMs=60000", {"headers": admin}),
+        ("GET traces/:id", "GET", f"/traces/{missing}", {"headers": admin}),
+        ("GET images/:id", "GET", f"/images/{image_id}", {}),
+        ("GET products", "GET", "/products?limit=1", {}),
+        ("GET search", "GET", "/search?q=bench&limit=1", {}),
+        ("GET products/export", "GET", f"/products/export?format=ndjson&brand={product['brand']}", {"headers": admin}),
+        ("GET products/:id", "GET", f"/products/{product['id']}", {}),
+        ("GET orders", "GET", "/orders", {"headers": admin}),
+        ("GET auth/me", "GET", "/auth/me", {"headers": user}),
+        ("GET favorites", "GET", "/favorites", {"headers": user}),
+        ("GET orders/my", "GET", "/orders/my", {"headers": user}),
+        ("GET admin/orders/:id/invoice", "GET", f"/admin/orders/{order_id}/invoice", {"headers": admin}),
+        ("GET admin/stats", "GET", "/admin/stats?days=1&top=1", {"headers": admin}),
+        ("GET admin/orders", "GET", "/admin/orders?limit=1", {"headers": admin}),
+        ("GET users", "GET", "/users?limit=1", {"headers": admin}),
+        ("GET users/:id/orders", "GET", f"/users/{user_id}/orders?limit=1", {"headers": admin}),
+        ("GET users/:id", "GET", f"/users/{user_id}?limit=1", {"headers": admin}),
+        ("GET reviews/:productId", "GET", f"/reviews/{product['id']}?limit=1", {}),
+        ("POST upload", "POST", "/upload", {"headers": admin, "files": {"file": ("dispatch.png", png, "image/png")}}),
+        ("POST products/import", "POST", "/products/import",
+         {"headers": {**admin, **ndjson}, "raw": json.dumps(product).encode()}),
+        ("POST auth/register", "POST", "/auth/register", {"data": {"email": email, "password": password}}),
+        ("POST auth/login", "POST", "/auth/login", {"data": {"email": email, "password": password}}),
+        ("POST login/login", "POST", "/login/login", {"data": {"username": admin_username, "password": admin_password}}),
+        ("POST products", "POST", "/products", {"headers": admin, "data": {**bench_product(1), "brand": product["brand"]}}),
+        ("POST orders", "POST", "/orders", {"headers": user, "data": {"items": [{"id": product["id"], "quantity": 1}],
+                                                                       "customerInfo": {"email": email}}}),
+        ("POST payment/bank", "POST", "/payment/bank", {"data": {"orderId": order_id}}),
+        ("POST payment/transfer", "POST", "/payment/transfer", {"data": {"orderId": order_id}}),
+        ("POST admin/stats/rebuild", "POST", "/admin/stats/rebuild", {"headers": admin}),
+        ("POST admin/reservations/expire", "POST", "/admin/reservations/expire", {"headers": admin}),
+        ("POST admin/orders/:id/invoice/resend", "POST", f"/admin/orders/{missing}/invoice/resend", {"headers": admin}),
+        ("POST favorites/add", "POST", "/favorites/add", {"headers": user, "data": {"productId": product["id"]}}),
+        ("POST reviews/:productId", "POST", f"/reviews/{product['id']}", {"headers": user, "data": {"rating": 5}}),
+        ("PUT auth/profile", "PUT", "/auth/profile", {"headers": user, "data": {"fullName": "Dispatch Benchmark"}}),
+        ("PUT products/:id", "PUT", f"/products/{product['id']}", {"headers": admin, "data": product}),
+        ("PUT admin/orders/:id", "PUT", f"/admin/orders/{order_id}", {"headers": admin, "data": {"status": "cancelled"}}),
+        ("DELETE products/:id", "DELETE", f"/products/{missing}", {"headers": admin}),
+        ("DELETE favorites/remove", "DELETE", "/favorites/remove", {"headers": user, "data": {"productId": product["id"]}}),
+        ("unmatched", "GET", "/no/such/route", {}),
+        ("unmatched", "POST", "/no/such/route", {"headers": {"Content-Type": "application/json"}, "raw": b"{not json"}),
+    ]
+
+    for size in runner.sizes:
+        runner.print_header(name, size, "requests per route")
+        rows, mismatched = [], []
+        for expected, method, endpoint, kwargs in cases:
+            case = f"{expected} ({method})" if expected == "unmatched" else expected
+            label = f"{name} n={size} {case}"
+            response, reported = None, set()
+            for _ in range(size):
+                response = runner.request(method, endpoint, **kwargs)
+                runner.metrics.record(method, endpoint, response, label=label)
+                reported.add(route_timing(response)[0])
+                if method == "POST" and endpoint == "/products" and response.status_code == 200:
+                    runner.created.setdefault("products", []).append(response.json()["id"])
+            dispatch = runner.metrics.endpoints[label].dispatch_ms
+            server = runner.metrics.endpoints[label].server_ms
+            if reported != {expected}:
+                mismatched.append(f"{case} → {', '.join(sorted(map(str, reported)))}")
+            rows.append(runner.add_row(name, size, case, label, response,
+                                       dispatch_p50_us=dispatch.percentile(50) * 1000,
+                                       dispatch_p95_us=dispatch.percentile(95) * 1000,
+                                       router_pct=dispatch.mean / server.mean * 100 if server.mean else 0.0))
+
+        if mismatched:
+            print(f"   ⚠️  Server reported a different route (or no Server-Timing) for: {'; '.join(mismatched)}")
+        routed = [row for row in rows if not row["case"].startswith("unmatched")]
+        slowest = max(routed, key=lambda row: row["dispatch_p95_us"])
+        shares = sorted(row["router_pct"] for row in routed)
+        print(f"   🧭 {len(routed)} routes: dispatch p50 {sorted(r['dispatch_p50_us'] for r in routed)[len(routed) // 2]:.0f}µs, "
+              f"slowest p95 {slowest['dispatch_p95_us']:.0f}µs ({slowest['case']}), unmatched 404 "
+              f"{max(r['dispatch_p95_us'] for r in rows if r['case'].startswith('unmatched')):.0f}µs p95; "
+              f"router is {shares[len(shares) // 2]:.1f}% of server time at the median route")
+
+
+BENCH_INDEX_SPEC = {
+    "users": [([("id", 1)], True), ([("email", 1)], True), ([("createdAt", -1), ("id", -1)], False)],
+    "orders": [([("id", 1)], True), ([("userId", 1), ("createdAt", -1), ("id", -1)], False),
+               ([("createdAt", -1), ("id", -1)], False), ([("status", 1), ("createdAt", -1), ("id", -1)], False)],
+}
+
+
+def bench_user_doc(index):
+    return {
+        "id": f"bench-user-{index}",
+        "email": f"bench_user_{index}@cypruswatch.com",
+        "password": "$2a$10$benchmarkbenchmarkbenchmarkbenchmarkbenchmarkbenchm",
+        "fullName": f"Bench User {index}",
+        "favoriteProducts": [],
+        "createdAt": f"2024-01-01T00:00:00.{index:06d}Z",
+    }
+
+
+def bench_order_doc(index, users):
+    rng = random.Random(index)
+    return {
+        "id": f"bench-order-{index}",
+        "userId": f"bench-user-{rng.randrange(users)}",
+        "items": [{"id": f"bench-product-{rng.randrange(1000)}", "name": "Bench Watch",
+                   "price": rng.randint(500, 90000), "quantity": 1} for _ in range(rng.randint(1, 3))],
+        "totalAmount": rng.randint(500, 270000),
+        "status": rng.choice(["pending", "paid", "shipped", "delivered"]),
+        "paymentMethod": rng.choice(["bank", "transfer"]),
+        "createdAt": f"2024-{1 + index % 12:02d}-{1 + index % 28:02d}T00:00:00.{index:07d}Z",
+    }
+
+
+@benchmark("indexes", sizes=(1_000_000,))
+def indexes_benchmark(runner, users_ratio=10, samples=200, unindexed_samples=20, batch=10_000):
+    """Hot route.js lookups on `size` orders and size/10 users, first with only _id, then with lib/db.js indexes
+
+    Talks to MongoDB directly (--mongo-url) in a throwaway database, since
+    seeding a million orders through the API would take hours.
+    """
+    if pymongo is None:
+        raise RuntimeError("The indexes benchmark needs pymongo: pip install pymongo")
+    if not runner.mongo_url:
+        raise RuntimeError("The indexes benchmark queries MongoDB directly: pass --mongo-url")
+    name = "indexes"
+    client = pymongo.MongoClient(runner.mongo_url)
+    db = client[f"cypruswatch_bench_{uuid.uuid4().hex[:8]}"]
+    try:
+        for size in runner.sizes:
+            users = max(size // users_ratio, 1)
+            db.users.drop()
+            db.orders.drop()
+            start = time.perf_counter()
+            for offset in range(0, users, batch):
+                db.users.insert_many([bench_user_doc(i) for i in range(offset, min(offset + batch, users))],
+                                     ordered=False)
+            for offset in range(0, size, batch):
+                db.orders.insert_many([bench_order_doc(i, users) for i in range(offset, min(offset + batch, size))],
+                                      ordered=False)
+            print(f"   🌱 Seeded {users} users and {size} orders in {time.perf_counter() - start:.1f}s")
+
+            rng = random.Random(size)
+            queries = [
+                ("users.findOne email", lambda: db.users.find({"email": f"bench_user_{rng.randrange(users)}@cypruswatch.com"}).limit(1)),
+                ("users.findOne id", lambda: db.users.find({"id": f"bench-user-{rng.randrange(users)}"}).limit(1)),
+                ("orders.findOne id", lambda: db.orders.find({"id": f"bench-order-{rng.randrange(size)}"}).limit(1)),
+                ("orders/my userId+sort", lambda: db.orders.find({"userId": f"bench-user-{rng.randrange(users)}"})
+                 .sort("createdAt", -1)),
+                ("admin orders newest 50", lambda: db.orders.find({}).sort([("createdAt", -1), ("id", -1)]).limit(51)),
+                ("admin orders status 50", lambda: db.orders.find({"status": "paid"})
+                 .sort([("createdAt", -1), ("id", -1)]).limit(51)),
+            ]
+
+            def run_queries(phase, count):
+                rows = {}
+                for case, make_cursor in queries:
+                    label = f"{name} n={size} {case} ({phase})"
+                    for _ in range(count):
+                        query_start = time.perf_counter()
+                        list(make_cursor())
+                        runner.metrics.record_duration(label, (time.perf_counter() - query_start) * 1000)
+                    stats = make_cursor().explain()["executionStats"]
+                    rows[case] = runner.add_row(name, size, f"{case} ({phase})", label,
+                                                docs_examined=stats["totalDocsExamined"])
+                return rows
+
+            runner.print_header(name, size, "orders")
+            before = run_queries("no indexes", unindexed_samples)
+            start = time.perf_counter()
+            for collection, indexes in BENCH_INDEX_SPEC.items():
+                db[collection].create_indexes([pymongo.IndexModel(keys, unique=unique) for keys, unique in indexes])
+            print(f"   🗂️  Built indexes in {time.perf_counter() - start:.1f}s")
+            after = run_queries("indexed", samples)
+            for case, row in after.items():
+                print(f"   ⚡ {case}: p50 {before[case]['p50_ms']:.1f}ms → {row['p50_ms']:.2f}ms, "
+                      f"{before[case]['docs_examined']} → {row['docs_examined']} docs examined")
+    finally:
+        client.drop_database(db.name)
+        client.close()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Bulk product loader for the Cyprus Watch catalog
+Streams an NDJSON or CSV file to POST /api/products/import in batches,
+reports progress and rows/sec, and resumes after an interruption from the
+last batch the server acknowledged. Also downloads GET /api/products/export.
+
+    python bulk_loader.py import products.csv --base-url http://localhost:3000
+    python bulk_loader.py export products.ndjson --base-url http://localhost:3000 --query productType=watch
+
+Both endpoints are admin routes: pass --token, or let the loader log in with
+ADMIN_USERNAME/ADMIN_PASSWORD (or --admin-username/--admin-password).
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import requests
+
+from harness_http import PooledSession
+
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def detect_format(path, requested=None):
+    if requested:
+        return requested
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def read_rows(path, file_format):
+    """Yield (file_line, row) for every non-empty record; `row` is the raw NDJSON line or a CSV value list
+
+    For CSV the header is yielded first with file_line 0.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if file_format == "ndjson":
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    yield line, text.rstrip("\r\n")
+            return
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield 0, header
+        previous = reader.line_num
+        for values in reader:
+            if values and values != [""]:
+                yield previous + 1, values
+            previous = reader.line_num
+
+
+def admin_login(base_url, username, password):
+    """Bearer header from POST /api/login/login"""
+    response = requests.post(f"{base_url.rstrip('/')}/api/login/login",
+                             json={"username": username, "password": password}, timeout=30, verify=False)
+    if response.status_code != 200:
+        raise RuntimeError(f"Admin login failed: HTTP {response.status_code} {response.text[:200]}")
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def count_rows(path, file_format):
+    return sum(1 for line, _ in read_rows(path, file_format) if line)
+
+
+class ImportState:
+    """Progress file next to the input: how many rows the server has acknowledged
+
+    Written atomically after every batch; ignored when the input file has
+    changed since (size or mtime), so a stale state never skips new rows.
+    """
+
+    def __init__(self, path, input_path):
+        self.path = path
+        stat = os.stat(input_path)
+        self.fingerprint = {"file": os.path.abspath(input_path), "size": stat.st_size, "mtime": stat.st_mtime}
+        self.rows_done = 0
+        self.totals = {"inserted": 0, "updated": 0, "failed": 0}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if any(saved.get(key) != value for key, value in self.fingerprint.items()):
+            print(f"⚠️  {self.path} belongs to a different version of the file, starting over")
+            return False
+        self.rows_done = saved["rows_done"]
+        self.totals = saved["totals"]
+        return True
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({**self.fingerprint, "rows_done": self.rows_done, "totals": self.totals}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BulkLoader:
+    """Send a product file to the import endpoint batch by batch"""
+
+    def __init__(self, base_url, batch_size=2000, retries=5, timeout=300, auth_headers=None):
+        self.import_url = f"{base_url.rstrip('/')}/api/products/import"
+        self.auth_headers = auth_headers or {}
+        self.batch_size = batch_size
+        self.retries = retries
+        self.session = PooledSession(pool_size=1, timeout=timeout)
+        self.errors = []
+
+    def batch_body(self, file_format, header, batch):
+        """Encode a batch and map the line numbers the server will report back to lines of the input file"""
+        if file_format == "ndjson":
+            body = "\n".join(row for _, row in batch)
+            return body.encode(), {index: line for index, (line, _) in enumerate(batch, 1)}
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        parts, lines, physical = [], {}, 2
+        for values in [header] + [values for _, values in batch]:
+            out.seek(0)
+            out.truncate()
+            writer.writerow(values)
+            parts.append(out.getvalue())
+        # Quoted newlines make a record span several lines; the server reports the line a record starts on
+        for (line, _), text in zip(batch, parts[1:]):
+            lines[physical] = line
+            physical += text.count("\n")
+        return "".join(parts).encode(), lines
+
+    def send(self, file_format, body):
+        """POST one batch, retrying connection errors and 5xx responses with backoff"""
+        delay = 1.0
+        for attempt in range(1, self.retries + 1):
+            try:
+                response = self.session.request("POST", f"{self.import_url}?format={file_format}", data=body,
+                                                headers={**self.auth_headers,
+                                                         "Content-Type": CONTENT_TYPES[file_format]})
+                if response.status_code < 500:
+                    return response
+                problem = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                problem = str(e)
+            if attempt == self.retries:
+                raise RuntimeError(f"Batch failed after {attempt} attempts: {problem}")
+            print(f"   🔁 {problem}, retrying in {delay:.0f}s ({attempt}/{self.retries})")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def run(self, path, file_format, state, total):
+        header, batch = None, []
+        start = time.perf_counter()
+        sent = 0
+        skipped = state.rows_done
+        if skipped:
+            print(f"⏩ Resuming after {skipped} rows already imported")
+
+        def flush():
+            nonlocal sent
+            body, lines = self.batch_body(file_format, header, batch)
+            response = self.send(file_format, body)
+            if response.status_code != 200:
+                raise RuntimeError(f"Import rejected: HTTP {response.status_code} {response.text[:200]}")
+            result = response.json()
+            for failure in result["errors"]:
+                self.errors.append({"line": lines.get(failure["line"], failure["line"]), "error": failure["error"]})
+            for key in state.totals:
+                state.totals[key] += result[key]
+            state.rows_done += len(batch)
+            state.save()
+            sent += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"   📦 {state.rows_done}/{total} rows ({state.rows_done / total * 100 if total else 100:.0f}%)  "
+                  f"{sent / elapsed if elapsed else 0:.0f} rows/s  "
+                  f"server {response.timings['server_ms']:.0f}ms/batch  {result['failed']} rejected")
+            batch.clear()
+
+        for line, row in read_rows(path, file_format):
+            if not line:
+                header = row
+                continue
+            if skipped:
+                skipped -= 1
+                continue
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                flush()
+        if batch:
+            flush()
+        elapsed = time.perf_counter() - start
+        return {"rows": state.rows_done, "sent": sent, "seconds": elapsed,
+                "rows_per_sec": sent / elapsed if elapsed else 0.0, **state.totals}
+
+
+def export_products(base_url, path, file_format, query="", auth_headers=None):
+    """Stream GET /api/products/export into a file without holding it in memory"""
+    url = f"{base_url.rstrip('/')}/api/products/export?format={file_format}" + (f"&{query}" if query else "")
+    start = time.perf_counter()
+    rows = size = 0
+    with requests.get(url, headers=auth_headers, stream=True, timeout=300, verify=False) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Export failed: HTTP {response.status_code} {response.text[:200]}")
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                f.write(chunk)
+                size += len(chunk)
+                rows += chunk.count(b"\n")
+    elapsed = time.perf_counter() - start
+    # CSV has a header line; quoted newlines make this an estimate for CSV
+    rows -= 1 if file_format == "csv" else 0
+    print(f"✅ Exported ~{rows} products ({size / 1024:.0f}KB) to {path} in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed else 0:.0f} rows/s)")
+    return {"rows": rows, "bytes": size, "seconds": elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export Cyprus Watch products")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help="NDJSON (.ndjson/.jsonl) or CSV (.csv) file")
+    parser.add_argument("--base-url", default="http://localhost:3000")
+    parser.add_argument("--format", choices=sorted(CONTENT_TYPES), help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Rows per import request")
+    parser.add_argument("--state", help="Progress file (default: <path>.progress.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and import from the first row")
+    parser.add_argument("--errors-file", help="Write rejected rows (line, error) as JSON")
+    parser.add_argument("--query", default="", help="Export filters, e.g. productType=watch&brand=Rolex")
+    parser.add_argument("--token", default=os.environ.get("ADMIN_TOKEN"),
+                        help="Admin JWT from /api/login/login (default: $ADMIN_TOKEN)")
+    parser.add_argument("--admin-username", default=os.environ.get("ADMIN_USERNAME"),
+                        help="Log in for a token when --token is not given (default: $ADMIN_USERNAME)")
+    parser.add_argument("--admin-password", default=os.environ.get("ADMIN_PASSWORD"),
+                        help="Default: $ADMIN_PASSWORD")
+    args = parser.parse_args(argv)
+
+    file_format = detect_format(args.path, args.format)
+    auth_headers = {}
+    if args.token:
+        auth_headers = {"Authorization": f"Bearer {args.token}"}
+    elif args.admin_password:
+        try:
+            auth_headers = admin_login(args.base_url, args.admin_username, args.admin_password)
+        except (RuntimeError, requests.RequestException) as e:
+            print(f"❌ {e}")
+            return 1
+    if args.command == "export":
+        export_products(args.base_url, args.path, file_format, args.query, auth_headers)
+        return 0
+
+    state = ImportState(args.state or f"{args.path}.progress.json", args.path)
+    if not args.restart:
+        state.load()
+    total = count_rows(args.path, file_format)
+    print(f"🚚 Importing {total} rows from {args.path} ({file_format}) to {args.base_url} "
+          f"in batches of {args.batch_size}")
+    loader = BulkLoader(args.base_url, args.batch_size, auth_headers=auth_headers)
+    try:
+        result = loader.run(args.path, file_format, state, total)
+    except (RuntimeError, KeyboardInterrupt) as e:
+        print(f"\n❌ Stopped after {state.rows_done}/{total} rows: {e or 'interrupted'}")
+        print(f"   Run the same command again to resume (progress saved in {state.path})")
+        return 1
+    state.clear()
+
+    print(f"\n✅ Imported {result['rows']} rows in {result['seconds']:.1f}s ({result['rows_per_sec']:.0f} rows/s this run)")
+    print(f"   ➕ {result['inserted']} inserted  ✏️  {result['updated']} updated  ❌ {result['failed']} rejected")
+    for failure in loader.errors[:10]:
+        print(f"   line {failure['line']}: {failure['error']}")
+    if len(loader.errors) > 10:
+        print(f"   ... {len(loader.errors) - 10} more")
+    if args.errors_file:
+        with open(args.errors_file, "w") as f:
+            json.dump(loader.errors, f, ensure_ascii=False, indent=2)
+        print(f"📄 Rejected rows written to {args.errors_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,7 @@ import { Home, Clock, Glasses, Info, Phone, ShoppingCart, Menu, User, LogOut, He
 import Logo from '@/components/Logo';
 import { useLanguage } from '@/lib/LanguageContext';
 import { languageFlags } from '@/lib/translations';
+import { imageSrc } from '@/lib/utils';
 import {
   DropdownMenu,
   DropdownMenuContent,
@@ -140,9 +141,9 @@ export default function Navbar() {
 
     setSearchLoading(true);
     try {
-      const response = await fetch(`/api/products?search=${encodeURIComponent(query)}`);
+      const response = await fetch(`/api/products?search=${encodeURIComponent(query)}&limit=5&fields=id,name,image,category,price`);
       const data = await response.json();
-      setSearchResults(Array.isArray(data) ? data.slice(0, 5) : []);
+      setSearchResults(Array.isArray(data.items) ? data.items : []);
     } catch (error) {
       console.error('Arama hatası:', error);
       setSearchResults([]);
@@ -539,7 +540,7 @@ export default function Navbar() {
                     className="flex items-center gap-3 p-3 rounded-lg hover:bg-gray-100 cursor-pointer transition-colors"
                   >
                     <img
-                      src={product.image}
+                      src={imageSrc(product.image, 128)}
                       alt={product.name}
                       className="w-12 h-12 object-cover rounded"
                     />
@@ -1,23 +1,33 @@
-import requests
 import json
-import urllib3
+import os
+import sys
 
-# Suppress SSL warnings for testing
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from harness_http import PooledSession
+from local_server import LocalCyprusWatchServer
+
+# --local runs against the in-memory stand-in instead of the live site
+if "--local" in sys.argv:
+    local_server = LocalCyprusWatchServer().start()
+    BASE_URL = local_server.base_url
+else:
+    BASE_URL = os.environ.get("CYPRUSWATCH_BASE_URL", "https://cypruswatch.com")
+
+# Shared keep-alive session so timings reflect the API, not handshakes
+session = PooledSession(pool_size=2)
 
 # Simple test script
 def test_endpoint(endpoint, data=None, method="GET"):
-    url = f"https://cypruswatch.com/api/{endpoint}"
+    url = f"{BASE_URL}/api/{endpoint}"
     print(f"\n🔍 Testing {method} {url}")
     
     try:
-        if method == "GET":
-            response = requests.get(url, verify=False, timeout=30)
-        elif method == "POST":
-            response = requests.post(url, json=data, verify=False, timeout=30, 
+        response = session.request(method, url, json=data if method != "GET" else None,
                                    headers={"Content-Type": "application/json"})
         
+        timings = response.timings
         print(f"Status: {response.status_code}")
+        print(f"Timing: connect {timings['connect_ms']:.1f}ms, server {timings['server_ms']:.1f}ms, "
+              f"total {timings['total_ms']:.1f}ms")
         print(f"Response: {response.text}")
         return response
     except Exception as e:
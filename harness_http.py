@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Shared pooled HTTP session for the Cyprus Watch test harness
+Reuses keep-alive connections, optionally speaks HTTP/2 and times
+connection setup separately from server time for every request
+"""
+
+import threading
+import time
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 support is optional
+    httpx = None
+
+# Suppress SSL warnings for testing
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+_connect_clock = threading.local()
+
+
+def _add_connect_time(elapsed_ms):
+    _connect_clock.connect_ms = getattr(_connect_clock, "connect_ms", 0.0) + elapsed_ms
+    _connect_clock.connections = getattr(_connect_clock, "connections", 0) + 1
+
+
+def _reset_connect_clock():
+    _connect_clock.connect_ms = 0.0
+    _connect_clock.connections = 0
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _add_connect_time((time.perf_counter() - start) * 1000)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # TCP connect and TLS handshake together
+        start = time.perf_counter()
+        super().connect()
+        _add_connect_time((time.perf_counter() - start) * 1000)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report their connect time"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+class PooledSession:
+    """Keep-alive session shared by every request the harness makes
+
+    Each response gets a `timings` dict:
+      connect_ms - TCP+TLS setup (0 when a pooled connection was reused)
+      server_ms  - time to response headers minus connect time
+      ttfb_ms    - time to response headers
+      total_ms   - wall time including the body download
+      reused     - whether the request went over an existing connection
+    """
+
+    def __init__(self, pool_size=10, http2=False, timeout=30, verify=False):
+        self.pool_size = pool_size
+        self.http2 = http2
+        self.timeout = timeout
+        self.verify = verify
+        if http2:
+            if httpx is None:
+                raise RuntimeError("HTTP/2 requires httpx: pip install 'httpx[http2]'")
+            self.client = httpx.Client(
+                http2=True,
+                verify=verify,
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            )
+        else:
+            self.client = requests.Session()
+            adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.client.mount("http://", adapter)
+            self.client.mount("https://", adapter)
+
+    def request(self, method, url, json=None, headers=None, files=None, data=None):
+        """Send a request over the pool and attach `response.timings`
+
+        `files` is passed through for multipart uploads ({"file": (name, bytes, type)}),
+        `data` for raw bodies such as NDJSON/CSV imports.
+        """
+        if self.http2:
+            return self._request_http2(method, url, json, headers, files, data)
+
+        _reset_connect_clock()
+        start = time.perf_counter()
+        response = self.client.request(method, url, json=json, headers=headers, files=files, data=data,
+                                       timeout=self.timeout, verify=self.verify)
+        total_ms = (time.perf_counter() - start) * 1000
+        connect_ms = _connect_clock.connect_ms
+        ttfb_ms = response.elapsed.total_seconds() * 1000
+        response.timings = {
+            "connect_ms": connect_ms,
+            "server_ms": max(ttfb_ms - connect_ms, 0.0),
+            "ttfb_ms": ttfb_ms,
+            "total_ms": total_ms,
+            "reused": _connect_clock.connections == 0,
+        }
+        return response
+
+    def _request_http2(self, method, url, json, headers, files, data=None):
+        events = {}
+
+        def trace(name, info):
+            events[name] = time.perf_counter()
+
+        start = time.perf_counter()
+        response = self.client.request(method, url, json=json, headers=headers, files=files, content=data,
+                                       extensions={"trace": trace})
+        total_ms = (time.perf_counter() - start) * 1000
+        connect_started = events.get("connection.connect_tcp.started")
+        connect_done = events.get("connection.start_tls.complete") or events.get("connection.connect_tcp.complete")
+        connect_ms = (connect_done - connect_started) * 1000 if connect_started and connect_done else 0.0
+        headers_done = (events.get("http2.receive_response_headers.complete")
+                        or events.get("http11.receive_response_headers.complete"))
+        ttfb_ms = (headers_done - start) * 1000 if headers_done else total_ms
+        response.timings = {
+            "connect_ms": connect_ms,
+            "server_ms": max(ttfb_ms - connect_ms, 0.0),
+            "ttfb_ms": ttfb_ms,
+            "total_ms": total_ms,
+            "reused": connect_started is None,
+        }
+        return response
+
+    def close(self):
+        self.client.close()
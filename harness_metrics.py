@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Per-endpoint latency histograms and benchmark reports for the Cyprus Watch test harness
+Requests are keyed by method and route template (e.g. GET /products/:id) and
+written as JSON/CSV so runs can be compared against a stored baseline
+"""
+
+import csv
+import json
+import re
+import statistics
+import threading
+import time
+from datetime import datetime
+
+# Static routes that share a prefix with a parameterised one ("products/import" is not "products/:id")
+LITERAL_ROUTES = {"products/import", "products/export"}
+
+# Route templates from app/api/[[...path]]/route.js, most specific first
+ROUTE_TEMPLATES = [
+    (re.compile(r"^admin/orders/[^/]+/invoice$"), "admin/orders/:id/invoice"),
+    (re.compile(r"^admin/orders/[^/]+/invoice/resend$"), "admin/orders/:id/invoice/resend"),
+    (re.compile(r"^admin/orders/[^/]+$"), "admin/orders/:id"),
+    (re.compile(r"^products/[^/]+$"), "products/:id"),
+    (re.compile(r"^reviews/[^/]+$"), "reviews/:productId"),
+    (re.compile(r"^images/[^/]+$"), "images/:id"),
+    (re.compile(r"^users/[^/]+/orders$"), "users/:id/orders"),
+    (re.compile(r"^users/[^/]+$"), "users/:id"),
+    (re.compile(r"^traces/[^/]+$"), "traces/:id"),
+]
+
+# Routes behind requireAdmin in app/api/[[...path]]/route.js, as "<METHOD> <route template>"
+ADMIN_ROUTES = {
+    "GET /products/export", "GET /orders", "GET /admin/orders", "GET /admin/orders/:id/invoice", "GET /admin/stats",
+    "GET /users", "GET /users/:id", "GET /users/:id/orders",
+    "POST /upload", "POST /products", "POST /products/import", "POST /admin/stats/rebuild",
+    "POST /admin/reservations/expire", "POST /admin/orders/:id/invoice/resend",
+    "PUT /products/:id", "PUT /admin/orders/:id", "DELETE /products/:id",
+}
+
+# Server-Timing entry written by the API router (lib/router.js): match + middleware time before the handler
+_ROUTE_TIMING = re.compile(r'(?:^|,)\s*route;desc="([^"]*)";dur=([\d.]+)')
+
+_ID_SEGMENT = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{24}|\d+)$", re.I)
+
+
+def route_template(endpoint):
+    """Map a concrete endpoint like /products/abc-123?x=1 to /products/:id"""
+    path = endpoint.split("?", 1)[0].strip("/")
+    if path in LITERAL_ROUTES:
+        return f"/{path}"
+    for pattern, template in ROUTE_TEMPLATES:
+        if pattern.match(path):
+            return f"/{template}"
+    segments = [":id" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/")]
+    return "/" + "/".join(segments)
+
+
+def is_admin_route(method, endpoint):
+    """True when the endpoint needs an admin token once the server sets ADMIN_AUTH_REQUIRED=1"""
+    return f"{method.upper()} {route_template(endpoint)}" in ADMIN_ROUTES
+
+
+def route_timing(response):
+    """(matched route, dispatch ms) from the router's Server-Timing header, or (None, None) when not sent"""
+    match = _ROUTE_TIMING.search(response.headers.get("Server-Timing") or "")
+    return (match.group(1), float(match.group(2))) if match else (None, None)
+
+
+def server_spans(response):
+    """Server span totals from the Server-Timing header (lib/tracing.js), {} when not sent
+
+    e.g. {"route": {"name": "POST auth/login", "ms": 0.02}, "db": {"count": 2, "ms": 1.4},
+    "bcrypt": {"count": 1, "ms": 92.0}, "total": {"ms": 95.1}}
+    """
+    spans = {}
+    for entry in (response.headers.get("Server-Timing") or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        if not name:
+            continue
+        values = dict(param.split("=", 1) for param in params if "=" in param)
+        desc = values.get("desc", "").strip('"')
+        ms = float(values["dur"]) if "dur" in values else None
+        if name == "route":
+            spans[name] = {"name": desc, "ms": ms}
+        elif desc.isdigit():
+            spans[name] = {"count": int(desc), "ms": ms}
+        else:
+            spans[name] = {"ms": ms}
+    return spans
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram with ~3 significant digits of precision
+
+    Values are stored as integer units (microseconds for latencies, bytes for
+    sizes) in buckets that keep the top 12 bits of the value, so memory stays
+    small no matter how many samples are recorded.
+    """
+
+    PRECISION_BITS = 12
+
+    def __init__(self, scale=1000):
+        # scale converts recorded values into integer units (ms → µs by default)
+        self.scale = scale
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, units):
+        shift = max(units.bit_length() - self.PRECISION_BITS, 0)
+        return (units >> shift) << shift
+
+    def record(self, value, count=1):
+        units = max(int(round(value * self.scale)), 0)
+        bucket = self._bucket(units)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += units * count
+        self.min = units if self.min is None else min(self.min, units)
+        self.max = units if self.max is None else max(self.max, units)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, pct):
+        """Value at the given percentile, in recorded (unscaled) units"""
+        if not self.count:
+            return 0.0
+        target = max(int(pct / 100.0 * self.count + 0.999999), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                width = 1 << max(bucket.bit_length() - self.PRECISION_BITS, 0)
+                # Middle of the bucket, clamped to what was actually observed
+                value = min(max(bucket + (width - 1) // 2, self.min), self.max)
+                return value / self.scale
+        return self.max / self.scale
+
+    @property
+    def mean(self):
+        return self.total / self.count / self.scale if self.count else 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "min": (self.min or 0) / self.scale,
+            "max": (self.max or 0) / self.scale,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+        }
+
+    def to_dict(self):
+        return {**self.summary(), "scale": self.scale,
+                "buckets": {str(bucket): count for bucket, count in sorted(self.counts.items())}}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(scale=data.get("scale", 1000))
+        for bucket, count in data.get("buckets", {}).items():
+            histogram.counts[int(bucket)] = count
+        histogram.count = data.get("count", 0)
+        histogram.total = int(data.get("mean", 0) * histogram.scale * histogram.count)
+        histogram.min = int(data.get("min", 0) * histogram.scale)
+        histogram.max = int(data.get("max", 0) * histogram.scale)
+        return histogram
+
+
+class EndpointMetrics:
+    """Histograms and status counts for one method + route template"""
+
+    def __init__(self):
+        self.wall_ms = LatencyHistogram()
+        self.ttfb_ms = LatencyHistogram()
+        self.server_ms = LatencyHistogram()
+        self.connect_ms = LatencyHistogram()
+        self.size_bytes = LatencyHistogram(scale=1)
+        # Server-reported MongoDB round trips (X-DB-Ops), when the server sends them
+        self.db_ops = LatencyHistogram(scale=1)
+        # Server-reported routing overhead (Server-Timing route;dur=), when the server sends it
+        self.dispatch_ms = LatencyHistogram()
+        # Server response cache outcomes (X-Cache: HIT, STALE, MISS, BYPASS), when the server sends them
+        self.cache = {}
+        self.statuses = {}
+
+    @property
+    def cache_hit_ratio(self):
+        """Share of responses served from the server cache (HIT or STALE), None when X-Cache was never sent"""
+        total = sum(self.cache.values())
+        return (self.cache.get("HIT", 0) + self.cache.get("STALE", 0)) / total if total else None
+
+    def to_dict(self):
+        return {
+            "count": self.wall_ms.count,
+            "statuses": dict(sorted(self.statuses.items())),
+            "wall_ms": self.wall_ms.to_dict(),
+            "ttfb_ms": self.ttfb_ms.to_dict(),
+            "server_ms": self.server_ms.to_dict(),
+            "connect_ms": self.connect_ms.to_dict(),
+            "size_bytes": self.size_bytes.to_dict(),
+            "db_ops": self.db_ops.to_dict(),
+            "dispatch_ms": self.dispatch_ms.to_dict(),
+            "cache": dict(sorted(self.cache.items())),
+            "cache_hit_ratio": self.cache_hit_ratio,
+        }
+
+
+class MetricsRecorder:
+    """Thread-safe collection of per-endpoint metrics for one harness run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.side_effects = {}
+        self.started_at = datetime.now()
+        # Client latency of every request since the last take_window(), for ServerMetricsScraper
+        self.window = LatencyHistogram()
+
+    def record(self, method, endpoint, response=None, wall_ms=None, label=None):
+        """Record one request; `response` is None when the request itself failed
+
+        `label` overrides the method + route template key, which benchmarks use
+        to keep the same endpoint at different data sizes apart.
+        """
+        label = label or f"{method.upper()} {route_template(endpoint)}"
+        with self.lock:
+            metrics = self.endpoints.setdefault(label, EndpointMetrics())
+            if response is None:
+                metrics.statuses["error"] = metrics.statuses.get("error", 0) + 1
+                if wall_ms is not None:
+                    metrics.wall_ms.record(wall_ms)
+                    self.window.record(wall_ms)
+                return label
+            timings = response.timings
+            status = str(response.status_code)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.wall_ms.record(timings["total_ms"])
+            self.window.record(timings["total_ms"])
+            metrics.ttfb_ms.record(timings["ttfb_ms"])
+            metrics.server_ms.record(timings["server_ms"])
+            if not timings["reused"]:
+                metrics.connect_ms.record(timings["connect_ms"])
+            metrics.size_bytes.record(len(response.content))
+            db_ops = response.headers.get("X-DB-Ops")
+            if db_ops is not None and db_ops.isdigit():
+                metrics.db_ops.record(int(db_ops))
+            _, dispatch_ms = route_timing(response)
+            if dispatch_ms is not None:
+                metrics.dispatch_ms.record(dispatch_ms)
+            cache = response.headers.get("X-Cache")
+            if cache:
+                metrics.cache[cache] = metrics.cache.get(cache, 0) + 1
+        return label
+
+    def record_duration(self, label, wall_ms):
+        """Record a timed operation that is not an HTTP request (e.g. a direct database query)"""
+        with self.lock:
+            metrics = self.endpoints.setdefault(label, EndpointMetrics())
+            metrics.statuses["ok"] = metrics.statuses.get("ok", 0) + 1
+            metrics.wall_ms.record(wall_ms)
+        return label
+
+    def take_window(self):
+        """Return the client latencies recorded since the previous call and start a new window"""
+        with self.lock:
+            window, self.window = self.window, LatencyHistogram()
+        return window
+
+    def record_side_effect(self, name, latency_ms):
+        """Record how long an asynchronous side effect (e.g. the invoice email) took to land"""
+        with self.lock:
+            self.side_effects.setdefault(name, LatencyHistogram()).record(latency_ms)
+
+    def report(self, **extra):
+        with self.lock:
+            return {
+                "generated_at": datetime.now().isoformat(),
+                "started_at": self.started_at.isoformat(),
+                **extra,
+                "endpoints": {label: metrics.to_dict() for label, metrics in sorted(self.endpoints.items())},
+                "side_effects": {name: histogram.to_dict() for name, histogram in sorted(self.side_effects.items())},
+            }
+
+    def print_summary(self):
+        print(f"\n{'Endpoint':<32}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'TTFB p95':>10}{'avg KB':>10}{'DB ops':>8}{'Hit %':>7}  Statuses")
+        with self.lock:
+            for label, metrics in sorted(self.endpoints.items()):
+                wall = metrics.wall_ms
+                statuses = ", ".join(f"{status}×{count}" for status, count in sorted(metrics.statuses.items()))
+                print(f"{label:<32}{wall.count:>8}{wall.percentile(50):>10.1f}{wall.percentile(95):>10.1f}"
+                      f"{wall.percentile(99):>10.1f}{metrics.ttfb_ms.percentile(95):>10.1f}"
+                      f"{metrics.size_bytes.mean / 1024:>10.1f}"
+                      f"{(f'{metrics.db_ops.mean:.1f}' if metrics.db_ops.count else '-'):>8}"
+                      f"{(f'{metrics.cache_hit_ratio * 100:.0f}' if metrics.cache else '-'):>7}  {statuses}")
+            for name, histogram in sorted(self.side_effects.items()):
+                print(f"{'~ ' + name:<32}{histogram.count:>8}{histogram.percentile(50):>10.1f}"
+                      f"{histogram.percentile(95):>10.1f}{histogram.percentile(99):>10.1f}")
+
+
+def _correlation(xs, ys):
+    try:
+        return round(statistics.correlation(xs, ys), 3)
+    except statistics.StatisticsError:
+        # Fewer than two samples, or one side never changed
+        return None
+
+
+class ServerMetricsScraper:
+    """Poll the server's /api/metrics during a run and line pool pressure up with client latency
+
+    Every `interval` seconds it takes the recorder's client latency window and
+    one metrics snapshot, so each sample pairs the client p95 of that window
+    with the pool's in-use/waiting connections and the mean checkout wait
+    since the previous sample. `fetch` returns the parsed /api/metrics JSON,
+    or None when the scrape failed.
+    """
+
+    def __init__(self, fetch, recorder, interval=1.0):
+        self.fetch = fetch
+        self.recorder = recorder
+        self.interval = interval
+        self.samples = []
+        self.failures = 0
+        self.last = None
+        self.started = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.recorder.take_window()
+        self.started = time.perf_counter()
+        self.last = self.fetch()
+        if self.last is None:
+            print("⚠️ /api/metrics is not available; running without server metrics")
+            return self
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread:
+            self.stop_event.set()
+            self.thread.join()
+            self.sample()
+        return self
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        window = self.recorder.take_window()
+        metrics = self.fetch()
+        if metrics is None:
+            self.failures += 1
+            return
+        pool, previous = metrics["pool"], self.last["pool"]
+        checkouts = pool["checkouts"] - previous["checkouts"]
+        wait, previous_wait = pool["checkoutWaitMs"], previous["checkoutWaitMs"]
+        wait_total = wait["mean"] * wait["count"] - previous_wait["mean"] * previous_wait["count"]
+        self.samples.append({
+            "t_s": round(time.perf_counter() - self.started, 3),
+            "requests": window.count,
+            "client_p50_ms": window.percentile(50),
+            "client_p95_ms": window.percentile(95),
+            "open": pool["open"],
+            "in_use": pool["inUse"],
+            "waiting": pool["waiting"],
+            "checkouts": checkouts,
+            "checkout_wait_mean_ms": max(wait_total, 0.0) / checkouts if checkouts > 0 else 0.0,
+            "checkout_failures": sum(pool["checkoutFailures"].values()),
+        })
+        self.last = metrics
+
+    def summary(self):
+        """Samples, the final server snapshot and how client p95 tracks pool pressure (Pearson r)"""
+        busy = [sample for sample in self.samples if sample["requests"]]
+        client_p95 = [sample["client_p95_ms"] for sample in busy]
+        return {
+            "interval_s": self.interval,
+            "failed_scrapes": self.failures,
+            "samples": self.samples,
+            "correlation": {
+                "client_p95_vs_pool_pressure": _correlation(
+                    client_p95, [sample["in_use"] + sample["waiting"] for sample in busy]),
+                "client_p95_vs_checkout_wait": _correlation(
+                    client_p95, [sample["checkout_wait_mean_ms"] for sample in busy]),
+            },
+            "pool": self.last["pool"] if self.last else None,
+            "operations": self.last["operations"] if self.last else None,
+        }
+
+
+def write_json_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📝 JSON report written to {path}")
+
+
+def write_csv_report(report, path):
+    columns = ["endpoint", "count", "errors",
+               "wall_p50_ms", "wall_p95_ms", "wall_p99_ms", "wall_max_ms",
+               "ttfb_p50_ms", "ttfb_p95_ms", "server_p95_ms",
+               "connections", "connect_mean_ms", "size_mean_bytes", "size_max_bytes", "db_ops_mean", "dispatch_p95_ms",
+               "cache_hit_ratio", "statuses"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for label, data in report["endpoints"].items():
+            statuses = data["statuses"]
+            errors = sum(count for status, count in statuses.items() if status == "error" or status.startswith("5"))
+            writer.writerow([
+                label, data["count"], errors,
+                f"{data['wall_ms']['p50']:.3f}", f"{data['wall_ms']['p95']:.3f}",
+                f"{data['wall_ms']['p99']:.3f}", f"{data['wall_ms']['max']:.3f}",
+                f"{data['ttfb_ms']['p50']:.3f}", f"{data['ttfb_ms']['p95']:.3f}",
+                f"{data['server_ms']['p95']:.3f}",
+                data["connect_ms"]["count"], f"{data['connect_ms']['mean']:.3f}",
+                f"{data['size_bytes']['mean']:.0f}", f"{data['size_bytes']['max']:.0f}",
+                f"{data['db_ops']['mean']:.2f}" if data.get("db_ops", {}).get("count") else "",
+                f"{data['dispatch_ms']['p95']:.3f}" if data.get("dispatch_ms", {}).get("count") else "",
+                f"{data['cache_hit_ratio']:.3f}" if data.get("cache_hit_ratio") is not None else "",
+                ";".join(f"{status}={count}" for status, count in statuses.items()),
+            ])
+    print(f"📝 CSV report written to {path}")
+
+
+def compare_to_baseline(report, baseline_path, max_regression=0.2, slack_ms=2.0):
+    """Return the endpoints whose wall p95 regressed past the baseline
+
+    An endpoint regresses when its p95 exceeds baseline * (1 + max_regression)
+    plus `slack_ms`, which keeps sub-millisecond noise from failing CI.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for label, data in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(label)
+        if not previous or not previous["wall_ms"]["count"]:
+            continue
+        before = previous["wall_ms"]["p95"]
+        after = data["wall_ms"]["p95"]
+        if after > before * (1 + max_regression) + slack_ms:
+            regressions.append({"endpoint": label, "baseline_p95_ms": before, "p95_ms": after,
+                                "change": (after - before) / before if before else float("inf")})
+    return regressions
@@ -0,0 +1,112 @@
+// Admin sipariş ve üye listeleri: en yeniden eskiye, createdAt + id üzerinde cursor sayfalama
+// GET /api/admin/orders?status=paid,shipped&from=2024-01-01&to=2024-01-31&limit=50&cursor=...
+// GET /api/users?from=...&to=...&limit=50&cursor=...
+import { MAX_PAGE_SIZE, decodeCursor, encodeCursor } from '@/lib/catalog';
+import { ORDER_STATUSES } from '@/lib/orders';
+
+export const ADMIN_PAGE_SIZE = 50;
+export const ORDER_HISTORY_PAGE_SIZE = 20;
+
+export const ORDER_LIST_PROJECTION = { _id: 0 };
+// Şifre hash'i listelerde veritabanından hiç okunmaz
+export const USER_LIST_PROJECTION = { _id: 0, password: 0 };
+
+const DATE_ONLY = /^\d{4}-\d{2}-\d{2}$/;
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// Helper: createdAt bound from a from/to query value (ISO strings compare in date order)
+function dateBound(value, isEnd) {
+  const date = new Date(value);
+  if (isNaN(date.getTime())) {
+    throw Object.assign(new Error('Geçersiz tarih'), { status: 400 });
+  }
+  // Sadece gün verilmişse (YYYY-MM-DD) bitiş tarihi o günün tamamını kapsar
+  if (isEnd && DATE_ONLY.test(value)) {
+    return { $lt: new Date(date.getTime() + DAY_MS).toISOString() };
+  }
+  return { [isEnd ? '$lte' : '$gte']: date.toISOString() };
+}
+
+// URL parametrelerinden filtre ve sayfa boyutu üretir; `statuses` verilirse ?status= filtresi açılır
+// limit/cursor yoksa eski davranış: düz dizi, en fazla MAX_PAGE_SIZE kayıt
+export function parseAdminListQuery(searchParams, { statuses = null, pageSize = ADMIN_PAGE_SIZE, base = {} } = {}) {
+  const conditions = Object.keys(base).length > 0 ? [base] : [];
+
+  const statusParam = statuses && searchParams.get('status');
+  if (statusParam && statusParam !== 'all') {
+    const values = statusParam.split(',').map(v => v.trim()).filter(Boolean);
+    if (values.some(v => !statuses.includes(v))) {
+      throw Object.assign(new Error('Geçersiz sipariş durumu'), { status: 400 });
+    }
+    // Durumu hiç yazılmamış eski siparişler beklemede sayılır
+    const matched = values.includes('pending') ? [...values, null] : values;
+    conditions.push({ status: matched.length === 1 ? matched[0] : { $in: matched } });
+  }
+
+  const from = searchParams.get('from');
+  const to = searchParams.get('to');
+  if (from || to) {
+    conditions.push({
+      createdAt: { ...(from ? dateBound(from, false) : {}), ...(to ? dateBound(to, true) : {}) }
+    });
+  }
+
+  const cursorParam = searchParams.get('cursor');
+  const limitParam = parseInt(searchParams.get('limit'));
+  const paginate = !isNaN(limitParam) || Boolean(cursorParam);
+  const limit = paginate
+    ? Math.min(Math.max(isNaN(limitParam) ? pageSize : limitParam, 1), MAX_PAGE_SIZE)
+    : MAX_PAGE_SIZE;
+
+  if (cursorParam) {
+    const cursor = decodeCursor(cursorParam);
+    if (!cursor) {
+      throw Object.assign(new Error('Geçersiz cursor'), { status: 400 });
+    }
+    conditions.push({
+      $or: [
+        { createdAt: { $lt: cursor.value } },
+        { createdAt: cursor.value, id: { $lt: cursor.id } }
+      ]
+    });
+  }
+
+  const filter = conditions.length === 0 ? {} : conditions.length === 1 ? conditions[0] : { $and: conditions };
+  return { filter, sort: { createdAt: -1, id: -1 }, paginate, limit };
+}
+
+// limit + 1 kayıt çekilir; fazlası varsa bir sonraki sayfanın cursor'ı döner
+export function adminPage(items, query) {
+  const hasMore = items.length > query.limit;
+  const pageItems = hasMore ? items.slice(0, query.limit) : items;
+  return {
+    items: pageItems,
+    nextCursor: hasMore ? encodeCursor(pageItems[pageItems.length - 1], 'createdAt') : null
+  };
+}
+
+// Sorguyu çalıştırır; sayfalıysa { items, nextCursor }, değilse düz dizi döner
+export async function findAdminPage(collection, query, projection) {
+  const items = await collection
+    .find(query.filter, { projection })
+    .sort(query.sort)
+    .limit(query.paginate ? query.limit + 1 : query.limit)
+    .toArray();
+  return query.paginate ? adminPage(items, query) : items;
+}
+
+export function parseOrderListQuery(searchParams) {
+  return parseAdminListQuery(searchParams, { statuses: ORDER_STATUSES });
+}
+
+// Kullanıcı detayındaki sipariş geçmişi: her zaman sayfalı, { userId, createdAt, id } indeksini kullanır
+export function parseOrderHistoryQuery(userId, searchParams) {
+  const query = parseAdminListQuery(searchParams, {
+    statuses: ORDER_STATUSES, pageSize: ORDER_HISTORY_PAGE_SIZE, base: { userId }
+  });
+  if (!query.paginate) {
+    query.paginate = true;
+    query.limit = ORDER_HISTORY_PAGE_SIZE;
+  }
+  return query;
+}
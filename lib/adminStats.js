@@ -0,0 +1,220 @@
+// Admin paneli özetleri: ciro, durum bazında sipariş sayıları, en çok satan ürünler, günlük yeni üyeler
+// Özetler adminStats koleksiyonunda tutulur ve sipariş/üye yazımlarında $inc ile güncellenir;
+// panel yüklemesi sipariş sayısından bağımsız olarak birkaç küçük doküman okur.
+// Dokümanlar:
+//   { _id: 'totals', orders, revenue, paidOrders, users, byStatus: { pending: n, ... } }
+//   { _id: 'day:YYYY-MM-DD', kind: 'day', date, orders, revenue, users }   (sipariş/kayıt günü, UTC)
+//   { _id: 'product:<id>', kind: 'product', productId, name, quantity, revenue }
+// Artımlı güncelleme başarısız olursa (ör. yazım sonrası bağlantı hatası) özet kayar; rebuildAdminStats düzeltir.
+import { ORDER_STATUSES } from '@/lib/orders';
+
+// Bu durumlardaki siparişlerin tutarı ciroya ve ürün satışlarına sayılır (iptal edilince geri düşülür)
+export const REVENUE_STATUSES = ['paid', 'shipped', 'delivered'];
+export const STATS_DAYS = 30;
+export const TOP_PRODUCTS = 10;
+const MAX_STATS_DAYS = 366;
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+export const ADMIN_STATS_INDEXES = [
+  // En çok satan ürünler
+  { key: { kind: 1, quantity: -1 } },
+];
+
+// Helper: UTC day of an ISO timestamp
+function dayOf(isoDate) {
+  return isoDate.slice(0, 10);
+}
+
+function dayUpdate(date, inc) {
+  return {
+    updateOne: {
+      filter: { _id: `day:${date}` },
+      update: { $inc: inc, $setOnInsert: { kind: 'day', date } },
+      upsert: true
+    }
+  };
+}
+
+function totalsUpdate(inc) {
+  return { updateOne: { filter: { _id: 'totals' }, update: { $inc: inc }, upsert: true } };
+}
+
+// Sipariş ciroya girdiğinde (sign 1) veya çıktığında (sign -1) tutar ve ürün adetleri
+function revenueUpdates(order, sign) {
+  const amount = sign * (order.totalAmount || 0);
+  const updates = [
+    totalsUpdate({ revenue: amount, paidOrders: sign }),
+    dayUpdate(dayOf(order.createdAt), { revenue: amount })
+  ];
+  for (const item of order.items || []) {
+    if (!item?.id) continue;
+    const quantity = item.quantity || 0;
+    updates.push({
+      updateOne: {
+        filter: { _id: `product:${item.id}` },
+        update: {
+          $inc: { quantity: sign * quantity, revenue: sign * (item.price || 0) * quantity },
+          $set: { name: item.name },
+          $setOnInsert: { kind: 'product', productId: item.id }
+        },
+        upsert: true
+      }
+    });
+  }
+  return updates;
+}
+
+async function applyUpdates(db, updates) {
+  try {
+    await db.collection('adminStats').bulkWrite(updates, { ordered: false });
+  } catch (error) {
+    // Sipariş yazımı zaten yapıldı; özetteki kayma yeniden hesaplamayla düzelir
+    console.error('Admin stats update failed:', error.message);
+  }
+}
+
+// POST /api/orders sonrası
+export function recordOrderCreated(db, order) {
+  const status = order.status || 'pending';
+  const updates = [
+    totalsUpdate({ orders: 1, [`byStatus.${status}`]: 1 }),
+    dayUpdate(dayOf(order.createdAt), { orders: 1 })
+  ];
+  if (REVENUE_STATUSES.includes(status)) {
+    updates.push(...revenueUpdates(order, 1));
+  }
+  return applyUpdates(db, updates);
+}
+
+// transitionOrder geçişi yaptığında (changed: true)
+export function recordOrderTransition(db, order, from, to) {
+  const updates = [totalsUpdate({ [`byStatus.${from}`]: -1, [`byStatus.${to}`]: 1 })];
+  const wasRevenue = REVENUE_STATUSES.includes(from);
+  const isRevenue = REVENUE_STATUSES.includes(to);
+  if (wasRevenue !== isRevenue) {
+    updates.push(...revenueUpdates(order, isRevenue ? 1 : -1));
+  }
+  return applyUpdates(db, updates);
+}
+
+// POST /api/auth/register sonrası
+export function recordUserRegistered(db, user) {
+  return applyUpdates(db, [totalsUpdate({ users: 1 }), dayUpdate(dayOf(user.createdAt), { users: 1 })]);
+}
+
+// Panel özeti: son `days` gün (boş günler sıfır), durum sayıları ve en çok satan ürünler; iki sorgu
+export async function getAdminStats(db, { days = STATS_DAYS, top = TOP_PRODUCTS } = {}) {
+  days = Math.min(Math.max(days, 1), MAX_STATS_DAYS);
+  const today = new Date(dayOf(new Date().toISOString())).getTime();
+  const dates = Array.from({ length: days }, (_, i) => dayOf(new Date(today - (days - 1 - i) * DAY_MS).toISOString()));
+
+  const stats = db.collection('adminStats');
+  const [docs, topProducts] = await Promise.all([
+    stats.find({ _id: { $in: ['totals', ...dates.map(date => `day:${date}`)] } }).toArray(),
+    stats.find({ kind: 'product', quantity: { $gt: 0 } }, { projection: { _id: 0, kind: 0 } })
+      .sort({ quantity: -1 })
+      .limit(top)
+      .toArray()
+  ]);
+
+  const byId = new Map(docs.map(doc => [doc._id, doc]));
+  const totals = byId.get('totals') || {};
+  return {
+    totals: {
+      orders: totals.orders || 0,
+      revenue: totals.revenue || 0,
+      paidOrders: totals.paidOrders || 0,
+      users: totals.users || 0
+    },
+    ordersByStatus: Object.fromEntries(ORDER_STATUSES.map(status => [status, totals.byStatus?.[status] || 0])),
+    daily: dates.map(date => {
+      const doc = byId.get(`day:${date}`) || {};
+      return { date, orders: doc.orders || 0, revenue: doc.revenue || 0, users: doc.users || 0 };
+    }),
+    topProducts
+  };
+}
+
+// Özetleri siparişlerden ve üyelerden baştan hesaplar ve koleksiyonu tek adımda değiştirir
+// Hesaplama sırasında gelen artımlı güncellemeler eski koleksiyona yazıldığı için kaybolur; sakin bir anda çalıştırılmalı
+export async function rebuildAdminStats(db) {
+  const status = { $ifNull: ['$status', 'pending'] };
+  const isRevenue = { $in: [status, REVENUE_STATUSES] };
+  const day = { $substrBytes: ['$createdAt', 0, 10] };
+
+  const [orderFacets] = await db.collection('orders').aggregate([
+    {
+      $facet: {
+        byDay: [{
+          $group: {
+            _id: day,
+            orders: { $sum: 1 },
+            revenue: { $sum: { $cond: [isRevenue, { $ifNull: ['$totalAmount', 0] }, 0] } }
+          }
+        }],
+        byStatus: [{ $group: { _id: status, count: { $sum: 1 } } }],
+        products: [
+          { $match: { $expr: isRevenue } },
+          { $unwind: '$items' },
+          { $match: { 'items.id': { $type: 'string' } } },
+          {
+            $group: {
+              _id: '$items.id',
+              name: { $last: '$items.name' },
+              quantity: { $sum: { $ifNull: ['$items.quantity', 0] } },
+              revenue: { $sum: { $multiply: [{ $ifNull: ['$items.price', 0] }, { $ifNull: ['$items.quantity', 0] }] } }
+            }
+          }
+        ]
+      }
+    }
+  ], { allowDiskUse: true }).toArray();
+  const usersByDay = await db.collection('users').aggregate([
+    { $group: { _id: day, users: { $sum: 1 } } }
+  ], { allowDiskUse: true }).toArray();
+
+  const days = new Map();
+  const dayDoc = date => {
+    if (!days.has(date)) days.set(date, { _id: `day:${date}`, kind: 'day', date, orders: 0, revenue: 0, users: 0 });
+    return days.get(date);
+  };
+  for (const { _id, orders, revenue } of orderFacets.byDay) {
+    if (!_id) continue;
+    Object.assign(dayDoc(_id), { orders, revenue });
+  }
+  for (const { _id, users } of usersByDay) {
+    if (!_id) continue;
+    dayDoc(_id).users = users;
+  }
+
+  const totals = {
+    _id: 'totals',
+    orders: orderFacets.byDay.reduce((sum, d) => sum + d.orders, 0),
+    revenue: orderFacets.byDay.reduce((sum, d) => sum + d.revenue, 0),
+    paidOrders: orderFacets.byStatus.filter(s => REVENUE_STATUSES.includes(s._id)).reduce((sum, s) => sum + s.count, 0),
+    users: usersByDay.reduce((sum, d) => sum + d.users, 0),
+    byStatus: Object.fromEntries(orderFacets.byStatus.map(s => [s._id, s.count]))
+  };
+  const docs = [
+    totals,
+    ...days.values(),
+    ...orderFacets.products.map(p => ({
+      _id: `product:${p._id}`, kind: 'product', productId: p._id, name: p.name, quantity: p.quantity, revenue: p.revenue
+    }))
+  ];
+
+  const staging = db.collection(`adminStats_rebuild_${Date.now()}`);
+  await staging.insertMany(docs, { ordered: false });
+  await staging.createIndexes(ADMIN_STATS_INDEXES);
+  await staging.rename('adminStats', { dropTarget: true });
+  return { orders: totals.orders, users: totals.users, days: days.size, products: orderFacets.products.length };
+}
+
+// İlk açılışta: özet hiç oluşturulmadıysa mevcut verilerden bir kez hesapla
+export async function backfillAdminStats(db) {
+  const totals = await db.collection('adminStats').findOne({ _id: 'totals' }, { projection: { _id: 1 } });
+  if (!totals) {
+    const result = await rebuildAdminStats(db);
+    console.log(`Admin stats backfilled from ${result.orders} orders and ${result.users} users`);
+  }
+}
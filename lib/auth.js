@@ -0,0 +1,162 @@
+// Kullanıcı oturumu: doğrulanmış JWT'ler kısa süre önbellekte tutulur, giriş denemeleri sınırlanır
+// requireUser / optionalUser / requireAdmin: lib/router.js rotaları için middleware
+import { createHash, timingSafeEqual } from 'crypto';
+import { NextResponse } from 'next/server';
+import jwt from 'jsonwebtoken';
+import { LRUCache } from '@/lib/lruCache';
+import { RateLimiter } from '@/lib/rateLimit';
+import { span } from '@/lib/tracing';
+
+const SESSION_CACHE_TTL_MS = parseInt(process.env.SESSION_CACHE_TTL_MS) || 60 * 1000;
+
+const ADMIN_TOKEN_TTL = '12h';
+// Açıksa admin rotaları token'sız isteği reddeder; kapalıyken token'sız eski istemciler geçer,
+// gönderilen token ise her durumda doğrulanır
+const ADMIN_AUTH_REQUIRED = process.env.ADMIN_AUTH_REQUIRED === '1';
+// Admin token'ı olmayan izleme araçları (ör. metrik kazıyıcı) operasyon uç noktalarına bu Bearer token ile erişir
+const METRICS_TOKEN = process.env.METRICS_TOKEN || '';
+
+const sessionCache = new LRUCache({ maxEntries: 10000, ttlMs: SESSION_CACHE_TTL_MS });
+
+// İstemci IP'si yalnızca bu kadar güvenilir proxy arkasındayken başlıklardan okunur (ör. TRUST_PROXY=1);
+// proxy yokken X-Forwarded-For istemcinin kendi yazdığı bir başlıktır
+const TRUSTED_PROXY_HOPS = parseInt(process.env.TRUST_PROXY) || 0;
+
+// Aynı e-posta + IP için hatalı giriş sınırı ve IP başına toplam hatalı giriş sınırı
+// IP bilinmiyorsa hesap kilitlenmez (herkes 5 yanlış şifreyle başkasının hesabını kilitleyebilirdi);
+// bunun yerine sınırı aşan her hatalı denemeden sonra o e-postanın girişleri giderek yavaşlatılır
+const LOGIN_MAX_FAILURES = parseInt(process.env.LOGIN_MAX_FAILURES) || 5;
+const LOGIN_DELAY_BASE_MS = 500;
+const LOGIN_DELAY_MAX_MS = 8000;
+const accountFailures = new RateLimiter({
+  limit: LOGIN_MAX_FAILURES,
+  windowMs: 15 * 60 * 1000,
+});
+const ipFailures = new RateLimiter({
+  limit: parseInt(process.env.LOGIN_MAX_FAILURES_PER_IP) || 50,
+  windowMs: 15 * 60 * 1000,
+});
+
+// Helper: Client IP as seen by the outermost trusted proxy, or null when no proxy is configured
+// Each proxy appends the address it received the request from, so only the last TRUSTED_PROXY_HOPS entries
+// of X-Forwarded-For are trustworthy; anything to their left was sent by the client
+export function clientIp(request) {
+  if (TRUSTED_PROXY_HOPS === 0) {
+    return null;
+  }
+  const forwarded = request.headers.get('x-forwarded-for')?.split(',').map(part => part.trim()).filter(Boolean);
+  if (forwarded?.length) {
+    return forwarded[Math.max(forwarded.length - TRUSTED_PROXY_HOPS, 0)];
+  }
+  return request.headers.get('x-real-ip') || null;
+}
+
+// Bearer token'ı doğrular; aynı token SESSION_CACHE_TTL_MS boyunca yeniden doğrulanmaz
+export function verifyToken(request) {
+  const authHeader = request.headers.get('authorization');
+  if (!authHeader || !authHeader.startsWith('Bearer ')) {
+    return null;
+  }
+  const token = authHeader.split(' ')[1];
+  const cached = sessionCache.get(token);
+  if (cached) {
+    return cached;
+  }
+  try {
+    const payload = span('jwt.verify', () => jwt.verify(token, process.env.JWT_SECRET));
+    // Önbellek süresi token'ın kendi bitişini geçmez
+    const ttlMs = payload.exp ? Math.min(SESSION_CACHE_TTL_MS, payload.exp * 1000 - Date.now()) : SESSION_CACHE_TTL_MS;
+    if (ttlMs > 0) {
+      sessionCache.set(token, payload, ttlMs);
+    }
+    return payload;
+  } catch (error) {
+    return null;
+  }
+}
+
+// Admin paneli oturumu: POST /api/login/login başarılı olunca verilir
+export function signAdminToken(username) {
+  return jwt.sign({ role: 'admin', username }, process.env.JWT_SECRET, { expiresIn: ADMIN_TOKEN_TTL });
+}
+
+// Middleware: geçerli kullanıcı token'ı zorunlu; ctx.user doldurulur
+export function requireUser(message = 'Unauthorized') {
+  return ctx => {
+    ctx.user = verifyToken(ctx.request);
+    if (!ctx.user) {
+      return NextResponse.json({ error: message }, { status: 401 });
+    }
+  };
+}
+
+// Middleware: token varsa ctx.user doldurulur, yoksa misafir olarak devam edilir
+export function optionalUser(ctx) {
+  ctx.user = verifyToken(ctx.request);
+}
+
+// Middleware: admin token'ı (role: 'admin'); müşteri token'ı 403, geçersiz token 401
+export function requireAdmin(ctx) {
+  if (!ctx.request.headers.get('authorization')) {
+    return ADMIN_AUTH_REQUIRED ? NextResponse.json({ error: 'Unauthorized' }, { status: 401 }) : undefined;
+  }
+  const payload = verifyToken(ctx.request);
+  if (!payload) {
+    return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
+  }
+  if (payload.role !== 'admin') {
+    return NextResponse.json({ error: 'Bu işlem için yetkiniz yok' }, { status: 403 });
+  }
+  ctx.admin = payload;
+}
+
+// Helper: Constant-time comparison of two secrets of any length
+function sameSecret(a, b) {
+  const digest = value => createHash('sha256').update(value).digest();
+  return timingSafeEqual(digest(a), digest(b));
+}
+
+// Middleware: operasyon uç noktaları (havuz, önbellek, istek izleri) ADMIN_AUTH_REQUIRED kapalıyken de
+// token'sız açılmaz; admin token'ı ya da METRICS_TOKEN gerekir
+export function requireOperator(ctx) {
+  const header = ctx.request.headers.get('authorization');
+  if (!header) {
+    return NextResponse.json({ error: 'Unauthorized' }, { status: 401 });
+  }
+  if (METRICS_TOKEN && header.startsWith('Bearer ') && sameSecret(header.slice('Bearer '.length), METRICS_TOKEN)) {
+    return;
+  }
+  return requireAdmin(ctx);
+}
+
+// Giriş denemesine izin var mı: { allowed, retryAfterMs, delayMs }
+// ip null ise IP sınırı atlanır ve hesap kilidi yerine delayMs kadar bekletilir
+export function checkLogin(email, ip) {
+  if (!ip) {
+    const failures = accountFailures.window(`${email}|`)?.count || 0;
+    const excess = failures - LOGIN_MAX_FAILURES;
+    const delayMs = excess < 0 ? 0 : Math.min(LOGIN_DELAY_BASE_MS * 2 ** excess, LOGIN_DELAY_MAX_MS);
+    return { allowed: true, retryAfterMs: 0, delayMs };
+  }
+  const account = accountFailures.check(`${email}|${ip}`);
+  const address = ipFailures.check(ip);
+  if (account.allowed && address.allowed) {
+    return { allowed: true, retryAfterMs: 0, delayMs: 0 };
+  }
+  return { allowed: false, retryAfterMs: Math.max(account.retryAfterMs, address.retryAfterMs), delayMs: 0 };
+}
+
+export function recordLoginFailure(email, ip) {
+  accountFailures.hit(`${email}|${ip ?? ''}`);
+  if (ip) {
+    ipFailures.hit(ip);
+  }
+}
+
+export function recordLoginSuccess(email, ip) {
+  accountFailures.reset(`${email}|${ip ?? ''}`);
+}
+
+export function sessionCacheStats() {
+  return sessionCache.stats();
+}
@@ -0,0 +1,149 @@
+// Ürün listesi sorguları: filtre, sıralama, cursor sayfalama ve alan seçimi
+// GET /api/products?productType=watch&gender=male,unisex&minPrice=1000&sort=price-asc&limit=24&fields=id,name,price
+
+export const MAX_PAGE_SIZE = 100;
+
+// Vitrin kartlarının kullandığı alanlar (listelerde reviews/specs gönderilmez)
+export const PRODUCT_CARD_FIELDS = [
+  'id', 'name', 'description', 'price', 'image', 'images', 'stock',
+  'category', 'productType', 'gender', 'brand', 'createdAt'
+];
+
+// Ürün teknik özellikleri; POST/PUT ve toplu içe aktarma aynı alanları yazar
+export const SPEC_FIELDS = [
+  'glassType', 'machineType', 'dialColor', 'strapType', 'caseSize',
+  'caseMaterial', 'functions', 'calendar', 'features', 'warranty'
+];
+
+export function productSpecs(specs) {
+  return Object.fromEntries(SPEC_FIELDS.map(field => [field, specs?.[field] || '']));
+}
+
+// productType alanı olmayan eski ürünler vitrin sayfalarının kuralıyla sınıflanır (route.js'teki tek seferlik
+// doldurma ile aynı kural): 'Gözlük' kategorisi gözlük, gerisi saat
+export function productTypeOf(product) {
+  return product.productType || (product.category === 'Gözlük' ? 'eyewear' : 'watch');
+}
+
+const PROJECTABLE_FIELDS = new Set([...PRODUCT_CARD_FIELDS, 'specs', 'ratingAverage', 'ratingCount', 'updatedAt']);
+
+// Her sıralama id ile tamamlanır, böylece cursor her zaman tek bir konumu gösterir
+export const PRODUCT_SORTS = {
+  'default': ['createdAt', 1],
+  'price-asc': ['price', 1],
+  'price-desc': ['price', -1],
+  'name-asc': ['name', 1],
+  'name-desc': ['name', -1],
+  'newest': ['createdAt', -1],
+};
+
+// Katalog sorgularını destekleyen indeksler
+export const PRODUCT_INDEXES = [
+  { key: { id: 1 }, unique: true },
+  { key: { productType: 1, price: 1, id: 1 } },
+  { key: { productType: 1, createdAt: -1, id: -1 } },
+  { key: { category: 1 } },
+  { key: { gender: 1 } },
+  { key: { brand: 1 } },
+  { key: { price: 1, id: 1 } },
+  { key: { createdAt: 1, id: 1 } },
+];
+
+function listParam(searchParams, name) {
+  const value = searchParams.get(name);
+  if (!value) return null;
+  const values = value.split(',').map(v => v.trim()).filter(Boolean);
+  return values.length > 0 ? values : null;
+}
+
+function escapeRegex(value) {
+  return value.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+}
+
+export function encodeCursor(product, sortField) {
+  return Buffer.from(JSON.stringify([product[sortField] ?? null, product.id])).toString('base64url');
+}
+
+export function decodeCursor(cursor) {
+  try {
+    const [value, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    return typeof id === 'string' ? { value, id } : null;
+  } catch (error) {
+    return null;
+  }
+}
+
+// URL parametrelerinden Mongo filtresi, sıralama ve projeksiyon üretir
+export function parseProductQuery(searchParams) {
+  const conditions = [];
+
+  for (const field of ['productType', 'category', 'gender', 'brand']) {
+    const values = listParam(searchParams, field);
+    if (values) {
+      conditions.push({ [field]: values.length === 1 ? values[0] : { $in: values } });
+    }
+  }
+
+  const minPrice = parseFloat(searchParams.get('minPrice'));
+  const maxPrice = parseFloat(searchParams.get('maxPrice'));
+  if (!isNaN(minPrice) || !isNaN(maxPrice)) {
+    const price = {};
+    if (!isNaN(minPrice)) price.$gte = minPrice;
+    if (!isNaN(maxPrice)) price.$lte = maxPrice;
+    conditions.push({ price });
+  }
+
+  const search = searchParams.get('search')?.trim();
+  if (search) {
+    const pattern = { $regex: escapeRegex(search), $options: 'i' };
+    conditions.push({ $or: [{ name: pattern }, { brand: pattern }, { description: pattern }, { category: pattern }] });
+  }
+
+  const sortKey = PRODUCT_SORTS[searchParams.get('sort')] ? searchParams.get('sort') : 'default';
+  const [sortField, direction] = PRODUCT_SORTS[sortKey];
+  const cursorParam = searchParams.get('cursor');
+  const limitParam = parseInt(searchParams.get('limit'));
+  const paginate = !isNaN(limitParam) || Boolean(cursorParam);
+  const limit = Math.min(Math.max(isNaN(limitParam) ? 24 : limitParam, 1), MAX_PAGE_SIZE);
+
+  if (cursorParam) {
+    const cursor = decodeCursor(cursorParam);
+    if (!cursor) {
+      throw Object.assign(new Error('Geçersiz cursor'), { status: 400 });
+    }
+    const op = direction === 1 ? '$gt' : '$lt';
+    conditions.push({
+      $or: [
+        { [sortField]: { [op]: cursor.value } },
+        { [sortField]: cursor.value, id: { [op]: cursor.id } }
+      ]
+    });
+  }
+
+  const fields = listParam(searchParams, 'fields')?.filter(f => PROJECTABLE_FIELDS.has(f));
+  let projection;
+  if (fields && fields.length > 0) {
+    // Cursor için sıralama alanı ve id her zaman döner
+    projection = { _id: 0, id: 1, [sortField]: 1 };
+    fields.forEach(f => { projection[f] = 1; });
+  } else {
+    // reviews: taşınmamış eski dokümanlar, ratingSum: sadece ortalama hesabı için
+    projection = { reviews: 0, ratingSum: 0 };
+  }
+
+  const filter = conditions.length === 0 ? {} : conditions.length === 1 ? conditions[0] : { $and: conditions };
+  // Sayfalama yoksa ve sıralama istenmediyse eski davranış: doğal sıra
+  const sort = paginate || sortKey !== 'default' ? { [sortField]: direction, id: direction } : null;
+
+  return { filter, sort, projection, paginate, limit, sortField };
+}
+
+// limit + 1 kayıt çekilir; fazlası varsa bir sonraki sayfanın cursor'ı döner
+export function productPage(items, query) {
+  const hasMore = items.length > query.limit;
+  const pageItems = hasMore ? items.slice(0, query.limit) : items;
+  return {
+    items: pageItems,
+    nextCursor: hasMore ? encodeCursor(pageItems[pageItems.length - 1], query.sortField) : null
+  };
+}
@@ -0,0 +1,132 @@
+// MongoDB bağlantısı, havuz ayarları ve tüm koleksiyonların indeks tanımı
+// İndeksler süreç başına ilk bağlantıda oluşturulur; createIndexes aynı tanımı tekrar oluşturmaz (idempotent)
+// Havuz ayarları ortam değişkenlerinden okunur (MONGO_MAX_POOL_SIZE, MONGO_READ_PREFERENCE...);
+// verilmeyenlerde sürücü varsayılanı geçerlidir
+import { MongoClient } from 'mongodb';
+import { ADMIN_STATS_INDEXES } from '@/lib/adminStats';
+import { PRODUCT_INDEXES } from '@/lib/catalog';
+import { instrumentPool } from '@/lib/dbMetrics';
+import { instrumentClient, untracked } from '@/lib/dbOps';
+import { IMAGE_INDEXES } from '@/lib/images';
+import { RESERVATION_INDEXES } from '@/lib/inventory';
+import { INVOICE_INDEXES } from '@/lib/invoice';
+import { OUTBOX_INDEXES, migrateOutboxDedupeKeys } from '@/lib/outbox';
+import { REVIEW_INDEXES } from '@/lib/reviews';
+import { traceCommands } from '@/lib/tracing';
+
+export const DB_NAME = process.env.DB_NAME || 'ecommerce';
+
+export const USER_INDEXES = [
+  { key: { id: 1 }, unique: true },
+  { key: { email: 1 }, unique: true },
+  // Admin kullanıcı listesi en yeniden eskiye; id cursor'daki eşitlikleri ayırır
+  { key: { createdAt: -1, id: -1 } },
+];
+
+export const ORDER_INDEXES = [
+  { key: { id: 1 }, unique: true },
+  // orders/my ve kullanıcı detayındaki sipariş geçmişi: userId ile filtre, createdAt ile sıralama
+  { key: { userId: 1, createdAt: -1, id: -1 } },
+  // Admin sipariş listesi ve durum filtreli listesi
+  { key: { createdAt: -1, id: -1 } },
+  { key: { status: 1, createdAt: -1, id: -1 } },
+  // Süresi dolan stok rezervasyonları (lib/inventory.js)
+  ...RESERVATION_INDEXES,
+];
+
+// koleksiyon -> indeksler
+export const INDEX_SPEC = {
+  users: USER_INDEXES,
+  orders: ORDER_INDEXES,
+  products: PRODUCT_INDEXES,
+  reviews: REVIEW_INDEXES,
+  images: IMAGE_INDEXES,
+  emailOutbox: OUTBOX_INDEXES,
+  invoices: INVOICE_INDEXES,
+  adminStats: ADMIN_STATS_INDEXES,
+};
+
+// Tanımdaki indeksleri oluşturur; bir koleksiyondaki hata (ör. mevcut yinelenen e-postalar) diğerlerini engellemez
+export async function ensureIndexes(db, spec = INDEX_SPEC) {
+  const failed = [];
+  for (const [name, indexes] of Object.entries(spec)) {
+    try {
+      await db.collection(name).createIndexes(indexes);
+    } catch (error) {
+      console.error(`Index setup failed for ${name}:`, error.message);
+      failed.push(name);
+    }
+  }
+  return failed;
+}
+
+function intEnv(name) {
+  const value = parseInt(process.env[name]);
+  return isNaN(value) ? undefined : value;
+}
+
+function flagEnv(name) {
+  return process.env[name] === undefined ? undefined : process.env[name] === '1';
+}
+
+// MONGO_WRITE_CONCERN: '1', '0' veya 'majority'; MONGO_WRITE_TIMEOUT_MS yalnızca onunla birlikte anlamlıdır
+function writeConcern() {
+  const w = process.env.MONGO_WRITE_CONCERN;
+  if (!w) {
+    return undefined;
+  }
+  return { w: /^\d+$/.test(w) ? parseInt(w) : w, wtimeoutMS: intEnv('MONGO_WRITE_TIMEOUT_MS') };
+}
+
+// MongoClient seçenekleri; undefined değerler sürücü varsayılanına bırakılır
+export const POOL_OPTIONS = Object.fromEntries(Object.entries({
+  maxPoolSize: intEnv('MONGO_MAX_POOL_SIZE'),
+  minPoolSize: intEnv('MONGO_MIN_POOL_SIZE'),
+  maxConnecting: intEnv('MONGO_MAX_CONNECTING'),
+  maxIdleTimeMS: intEnv('MONGO_MAX_IDLE_TIME_MS'),
+  // Havuz doluyken bağlantı bekleyen komut bu süreden sonra hata alır (checkout zaman aşımı)
+  waitQueueTimeoutMS: intEnv('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+  connectTimeoutMS: intEnv('MONGO_CONNECT_TIMEOUT_MS'),
+  serverSelectionTimeoutMS: intEnv('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+  socketTimeoutMS: intEnv('MONGO_SOCKET_TIMEOUT_MS'),
+  // primary, primaryPreferred, secondary, secondaryPreferred, nearest
+  readPreference: process.env.MONGO_READ_PREFERENCE || undefined,
+  writeConcern: writeConcern(),
+  retryReads: flagEnv('MONGO_RETRY_READS'),
+  retryWrites: flagEnv('MONGO_RETRY_WRITES'),
+}).filter(([, value]) => value !== undefined));
+
+let clientReady = null;
+
+// İlk çağrı bağlanır ve indeksleri kurar; eşzamanlı ilk istekler aynı bağlantıyı bekler
+export function connectToDatabase() {
+  if (!clientReady) {
+    // Kurulum komutları ilk isteğin X-DB-Ops sayısına yazılmaz
+    const ready = untracked(async () => {
+      // Komut izleme, istek başına DB gidiş-dönüş sayısını X-DB-Ops başlığında,
+      // havuz ve komut gecikmelerini /api/metrics'te, her komutu isteğin izinde (lib/tracing.js) raporlar
+      const client = traceCommands(instrumentPool(instrumentClient(
+        new MongoClient(process.env.MONGO_URL, { ...POOL_OPTIONS, monitorCommands: true })
+      )));
+      // Bağlantı kapanırsa (ör. client.close()) sonraki istek yeniden bağlanır
+      client.once('topologyClosed', () => {
+        if (clientReady === ready) clientReady = null;
+      });
+      await client.connect();
+      const db = client.db(DB_NAME);
+      try {
+        // Eski outbox tekilliği dedupeKey indeksinden önce taşınmalı
+        await migrateOutboxDedupeKeys(db);
+        await ensureIndexes(db);
+      } catch (error) {
+        console.error('Index bootstrap failed:', error);
+      }
+      return client;
+    }).catch(error => {
+      clientReady = null;
+      throw error;
+    });
+    clientReady = ready;
+  }
+  return clientReady;
+}
@@ -0,0 +1,133 @@
+// MongoDB bağlantı havuzu ve komut gecikmesi metrikleri (GET /api/metrics, GET /api/health)
+// Havuz: CMAP olaylarıyla açık/kullanımda/bekleyen bağlantı sayısı ve bağlantı alma (checkout) bekleme süresi
+// Komutlar: "koleksiyon.komut" başına gecikme dağılımı (ör. products.find, orders.update)
+// Sayaçlar süreç başınadır; süreç yeniden başlayınca sıfırlanır
+
+// Gecikme kova sınırları (ms); yüzdelikler kova üst sınırından okunur, en fazla gözlenen max kadar
+const LATENCY_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000];
+
+export class LatencyStats {
+  constructor() {
+    this.buckets = new Array(LATENCY_BOUNDS_MS.length + 1).fill(0);
+    this.count = 0;
+    this.errors = 0;
+    this.sum = 0;
+    this.max = 0;
+  }
+
+  record(ms, failed = false) {
+    let index = 0;
+    while (index < LATENCY_BOUNDS_MS.length && ms > LATENCY_BOUNDS_MS[index]) index++;
+    this.buckets[index]++;
+    this.count++;
+    this.sum += ms;
+    this.max = Math.max(this.max, ms);
+    if (failed) this.errors++;
+  }
+
+  percentile(p) {
+    const rank = Math.ceil(this.count * p);
+    let seen = 0;
+    for (let index = 0; index < this.buckets.length; index++) {
+      seen += this.buckets[index];
+      if (seen >= rank) {
+        return Math.min(LATENCY_BOUNDS_MS[index] ?? this.max, this.max);
+      }
+    }
+    return this.max;
+  }
+
+  toJSON() {
+    const round = value => Math.round(value * 1000) / 1000;
+    return {
+      count: this.count,
+      errors: this.errors,
+      mean: this.count > 0 ? round(this.sum / this.count) : 0,
+      p50: round(this.percentile(0.5)),
+      p95: round(this.percentile(0.95)),
+      p99: round(this.percentile(0.99)),
+      max: round(this.max),
+    };
+  }
+}
+
+const pool = {
+  open: 0,
+  inUse: 0,
+  waiting: 0,
+  peakInUse: 0,
+  peakWaiting: 0,
+  checkouts: 0,
+  checkoutFailures: {},
+  cleared: 0,
+};
+const checkoutWait = new LatencyStats();
+// Eski sürücülerde connectionCheckedOut olayında durationMS yok; bekleme kuyruğu FIFO olduğundan
+// başlangıç zamanları sırayla eşlenir
+const checkoutStarts = [];
+
+const operations = new Map();
+const inflight = new Map();
+
+// find/insert/update/delete/aggregate komutlarında koleksiyon adı komutun ilk alanıdır, getMore'da `collection`
+export function operationName({ commandName, command }) {
+  const target = command?.[commandName];
+  const collection = typeof target === 'string' ? target : command?.collection;
+  return collection ? `${collection}.${commandName}` : commandName;
+}
+
+function recordOperation(event, failed) {
+  const name = inflight.get(event.requestId);
+  if (name === undefined) {
+    return;
+  }
+  inflight.delete(event.requestId);
+  if (!operations.has(name)) {
+    operations.set(name, new LatencyStats());
+  }
+  operations.get(name).record(event.duration, failed);
+}
+
+// MongoClient `monitorCommands: true` ile oluşturulmalı (komut olayları için)
+export function instrumentPool(client) {
+  client.on('connectionCreated', () => { pool.open++; });
+  client.on('connectionClosed', () => { pool.open = Math.max(pool.open - 1, 0); });
+  client.on('connectionCheckOutStarted', () => {
+    checkoutStarts.push(performance.now());
+    pool.waiting++;
+    pool.peakWaiting = Math.max(pool.peakWaiting, pool.waiting);
+  });
+  client.on('connectionCheckedOut', event => {
+    const started = checkoutStarts.shift();
+    pool.waiting = Math.max(pool.waiting - 1, 0);
+    pool.inUse++;
+    pool.peakInUse = Math.max(pool.peakInUse, pool.inUse);
+    pool.checkouts++;
+    checkoutWait.record(event.durationMS ?? (started === undefined ? 0 : performance.now() - started));
+  });
+  client.on('connectionCheckOutFailed', event => {
+    checkoutStarts.shift();
+    pool.waiting = Math.max(pool.waiting - 1, 0);
+    pool.checkoutFailures[event.reason] = (pool.checkoutFailures[event.reason] || 0) + 1;
+  });
+  client.on('connectionCheckedIn', () => { pool.inUse = Math.max(pool.inUse - 1, 0); });
+  client.on('connectionPoolCleared', () => { pool.cleared++; });
+
+  client.on('commandStarted', event => { inflight.set(event.requestId, operationName(event)); });
+  client.on('commandSucceeded', event => recordOperation(event, false));
+  client.on('commandFailed', event => recordOperation(event, true));
+  return client;
+}
+
+export function poolStats() {
+  return { ...pool, checkoutFailures: { ...pool.checkoutFailures }, checkoutWaitMs: checkoutWait.toJSON() };
+}
+
+// En yavaş p95'ten hızlıya sıralı
+export function operationStats() {
+  return Object.fromEntries(
+    [...operations.entries()]
+      .map(([name, stats]) => [name, stats.toJSON()])
+      .sort(([, a], [, b]) => b.p95 - a.p95 || b.count - a.count)
+  );
+}
@@ -0,0 +1,31 @@
+// İstek başına MongoDB gidiş-dönüş sayacı: sürücünün komut izleme olaylarını
+// AsyncLocalStorage ile isteğe bağlar ve yanıta `X-DB-Ops` başlığı olarak yazar
+import { AsyncLocalStorage } from 'async_hooks';
+
+const requestOps = new AsyncLocalStorage();
+
+// MongoClient `monitorCommands: true` ile oluşturulmalı; her komut (find, getMore, update...) bir gidiş-dönüştür
+export function instrumentClient(client) {
+  client.on('commandStarted', () => {
+    const ops = requestOps.getStore();
+    if (ops) ops.count++;
+  });
+  return client;
+}
+
+// Arka plan işlerini (ör. outbox boşaltma) isteğin sayacının dışında çalıştırır
+export function untracked(fn) {
+  return requestOps.exit(fn);
+}
+
+// Route handler'ı sarar; yanıt döndüğünde o isteğin yaptığı DB komut sayısını başlığa ekler
+export function withDbOps(handler) {
+  return (request, ...args) => {
+    const ops = { count: 0 };
+    return requestOps.run(ops, async () => {
+      const response = await handler(request, ...args);
+      response.headers.set('X-DB-Ops', String(ops.count));
+      return response;
+    });
+  };
+}
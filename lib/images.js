@@ -0,0 +1,224 @@
+// Yüklenen görseller: içerik adresli (sha256) GridFS deposu, ETag ve Range destekli okuma
+// GET /api/images/:id  ->  200 / 206 (Range) / 304 (If-None-Match)
+// GET /api/images/:id?w=640&q=75&format=webp|avif|auto  ->  yeniden boyutlandırılmış türev
+import { createHash } from 'crypto';
+import { Readable } from 'stream';
+import { GridFSBucket } from 'mongodb';
+import sharp from 'sharp';
+import { LRUCache } from '@/lib/lruCache';
+
+export const IMAGE_BUCKET = 'imageFiles';
+
+export const IMAGE_INDEXES = [
+  { key: { id: 1 }, unique: true },
+  { key: { sha256: 1 } },
+];
+
+export const IMAGE_CACHE_CONTROL = 'public, max-age=31536000, immutable';
+
+export function imageBucket(db) {
+  return new GridFSBucket(db, { bucketName: IMAGE_BUCKET });
+}
+
+export function imageEtag(sha256) {
+  return `"${sha256}"`;
+}
+
+// Eşzamanlı yükleme çakışmasında diğer yüklemenin files kaydını bu kadar bekler
+const RACING_UPLOAD_WAIT_MS = [50, 100, 200, 400, 800];
+
+// Helper: Whether the GridFS files document for this content exists (GridFS writes it after all chunks)
+async function blobStored(db, sha256) {
+  return Boolean(await db.collection(`${IMAGE_BUCKET}.files`).findOne({ _id: sha256 }, { projection: { _id: 1 } }));
+}
+
+// Helper: Write bytes to GridFS under their sha256 unless the same content is already stored
+async function storeBlob(db, buffer, sha256, filename, mimeType) {
+  if (await blobStored(db, sha256)) {
+    return true;
+  }
+  try {
+    await new Promise((resolve, reject) => {
+      const upload = imageBucket(db).openUploadStreamWithId(sha256, filename, { metadata: { mimeType } });
+      upload.once('finish', resolve);
+      upload.once('error', reject);
+      upload.end(buffer);
+    });
+    return false;
+  } catch (error) {
+    // Aynı içerik eşzamanlı yükleniyor: çakışma chunk'larda da olabilir, o anda diğer yüklemenin files kaydı henüz
+    // yoktur (veya o yükleme başarısız olur). Yalnızca files kaydı görünürse içerik saklanmış sayılır
+    if (error.code === 11000) {
+      for (const delay of RACING_UPLOAD_WAIT_MS) {
+        if (await blobStored(db, sha256)) {
+          return true;
+        }
+        await new Promise(resolve => setTimeout(resolve, delay));
+      }
+      if (await blobStored(db, sha256)) {
+        return true;
+      }
+    }
+    throw error;
+  }
+}
+
+// Görseli kaydeder; aynı içerik ikinci kez yüklenirse aynı id döner
+export async function storeImage(db, buffer, { filename, mimeType }) {
+  const sha256 = createHash('sha256').update(buffer).digest('hex');
+  const deduplicated = await storeBlob(db, buffer, sha256, filename, mimeType);
+  await db.collection('images').updateOne(
+    { id: sha256 },
+    {
+      $setOnInsert: {
+        id: sha256,
+        sha256,
+        filename,
+        mimeType,
+        size: buffer.length,
+        createdAt: new Date().toISOString()
+      }
+    },
+    { upsert: true }
+  );
+  return { id: sha256, sha256, deduplicated };
+}
+
+// If-None-Match: "a", W/"b" veya * — zayıf karşılaştırma yeterli
+export function etagMatches(ifNoneMatch, etag) {
+  if (!ifNoneMatch) return false;
+  return ifNoneMatch.split(',').some(tag => {
+    const value = tag.trim();
+    return value === '*' || value.replace(/^W\//, '') === etag;
+  });
+}
+
+// Tek aralıklı "bytes=start-end" başlığını çözer; null = tüm dosya, false = karşılanamaz
+export function parseRange(header, size) {
+  if (!header) return null;
+  const match = /^bytes=(\d*)-(\d*)$/.exec(header.trim());
+  // Çoklu veya bozuk aralıklarda tüm dosya gönderilir
+  if (!match || (match[1] === '' && match[2] === '')) return null;
+
+  let start;
+  let end;
+  if (match[1] === '') {
+    // bytes=-500: son 500 bayt
+    start = Math.max(size - parseInt(match[2]), 0);
+    end = size - 1;
+  } else {
+    start = parseInt(match[1]);
+    end = match[2] === '' ? size - 1 : Math.min(parseInt(match[2]), size - 1);
+  }
+  if (start >= size || start > end) return false;
+  return { start, end };
+}
+
+// GridFS'ten okuma akışı (end dahil) web ReadableStream olarak
+export function streamImage(db, sha256, range) {
+  const options = range ? { start: range.start, end: range.end + 1 } : {};
+  return Readable.toWeb(imageBucket(db).openDownloadStream(sha256, options));
+}
+
+// Eski base64 görsel dokümanlarını GridFS'e taşır; id'ler ve URL'ler değişmez
+export async function migrateBase64Images(db) {
+  const images = db.collection('images');
+  const legacy = images.find({ data: { $exists: true } }, { projection: { id: 1, data: 1, filename: 1, mimeType: 1 } });
+
+  for await (const image of legacy) {
+    const buffer = Buffer.from(image.data.replace(/^data:image\/\w+;base64,/, ''), 'base64');
+    const sha256 = createHash('sha256').update(buffer).digest('hex');
+    await storeBlob(db, buffer, sha256, image.filename || image.id, image.mimeType || 'image/jpeg');
+    await images.updateOne(
+      { id: image.id },
+      { $set: { sha256, size: buffer.length }, $unset: { data: '' } }
+    );
+  }
+}
+
+// Türev genişlikleri sabit basamaklara yuvarlanır, böylece önbellekteki varyant sayısı sınırlı kalır
+export const DERIVATIVE_WIDTHS = [64, 128, 256, 384, 512, 640, 828, 1080, 1280, 1600, 2048];
+
+const DERIVATIVE_FORMATS = {
+  webp: 'image/webp',
+  avif: 'image/avif',
+  jpeg: 'image/jpeg',
+  png: 'image/png',
+};
+
+const derivativeCache = new LRUCache({
+  maxBytes: (parseInt(process.env.IMAGE_CACHE_MB) || 64) * 1024 * 1024,
+  sizeOf: derivative => derivative.buffer.length,
+});
+// Aynı türev için eşzamanlı istekler tek bir dönüşümü bekler
+const pendingDerivatives = new Map();
+
+// w/q/format parametrelerini çözer; hiçbiri yoksa null (orijinal dosya)
+export function parseDerivativeParams(searchParams, accept) {
+  const widthParam = parseInt(searchParams.get('w'));
+  const qualityParam = parseInt(searchParams.get('q'));
+  const formatParam = searchParams.get('format');
+  if (isNaN(widthParam) && isNaN(qualityParam) && !formatParam) {
+    return null;
+  }
+
+  const width = isNaN(widthParam)
+    ? null
+    : DERIVATIVE_WIDTHS.find(w => w >= widthParam) || DERIVATIVE_WIDTHS[DERIVATIVE_WIDTHS.length - 1];
+  const quality = isNaN(qualityParam) ? 75 : Math.min(Math.max(qualityParam, 1), 100);
+
+  // format=auto: Accept başlığı webp destekliyorsa webp, yoksa jpeg
+  // AVIF kodlaması çok yavaş olduğundan sadece format=avif ile açıkça istenir
+  let format = formatParam;
+  const negotiated = !formatParam || formatParam === 'auto';
+  if (negotiated) {
+    format = accept?.includes('image/webp') ? 'webp' : 'jpeg';
+  }
+  if (!DERIVATIVE_FORMATS[format]) {
+    throw Object.assign(new Error('Geçersiz görsel formatı (webp, avif, jpeg, png, auto)'), { status: 400 });
+  }
+  return { width, quality, format, negotiated, mimeType: DERIVATIVE_FORMATS[format] };
+}
+
+export function derivativeEtag(sha256, params) {
+  return `"${sha256}-w${params.width || 0}-q${params.quality}-${params.format}"`;
+}
+
+async function readImage(db, sha256) {
+  const chunks = [];
+  for await (const chunk of imageBucket(db).openDownloadStream(sha256)) {
+    chunks.push(chunk);
+  }
+  return Buffer.concat(chunks);
+}
+
+async function renderDerivative(db, sha256, params) {
+  let pipeline = sharp(await readImage(db, sha256)).rotate();
+  if (params.width) {
+    pipeline = pipeline.resize({ width: params.width, withoutEnlargement: true });
+  }
+  const buffer = await pipeline.toFormat(params.format, { quality: params.quality }).toBuffer();
+  return { buffer, mimeType: params.mimeType };
+}
+
+// Türevi önbellekten döner, yoksa bir kez üretip önbelleğe koyar
+export async function getDerivative(db, sha256, params) {
+  const key = derivativeEtag(sha256, params);
+  const cached = derivativeCache.get(key);
+  if (cached) {
+    return cached;
+  }
+  if (!pendingDerivatives.has(key)) {
+    pendingDerivatives.set(key, renderDerivative(db, sha256, params)
+      .then(derivative => {
+        derivativeCache.set(key, derivative);
+        return derivative;
+      })
+      .finally(() => pendingDerivatives.delete(key)));
+  }
+  return pendingDerivatives.get(key);
+}
+
+export function derivativeCacheStats() {
+  return derivativeCache.stats();
+}
@@ -0,0 +1,162 @@
+// Sipariş stok rezervasyonu: POST /api/orders sepetteki her ürünün stoğunu koşullu $inc ile düşer
+// ({ id, stock: { $gte: adet } }), fiyatları ve toplamı sunucu hesaplar; istemcinin gönderdiği fiyat/toplam kullanılmaz.
+// Bir kalem yetersizse başarılı kalemlerin düşümü geri alınır (telafi) ve sipariş oluşmaz, stok hiç eksiye inmez.
+// Çok dokümanlı transaction yerine koşullu $inc: replica set gerektirmez ve sıcak üründe yazım çakışması yeniden
+// denemesi olmaz; geri alma sırasında başka bir alıcı kısa süre "yetersiz stok" görebilir (fazla satış olmaz).
+// Ödenmemiş siparişin rezervasyonu reservedUntil'de düşer: süpürücü siparişi iptal eder ve stoğu geri koyar.
+//   pending            ORDER_RESERVATION_MS (ödeme sayfası)
+//   awaiting_transfer  TRANSFER_RESERVATION_MS (havale bekleniyor)
+//   paid ve sonrası    süresiz (reservedUntil: null)
+import { untracked } from '@/lib/dbOps';
+import { transitionOrder } from '@/lib/orders';
+import { invalidateProduct } from '@/lib/responseCache';
+
+export const ORDER_RESERVATION_MS = parseInt(process.env.ORDER_RESERVATION_MS) || 30 * 60 * 1000;
+export const TRANSFER_RESERVATION_MS = parseInt(process.env.TRANSFER_RESERVATION_MS) || 3 * 24 * 60 * 60 * 1000;
+const RESERVATION_SWEEP_MS = parseInt(process.env.RESERVATION_SWEEP_MS) || 60 * 1000;
+const SWEEP_BATCH = 100;
+export const MAX_ORDER_LINES = 100;
+// Vitrin bu sayının altındaki stoğu "Son N adet" olarak gösterir; üstündeki değişimler önbelleği eskitmez
+const LOW_STOCK = 10;
+const EXPIRABLE_STATUSES = ['pending', 'awaiting_transfer'];
+
+export const RESERVATION_INDEXES = [
+  // Süpürücü: yalnızca süresi olan (ödenmemiş) siparişler indekslenir
+  { key: { reservedUntil: 1 }, partialFilterExpression: { reservedUntil: { $type: 'string' } } },
+];
+
+// Helper: ISO timestamp `ms` from now
+export function reservationDeadline(ms) {
+  return new Date(Date.now() + ms).toISOString();
+}
+
+// Sepeti doğrular ve aynı ürünün satırlarını birleştirir: [{ id, quantity }]
+export function parseOrderItems(items) {
+  if (!Array.isArray(items) || items.length === 0) {
+    throw Object.assign(new Error('Sepet boş'), { status: 400 });
+  }
+  if (items.length > MAX_ORDER_LINES) {
+    throw Object.assign(new Error(`Sepette en fazla ${MAX_ORDER_LINES} satır olabilir`), { status: 400 });
+  }
+  const quantities = new Map();
+  for (const item of items) {
+    const quantity = item?.quantity === undefined ? 1 : Number(item.quantity);
+    if (typeof item?.id !== 'string' || !item.id || !Number.isInteger(quantity) || quantity < 1) {
+      throw Object.assign(new Error('Geçersiz sepet satırı'), { status: 400 });
+    }
+    quantities.set(item.id, (quantities.get(item.id) || 0) + quantity);
+  }
+  return [...quantities].map(([id, quantity]) => ({ id, quantity }));
+}
+
+// Helper: Put reserved units back in one bulkWrite
+async function restock(db, items) {
+  if (items.length === 0) return;
+  await db.collection('products').bulkWrite(items.map(({ id, quantity }) => ({
+    updateOne: { filter: { id }, update: { $inc: { stock: quantity } } }
+  })), { ordered: false });
+}
+
+// Kalemleri paralel olarak rezerve eder ve sunucu fiyatlarıyla sipariş satırlarını döner
+// { items, totalAmount } veya { unavailable: [{ id, name, requested, available }] } (hiçbir stok düşülmemiş olarak)
+export async function reserveStock(db, lines) {
+  const products = db.collection('products');
+  const results = await Promise.all(lines.map(({ id, quantity }) => products.findOneAndUpdate(
+    { id, stock: { $gte: quantity } },
+    { $inc: { stock: -quantity } },
+    { returnDocument: 'after', projection: { _id: 0, id: 1, name: 1, price: 1, image: 1, stock: 1 } }
+  )));
+
+  const failed = lines.filter((_, i) => !results[i]);
+  if (failed.length > 0) {
+    await restock(db, lines.filter((_, i) => results[i]));
+    const found = await products
+      .find({ id: { $in: failed.map(line => line.id) } }, { projection: { _id: 0, id: 1, name: 1, stock: 1 } })
+      .toArray();
+    const byId = new Map(found.map(product => [product.id, product]));
+    return {
+      unavailable: failed.map(({ id, quantity }) => ({
+        id,
+        name: byId.get(id)?.name ?? null,
+        requested: quantity,
+        available: Math.max(byId.get(id)?.stock ?? 0, 0)
+      }))
+    };
+  }
+
+  // Vitrinde görünen stok değiştiyse ürün yanıtları eskir
+  await Promise.all(results
+    .filter(product => product.stock < LOW_STOCK)
+    .map(product => invalidateProduct(db, product.id)));
+
+  const items = results.map((product, i) => ({
+    id: product.id,
+    name: product.name,
+    price: product.price,
+    image: product.image,
+    quantity: lines[i].quantity
+  }));
+  const totalAmount = Math.round(items.reduce((sum, item) => sum + item.price * item.quantity, 0) * 100) / 100;
+  return { items, totalAmount };
+}
+
+// Sipariş oluşturulamadıysa (ör. insertOne hatası) rezervasyonu geri alır
+export function cancelReservation(db, items) {
+  return restock(db, items);
+}
+
+// İptal edilen siparişin stoğunu bir kez geri koyar; stockReserved bayrağı çift iadeyi önler
+export async function releaseStock(db, orderId) {
+  const order = await db.collection('orders').findOneAndUpdate(
+    { id: orderId, stockReserved: true },
+    { $set: { stockReserved: false, reservedUntil: null } },
+    { projection: { _id: 0, items: 1 } }
+  );
+  if (!order) return false;
+  const items = (order.items || []).filter(item => item?.id && item.quantity > 0);
+  await restock(db, items);
+  await Promise.all(items.map(item => invalidateProduct(db, item.id)));
+  return true;
+}
+
+// Süresi dolmuş ödenmemiş siparişleri iptal eder (stok transitionOrder içinde geri konur); iptal edilen sayıyı döner
+export async function expireReservations(db) {
+  let expired = 0;
+  for (;;) {
+    const now = new Date().toISOString();
+    const due = await db.collection('orders')
+      .find(
+        { reservedUntil: { $type: 'string', $lte: now }, status: { $in: EXPIRABLE_STATUSES } },
+        { projection: { _id: 0, id: 1 } }
+      )
+      .sort({ reservedUntil: 1 })
+      .limit(SWEEP_BATCH)
+      .toArray();
+    for (const { id } of due) {
+      // Bu arada ödenen veya süresi uzatılan sipariş koşula uymaz ve iptal edilmez
+      const { changed } = await transitionOrder(db, id, 'cancelled', { cancelReason: 'reservation_expired' }, {
+        reservedUntil: { $lte: now }
+      });
+      if (changed) expired++;
+    }
+    if (due.length < SWEEP_BATCH) return expired;
+  }
+}
+
+let sweeperDb = null;
+let sweeping = null;
+
+// Süreç başına bir kez: süresi dolan rezervasyonları periyodik olarak düşürür
+export function startReservationSweeper(db) {
+  if (sweeperDb) return;
+  sweeperDb = db;
+  const sweep = () => {
+    if (sweeping) return;
+    // Tarama hiçbir isteğin DB sayacına yazılmaz
+    sweeping = untracked(() => expireReservations(db))
+      .catch(error => console.error('Reservation sweep failed:', error))
+      .finally(() => { sweeping = null; });
+  };
+  const timer = setInterval(sweep, RESERVATION_SWEEP_MS);
+  timer.unref?.();
+}
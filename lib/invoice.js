@@ -0,0 +1,186 @@
+// Fatura şablonu: statik HTML kabuğu modül yüklenirken bir kez hazırlanır,
+// her siparişte sadece müşteri bilgileri, ürün satırları ve toplamlar üretilir.
+// Üretilen fatura `invoices` koleksiyonunda sipariş başına saklanır; faturada sipariş durumu yazdığı için
+// durum değişince (ör. havale bekleniyor -> ödendi) yeniden üretilir.
+
+export const INVOICE_INDEXES = [
+  { key: { orderId: 1 }, unique: true },
+];
+
+const DATE_FORMAT = new Intl.DateTimeFormat('tr-TR', {
+  year: 'numeric', month: 'long', day: 'numeric', hour: '2-digit', minute: '2-digit'
+});
+
+const PAYMENT_METHODS = { bank: 'Kredi/Banka Kartı', transfer: 'IBAN/Havale' };
+const STATUS_LABELS = { paid: '✅ Ödendi', awaiting_transfer: '⏳ Havale Bekleniyor' };
+
+const SHELL_HEAD = `
+    <!DOCTYPE html>
+    <html>
+    <head>
+      <meta charset="utf-8">
+      <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 650px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #f59e0b 0%, #eab308 100%); color: #000; padding: 30px; text-align: center; border-radius: 8px 8px 0 0; }
+        .content { background: #fff; padding: 30px; border: 1px solid #e5e7eb; }
+        .invoice-details { background: #f9fafb; padding: 20px; border-radius: 8px; margin: 20px 0; }
+        table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+        th { background: #f3f4f6; padding: 12px; text-align: left; font-weight: bold; }
+        td { padding: 12px; }
+        tr.item { border-bottom: 1px solid #e5e7eb; }
+        .center { text-align: center; }
+        .right { text-align: right; }
+        .total { background: #fef3c7; padding: 15px; text-align: right; font-size: 18px; font-weight: bold; border-radius: 8px; margin-top: 20px; }
+        .transfer { background: #fef3c7; padding: 15px; border-radius: 8px; margin-top: 20px; border-left: 4px solid #f59e0b; }
+        .footer { background: #1f2937; color: #9ca3af; padding: 20px; text-align: center; border-radius: 0 0 8px 8px; font-size: 12px; }
+      </style>
+    </head>
+    <body>
+      <div class="container">
+        <div class="header">
+          <h1 style="margin: 0; font-size: 32px;">🕐 Cyprus Watch</h1>
+          <p style="margin: 5px 0 0 0;">Lüks Saat ve Gözlük</p>
+        </div>
+
+        <div class="content">
+          <h2 style="color: #f59e0b; margin-top: 0;">Fatura</h2>
+
+          <div class="invoice-details">`;
+
+const TABLE_HEAD = `
+          </div>
+
+          <h3>Sipariş Detayları</h3>
+          <table>
+            <thead>
+              <tr style="background: #f3f4f6;">
+                <th>Ürün</th>
+                <th class="center">Adet</th>
+                <th class="right">Birim Fiyat</th>
+                <th class="right">Toplam</th>
+              </tr>
+            </thead>
+            <tbody>`;
+
+const TABLE_FOOT = `
+            </tbody>
+          </table>`;
+
+const TRANSFER_HEAD = `
+          <div class="transfer">
+            <h4 style="margin-top: 0; color: #92400e;">Havale Bilgileri</h4>
+            <p><strong>IBAN:</strong> TR33 0006 1005 1978 6457 8413 26</p>
+            <p><strong>Hesap Adı:</strong> E-Ticaret Şirketi A.Ş.</p>
+            <p><strong>Banka:</strong> Ziraat Bankası</p>
+            <p style="font-size: 12px; color: #92400e; margin-bottom: 0;">⚠️ Lütfen açıklama kısmına sipariş numaranızı yazınız: <strong>`;
+
+const TRANSFER_FOOT = `</strong></p>
+          </div>`;
+
+const SHELL_FOOT = `
+        </div>
+
+        <div class="footer">
+          <p><strong>Cyprus Watch</strong> | info@cypruswatch.com | +90 533 123 4123</p>
+          <p>Kıbrıs, Lefkoşa | www.cypruswatch.com</p>
+          <p style="margin-top: 10px;">Teşekkür ederiz! 🎉</p>
+        </div>
+      </div>
+    </body>
+    </html>
+  `;
+
+const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+
+// Helper: Escape user-provided text before it goes into the invoice
+function escapeHtml(value) {
+  return String(value ?? '').replace(/[&<>"']/g, ch => HTML_ESCAPES[ch]);
+}
+
+function money(value) {
+  return (Number(value) || 0).toFixed(2);
+}
+
+// Siparişin fatura HTML'ini üretir; statik kısımlar yeniden oluşturulmaz
+export function renderInvoiceHTML(order, user) {
+  const customer = order.customerInfo || {};
+  const parts = [
+    SHELL_HEAD,
+    '\n            <p><strong>Sipariş No:</strong> ', escapeHtml(order.id), '</p>',
+    '\n            <p><strong>Tarih:</strong> ', DATE_FORMAT.format(new Date(order.createdAt)), '</p>',
+    '\n            <p><strong>Müşteri:</strong> ', escapeHtml(customer.fullName || user?.fullName || 'N/A'), '</p>',
+    '\n            <p><strong>E-posta:</strong> ', escapeHtml(customer.email || user?.email || 'N/A'), '</p>',
+    '\n            <p><strong>Telefon:</strong> ', escapeHtml(customer.phone || user?.phone || 'N/A'), '</p>',
+    '\n            <p><strong>Adres:</strong> ', escapeHtml(customer.address || user?.address || 'N/A'), '</p>',
+    '\n            <p><strong>Ödeme Yöntemi:</strong> ', PAYMENT_METHODS[order.paymentMethod === 'bank' ? 'bank' : 'transfer'], '</p>',
+    '\n            <p><strong>Durum:</strong> ', STATUS_LABELS[order.status] || '📦 Beklemede', '</p>',
+    TABLE_HEAD
+  ];
+
+  for (const item of order.items || []) {
+    parts.push(
+      '\n              <tr class="item"><td>', escapeHtml(item.name),
+      '</td><td class="center">', escapeHtml(item.quantity),
+      '</td><td class="right">', money(item.price),
+      ' ₺</td><td class="right"><strong>', money((item.price || 0) * (item.quantity || 0)),
+      ' ₺</strong></td></tr>'
+    );
+  }
+
+  parts.push(TABLE_FOOT, '\n\n          <div class="total">Toplam Tutar: ', money(order.totalAmount), ' ₺</div>');
+  if (order.paymentMethod === 'transfer') {
+    parts.push(TRANSFER_HEAD, escapeHtml(order.id), TRANSFER_FOOT);
+  }
+  parts.push(SHELL_FOOT);
+  return parts.join('');
+}
+
+// Helper: Render the invoice artifact for an order as it is now
+function invoiceArtifact(order, usersById) {
+  return {
+    orderId: order.id,
+    html: renderInvoiceHTML(order, usersById.get(order.userId) || null),
+    orderStatus: order.status,
+    createdAt: new Date().toISOString()
+  };
+}
+
+// Siparişlerin saklanan faturalarını döner; olmayanları üretip kaydeder, durumu değişmiş olanları yeniden üretir
+// users: userId -> kullanıcı (müşteri bilgisi siparişte yoksa kullanılır)
+export async function getInvoices(db, orders, usersById = new Map()) {
+  const invoices = db.collection('invoices');
+  const stored = await invoices
+    .find({ orderId: { $in: orders.map(order => order.id) } }, { projection: { _id: 0 } })
+    .toArray();
+  const byOrderId = new Map(stored.map(invoice => [invoice.orderId, invoice]));
+
+  const stale = orders.filter(order => byOrderId.has(order.id) && byOrderId.get(order.id).orderStatus !== order.status);
+  if (stale.length > 0) {
+    const rendered = stale.map(order => invoiceArtifact(order, usersById));
+    // Yalnızca okunan sürüm hâlâ saklıysa değiştirilir; eşzamanlı yeniden üretimde biri kazanır, içerik aynıdır
+    await invoices.bulkWrite(rendered.map(invoice => ({
+      replaceOne: {
+        filter: { orderId: invoice.orderId, orderStatus: byOrderId.get(invoice.orderId).orderStatus },
+        replacement: { ...invoice }
+      }
+    })), { ordered: false });
+    rendered.forEach(invoice => byOrderId.set(invoice.orderId, invoice));
+  }
+
+  const missing = orders.filter(order => !byOrderId.has(order.id));
+  if (missing.length > 0) {
+    const created = missing.map(order => invoiceArtifact(order, usersById));
+    try {
+      await invoices.insertMany(created.map(invoice => ({ ...invoice })), { ordered: false });
+    } catch (error) {
+      // Aynı fatura eşzamanlı üretildiyse ilk kaydedilen geçerlidir
+      const writeErrors = [].concat(error.writeErrors || []);
+      if (error.code !== 11000 && !(writeErrors.length > 0 && writeErrors.every(e => e.code === 11000))) {
+        throw error;
+      }
+    }
+    created.forEach(invoice => byOrderId.set(invoice.orderId, invoice));
+  }
+  return byOrderId;
+}
@@ -0,0 +1,81 @@
+// Boyut sınırlı LRU önbellek (isteğe bağlı TTL ile)
+// Map ekleme sırasını korur: en eski kayıt ilk anahtardır, okunan kayıt sona taşınır
+
+export class LRUCache {
+  constructor({ maxEntries = Infinity, maxBytes = Infinity, ttlMs = 0, sizeOf = () => 1 } = {}) {
+    this.maxEntries = maxEntries;
+    this.maxBytes = maxBytes;
+    this.ttlMs = ttlMs;
+    this.sizeOf = sizeOf;
+    this.entries = new Map();
+    this.bytes = 0;
+    this.hits = 0;
+    this.misses = 0;
+    this.evictions = 0;
+  }
+
+  get(key) {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      this.misses++;
+      return undefined;
+    }
+    if (entry.expiresAt && entry.expiresAt <= Date.now()) {
+      this.delete(key);
+      this.misses++;
+      return undefined;
+    }
+    // Son kullanılan olarak işaretle
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    this.hits++;
+    return entry.value;
+  }
+
+  has(key) {
+    const entry = this.entries.get(key);
+    return Boolean(entry) && !(entry.expiresAt && entry.expiresAt <= Date.now());
+  }
+
+  set(key, value, ttlMs = this.ttlMs) {
+    const size = this.sizeOf(value);
+    // Tek başına sınırı aşan değer önbelleğe alınmaz
+    if (size > this.maxBytes) {
+      this.delete(key);
+      return false;
+    }
+    this.delete(key);
+    this.entries.set(key, { value, size, expiresAt: ttlMs ? Date.now() + ttlMs : 0 });
+    this.bytes += size;
+    while (this.entries.size > this.maxEntries || this.bytes > this.maxBytes) {
+      this.delete(this.entries.keys().next().value);
+      this.evictions++;
+    }
+    return true;
+  }
+
+  delete(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+    this.entries.delete(key);
+    this.bytes -= entry.size;
+    return true;
+  }
+
+  clear() {
+    this.entries.clear();
+    this.bytes = 0;
+  }
+
+  stats() {
+    const lookups = this.hits + this.misses;
+    return {
+      entries: this.entries.size,
+      bytes: this.bytes,
+      hits: this.hits,
+      misses: this.misses,
+      evictions: this.evictions,
+      hitRatio: lookups > 0 ? this.hits / lookups : 0
+    };
+  }
+}
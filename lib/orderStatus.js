@@ -0,0 +1,14 @@
+// Sipariş durumları ve izin verilen geçişler; sunucu (lib/orders.js) ve admin paneli aynı tabloyu kullanır
+// Bu modül veritabanı koduna bağlı değildir, istemci bileşenlerinden içe aktarılabilir
+
+// durum -> geçilebilecek durumlar
+export const ORDER_TRANSITIONS = {
+  pending: ['awaiting_transfer', 'paid', 'shipped', 'cancelled'],
+  awaiting_transfer: ['paid', 'shipped', 'cancelled'],
+  paid: ['shipped', 'delivered', 'cancelled'],
+  shipped: ['delivered', 'cancelled'],
+  delivered: [],
+  cancelled: [],
+};
+
+export const ORDER_STATUSES = Object.keys(ORDER_TRANSITIONS);
@@ -0,0 +1,51 @@
+// Sipariş durum makinesi: her geçiş tek bir findOneAndUpdate ile, durum ön koşuluyla yapılır
+// Aynı geçiş tekrar istenirse (çift tıklama, eşzamanlı ödeme) sipariş ikinci kez işlenmez
+import { recordOrderTransition } from '@/lib/adminStats';
+import { releaseStock } from '@/lib/inventory';
+import { ORDER_STATUSES, ORDER_TRANSITIONS } from '@/lib/orderStatus';
+
+export { ORDER_STATUSES, ORDER_TRANSITIONS };
+
+// Helper: Statuses an order may be in to move to `to`
+function sourceStatuses(to) {
+  return ORDER_STATUSES.filter(status => ORDER_TRANSITIONS[status].includes(to));
+}
+
+// Siparişi `to` durumuna geçirir ve geçişle birlikte `fields` alanlarını yazar
+// Tek gidiş-dönüş: koşul pipeline içinde değerlendirilir, dönen eski doküman sonucu belirler
+// { order: null } -> sipariş yok
+// { changed: true } -> geçiş bu çağrıda yapıldı
+// { changed: false } -> geçiş yapılmadı; order.status === to ise daha önce yapılmış (tekrar istek)
+// `condition` filtreye eklenir (ör. süpürücü: reservedUntil hâlâ geçmişte); uymazsa { order: null } döner
+// İptal edilen siparişin rezerve stoğu geri konur
+export async function transitionOrder(db, orderId, to, fields = {}, condition = {}) {
+  if (!ORDER_TRANSITIONS[to]) {
+    throw Object.assign(new Error('Geçersiz sipariş durumu'), { status: 400 });
+  }
+  const allowed = { $in: [{ $ifNull: ['$status', 'pending'] }, sourceStatuses(to)] };
+  const changes = { ...fields, status: to, updatedAt: new Date().toISOString() };
+  const update = {};
+  for (const [field, value] of Object.entries(changes)) {
+    update[field] = { $cond: [allowed, { $literal: value }, `$${field}`] };
+  }
+
+  const before = await db.collection('orders').findOneAndUpdate(
+    { ...condition, id: orderId },
+    [{ $set: update }],
+    { returnDocument: 'before', projection: { _id: 0 } }
+  );
+  if (!before) {
+    return { order: null, changed: false };
+  }
+  const from = before.status || 'pending';
+  if ((ORDER_TRANSITIONS[from] || []).includes(to)) {
+    const order = { ...before, ...changes };
+    // Admin özetleri yalnızca geçişi yapan çağrıda güncellenir; tekrar istekler çift saymaz
+    await recordOrderTransition(db, order, from, to);
+    if (to === 'cancelled') {
+      await releaseStock(db, orderId);
+    }
+    return { order, changed: true, from };
+  }
+  return { order: before, changed: false, from };
+}
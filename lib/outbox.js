@@ -0,0 +1,188 @@
+// Kalıcı e-posta kuyruğu (outbox): ödeme yanıtı e-postayı beklemez
+// İşler `emailOutbox` koleksiyonunda durur; arka plan işçisi toplu gönderir, hata olursa
+// üstel geri çekilmeyle yeniden dener
+import { v4 as uuidv4 } from 'uuid';
+import { untracked } from '@/lib/dbOps';
+import { currentRequestId, runTrace, untraced } from '@/lib/tracing';
+
+export const OUTBOX_BATCH_SIZE = parseInt(process.env.OUTBOX_BATCH_SIZE) || 20;
+export const OUTBOX_MAX_ATTEMPTS = parseInt(process.env.OUTBOX_MAX_ATTEMPTS) || 6;
+const OUTBOX_POLL_MS = parseInt(process.env.OUTBOX_POLL_MS) || 2000;
+// Gönderim sırasında çöken bir işçinin kilidi bu süreden sonra düşer
+const OUTBOX_LOCK_MS = 60 * 1000;
+const BACKOFF_BASE_MS = 2000;
+const BACKOFF_MAX_MS = 10 * 60 * 1000;
+
+export const OUTBOX_INDEXES = [
+  { key: { id: 1 }, unique: true },
+  // Aynı anahtarla (varsayılan: tür + sipariş; faturada ayrıca hedef durum) e-posta bir kez kuyruğa girer
+  { key: { dedupeKey: 1 }, unique: true },
+  { key: { status: 1, nextAttemptAt: 1 } },
+];
+
+// Helper: Exponential backoff with jitter for the given attempt number (1-based)
+export function backoffDelay(attempt) {
+  const delay = Math.min(BACKOFF_BASE_MS * 2 ** (attempt - 1), BACKOFF_MAX_MS);
+  return Math.round(delay * (0.5 + Math.random() / 2));
+}
+
+// E-postayı kuyruğa ekler (aynı dedupeKey ile tekrar çağrılırsa yeni iş açmaz) ve işçiyi dürter
+// Sipariş başına birden çok kez gönderilen e-postalar (ör. havale + ödeme faturası) anahtara durumu eklemelidir
+export async function enqueueEmail(db, type, orderId, dedupeKey = `${type}:${orderId}`) {
+  const now = new Date();
+  await db.collection('emailOutbox').updateOne(
+    { dedupeKey },
+    {
+      $setOnInsert: {
+        id: uuidv4(),
+        dedupeKey,
+        type,
+        orderId,
+        status: 'pending',
+        attempts: 0,
+        nextAttemptAt: now,
+        createdAt: now.toISOString(),
+        // Gönderim izi (lib/tracing.js) işi kuyruğa alan isteğe bu kimlikle bağlanır
+        requestId: currentRequestId()
+      }
+    },
+    { upsert: true }
+  );
+  kickOutbox();
+}
+
+// Eski (type, orderId) tekilliğinden dedupeKey alanına geçiş; indeksler oluşturulmadan önce çalışır
+export async function migrateOutboxDedupeKeys(db) {
+  const outbox = db.collection('emailOutbox');
+  const indexes = await outbox.indexes().catch(() => []);
+  if (indexes.some(index => index.name === 'type_1_orderId_1')) {
+    await outbox.dropIndex('type_1_orderId_1');
+  }
+  await outbox.updateMany(
+    { dedupeKey: { $exists: false } },
+    [{ $set: { dedupeKey: { $concat: ['$type', ':', '$orderId'] } } }]
+  );
+}
+
+// Helper: Claim up to `limit` due jobs; each claim is atomic so parallel workers never share a job
+async function claimJobs(db, limit) {
+  const outbox = db.collection('emailOutbox');
+  const jobs = [];
+  while (jobs.length < limit) {
+    const now = new Date();
+    const job = await outbox.findOneAndUpdate(
+      {
+        $or: [
+          { status: 'pending', nextAttemptAt: { $lte: now } },
+          { status: 'sending', lockedUntil: { $lte: now } }
+        ]
+      },
+      {
+        $set: { status: 'sending', lockedUntil: new Date(now.getTime() + OUTBOX_LOCK_MS) },
+        $inc: { attempts: 1 }
+      },
+      { sort: { nextAttemptAt: 1 }, returnDocument: 'after' }
+    );
+    if (!job) break;
+    jobs.push(job);
+  }
+  return jobs;
+}
+
+// Helper: Record delivery results for a claimed batch in one bulkWrite
+async function settleJobs(db, jobs, results) {
+  const now = new Date();
+  const operations = jobs.map((job, index) => {
+    const result = results[index] || { success: false, error: 'No result' };
+    if (result.success) {
+      return {
+        updateOne: {
+          filter: { id: job.id },
+          update: {
+            $set: { status: 'sent', sentAt: now.toISOString(), emailId: result.emailId },
+            $unset: { lockedUntil: '', lastError: '' }
+          }
+        }
+      };
+    }
+    // permanent: yeniden denemenin işe yaramayacağı hatalar (alıcı yok, sipariş silinmiş)
+    const exhausted = result.permanent || job.attempts >= OUTBOX_MAX_ATTEMPTS;
+    return {
+      updateOne: {
+        filter: { id: job.id },
+        update: {
+          $set: {
+            status: exhausted ? 'failed' : 'pending',
+            nextAttemptAt: new Date(now.getTime() + backoffDelay(job.attempts)),
+            lastError: String(result.error?.message || result.error)
+          },
+          $unset: { lockedUntil: '' }
+        }
+      }
+    };
+  });
+  if (operations.length > 0) {
+    await db.collection('emailOutbox').bulkWrite(operations, { ordered: false });
+  }
+}
+
+let outboxDb = null;
+let outboxHandlers = {};
+let draining = null;
+let drainAgain = false;
+
+// Kuyruktaki tüm vadesi gelmiş işleri tür bazında toplu olarak teslim eder
+export async function drainOutbox(db = outboxDb, handlers = outboxHandlers) {
+  let delivered = 0;
+  for (;;) {
+    const jobs = await claimJobs(db, OUTBOX_BATCH_SIZE);
+    if (jobs.length === 0) return delivered;
+
+    const byType = new Map();
+    jobs.forEach(job => byType.set(job.type, [...(byType.get(job.type) || []), job]));
+    for (const [type, typeJobs] of byType) {
+      // Her tür grubu ayrı bir iz; tetikleyen isteklerin kimlikleri izde durur
+      delivered += await runTrace(`outbox ${type}`, async () => {
+        let results;
+        try {
+          results = handlers[type]
+            ? await handlers[type](db, typeJobs)
+            : typeJobs.map(() => ({ success: false, error: `No handler for ${type}` }));
+        } catch (error) {
+          results = typeJobs.map(() => ({ success: false, error }));
+        }
+        await settleJobs(db, typeJobs, results);
+        return results.filter(r => r?.success).length;
+      }, { jobs: typeJobs.length, requestIds: typeJobs.map(job => job.requestId).filter(Boolean) });
+    }
+  }
+}
+
+// Helper: Run a drain unless one is already running; a kick during a drain triggers one more pass
+export function kickOutbox() {
+  if (!outboxDb) return;
+  if (draining) {
+    drainAgain = true;
+    return;
+  }
+  // Boşaltma, onu tetikleyen isteğin DB sayacına ve izine yazılmaz
+  draining = untracked(() => untraced(() => drainOutbox()))
+    .catch(error => console.error('Outbox drain failed:', error))
+    .finally(() => {
+      draining = null;
+      if (drainAgain) {
+        drainAgain = false;
+        kickOutbox();
+      }
+    });
+}
+
+// Süreç başına bir kez: işleyicileri kaydeder ve yeniden denemeler için periyodik tarama başlatır
+export function startOutboxWorker(db, handlers) {
+  if (outboxDb) return;
+  outboxDb = db;
+  outboxHandlers = handlers;
+  const timer = setInterval(kickOutbox, OUTBOX_POLL_MS);
+  timer.unref?.();
+  kickOutbox();
+}
@@ -0,0 +1,186 @@
+// Şifre hash'leme: bcrypt işleri worker thread havuzunda çalışır, event loop diğer isteklere açık kalır
+// Maliyet (cost) açılışta ölçülerek BCRYPT_TARGET_MS hedefine göre seçilir; BCRYPT_COST ile sabitlenebilir
+import os from 'os';
+import { Worker } from 'worker_threads';
+import bcrypt from 'bcryptjs';
+import { span } from '@/lib/tracing';
+
+export const BCRYPT_MIN_COST = 10;
+export const BCRYPT_MAX_COST = 14;
+const BCRYPT_TARGET_MS = parseInt(process.env.BCRYPT_TARGET_MS) || 100;
+const POOL_SIZE = parseInt(process.env.PASSWORD_WORKERS)
+  || Math.max(1, Math.min(4, (os.availableParallelism?.() || os.cpus().length) - 1));
+// Kuyruk bu uzunluğu aşarsa yeni istekler reddedilir (yük atma)
+export const PASSWORD_QUEUE_MAX = parseInt(process.env.PASSWORD_QUEUE_MAX) || 256;
+
+// Worker kaynağı eval ile yüklenir; bundler'ın ayrı bir dosyayı paketlemesi gerekmez
+const WORKER_SOURCE = `
+const { parentPort } = require('worker_threads');
+const bcrypt = require('bcryptjs');
+parentPort.on('message', ({ id, op, args }) => {
+  try {
+    const result = op === 'hash' ? bcrypt.hashSync(args[0], args[1]) : bcrypt.compareSync(args[0], args[1]);
+    parentPort.postMessage({ id, result });
+  } catch (error) {
+    parentPort.postMessage({ id, error: error.message });
+  }
+});
+`;
+
+export class PasswordQueueFullError extends Error {
+  constructor() {
+    super('Sunucu yoğun, lütfen tekrar deneyin');
+    this.status = 503;
+  }
+}
+
+// Helper: bcryptjs on the main thread, for when the worker pool is unavailable
+function runOnMainThread(op, args) {
+  return op === 'hash' ? bcrypt.hash(args[0], args[1]) : bcrypt.compare(args[0], args[1]);
+}
+
+class PasswordPool {
+  constructor(size) {
+    this.size = size;
+    this.idle = [];
+    this.queue = [];
+    this.pending = new Map();
+    this.nextId = 0;
+    this.failed = false;
+    this.started = false;
+  }
+
+  start() {
+    this.started = true;
+    for (let i = 0; i < this.size; i++) {
+      this.spawn();
+    }
+  }
+
+  spawn() {
+    let worker;
+    try {
+      worker = new Worker(WORKER_SOURCE, { eval: true });
+    } catch (error) {
+      console.error('Password worker could not start, hashing on the main thread:', error);
+      this.fallBack();
+      return;
+    }
+    worker.unref();
+    worker.on('message', ({ id, result, error }) => {
+      const task = this.pending.get(id);
+      this.pending.delete(id);
+      worker.completed = true;
+      this.idle.push(worker);
+      this.next();
+      if (error) task.reject(new Error(error));
+      else task.resolve(result);
+    });
+    worker.on('error', error => {
+      console.error('Password worker failed:', error);
+      this.idle = this.idle.filter(w => w !== worker);
+      for (const [id, task] of this.pending) {
+        if (task.worker === worker) {
+          this.pending.delete(id);
+          this.queue.unshift(task);
+        }
+      }
+      // Hiç iş bitiremeden düşen worker (ör. bcryptjs yüklenemedi) yeniden açılmaz; ana thread'e dönülür
+      if (worker.completed) {
+        this.spawn();
+        this.next();
+      } else {
+        this.fallBack();
+      }
+    });
+    this.idle.push(worker);
+  }
+
+  fallBack() {
+    this.failed = true;
+    for (const task of this.queue.splice(0)) {
+      runOnMainThread(task.op, task.args).then(task.resolve, task.reject);
+    }
+  }
+
+  run(op, args) {
+    if (!this.started) this.start();
+    if (this.failed) {
+      return runOnMainThread(op, args);
+    }
+    if (this.queue.length >= PASSWORD_QUEUE_MAX) {
+      return Promise.reject(new PasswordQueueFullError());
+    }
+    return new Promise((resolve, reject) => {
+      this.queue.push({ op, args, resolve, reject });
+      this.next();
+    });
+  }
+
+  next() {
+    while (this.idle.length > 0 && this.queue.length > 0) {
+      const worker = this.idle.pop();
+      const task = this.queue.shift();
+      const id = this.nextId++;
+      task.worker = worker;
+      this.pending.set(id, task);
+      worker.postMessage({ id, op: task.op, args: task.args });
+    }
+  }
+
+  stats() {
+    return { workers: this.size, idle: this.idle.length, queued: this.queue.length, running: this.pending.size };
+  }
+}
+
+const pool = new PasswordPool(POOL_SIZE);
+let costReady = null;
+
+// Açılışta bir kez: BCRYPT_MIN_COST ile bir hash süresini ölçüp hedef süreye en yakın maliyeti seçer
+export function tunePasswordCost() {
+  if (!costReady) {
+    costReady = (async () => {
+      const fixed = parseInt(process.env.BCRYPT_COST);
+      if (fixed) {
+        return fixed;
+      }
+      // İlk iş worker açılışını ve bcryptjs yüklemesini de içerir, ölçüme katılmaz
+      await pool.run('hash', ['warm-up', 4]);
+      const start = process.hrtime.bigint();
+      await pool.run('hash', ['cost-calibration', BCRYPT_MIN_COST]);
+      const elapsedMs = Number(process.hrtime.bigint() - start) / 1e6;
+      // Her maliyet artışı süreyi ikiye katlar
+      const extra = Math.floor(Math.log2(BCRYPT_TARGET_MS / Math.max(elapsedMs, 1)));
+      const cost = Math.min(Math.max(BCRYPT_MIN_COST + extra, BCRYPT_MIN_COST), BCRYPT_MAX_COST);
+      console.log(`bcrypt cost ${cost} (cost ${BCRYPT_MIN_COST} took ${elapsedMs.toFixed(0)}ms, target ${BCRYPT_TARGET_MS}ms)`);
+      return cost;
+    })().catch(error => {
+      console.error('bcrypt cost calibration failed:', error);
+      return BCRYPT_MIN_COST;
+    });
+  }
+  return costReady;
+}
+
+// İzdeki bcrypt span'i havuz kuyruğunda bekleme süresini de içerir
+export async function hashPassword(password) {
+  const cost = await tunePasswordCost();
+  return span('bcrypt.hash', () => pool.run('hash', [password, cost]), { cost });
+}
+
+export function verifyPassword(password, hash) {
+  return span('bcrypt.compare', () => pool.run('compare', [password, hash]));
+}
+
+// Eski (daha düşük maliyetli) hash'ler başarılı girişten sonra güncel maliyetle yeniden hash'lenir
+export async function needsRehash(hash) {
+  try {
+    return bcrypt.getRounds(hash) < await tunePasswordCost();
+  } catch (error) {
+    return false;
+  }
+}
+
+export function passwordPoolStats() {
+  return pool.stats();
+}
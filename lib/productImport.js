@@ -0,0 +1,344 @@
+// Toplu ürün içe/dışa aktarma (NDJSON veya CSV)
+// POST /api/products/import?format=ndjson|csv - gövde akış olarak okunur, IMPORT_CHUNK satırda bir bulkWrite
+// GET  /api/products/export?format=ndjson|csv&productType=watch - imleçten akış olarak yazılır
+// Satırlar id'ye göre upsert edilir: aynı dosyayı tekrar yüklemek aynı ürünleri günceller, kaldığı yerden
+// devam etmek güvenlidir. id'siz satırlara yeni id verilir (bunlar her yüklemede yeni ürün açar).
+// Mevcut üründe yalnızca satırda verilen (boş olmayan) sütunlar güncellenir; stok, görseller vb. verilmezse korunur.
+import { v4 as uuidv4 } from 'uuid';
+import { SPEC_FIELDS } from '@/lib/catalog';
+
+export const IMPORT_CHUNK = parseInt(process.env.PRODUCT_IMPORT_CHUNK) || 500;
+const MAX_ROW_ERRORS = 100;
+const MAX_LINE_LENGTH = 1024 * 1024;
+const MAX_ID_LENGTH = 100;
+const PRODUCT_TYPES = ['watch', 'eyewear', 'eta'];
+const GENDERS = ['male', 'female', 'unisex'];
+const DEFAULT_IMAGE = 'https://via.placeholder.com/400x300?text=Ürün+Görseli';
+
+export const PRODUCT_FILE_TYPES = {
+  ndjson: 'application/x-ndjson; charset=utf-8',
+  csv: 'text/csv; charset=utf-8',
+};
+
+// CSV sütunları; specs.* teknik özellikler, images '|' ile ayrılır
+export const EXPORT_COLUMNS = [
+  'id', 'name', 'description', 'price', 'stock', 'category', 'productType', 'gender', 'brand', 'image', 'images',
+  ...SPEC_FIELDS.map(field => `specs.${field}`)
+];
+
+const EXPORT_PROJECTION = Object.fromEntries([
+  ['_id', 0],
+  ...['id', 'name', 'description', 'price', 'stock', 'category', 'productType', 'gender', 'brand', 'image', 'images', 'specs']
+    .map(field => [field, 1])
+]);
+
+// ?format= verilmezse Content-Type'tan (text/csv) çıkarılır; varsayılan NDJSON
+export function productFileFormat(searchParams, contentType = '') {
+  const format = searchParams.get('format') || (contentType.includes('csv') ? 'csv' : 'ndjson');
+  if (!PRODUCT_FILE_TYPES[format]) {
+    throw Object.assign(new Error('Desteklenmeyen format (ndjson veya csv)'), { status: 400 });
+  }
+  return format;
+}
+
+// Helper: Decode a byte stream into text chunks, rejecting runaway lines
+async function* textChunks(stream) {
+  const decoder = new TextDecoder();
+  for await (const chunk of stream) {
+    yield decoder.decode(chunk, { stream: true });
+  }
+  const rest = decoder.decode();
+  if (rest) yield rest;
+}
+
+function lineTooLong(line) {
+  return Object.assign(new Error(`Satır ${line} çok uzun`), { status: 413 });
+}
+
+// Helper: NDJSON rows as { line, row } or { line, error }
+async function* ndjsonRows(stream) {
+  let buffer = '';
+  let line = 0;
+  const parse = text => {
+    line++;
+    if (!text.trim()) return null;
+    try {
+      return { line, row: JSON.parse(text) };
+    } catch (error) {
+      return { line, error: 'Geçersiz JSON' };
+    }
+  };
+  for await (const text of textChunks(stream)) {
+    const lines = (buffer + text).split('\n');
+    buffer = lines.pop();
+    if (buffer.length > MAX_LINE_LENGTH) throw lineTooLong(line + lines.length + 1);
+    for (const entry of lines) {
+      const parsed = parse(entry);
+      if (parsed) yield parsed;
+    }
+  }
+  const parsed = parse(buffer);
+  if (parsed) yield parsed;
+}
+
+// Helper: RFC 4180 CSV records; quoted fields may hold commas, "" and newlines
+async function* csvRecords(stream) {
+  let record = [];
+  let field = '';
+  let state = 'field'; // field | quoted | quoteInQuoted
+  let line = 1;
+  let recordLine = 1;
+  const endRecord = () => {
+    record.push(field);
+    const done = { line: recordLine, values: record };
+    record = [];
+    field = '';
+    recordLine = line;
+    return done.values.length === 1 && done.values[0] === '' ? null : done;
+  };
+
+  for await (const text of textChunks(stream)) {
+    for (let i = 0; i < text.length; i++) {
+      const c = text[i];
+      if (state === 'quoteInQuoted') {
+        // "" içeride kaçışlı tırnak, başka bir karakter alanın kapandığını gösterir
+        if (c === '"') {
+          field += '"';
+          state = 'quoted';
+          continue;
+        }
+        state = 'field';
+      }
+      if (state === 'quoted') {
+        if (c === '"') {
+          state = 'quoteInQuoted';
+        } else {
+          if (c === '\n') line++;
+          field += c;
+        }
+      } else if (c === '"' && field === '') {
+        state = 'quoted';
+      } else if (c === ',') {
+        record.push(field);
+        field = '';
+      } else if (c === '\n') {
+        line++;
+        const done = endRecord();
+        if (done) yield done;
+      } else if (c !== '\r') {
+        field += c;
+      }
+      if (field.length > MAX_LINE_LENGTH) throw lineTooLong(recordLine);
+    }
+  }
+  if (field !== '' || record.length > 0) {
+    const done = endRecord();
+    if (done) yield done;
+  }
+}
+
+// Helper: CSV rows as objects keyed by the header, with specs.* and images unflattened
+async function* csvRows(stream) {
+  let columns = null;
+  for await (const { line, values } of csvRecords(stream)) {
+    if (!columns) {
+      columns = values.map(value => value.trim());
+      continue;
+    }
+    const row = { specs: {} };
+    columns.forEach((column, i) => {
+      const value = values[i] ?? '';
+      if (column.startsWith('specs.')) row.specs[column.slice('specs.'.length)] = value;
+      else if (column === 'images') row.images = value ? value.split('|') : undefined;
+      else row[column] = value;
+    });
+    yield { line, row };
+  }
+}
+
+export function productRows(stream, format) {
+  return format === 'csv' ? csvRows(stream) : ndjsonRows(stream);
+}
+
+// Helper: A column counts as given when it is present and not empty (an empty CSV cell is not a value)
+function given(value) {
+  return value !== undefined && value !== null && value !== '';
+}
+
+// Satırı doğrular; { id, fields, defaults } veya { error } döner
+// fields yalnızca satırda verilen sütunlardır (mevcut ürünün diğer alanları korunur); defaults eksik sütunların
+// POST /api/products ile aynı varsayılanlarıdır ve yalnızca ürün yeni oluşturuluyorsa yazılır
+export function normalizeProductRow(row) {
+  if (!row || typeof row !== 'object' || Array.isArray(row)) {
+    return { error: 'Satır bir nesne olmalı' };
+  }
+  const name = typeof row.name === 'string' ? row.name.trim() : '';
+  if (!name) {
+    return { error: 'Ürün adı zorunlu' };
+  }
+  const price = typeof row.price === 'number' ? row.price : parseFloat(row.price);
+  if (!Number.isFinite(price) || price < 0) {
+    return { error: 'Geçersiz fiyat' };
+  }
+  const fields = { name, price };
+  const defaults = {};
+
+  if (given(row.stock)) {
+    fields.stock = Number(row.stock);
+    if (!Number.isInteger(fields.stock) || fields.stock < 0) {
+      return { error: 'Geçersiz stok' };
+    }
+  } else {
+    defaults.stock = 100;
+  }
+  if (given(row.productType)) {
+    if (!PRODUCT_TYPES.includes(row.productType)) {
+      return { error: 'Geçersiz ürün tipi' };
+    }
+    fields.productType = row.productType;
+  } else {
+    defaults.productType = 'watch';
+  }
+  if (given(row.gender)) {
+    if (!GENDERS.includes(row.gender)) {
+      return { error: 'Geçersiz cinsiyet' };
+    }
+    fields.gender = row.gender;
+  } else {
+    defaults.gender = 'unisex';
+  }
+  const id = given(row.id) ? String(row.id) : uuidv4();
+  if (id.length > MAX_ID_LENGTH) {
+    return { error: 'Geçersiz id' };
+  }
+
+  for (const [column, fallback] of [['description', ''], ['category', 'Genel'], ['brand', '']]) {
+    if (given(row[column])) fields[column] = String(row[column]);
+    else defaults[column] = fallback;
+  }
+  if (Array.isArray(row.images)) {
+    fields.images = row.images.filter(image => typeof image === 'string' && image);
+  }
+  if (given(row.image)) {
+    fields.image = String(row.image);
+  }
+  // Yeni ürünün görselleri birbirinden türetilir: tek görsel listeye girer, listenin ilki ana görsel olur
+  if (!fields.images) {
+    defaults.images = fields.image ? [fields.image] : [];
+  }
+  if (!fields.image) {
+    defaults.image = fields.images?.[0] || defaults.images[0] || DEFAULT_IMAGE;
+  }
+  // Teknik özellikler alan alan yazılır; verilmeyenler mevcut üründe korunur
+  for (const field of SPEC_FIELDS) {
+    const value = row.specs?.[field];
+    if (given(value)) fields[`specs.${field}`] = String(value);
+    else defaults[`specs.${field}`] = '';
+  }
+  return { id, fields, defaults };
+}
+
+// Satırları doğrular ve IMPORT_CHUNK'lık parçalar halinde upsert eder; parça yazılırken gövde okunmaz (geri basınç)
+export async function importProducts(db, rows) {
+  const products = db.collection('products');
+  const summary = { received: 0, valid: 0, inserted: 0, updated: 0, failed: 0, chunks: 0, errors: [] };
+  const fail = (line, error) => {
+    summary.failed++;
+    if (summary.errors.length < MAX_ROW_ERRORS) summary.errors.push({ line, error });
+  };
+  // id -> satır; aynı parçada tekrar eden id'de son satır geçerli olur
+  let chunk = new Map();
+
+  const flush = async () => {
+    if (chunk.size === 0) return;
+    const entries = [...chunk.values()];
+    chunk = new Map();
+    const now = new Date().toISOString();
+    const operations = entries.map(({ id, fields, defaults }) => ({
+      updateOne: {
+        filter: { id },
+        update: {
+          $set: { ...fields, updatedAt: now },
+          $setOnInsert: { ...defaults, id, createdAt: now, ratingCount: 0, ratingSum: 0, ratingAverage: 0 }
+        },
+        upsert: true
+      }
+    }));
+    let result;
+    try {
+      result = await products.bulkWrite(operations, { ordered: false });
+    } catch (error) {
+      if (!error.writeErrors) throw error;
+      result = error.result;
+      for (const writeError of [].concat(error.writeErrors)) {
+        fail(entries[writeError.index].line, writeError.errmsg);
+      }
+    }
+    summary.inserted += result.upsertedCount;
+    summary.updated += result.matchedCount;
+    summary.chunks++;
+  };
+
+  for await (const { line, row, error } of rows) {
+    summary.received++;
+    const product = error ? { error } : normalizeProductRow(row);
+    if (product.error) {
+      fail(line, product.error);
+      continue;
+    }
+    summary.valid++;
+    chunk.set(product.id, { line, ...product });
+    if (chunk.size >= IMPORT_CHUNK) {
+      await flush();
+    }
+  }
+  await flush();
+  return summary;
+}
+
+function csvValue(value) {
+  const text = value === undefined || value === null ? '' : String(value);
+  return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+}
+
+function csvRow(product) {
+  return EXPORT_COLUMNS.map(column => {
+    if (column.startsWith('specs.')) return csvValue(product.specs?.[column.slice('specs.'.length)]);
+    if (column === 'images') return csvValue((product.images || []).join('|'));
+    return csvValue(product[column]);
+  }).join(',') + '\n';
+}
+
+// Filtreye uyan ürünleri id sırasıyla akış olarak yazar; çıktı import ile aynen geri yüklenebilir
+export function exportProducts(db, filter, format) {
+  const cursor = db.collection('products')
+    .find(filter, { projection: EXPORT_PROJECTION })
+    .sort({ id: 1 })
+    .batchSize(1000);
+  const encoder = new TextEncoder();
+  let started = false;
+
+  return new ReadableStream({
+    async pull(controller) {
+      const parts = [];
+      if (!started) {
+        started = true;
+        if (format === 'csv') parts.push(EXPORT_COLUMNS.join(',') + '\n');
+      }
+      // Sürücünün elindeki parti bitene kadar yaz; yeni getMore yalnızca okuyucu hazırsa yapılır
+      do {
+        const product = await cursor.next();
+        if (!product) {
+          if (parts.length > 0) controller.enqueue(encoder.encode(parts.join('')));
+          controller.close();
+          return;
+        }
+        parts.push(format === 'csv' ? csvRow(product) : JSON.stringify(product) + '\n');
+      } while (cursor.bufferedCount() > 0);
+      controller.enqueue(encoder.encode(parts.join('')));
+    },
+    cancel() {
+      return cursor.close();
+    }
+  });
+}
@@ -0,0 +1,59 @@
+// Sabit pencereli, bellek içi hız sınırlayıcı (süreç başına)
+// Anahtar başına pencere içinde en fazla `limit` kayıt; dolunca pencere bitene kadar engellenir
+
+export class RateLimiter {
+  constructor({ limit, windowMs, maxKeys = 100000 }) {
+    this.limit = limit;
+    this.windowMs = windowMs;
+    this.maxKeys = maxKeys;
+    this.windows = new Map();
+  }
+
+  // Helper: Current window for the key, or null once it has expired
+  window(key, now = Date.now()) {
+    const window = this.windows.get(key);
+    if (window && window.resetAt <= now) {
+      this.windows.delete(key);
+      return null;
+    }
+    return window || null;
+  }
+
+  // Sayacı artırmadan kontrol eder: { allowed, retryAfterMs }
+  check(key) {
+    const now = Date.now();
+    const window = this.window(key, now);
+    if (window && window.count >= this.limit) {
+      return { allowed: false, retryAfterMs: window.resetAt - now };
+    }
+    return { allowed: true, retryAfterMs: 0 };
+  }
+
+  hit(key) {
+    const now = Date.now();
+    const window = this.window(key, now);
+    if (window) {
+      window.count++;
+      return;
+    }
+    if (this.windows.size >= this.maxKeys) {
+      this.prune(now);
+    }
+    this.windows.set(key, { count: 1, resetAt: now + this.windowMs });
+  }
+
+  reset(key) {
+    this.windows.delete(key);
+  }
+
+  prune(now = Date.now()) {
+    for (const [key, window] of this.windows) {
+      if (window.resetAt <= now) this.windows.delete(key);
+    }
+    // Hâlâ doluysa en eski pencereler düşer (Map ekleme sırası)
+    for (const key of this.windows.keys()) {
+      if (this.windows.size < this.maxKeys) break;
+      this.windows.delete(key);
+    }
+  }
+}
@@ -0,0 +1,201 @@
+// Katalog okumaları için yanıt önbelleği: GET /api/products, /api/products/:id, /api/reviews/:productId
+// Kayıt anahtarı, yanıtın bağlı olduğu kapsamların sürümlerini içerir; yazımlar sürümü artırır (invalidateProduct,
+// invalidateCatalog)
+// ve eski sürümle üretilmiş kayıtlar bir daha okunmaz (LRU'dan düşer). Yazım sırasında süren bir okuma da
+// sonucunu eski sürümün anahtarına yazdığı için yeni sürümü kirletemez.
+// Kapsamlar:
+//   catalog        tüm katalog (toplu içe aktarma)
+//   products       ürün listeleri (herhangi bir ürün eklenince/değişince/silinince)
+//   product:<id>   tek ürünün detayı ve değerlendirmeleri
+// RESPONSE_CACHE_SHARED=1: sürümler cacheVersions koleksiyonunda tutulur, başka süreçteki yazım en geç
+// RESPONSE_CACHE_POLL_MS içinde görülür. Aksi halde sürümler süreç içidir; diğer süreçlerin yazımları en fazla
+// taze süre (RESPONSE_CACHE_FRESH_MS) kadar gecikir.
+// Taze süresi dolan kayıt RESPONSE_CACHE_STALE_MS boyunca hemen döner ve arka planda yenilenir (stale-while-revalidate).
+// Yanıtlar güçlü ETag (gövdenin sha256'sı) taşır; If-None-Match eşleşirse gövdesiz 304 döner.
+import { createHash } from 'crypto';
+import { NextResponse } from 'next/server';
+import { untracked } from '@/lib/dbOps';
+import { etagMatches } from '@/lib/images';
+import { LRUCache } from '@/lib/lruCache';
+
+const FRESH_MS = parseInt(process.env.RESPONSE_CACHE_FRESH_MS) || 30 * 1000;
+const STALE_MS = parseInt(process.env.RESPONSE_CACHE_STALE_MS) || 5 * 60 * 1000;
+const MAX_BYTES = parseInt(process.env.RESPONSE_CACHE_MAX_BYTES) || 64 * 1024 * 1024;
+const SHARED = process.env.RESPONSE_CACHE_SHARED === '1';
+const POLL_MS = parseInt(process.env.RESPONSE_CACHE_POLL_MS) || 1000;
+
+// Tarayıcı/CDN: kısa süre taze, sonra arka planda doğrulanırken eski kopya kullanılabilir.
+// Yazım sonrası güncel veri gereken yerler fetch(..., { cache: 'no-cache' }) ile ETag doğrulaması yapar.
+export const CATALOG_CACHE_CONTROL = `public, max-age=${parseInt(process.env.CATALOG_MAX_AGE) || 5}, ` +
+  `stale-while-revalidate=${parseInt(process.env.CATALOG_STALE_WHILE_REVALIDATE) || 60}`;
+
+const entries = new LRUCache({
+  maxBytes: MAX_BYTES,
+  ttlMs: FRESH_MS + STALE_MS,
+  sizeOf: entry => entry.body.length
+});
+// anahtar -> doldurma sözü; aynı anda gelen ıskalar tek sorgu bekler
+const inflight = new Map();
+const counters = { hits: 0, stale: 0, misses: 0, bypassed: 0, coalesced: 0, notModified: 0 };
+
+// Süreç içi sürümler: kapsam -> sayaç (yalnızca yazılmış kapsamlar tutulur)
+const localVersions = new Map();
+// Paylaşımlı modda okunan sürümler POLL_MS boyunca geçerli
+const sharedVersions = new LRUCache({ maxEntries: 10000, ttlMs: POLL_MS });
+const pendingVersions = new Map();
+
+// Helper: Remember a shared version without going back to an older one read concurrently
+function rememberSharedVersion(scope, version) {
+  sharedVersions.set(scope, Math.max(version, sharedVersions.get(scope) ?? 0));
+}
+
+// Helper: Versions of `scopes` from cacheVersions, at most one read per scope per POLL_MS
+function readSharedVersions(db, scopes) {
+  const known = new Map();
+  const missing = [];
+  for (const scope of scopes) {
+    const version = sharedVersions.get(scope);
+    if (version !== undefined) known.set(scope, version);
+    else if (!pendingVersions.has(scope)) missing.push(scope);
+  }
+  if (missing.length > 0) {
+    const read = db.collection('cacheVersions').find({ _id: { $in: missing } }).toArray()
+      .then(docs => {
+        const found = new Map(docs.map(doc => [doc._id, doc.version]));
+        const versions = new Map(missing.map(scope => [scope, found.get(scope) || 0]));
+        versions.forEach((version, scope) => rememberSharedVersion(scope, version));
+        return versions;
+      })
+      .finally(() => missing.forEach(scope => pendingVersions.delete(scope)));
+    missing.forEach(scope => pendingVersions.set(scope, read));
+  }
+  return Promise.all(scopes.map(async scope => (
+    known.has(scope) ? known.get(scope) : (await pendingVersions.get(scope)).get(scope)
+  )));
+}
+
+async function currentVersions(db, scopes) {
+  if (SHARED) {
+    return readSharedVersions(db, scopes);
+  }
+  return scopes.map(scope => localVersions.get(scope) || 0);
+}
+
+async function bumpCacheVersions(db, scopes) {
+  for (const scope of scopes) {
+    localVersions.set(scope, (localVersions.get(scope) || 0) + 1);
+  }
+  if (SHARED) {
+    // Bu süreç kendi yazımını POLL_MS beklemeden görsün
+    await Promise.all(scopes.map(async scope => {
+      const doc = await db.collection('cacheVersions').findOneAndUpdate(
+        { _id: scope }, { $inc: { version: 1 } }, { upsert: true, returnDocument: 'after' }
+      );
+      rememberSharedVersion(scope, doc.version);
+    }));
+  }
+}
+
+// Okuma kapsamları
+export const PRODUCT_LIST_SCOPES = ['catalog', 'products'];
+
+export function productScopes(productId) {
+  return ['catalog', `product:${productId}`];
+}
+
+// Ürün eklendi/güncellendi/silindi veya değerlendirme aldı; yanıt dönmeden önce beklenir
+export function invalidateProduct(db, productId) {
+  return bumpCacheVersions(db, ['products', `product:${productId}`]);
+}
+
+// Toplu içe aktarma: tüm katalog kayıtları eskir
+export function invalidateCatalog(db) {
+  return bumpCacheVersions(db, ['catalog']);
+}
+
+// Helper: Query string with parameters sorted, so ?a=1&b=2 and ?b=2&a=1 share an entry
+function cacheKey(url, scopes, versions) {
+  const params = [...url.searchParams].sort(([a, x], [b, y]) => (a < b ? -1 : a > b ? 1 : x < y ? -1 : x > y ? 1 : 0));
+  const scopeKey = scopes.map((scope, i) => `${scope}@${versions[i]}`).join(',');
+  return `${scopeKey} ${url.pathname}?${new URLSearchParams(params)}`;
+}
+
+async function load(key, loader, notFound, store) {
+  const value = await loader();
+  const body = JSON.stringify(value ?? { error: notFound });
+  const entry = {
+    status: value ? 200 : 404,
+    body,
+    etag: `"${createHash('sha256').update(body).digest('base64url')}"`,
+    storedAt: Date.now()
+  };
+  if (store) {
+    entries.set(key, entry);
+  }
+  return entry;
+}
+
+// Helper: One load per key at a time; concurrent misses and background refreshes wait for it
+function fill(key, loader, notFound) {
+  if (inflight.has(key)) {
+    counters.coalesced++;
+    return inflight.get(key);
+  }
+  const pending = load(key, loader, notFound, true).finally(() => inflight.delete(key));
+  inflight.set(key, pending);
+  return pending;
+}
+
+function respond(request, entry, state) {
+  const headers = { 'X-Cache': state };
+  if (entry.status !== 200) {
+    return new NextResponse(entry.body, { status: entry.status, headers: { ...headers, 'Content-Type': 'application/json' } });
+  }
+  headers.ETag = entry.etag;
+  headers['Cache-Control'] = CATALOG_CACHE_CONTROL;
+  if (etagMatches(request.headers.get('if-none-match'), entry.etag)) {
+    counters.notModified++;
+    return new NextResponse(null, { status: 304, headers });
+  }
+  return new NextResponse(entry.body, { headers: { ...headers, 'Content-Type': 'application/json' } });
+}
+
+// `scopes` sürümlerine bağlı JSON yanıtı önbellekten veya loader() ile üretir.
+// loader null dönerse { error: notFound } ile 404 döner; bu da önbelleğe girer (ürün eklenince sürüm değişir).
+// İstek `Cache-Control: no-cache` taşıyorsa (zorla yenileme) önbellek okunmaz ama sonuç yazılır.
+// X-Cache: HIT | STALE | MISS | BYPASS
+export async function cachedJson(request, db, { scopes, notFound = 'Bulunamadı' }, loader) {
+  const key = cacheKey(new URL(request.url), scopes, await currentVersions(db, scopes));
+
+  if (/no-cache/.test(request.headers.get('cache-control') || '')) {
+    counters.bypassed++;
+    return respond(request, await load(key, loader, notFound, true), 'BYPASS');
+  }
+
+  const entry = entries.get(key);
+  if (entry && Date.now() - entry.storedAt < FRESH_MS) {
+    counters.hits++;
+    return respond(request, entry, 'HIT');
+  }
+  if (entry) {
+    counters.stale++;
+    // Yenileme isteğin DB sayacına yazılmaz; hata olursa eski kayıt STALE_MS dolana kadar kullanılmaya devam eder
+    untracked(() => fill(key, loader, notFound)).catch(error => console.error('Cache refresh failed:', error.message));
+    return respond(request, entry, 'STALE');
+  }
+  counters.misses++;
+  return respond(request, await fill(key, loader, notFound), 'MISS');
+}
+
+export function responseCacheStats() {
+  const { entries: size, bytes, evictions } = entries.stats();
+  const served = counters.hits + counters.stale + counters.misses;
+  return {
+    entries: size,
+    bytes,
+    evictions,
+    ...counters,
+    hitRatio: served > 0 ? (counters.hits + counters.stale) / served : 0,
+    shared: SHARED
+  };
+}
@@ -0,0 +1,88 @@
+// Ürün değerlendirmeleri: ayrı koleksiyon, cursor sayfalama ve ürün üzerindeki puan özetleri
+// GET /api/reviews/:productId?limit=20&cursor=...
+import { MAX_PAGE_SIZE, decodeCursor, encodeCursor } from '@/lib/catalog';
+
+export const REVIEW_PAGE_SIZE = 20;
+
+// Değerlendirmeler en yeniden eskiye okunur
+export const REVIEW_INDEXES = [
+  { key: { id: 1 }, unique: true },
+  { key: { productId: 1, createdAt: -1, id: -1 } },
+];
+
+// Helper: Pipeline update that folds one rating into the product's running aggregates
+export function ratingUpdate(rating) {
+  const count = { $add: [{ $ifNull: ['$ratingCount', 0] }, 1] };
+  const sum = { $add: [{ $ifNull: ['$ratingSum', 0] }, rating] };
+  return [
+    { $set: { ratingCount: count, ratingSum: sum, ratingAverage: { $round: [{ $divide: [sum, count] }, 2] } } }
+  ];
+}
+
+// URL parametrelerinden değerlendirme sorgusu üretir
+export function parseReviewQuery(productId, searchParams) {
+  const filter = { productId };
+  const cursorParam = searchParams.get('cursor');
+  const limitParam = parseInt(searchParams.get('limit'));
+  const paginate = !isNaN(limitParam) || Boolean(cursorParam);
+  // Parametresiz istek eski dizi yanıtını korur ama en yeni MAX_PAGE_SIZE kayıtla sınırlıdır
+  const limit = paginate
+    ? Math.min(Math.max(isNaN(limitParam) ? REVIEW_PAGE_SIZE : limitParam, 1), MAX_PAGE_SIZE)
+    : MAX_PAGE_SIZE;
+
+  if (cursorParam) {
+    const cursor = decodeCursor(cursorParam);
+    if (!cursor) {
+      throw Object.assign(new Error('Geçersiz cursor'), { status: 400 });
+    }
+    filter.$or = [
+      { createdAt: { $lt: cursor.value } },
+      { createdAt: cursor.value, id: { $lt: cursor.id } }
+    ];
+  }
+
+  return { filter, sort: { createdAt: -1, id: -1 }, projection: { _id: 0 }, paginate, limit };
+}
+
+// limit + 1 kayıt çekilir; fazlası varsa bir sonraki sayfanın cursor'ı döner
+export function reviewPage(items, query) {
+  const hasMore = items.length > query.limit;
+  const pageItems = hasMore ? items.slice(0, query.limit) : items;
+  return {
+    items: pageItems,
+    nextCursor: hasMore ? encodeCursor(pageItems[pageItems.length - 1], 'createdAt') : null
+  };
+}
+
+// Ürün dokümanına gömülü eski değerlendirmeleri koleksiyona taşır ve özetleri hesaplar
+export async function migrateEmbeddedReviews(db) {
+  const products = db.collection('products');
+  const reviews = db.collection('reviews');
+  const legacy = products.find({ reviews: { $exists: true } }, { projection: { id: 1, reviews: 1 } });
+
+  for await (const product of legacy) {
+    const embedded = Array.isArray(product.reviews) ? product.reviews : [];
+    if (embedded.length > 0) {
+      // Yarıda kalan bir taşımadan sonra tekrar çalışabilmesi için upsert
+      await reviews.bulkWrite(embedded.map(review => ({
+        updateOne: {
+          filter: { id: review.id },
+          update: { $setOnInsert: { ...review, productId: product.id } },
+          upsert: true
+        }
+      })), { ordered: false });
+    }
+    const ratingSum = embedded.reduce((acc, r) => acc + (parseInt(r.rating) || 0), 0);
+    await products.updateOne(
+      { id: product.id },
+      {
+        $set: {
+          ratingCount: embedded.length,
+          ratingSum,
+          ratingAverage: embedded.length > 0 ? Math.round(ratingSum / embedded.length * 100) / 100 : 0
+        },
+        $unset: { reviews: '' }
+      }
+    );
+  }
+}
@@ -0,0 +1,199 @@
+// API yönlendirici: rotalar metot başına bir kez segment ağacına (trie) derlenir, istek yolu bir kez bölünür
+// Desenler: 'products/export' (statik), 'products/:id' (metin parametresi), 'orders/:page(int)' (tipli parametre)
+// Statik segment parametreden önce denenir; eşleşme olmazsa gövde okunmadan ve DB'ye gidilmeden 404 döner
+// Gövde tembel okunur: handler ctx.json() çağırmadıkça request.json() hiç çalışmaz
+import { NextResponse } from 'next/server';
+import { currentRequestId, recordSpan, span } from '@/lib/tracing';
+
+// Parametre tipleri: dönüştürülen değer döner, uymuyorsa undefined (segment eşleşmez)
+export const PARAM_TYPES = {
+  string: value => value,
+  int: value => (/^-?\d+$/.test(value) ? parseInt(value, 10) : undefined),
+};
+
+const PARAM_PATTERN = /^:(\w+)(?:\((\w+)\))?$/;
+
+function createNode() {
+  return { children: new Map(), params: [], route: null };
+}
+
+function compileSegment(segment, pattern) {
+  const param = PARAM_PATTERN.exec(segment);
+  if (!param) {
+    return { literal: segment };
+  }
+  const [, name, type = 'string'] = param;
+  if (!PARAM_TYPES[type]) {
+    throw new Error(`Bilinmeyen parametre tipi "${type}": ${pattern}`);
+  }
+  return { name, type, parse: PARAM_TYPES[type] };
+}
+
+// Sondaki/yinelenen eğik çizgiler yok sayılır: 'products/' ile 'products' aynı rotadır
+function splitPath(path) {
+  return path.split('/').filter(Boolean);
+}
+
+function decodeSegment(segment) {
+  try {
+    return decodeURIComponent(segment);
+  } catch (error) {
+    return undefined;
+  }
+}
+
+export class Router {
+  // base: rotaların bağlandığı önek ('/api'); prepare: eşleşen her istekte handler'dan önce bir kez çalışır (ör. DB)
+  constructor({ base = '', prepare = null } = {}) {
+    this.baseSegments = splitPath(base).length;
+    this.prepare = prepare;
+    this.trees = new Map();
+  }
+
+  // router.add('GET', 'products/:id', ...middleware, handler)
+  // Middleware ctx alır; yanıt dönerse zincir orada biter, undefined dönerse sıradaki çalışır
+  // İsteğe bağlı ilk argüman rota seçenekleridir: { prepare: false } prepare adımını atlar (ör. /api/health)
+  add(method, pattern, ...stack) {
+    const options = stack[0] !== null && typeof stack[0] === 'object' ? stack.shift() : {};
+    const handler = stack.pop();
+    if (typeof handler !== 'function' || stack.some(fn => typeof fn !== 'function')) {
+      throw new Error(`Geçersiz rota tanımı: ${method} ${pattern}`);
+    }
+    if (!this.trees.has(method)) {
+      this.trees.set(method, createNode());
+    }
+    let node = this.trees.get(method);
+    for (const segment of splitPath(pattern).map(s => compileSegment(s, pattern))) {
+      if (segment.literal !== undefined) {
+        if (!node.children.has(segment.literal)) {
+          node.children.set(segment.literal, createNode());
+        }
+        node = node.children.get(segment.literal);
+      } else {
+        let param = node.params.find(p => p.name === segment.name && p.type === segment.type);
+        if (!param) {
+          param = { ...segment, node: createNode() };
+          node.params.push(param);
+        }
+        node = param.node;
+      }
+    }
+    if (node.route) {
+      throw new Error(`Rota iki kez tanımlandı: ${method} ${pattern}`);
+    }
+    node.route = {
+      method,
+      pattern: splitPath(pattern).join('/'),
+      middleware: stack,
+      handler,
+      prepare: options.prepare !== false,
+    };
+    return this;
+  }
+
+  get(pattern, ...stack) { return this.add('GET', pattern, ...stack); }
+  post(pattern, ...stack) { return this.add('POST', pattern, ...stack); }
+  put(pattern, ...stack) { return this.add('PUT', pattern, ...stack); }
+  delete(pattern, ...stack) { return this.add('DELETE', pattern, ...stack); }
+
+  // { route, params } veya null; önce statik çocuk, sonra parametreler sırayla denenir (geri izlemeli)
+  match(method, pathname) {
+    const root = this.trees.get(method);
+    if (!root) {
+      return null;
+    }
+    const segments = splitPath(pathname).slice(this.baseSegments);
+    const params = {};
+    const route = matchNode(root, segments, 0, params);
+    return route ? { route, params } : null;
+  }
+
+  // Next.js route export'u: GET = router.handler()
+  handler() {
+    return request => this.handle(request);
+  }
+
+  async handle(request) {
+    const started = performance.now();
+    const url = new URL(request.url);
+    const matched = this.match(request.method, url.pathname);
+    if (!matched) {
+      const dispatched = performance.now();
+      return withDispatchTiming(
+        NextResponse.json({ error: 'Endpoint bulunamadı' }, { status: 404 }), 'unmatched', started, dispatched
+      );
+    }
+
+    const { route, params } = matched;
+    let body;
+    const ctx = {
+      request,
+      url,
+      params,
+      query: url.searchParams,
+      user: null,
+      json: () => (body ??= span('body.parse', () => request.json())),
+    };
+
+    let dispatched = null;
+    try {
+      for (const middleware of route.middleware) {
+        const response = await middleware(ctx);
+        if (response) {
+          return withDispatchTiming(response, route, started, performance.now());
+        }
+      }
+      dispatched = performance.now();
+      if (this.prepare && route.prepare) {
+        await this.prepare(ctx);
+      }
+      return withDispatchTiming(await route.handler(ctx), route, started, dispatched);
+    } catch (error) {
+      dispatched ??= performance.now();
+      console.error(`${request.method} Error [${currentRequestId()}]:`, error);
+      return withDispatchTiming(
+        NextResponse.json({ error: error.message }, { status: error.status || 500 }), route, started, dispatched
+      );
+    }
+  }
+}
+
+function matchNode(node, segments, index, params) {
+  if (index === segments.length) {
+    return node.route;
+  }
+  const child = node.children.get(segments[index]);
+  if (child) {
+    const route = matchNode(child, segments, index + 1, params);
+    if (route) {
+      return route;
+    }
+  }
+  if (node.params.length > 0) {
+    const raw = decodeSegment(segments[index]);
+    if (raw === undefined) {
+      return null;
+    }
+    for (const param of node.params) {
+      const value = param.parse(raw);
+      if (value === undefined) {
+        continue;
+      }
+      const route = matchNode(param.node, segments, index + 1, params);
+      if (route) {
+        params[param.name] = value;
+        return route;
+      }
+    }
+  }
+  return null;
+}
+
+// Server-Timing: route;desc="GET products/:id";dur=0.012 - eşleştirme + middleware süresi (ms, handler hariç)
+// Aynı aralık isteğin izine 'route' span'i olarak yazılır
+function withDispatchTiming(response, route, started, dispatched) {
+  const name = typeof route === 'string' ? route : `${route.method} ${route.pattern}`;
+  recordSpan('route', started, dispatched, { route: name });
+  response.headers.append('Server-Timing', `route;desc="${name}";dur=${(dispatched - started).toFixed(3)}`);
+  return response;
+}
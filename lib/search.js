@@ -0,0 +1,522 @@
+// Katalog araması: süreç içi ters indeks (inverted index), yazım hatası toleransı, TR/EN normalizasyonu, facet sayıları
+// GET /api/search?q=celik dalgic&productType=watch&gender=male,unisex&brand=Rolex&minPrice=1000&sort=relevance&page=1&limit=24
+// Normalizasyon: büyük/küçük harf ve Türkçe karakterler katlanır (İ/I/ı -> i, ç -> c, ğ -> g, ö -> o, ş -> s, ü -> u),
+// basit çoğul ekleri atılır (saatler -> saat, watches -> watch) ve TR/EN eş anlamlılar eşleşir (dalgıç ~ diver).
+// Yazım hatası: sözlükte karşılığı olmayan 4+ harfli terimler tek düzenleme uzaklığındaki terimlerle eşleşir
+// (silme komşuluğu indeksi, SymSpell); son terim ön ek olarak da eşleşir (yazarken arama).
+// Facet'ler ayrıştırıcıdır: bir alanın sayıları o alanın kendi filtresi hariç diğer filtrelerle hesaplanır.
+// İndeks ilk aramada ürünlerden kurulur; bu süreçteki ürün yazımları (markProductChanged) sonraki aramadan önce
+// uygulanır, toplu içe aktarma (markCatalogChanged) yeniden kurar. Diğer süreçlerin yazımları en geç
+// SEARCH_INDEX_MAX_AGE_MS sonra arka planda yapılan yeniden kurulumla görünür.
+import { untracked } from '@/lib/dbOps';
+import { MAX_PAGE_SIZE, PRODUCT_CARD_FIELDS, PRODUCT_SORTS, productTypeOf } from '@/lib/catalog';
+
+const MAX_AGE_MS = parseInt(process.env.SEARCH_INDEX_MAX_AGE_MS) || 5 * 60 * 1000;
+const MAX_QUERY_TERMS = 10;
+const MIN_FUZZY_LENGTH = 4;
+const MAX_PREFIX_TERMS = 50;
+const FACET_LIMIT = 20;
+const BUILD_BATCH = 2000;
+
+// Alan ağırlıkları: isim ve marka eşleşmesi açıklamadakinden değerlidir
+const FIELD_WEIGHTS = { name: 4, brand: 4, category: 2, productType: 2, gender: 2, specs: 1.5, description: 1 };
+const SPEC_SEARCH_FIELDS = ['glassType', 'machineType', 'dialColor', 'strapType', 'caseMaterial'];
+// Terim eşleşme kalitesi
+const EXACT = 1;
+const SYNONYM = 0.9;
+const PREFIX = 0.7;
+const FUZZY = 0.5;
+
+// Fiyat facet aralıkları (TL): [0, 1000), [1000, 5000), ..., [100000, ∞)
+export const PRICE_BUCKETS = [0, 1000, 5000, 10000, 25000, 50000, 100000];
+const FACET_FIELDS = ['productType', 'brand', 'gender', 'category'];
+
+const SEARCH_PROJECTION = {
+  _id: 0, id: 1, name: 1, brand: 1, category: 1, productType: 1, gender: 1, description: 1, price: 1, createdAt: 1,
+  ...Object.fromEntries(SPEC_SEARCH_FIELDS.map(field => [`specs.${field}`, 1]))
+};
+const RESULT_PROJECTION = Object.fromEntries([
+  ['_id', 0], ...[...PRODUCT_CARD_FIELDS, 'ratingAverage', 'ratingCount'].map(field => [field, 1])
+]);
+
+// Eş anlamlı gruplar (normalize edilmiş ve eki atılmış biçimde); sorgudaki terim gruptaki diğerleriyle de eşleşir
+const SYNONYM_GROUPS = [
+  ['saat', 'watch'],
+  ['gozluk', 'eyewear', 'glass', 'sunglass'],
+  ['gunes', 'sun'],
+  ['erkek', 'male', 'men', 'man'],
+  ['kadin', 'female', 'women', 'woman', 'bayan'],
+  ['celik', 'steel'],
+  ['altin', 'gold'],
+  ['gumus', 'silver'],
+  ['deri', 'leather'],
+  ['siyah', 'black'],
+  ['beyaz', 'white'],
+  ['mavi', 'blue'],
+  ['yesil', 'green'],
+  ['kirmizi', 'red'],
+  ['otomatik', 'automatic'],
+  ['kuvars', 'quartz'],
+  ['safir', 'sapphire'],
+  ['kayis', 'strap'],
+  ['kadran', 'dial'],
+  ['dalgic', 'diver', 'dive'],
+  ['kronograf', 'chronograph'],
+];
+const SYNONYMS = new Map();
+for (const group of SYNONYM_GROUPS) {
+  for (const term of group) {
+    SYNONYMS.set(term, group.filter(other => other !== term));
+  }
+}
+
+// Büyük/küçük harf ve aksanları katlar: "İSTANBUL", "Istanbul", "ıstanbul" -> "istanbul"; "Gözlük" -> "gozluk"
+export function normalizeText(text) {
+  return String(text ?? '')
+    .replace(/[İI]/g, 'i')
+    .toLowerCase()
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .replace(/ı/g, 'i');
+}
+
+// Helper: Strip Turkish (-lar/-ler) and English (-s/-es/-ies) plural endings
+function stem(term) {
+  if (term.length >= 6 && (term.endsWith('lar') || term.endsWith('ler'))) return term.slice(0, -3);
+  if (term.length >= 5 && term.endsWith('ies')) return `${term.slice(0, -3)}y`;
+  if (term.length >= 5 && /(s|x|z|ch|sh)es$/.test(term)) return term.slice(0, -2);
+  if (term.length >= 4 && term.endsWith('s') && !/(ss|us|is)$/.test(term)) return term.slice(0, -1);
+  return term;
+}
+
+export function tokenize(text) {
+  return normalizeText(text).split(/[^a-z0-9]+/).filter(Boolean).map(stem);
+}
+
+// Helper: Every string one deletion away from `term`
+function deletions(term) {
+  const result = new Set();
+  for (let i = 0; i < term.length; i++) {
+    result.add(term.slice(0, i) + term.slice(i + 1));
+  }
+  return result;
+}
+
+// Helper: Optimal string alignment distance is at most 1 (one insertion, deletion, substitution or swap)
+function withinOneEdit(a, b) {
+  if (Math.abs(a.length - b.length) > 1) return false;
+  let i = 0;
+  while (i < a.length && i < b.length && a[i] === b[i]) i++;
+  if (a.length === b.length) {
+    return a.slice(i + 1) === b.slice(i + 1) ||
+      (a[i] === b[i + 1] && a[i + 1] === b[i] && a.slice(i + 2) === b.slice(i + 2));
+  }
+  return a.length > b.length ? a.slice(i + 1) === b.slice(i) : a.slice(i) === b.slice(i + 1);
+}
+
+// Helper: First index in the sorted array whose value is >= `value`
+function lowerBound(sorted, value) {
+  let lo = 0;
+  let hi = sorted.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (sorted[mid] < value) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+function listParam(searchParams, name) {
+  const values = (searchParams.get(name) || '').split(',').map(value => value.trim()).filter(Boolean);
+  return values.length > 0 ? values : null;
+}
+
+// Arama parametrelerini doğrular
+export function parseSearchQuery(searchParams) {
+  const filters = {};
+  for (const field of FACET_FIELDS) {
+    const values = listParam(searchParams, field);
+    if (values) filters[field] = new Set(values);
+  }
+  const minPrice = parseFloat(searchParams.get('minPrice'));
+  const maxPrice = parseFloat(searchParams.get('maxPrice'));
+  const sort = searchParams.get('sort') || 'relevance';
+  if (sort !== 'relevance' && !PRODUCT_SORTS[sort]) {
+    throw Object.assign(new Error('Geçersiz sıralama'), { status: 400 });
+  }
+  const limitParam = parseInt(searchParams.get('limit'));
+  const pageParam = parseInt(searchParams.get('page'));
+  return {
+    q: (searchParams.get('q') || '').slice(0, 200),
+    filters,
+    minPrice: isNaN(minPrice) ? null : minPrice,
+    maxPrice: isNaN(maxPrice) ? null : maxPrice,
+    sort,
+    limit: Math.min(Math.max(isNaN(limitParam) ? 24 : limitParam, 1), MAX_PAGE_SIZE),
+    page: Math.max(isNaN(pageParam) ? 1 : pageParam, 1)
+  };
+}
+
+// Bellekteki ters indeks: terim -> (ürün sırası -> alan ağırlığı)
+export class SearchIndex {
+  constructor() {
+    this.docs = [];
+    this.free = [];
+    this.byId = new Map();
+    this.postings = new Map();
+    this.sortedTerms = [];
+    this.deletes = new Map();
+    this.ranks = new Map();
+    this.builtAt = Date.now();
+  }
+
+  get size() {
+    return this.byId.size;
+  }
+
+  addTerm(term) {
+    this.postings.set(term, new Map());
+    this.sortedTerms.splice(lowerBound(this.sortedTerms, term), 0, term);
+    if (term.length >= MIN_FUZZY_LENGTH) {
+      for (const deleted of deletions(term)) {
+        if (!this.deletes.has(deleted)) this.deletes.set(deleted, new Set());
+        this.deletes.get(deleted).add(term);
+      }
+    }
+  }
+
+  dropTerm(term) {
+    this.postings.delete(term);
+    this.sortedTerms.splice(lowerBound(this.sortedTerms, term), 1);
+    if (term.length >= MIN_FUZZY_LENGTH) {
+      for (const deleted of deletions(term)) {
+        const terms = this.deletes.get(deleted);
+        terms.delete(term);
+        if (terms.size === 0) this.deletes.delete(deleted);
+      }
+    }
+  }
+
+  // Toplu kurulumda terimler sonda bir kez sıralanır
+  add(product, { bulk = false } = {}) {
+    this.remove(product.id);
+    this.ranks.clear();
+    const weights = new Map();
+    const addField = (text, weight) => {
+      for (const term of tokenize(text)) {
+        if ((weights.get(term) || 0) < weight) weights.set(term, weight);
+      }
+    };
+    const productType = productTypeOf(product);
+    for (const field of ['name', 'brand', 'category', 'gender', 'description']) {
+      addField(product[field], FIELD_WEIGHTS[field]);
+    }
+    addField(productType, FIELD_WEIGHTS.productType);
+    addField(SPEC_SEARCH_FIELDS.map(field => product.specs?.[field] || '').join(' '), FIELD_WEIGHTS.specs);
+
+    const ordinal = this.free.length > 0 ? this.free.pop() : this.docs.length;
+    this.docs[ordinal] = {
+      id: product.id,
+      productType,
+      brand: product.brand || '',
+      gender: product.gender || 'unisex',
+      category: product.category || '',
+      price: typeof product.price === 'number' ? product.price : 0,
+      name: product.name || '',
+      createdAt: product.createdAt || '',
+      terms: [...weights.keys()]
+    };
+    this.byId.set(product.id, ordinal);
+    for (const [term, weight] of weights) {
+      if (!this.postings.has(term)) {
+        if (bulk) this.postings.set(term, new Map());
+        else this.addTerm(term);
+      }
+      this.postings.get(term).set(ordinal, weight);
+    }
+  }
+
+  remove(productId) {
+    const ordinal = this.byId.get(productId);
+    if (ordinal === undefined) return;
+    this.ranks.clear();
+    for (const term of this.docs[ordinal].terms) {
+      const postings = this.postings.get(term);
+      postings.delete(ordinal);
+      if (postings.size === 0) this.dropTerm(term);
+    }
+    this.docs[ordinal] = null;
+    this.free.push(ordinal);
+    this.byId.delete(productId);
+  }
+
+  finishBulk() {
+    this.sortedTerms = [...this.postings.keys()].sort();
+    for (const term of this.sortedTerms) {
+      if (term.length < MIN_FUZZY_LENGTH) continue;
+      for (const deleted of deletions(term)) {
+        if (!this.deletes.has(deleted)) this.deletes.set(deleted, new Set());
+        this.deletes.get(deleted).add(term);
+      }
+    }
+  }
+
+  // Sorgu terimi -> eşleşen sözlük terimleri ve kaliteleri; düzeltme yapıldıysa `corrected` dolar
+  expand(term, isLast) {
+    const matches = new Map();
+    const offer = (candidate, quality) => {
+      if (this.postings.has(candidate) && (matches.get(candidate) || 0) < quality) matches.set(candidate, quality);
+    };
+    offer(term, EXACT);
+    for (const synonym of SYNONYMS.get(term) || []) offer(synonym, SYNONYM);
+    if (isLast && term.length >= 2) {
+      const start = lowerBound(this.sortedTerms, term);
+      for (let i = start; i < this.sortedTerms.length && i < start + MAX_PREFIX_TERMS; i++) {
+        if (!this.sortedTerms[i].startsWith(term)) break;
+        offer(this.sortedTerms[i], PREFIX);
+      }
+    }
+    let corrected = null;
+    if (matches.size === 0 && term.length >= MIN_FUZZY_LENGTH) {
+      const candidates = new Set([...(this.deletes.get(term) || [])]);
+      for (const deleted of deletions(term)) {
+        candidates.add(deleted);
+        for (const candidate of this.deletes.get(deleted) || []) candidates.add(candidate);
+      }
+      for (const candidate of candidates) {
+        if (withinOneEdit(term, candidate)) offer(candidate, FUZZY);
+      }
+      corrected = [...matches.keys()];
+    }
+    return { matches, corrected };
+  }
+
+  // Eşleşen ürün sıraları (skorlarıyla), toplam ve facet sayıları
+  search(query) {
+    const terms = [...new Set(tokenize(query.q))].slice(0, MAX_QUERY_TERMS);
+    const corrections = {};
+    const expanded = terms.map((term, i) => {
+      const { matches, corrected } = this.expand(term, i === terms.length - 1);
+      if (corrected?.length) corrections[term] = corrected;
+      return matches;
+    });
+
+    // Her terim eşleşmeli (AND); en seçici terimden başlanır. Skorlar ürün sırasıyla dizinlenmiş dizide tutulur
+    const scores = new Float64Array(this.docs.length);
+    let candidates;
+    if (terms.length === 0) {
+      candidates = [...this.byId.values()];
+    } else {
+      const postingsSize = matches => [...matches.keys()].reduce((sum, term) => sum + this.postings.get(term).size, 0);
+      const order = expanded.map((matches, i) => [postingsSize(matches), i]).sort((a, b) => a[0] - b[0]);
+      for (const [, i] of order) {
+        const matches = [...expanded[i]].map(([term, quality]) => [this.postings.get(term), quality]);
+        if (!candidates) {
+          candidates = [];
+          for (const [postings, quality] of matches) {
+            postings.forEach((weight, ordinal) => {
+              if (scores[ordinal] === 0) candidates.push(ordinal);
+              if (scores[ordinal] < weight * quality) scores[ordinal] = weight * quality;
+            });
+          }
+        } else {
+          // Geniş terimde (ör. "saat" ~ "watch") aday başına Map araması yerine postings'ler sırayla bir kez taranır
+          const best = new Float64Array(this.docs.length);
+          for (const [postings, quality] of matches) {
+            postings.forEach((weight, ordinal) => {
+              if (best[ordinal] < weight * quality) best[ordinal] = weight * quality;
+            });
+          }
+          let kept = 0;
+          for (const ordinal of candidates) {
+            if (best[ordinal] > 0) {
+              scores[ordinal] += best[ordinal];
+              candidates[kept++] = ordinal;
+            }
+          }
+          candidates.length = kept;
+        }
+        if (candidates.length === 0) break;
+      }
+    }
+
+    // Tek geçişte filtre ve ayrıştırıcı facet'ler: yalnızca bir filtreye takılan ürün o filtrenin facet'ine sayılır
+    const active = FACET_FIELDS.filter(field => query.filters[field]);
+    const priceFiltered = query.minPrice !== null || query.maxPrice !== null;
+    const counts = Object.fromEntries(FACET_FIELDS.map(field => [field, new Map()]));
+    const priceCounts = new Array(PRICE_BUCKETS.length).fill(0);
+    const hits = [];
+    for (const ordinal of candidates) {
+      const doc = this.docs[ordinal];
+      let failed = null;
+      let failures = 0;
+      for (const field of active) {
+        if (!query.filters[field].has(doc[field])) {
+          failed = field;
+          failures++;
+        }
+      }
+      if (priceFiltered && ((query.minPrice !== null && doc.price < query.minPrice) ||
+        (query.maxPrice !== null && doc.price > query.maxPrice))) {
+        failed = 'price';
+        failures++;
+      }
+      if (failures > 1) continue;
+      for (const field of FACET_FIELDS) {
+        if (failures === 0 || failed === field) {
+          const value = doc[field];
+          if (value) counts[field].set(value, (counts[field].get(value) || 0) + 1);
+        }
+      }
+      if (failures === 0 || failed === 'price') {
+        priceCounts[Math.max(PRICE_BUCKETS.findLastIndex(min => doc.price >= min), 0)]++;
+      }
+      if (failures === 0) hits.push(ordinal);
+    }
+
+    hits.sort(this.comparator(query.sort === 'relevance' && terms.length === 0 ? 'default' : query.sort, scores));
+    const facets = Object.fromEntries(FACET_FIELDS.map(field => [
+      field,
+      [...counts[field]].sort((a, b) => b[1] - a[1] || (a[0] < b[0] ? -1 : 1)).slice(0, FACET_LIMIT)
+        .map(([value, count]) => ({ value, count }))
+    ]));
+    facets.price = PRICE_BUCKETS.map((min, i) => ({ min, max: PRICE_BUCKETS[i + 1] ?? null, count: priceCounts[i] }))
+      .filter(bucket => bucket.count > 0);
+    return { hits, facets, corrections };
+  }
+
+  // Sıralama alanına (ve /api/products gibi id'ye) göre her ürünün sırası; yazımlar önbelleği temizler,
+  // sonraki arama bir kez yeniden sıralar
+  rank(field, direction) {
+    const key = `${field}:${direction}`;
+    if (!this.ranks.has(key)) {
+      const docs = this.docs;
+      const ordinals = [...this.byId.values()].sort((a, b) => {
+        const x = docs[a][field];
+        const y = docs[b][field];
+        return x < y ? -direction : x > y ? direction : docs[a].id < docs[b].id ? -direction : direction;
+      });
+      const rank = new Int32Array(docs.length);
+      ordinals.forEach((ordinal, i) => { rank[ordinal] = i; });
+      this.ranks.set(key, rank);
+    }
+    return this.ranks.get(key);
+  }
+
+  comparator(sort, scores) {
+    if (sort === 'relevance') {
+      const newest = this.rank(...PRODUCT_SORTS.newest);
+      return (a, b) => scores[b] - scores[a] || newest[a] - newest[b];
+    }
+    const rank = this.rank(...PRODUCT_SORTS[sort]);
+    return (a, b) => rank[a] - rank[b];
+  }
+}
+
+let current = null;
+let building = null;
+let rebuildRequested = false;
+// Bu süreçte yazılan ve indekse henüz uygulanmamış ürünler; yeniden kurulum sırasında yazılanlar ayrıca tutulur
+const pending = new Set();
+let writtenDuringBuild = null;
+let applying = null;
+const counters = { builds: 0, incrementalUpdates: 0, searches: 0 };
+
+// Ürün eklendi/güncellendi/silindi; sonraki arama önce bu ürünü indekste günceller
+export function markProductChanged(productId) {
+  pending.add(productId);
+  writtenDuringBuild?.add(productId);
+}
+
+// Toplu içe aktarma: sonraki arama indeksi baştan kurar
+export function markCatalogChanged() {
+  rebuildRequested = true;
+}
+
+async function buildIndex(db) {
+  const written = writtenDuringBuild = new Set();
+  const started = Date.now();
+  const index = new SearchIndex();
+  try {
+    const cursor = db.collection('products').find({}, { projection: SEARCH_PROJECTION }).batchSize(BUILD_BATCH);
+    for await (const product of cursor) {
+      index.add(product, { bulk: true });
+    }
+    index.finishBulk();
+  } finally {
+    writtenDuringBuild = null;
+  }
+  counters.builds++;
+  counters.lastBuildMs = Date.now() - started;
+  // Tarama bitmiş ürünleri kaçırmış olabilir: kurulum sırasında yazılanlar yeni indekse tekrar uygulanır
+  written.forEach(id => pending.add(id));
+  current = index;
+  return index;
+}
+
+function rebuild(db) {
+  if (!building) {
+    rebuildRequested = false;
+    building = buildIndex(db).finally(() => { building = null; });
+  }
+  return building;
+}
+
+// Helper: Re-read the products written in this process since the last search and update the index
+async function applyPending(db) {
+  while (pending.size > 0) {
+    if (!applying) {
+      const ids = [...pending];
+      pending.clear();
+      applying = db.collection('products').find({ id: { $in: ids } }, { projection: SEARCH_PROJECTION }).toArray()
+        .then(products => {
+          const found = new Map(products.map(product => [product.id, product]));
+          for (const id of ids) {
+            if (found.has(id)) current.add(found.get(id));
+            else current.remove(id);
+          }
+          counters.incrementalUpdates += ids.length;
+        })
+        .finally(() => { applying = null; });
+    }
+    await applying;
+  }
+}
+
+async function getSearchIndex(db) {
+  if (!current || rebuildRequested) {
+    // Sürmekte olan kurulum içe aktarmadan önce başlamış olabilir; bayrak temizlenene kadar yeniden kurulur
+    while (!current || rebuildRequested) await rebuild(db);
+  } else if (Date.now() - current.builtAt > MAX_AGE_MS && !building) {
+    // Eski indeksle yanıt verilir; yeni indeks arka planda kurulup değiştirilir
+    untracked(() => rebuild(db)).catch(error => console.error('Search index rebuild failed:', error));
+  }
+  await applyPending(db);
+  return current;
+}
+
+// Arama sayfası: { items, total, page, pages, facets, corrections }
+// Ürünler indeksteki sıraya göre tek $in sorgusuyla okunur (stok ve fiyat her zaman güncel)
+export async function searchProducts(db, query) {
+  const index = await getSearchIndex(db);
+  counters.searches++;
+  const { hits, facets, corrections } = index.search(query);
+  const start = (query.page - 1) * query.limit;
+  const ids = hits.slice(start, start + query.limit).map(ordinal => index.docs[ordinal].id);
+  const products = ids.length > 0
+    ? await db.collection('products').find({ id: { $in: ids } }, { projection: RESULT_PROJECTION }).toArray()
+    : [];
+  const byId = new Map(products.map(product => [product.id, product]));
+  return {
+    items: ids.map(id => byId.get(id)).filter(Boolean),
+    total: hits.length,
+    page: query.page,
+    pages: Math.ceil(hits.length / query.limit),
+    facets,
+    corrections
+  };
+}
+
+export function searchIndexStats() {
+  return { products: current?.size ?? 0, terms: current?.postings.size ?? 0, pending: pending.size, ...counters };
+}
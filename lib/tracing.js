@@ -0,0 +1,223 @@
+// İstek izleme: her istek bir iz (trace), içindeki işler span'lerdir
+// (rota eşleştirme, gövde ayrıştırma, her DB komutu, JWT doğrulama, bcrypt, e-posta gönderimi)
+// İstek kimliği X-Request-Id başlığından alınır (yoksa üretilir) ve yanıta geri yazılır
+// Span türlerinin toplam süreleri Server-Timing başlığında döner: db;dur=3.2;desc="4", jwt;dur=0.1;desc="1"
+// Son TRACE_BUFFER_SIZE iz bellekte tutulur ve GET /api/traces ile Chrome Trace Event biçiminde dışa aktarılır
+// SLOW_REQUEST_MS verilirse bu süreyi aşan istekler span dökümüyle tek satır JSON olarak loglanır
+import { AsyncLocalStorage } from 'async_hooks';
+import { randomUUID } from 'crypto';
+import { operationName } from '@/lib/dbMetrics';
+
+export const SLOW_REQUEST_MS = parseInt(process.env.SLOW_REQUEST_MS) || 0;
+const TRACE_BUFFER_SIZE = parseInt(process.env.TRACE_BUFFER_SIZE) || 200;
+// Bir izde en fazla bu kadar span tutulur (ör. binlerce satırlık içe aktarma); fazlası yalnızca sayılır
+const MAX_SPANS = 500;
+// İstemcinin gönderdiği kimlik loglara ve başlığa aynen yazılır, bu yüzden biçimi sınırlıdır
+const REQUEST_ID_PATTERN = /^[\w.:-]{1,128}$/;
+
+const activeTrace = new AsyncLocalStorage();
+const recent = [];
+
+function createTrace(name, id, attrs = {}) {
+  return { id, name, startedAt: Date.now(), start: performance.now(), duration: null, attrs, spans: [], dropped: 0 };
+}
+
+function addSpan(trace, name, start, end, attrs, error) {
+  // Yanıttan sonra biten arka plan işleri (ör. ilk istekte kurulan zamanlayıcılar) bitmiş ize yazılmaz
+  if (trace.duration !== null) {
+    return;
+  }
+  if (trace.spans.length >= MAX_SPANS) {
+    trace.dropped++;
+    return;
+  }
+  trace.spans.push({
+    name,
+    start: round(start - trace.start),
+    duration: round(end - start),
+    ...(attrs && { attrs }),
+    ...(error && { error: error.message || String(error) }),
+  });
+}
+
+function round(ms) {
+  return Math.round(ms * 1000) / 1000;
+}
+
+// 'db products.find' -> 'db', 'jwt.verify' -> 'jwt'
+function spanKind(name) {
+  return name.split(/[.\s]/, 1)[0];
+}
+
+// Tür başına toplam süre ve span sayısı; eşzamanlı span'ler (Promise.all) toplamı duvar süresinin üstüne çıkarabilir
+export function spanBreakdown(trace) {
+  const kinds = {};
+  for (const span of trace.spans) {
+    const kind = (kinds[spanKind(span.name)] ??= { count: 0, ms: 0 });
+    kind.count++;
+    kind.ms = round(kind.ms + span.duration);
+  }
+  return kinds;
+}
+
+function finishTrace(trace, status) {
+  trace.duration = round(performance.now() - trace.start);
+  if (status !== undefined) {
+    trace.attrs.status = status;
+  }
+  const route = trace.spans.find(span => span.name === 'route')?.attrs?.route;
+  if (route) {
+    trace.name = route;
+  }
+  recent.push(trace);
+  if (recent.length > TRACE_BUFFER_SIZE) {
+    recent.shift();
+  }
+  if (SLOW_REQUEST_MS && trace.duration >= SLOW_REQUEST_MS) {
+    console.warn(JSON.stringify({
+      msg: 'slow request',
+      requestId: trace.id,
+      name: trace.name,
+      ...trace.attrs,
+      durationMs: trace.duration,
+      breakdown: spanBreakdown(trace),
+      slowestSpans: [...trace.spans].sort((a, b) => b.duration - a.duration).slice(0, 10),
+    }));
+  }
+}
+
+// İzin başlangıcından itibaren ölçülmüş bir aralığı (performance.now) span olarak ekler; aktif iz yoksa bir şey yapmaz
+export function recordSpan(name, start, end, attrs) {
+  const trace = activeTrace.getStore();
+  if (trace) {
+    addSpan(trace, name, start, end, attrs);
+  }
+}
+
+// fn'i (senkron veya async) bir span içinde çalıştırır; aktif iz yoksa yalnızca çalıştırır
+export function span(name, fn, attrs) {
+  const trace = activeTrace.getStore();
+  if (!trace) {
+    return fn();
+  }
+  const start = performance.now();
+  let result;
+  try {
+    result = fn();
+  } catch (error) {
+    addSpan(trace, name, start, performance.now(), attrs, error);
+    throw error;
+  }
+  if (typeof result?.then !== 'function') {
+    addSpan(trace, name, start, performance.now(), attrs);
+    return result;
+  }
+  return result.then(
+    value => {
+      addSpan(trace, name, start, performance.now(), attrs);
+      return value;
+    },
+    error => {
+      addSpan(trace, name, start, performance.now(), attrs, error);
+      throw error;
+    }
+  );
+}
+
+export function currentRequestId() {
+  return activeTrace.getStore()?.id ?? null;
+}
+
+// Arka plan işini isteğin izinin dışında başlatır
+export function untraced(fn) {
+  return activeTrace.exit(fn);
+}
+
+// İstek dışı işler (ör. outbox boşaltma) için ayrı bir iz; onu tetikleyen isteğin izine yazılmaz
+export function runTrace(name, fn, attrs) {
+  const trace = createTrace(name, randomUUID(), attrs);
+  return activeTrace.run(trace, async () => {
+    try {
+      return await fn();
+    } finally {
+      finishTrace(trace);
+    }
+  });
+}
+
+// Route handler'ı sarar: isteğin izini açar, yanıta X-Request-Id ve span özetini (Server-Timing) yazar
+export function withTracing(handler) {
+  return (request, ...args) => {
+    const header = request.headers.get('x-request-id');
+    const id = header && REQUEST_ID_PATTERN.test(header) ? header : randomUUID();
+    const trace = createTrace(request.method, id, { method: request.method, path: new URL(request.url).pathname });
+    return activeTrace.run(trace, async () => {
+      const response = await handler(request, ...args);
+      finishTrace(trace, response.status);
+      response.headers.set('X-Request-Id', id);
+      // route girdisini lib/router.js zaten yazar
+      for (const [kind, { count, ms }] of Object.entries(spanBreakdown(trace))) {
+        if (kind !== 'route') {
+          response.headers.append('Server-Timing', `${kind};desc="${count}";dur=${ms.toFixed(3)}`);
+        }
+      }
+      response.headers.append('Server-Timing', `total;dur=${trace.duration.toFixed(3)}`);
+      return response;
+    });
+  };
+}
+
+// Her DB komutu, onu çalıştıran isteğin izine 'db koleksiyon.komut' span'i olarak eklenir
+// (MongoClient `monitorCommands: true` ile oluşturulmalı)
+export function traceCommands(client) {
+  const pending = new Map();
+  client.on('commandStarted', event => {
+    const trace = activeTrace.getStore();
+    if (trace) {
+      pending.set(event.requestId, { trace, start: performance.now(), name: `db ${operationName(event)}` });
+    }
+  });
+  const finish = (event, failed) => {
+    const started = pending.get(event.requestId);
+    if (!started) {
+      return;
+    }
+    pending.delete(event.requestId);
+    addSpan(started.trace, started.name, started.start, performance.now(), undefined,
+      failed ? event.failure : undefined);
+  };
+  client.on('commandSucceeded', event => finish(event, false));
+  client.on('commandFailed', event => finish(event, true));
+  return client;
+}
+
+// minMs: yalnızca bu süreyi aşan izler; en yeni sonda
+export function recentTraces({ minMs = 0 } = {}) {
+  return recent.filter(trace => trace.duration >= minMs);
+}
+
+export function findTrace(id) {
+  return recent.findLast(trace => trace.id === id) ?? null;
+}
+
+// Chrome Trace Event biçimi (chrome://tracing, Perfetto): her iz ayrı bir satır (tid), süreler mikrosaniye
+export function chromeTraceEvents(traces) {
+  return {
+    displayTimeUnit: 'ms',
+    traceEvents: traces.flatMap((trace, index) => {
+      const base = trace.startedAt * 1000;
+      return [
+        {
+          name: trace.name, cat: 'request', ph: 'X', pid: 1, tid: index + 1,
+          ts: base, dur: Math.round(trace.duration * 1000),
+          args: { requestId: trace.id, ...trace.attrs, droppedSpans: trace.dropped },
+        },
+        ...trace.spans.map(span => ({
+          name: span.name, cat: spanKind(span.name), ph: 'X', pid: 1, tid: index + 1,
+          ts: Math.round(base + span.start * 1000), dur: Math.round(span.duration * 1000),
+          args: { ...span.attrs, ...(span.error && { error: span.error }) },
+        })),
+      ];
+    }),
+  };
+}
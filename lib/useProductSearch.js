@@ -0,0 +1,51 @@
+'use client';
+
+// Katalog sayfaları için sunucu araması (GET /api/search): yalnızca görüntülenen sayfa gelir.
+// Arama kutusu yazmayı bitirince (SEARCH_DEBOUNCE_MS) gönderilir; filtre, sıralama ve sayfa değişimi hemen istenir.
+// Cevabı gelmeden yeni istek başlarsa eskisi iptal edilir, böylece geç gelen eski sonuç ekrana yazılmaz.
+import { useEffect, useState } from 'react';
+
+const SEARCH_DEBOUNCE_MS = 250;
+const EMPTY_RESULT = { items: [], total: 0, pages: 0, facets: {}, corrections: {} };
+
+// "Varsayılan" sıralama: arama varsa alaka düzeyi, yoksa eklenme sırası
+// Cinsiyet filtresi unisex ürünleri de kapsar
+export function useProductSearch({ productType, query, category, gender, sort, page, limit }) {
+  const [debouncedQuery, setDebouncedQuery] = useState(query);
+  const [result, setResult] = useState(EMPTY_RESULT);
+  const [loaded, setLoaded] = useState(false);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(query.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  useEffect(() => {
+    const params = new URLSearchParams({
+      productType,
+      sort: sort === 'default' ? 'relevance' : sort,
+      page: String(page),
+      limit: String(limit)
+    });
+    if (debouncedQuery) params.set('q', debouncedQuery);
+    if (category && category !== 'all') params.set('category', category);
+    if (gender && gender !== 'all') params.set('gender', gender === 'unisex' ? 'unisex' : `${gender},unisex`);
+
+    const controller = new AbortController();
+    fetch(`/api/search?${params}`, { signal: controller.signal })
+      .then(response => response.json())
+      .then(data => {
+        setResult(Array.isArray(data.items) ? data : EMPTY_RESULT);
+        setLoaded(true);
+      })
+      .catch(error => {
+        if (error.name === 'AbortError') return;
+        console.error('Ürünler yüklenemedi:', error);
+        setResult(EMPTY_RESULT);
+        setLoaded(true);
+      });
+    return () => controller.abort();
+  }, [productType, debouncedQuery, category, gender, sort, page, limit]);
+
+  return { ...result, loading: !loaded };
+}
@@ -0,0 +1,59 @@
+// Süreç başına kullanıcı profili ve favori ürün özetleri önbelleği (LRU + TTL)
+// Profil/favori yazımları ilgili kullanıcının kayıtlarını siler; ürün yazımları tüm favori özetlerini siler.
+// Birden fazla süreç çalışıyorsa diğer süreçlerdeki kopyalar en fazla USER_CACHE_TTL_MS kadar eski kalır.
+import { PRODUCT_CARD_FIELDS } from '@/lib/catalog';
+import { LRUCache } from '@/lib/lruCache';
+
+const USER_CACHE_TTL_MS = parseInt(process.env.USER_CACHE_TTL_MS) || 30 * 1000;
+const USER_CACHE_MAX = parseInt(process.env.USER_CACHE_MAX) || 5000;
+
+const FAVORITE_PROJECTION = Object.fromEntries([['_id', 0], ...PRODUCT_CARD_FIELDS.map(field => [field, 1])]);
+
+const profiles = new LRUCache({ maxEntries: USER_CACHE_MAX, ttlMs: USER_CACHE_TTL_MS });
+const favorites = new LRUCache({ maxEntries: USER_CACHE_MAX, ttlMs: USER_CACHE_TTL_MS });
+
+// Şifresiz kullanıcı profili; yoksa null
+export async function getUserProfile(db, userId) {
+  const cached = profiles.get(userId);
+  if (cached) {
+    return cached;
+  }
+  const user = await db.collection('users').findOne({ id: userId }, { projection: { _id: 0, password: 0 } });
+  if (user) {
+    profiles.set(userId, user);
+  }
+  return user;
+}
+
+// Kullanıcının favori ürünlerinin kart alanları; kullanıcı yoksa null
+export async function getFavoriteProducts(db, userId) {
+  const cached = favorites.get(userId);
+  if (cached) {
+    return cached;
+  }
+  const user = await getUserProfile(db, userId);
+  if (!user) {
+    return null;
+  }
+  const favoriteIds = user.favoriteProducts || [];
+  const products = favoriteIds.length > 0
+    ? await db.collection('products').find({ id: { $in: favoriteIds } }, { projection: FAVORITE_PROJECTION }).toArray()
+    : [];
+  favorites.set(userId, products);
+  return products;
+}
+
+// auth/profile, favorites/add, favorites/remove yazımlarından sonra
+export function invalidateUser(userId) {
+  profiles.delete(userId);
+  favorites.delete(userId);
+}
+
+// Ürün güncellenince/silinince favori özetleri eskir
+export function invalidateFavoriteSummaries() {
+  favorites.clear();
+}
+
+export function userCacheStats() {
+  return { profiles: profiles.stats(), favorites: favorites.stats() };
+}
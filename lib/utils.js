@@ -27,3 +27,10 @@ export function parsePrice(priceString) {
   
   return parseFloat(normalized) || 0;
 }
+
+// Yüklenen görseller için küçültülmüş türev URL'i (/api/images/:id?w=640&format=auto)
+// Harici URL'ler olduğu gibi döner
+export function imageSrc(src, width) {
+  if (!src || !src.startsWith('/api/images/') || src.includes('?')) return src;
+  return `${src}?w=${width}&format=auto`;
+}
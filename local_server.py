@@ -0,0 +1,2794 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Cyprus Watch API
+Implements the routes in app/api/[[...path]]/route.js on an in-memory document
+store with a fake Resend mailer, so benchmarks and load tests run hermetically
+on one machine with no network access
+"""
+
+import argparse
+import base64
+import bisect
+import contextlib
+import csv
+import functools
+import hashlib
+import hmac
+import html
+import io
+import json
+import os
+import random
+import re
+import resource
+import sys
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # image derivatives are optional; without Pillow originals are served as-is
+    Image = None
+
+# The harness logs in with the same variables; the stand-in's fallback is not the deployed password
+ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin123")
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "local-standin-admin")
+ADMIN_AUTH_REQUIRED = os.environ.get("ADMIN_AUTH_REQUIRED") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+ADMIN_TOKEN_TTL = 12 * 3600
+# Mirrors lib/auth.js: X-Forwarded-For is only read behind this many trusted proxies
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUST_PROXY") or 0)
+ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/jpg", "image/png", "image/webp", "image/gif"]
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+DERIVATIVE_WIDTHS = [64, 128, 256, 384, 512, 640, 828, 1080, 1280, 1600, 2048]
+DERIVATIVE_FORMATS = {"webp": "image/webp", "avif": "image/avif", "jpeg": "image/jpeg", "png": "image/png"}
+SPEC_FIELDS = ["glassType", "machineType", "dialColor", "strapType", "caseSize",
+               "caseMaterial", "functions", "calendar", "features", "warranty"]
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def client_ip(headers, peer):
+    """lib/auth.js clientIp, except the stand-in always knows the socket peer to fall back on
+
+    Behind TRUSTED_PROXY_HOPS proxies the address the outermost one saw is read from
+    the right of X-Forwarded-For; entries to its left are whatever the client sent.
+    """
+    if not TRUSTED_PROXY_HOPS:
+        return peer
+    forwarded = [part.strip() for part in headers.get("X-Forwarded-For", "").split(",") if part.strip()]
+    if forwarded:
+        return forwarded[max(len(forwarded) - TRUSTED_PROXY_HOPS, 0)]
+    return headers.get("X-Real-IP") or peer
+
+
+# Latency bucket bounds in ms, as in lib/dbMetrics.js; percentiles read a bucket's upper bound, capped at max
+LATENCY_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyStats:
+    """Bucketed latency summary, as in lib/dbMetrics.js (not thread-safe; callers hold a lock)"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, ms, failed=False):
+        self.buckets[bisect.bisect_left(LATENCY_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.max = max(self.max, ms)
+        if failed:
+            self.errors += 1
+
+    def percentile(self, p):
+        rank = -(-self.count * p // 1)
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                bound = LATENCY_BOUNDS_MS[index] if index < len(LATENCY_BOUNDS_MS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "errors": self.errors,
+                "mean": round(self.sum / self.count, 3) if self.count else 0,
+                "p50": round(self.percentile(0.5), 3), "p95": round(self.percentile(0.95), 3),
+                "p99": round(self.percentile(0.99), 3), "max": round(self.max, 3)}
+
+
+# Request tracing, like lib/tracing.js: one trace per request on the handling thread, spans for the
+# route match, body parse, each store call, JWT verify, password hashing and email sends
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS") or 0)
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE") or 200)
+MAX_TRACE_SPANS = 500
+REQUEST_ID_PATTERN = re.compile(r"^[\w.:-]{1,128}$")
+
+_active_trace = threading.local()
+
+
+def current_trace():
+    return getattr(_active_trace, "trace", None)
+
+
+def span_kind(name):
+    """'db products.find' -> 'db', 'jwt.verify' -> 'jwt'"""
+    return re.split(r"[.\s]", name, maxsplit=1)[0]
+
+
+class Trace:
+    def __init__(self, trace_id, name, attrs):
+        self.id = trace_id
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, name, start, end, attrs=None, error=None):
+        # Work finishing after the response (e.g. a background refresh) is left out of a finished trace
+        if self.duration is not None:
+            return
+        if len(self.spans) >= MAX_TRACE_SPANS:
+            self.dropped += 1
+            return
+        span = {"name": name, "start": round((start - self.start) * 1000, 3),
+                "duration": round((end - start) * 1000, 3)}
+        if attrs:
+            span["attrs"] = attrs
+        if error is not None:
+            span["error"] = str(error)
+        self.spans.append(span)
+
+    def breakdown(self):
+        """Total ms and span count per kind; concurrent spans can add up to more than the wall time"""
+        kinds = {}
+        for span in self.spans:
+            kind = kinds.setdefault(span_kind(span["name"]), {"count": 0, "ms": 0.0})
+            kind["count"] += 1
+            kind["ms"] = round(kind["ms"] + span["duration"], 3)
+        return kinds
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "startedAt": int(self.started_at * 1000),
+                "duration": self.duration, "attrs": self.attrs, "spans": list(self.spans), "dropped": self.dropped}
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Time the block as a span of the current trace; a no-op outside a trace"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        trace.add(name, start, time.perf_counter(), attrs, e)
+        raise
+    trace.add(name, start, time.perf_counter(), attrs)
+
+
+def record_span(name, start, end, **attrs):
+    """Add an interval already measured with time.perf_counter() to the current trace"""
+    trace = current_trace()
+    if trace is not None:
+        trace.add(name, start, end, attrs)
+
+
+class Tracer:
+    """Keeps the last `buffer_size` traces for GET /api/traces and logs requests slower than `slow_ms`"""
+
+    def __init__(self, slow_ms=SLOW_REQUEST_MS, buffer_size=TRACE_BUFFER_SIZE):
+        self.slow_ms = slow_ms
+        self.lock = threading.Lock()
+        self.traces = deque(maxlen=buffer_size)
+
+    @contextlib.contextmanager
+    def trace(self, name, trace_id=None, **attrs):
+        """Run the block as a new trace on this thread; set `trace.attrs["status"]` before it ends"""
+        trace = Trace(trace_id or str(uuid.uuid4()), name, attrs)
+        previous, _active_trace.trace = current_trace(), trace
+        try:
+            yield trace
+        finally:
+            _active_trace.trace = previous
+            self.finish(trace)
+
+    def finish(self, trace):
+        trace.duration = round((time.perf_counter() - trace.start) * 1000, 3)
+        route = next((span["attrs"]["route"] for span in trace.spans if span["name"] == "route"), None)
+        if route:
+            trace.name = route
+        with self.lock:
+            self.traces.append(trace)
+        if self.slow_ms and trace.duration >= self.slow_ms:
+            print(json.dumps({"msg": "slow request", "requestId": trace.id, "name": trace.name, **trace.attrs,
+                              "durationMs": trace.duration, "breakdown": trace.breakdown(),
+                              "slowestSpans": sorted(trace.spans, key=lambda s: -s["duration"])[:10]},
+                             ensure_ascii=False), file=sys.stderr)
+
+    def recent(self, min_ms=0.0):
+        with self.lock:
+            return [trace for trace in self.traces if trace.duration >= min_ms]
+
+    def find(self, trace_id):
+        with self.lock:
+            return next((trace for trace in reversed(self.traces) if trace.id == trace_id), None)
+
+
+def chrome_trace_events(traces):
+    """Chrome Trace Event format (chrome://tracing, Perfetto): one row (tid) per trace, times in µs"""
+    events = []
+    for index, trace in enumerate(traces, 1):
+        base = trace.started_at * 1_000_000
+        events.append({"name": trace.name, "cat": "request", "ph": "X", "pid": 1, "tid": index,
+                       "ts": round(base), "dur": round(trace.duration * 1000),
+                       "args": {"requestId": trace.id, **trace.attrs, "droppedSpans": trace.dropped}})
+        for span in trace.spans:
+            args = dict(span.get("attrs", {}))
+            if "error" in span:
+                args["error"] = span["error"]
+            events.append({"name": span["name"], "cat": span_kind(span["name"]), "ph": "X", "pid": 1,
+                           "tid": index, "ts": round(base + span["start"] * 1000),
+                           "dur": round(span["duration"] * 1000), "args": args})
+    return {"displayTimeUnit": "ms", "traceEvents": events}
+
+
+class InMemoryStore:
+    """Tiny thread-safe document store: one dict of documents (keyed by `id`) per collection
+
+    Each public call stands for one MongoDB round trip and is counted for the
+    request being handled on the calling thread (see `track_ops`). The store
+    lock stands in for the connection pool: waiting for it is reported as the
+    checkout wait, and each call is timed as `collection.command`.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.collections = {}
+        self.ops = threading.local()
+        self.metrics_lock = threading.Lock()
+        self.pool = {"open": 1, "inUse": 0, "waiting": 0, "peakInUse": 0, "peakWaiting": 0,
+                     "checkouts": 0, "checkoutFailures": {}, "cleared": 0}
+        self.checkout_wait = LatencyStats()
+        self.operations = {}
+
+    def collection(self, name):
+        return self.collections.setdefault(name, {})
+
+    def track_ops(self):
+        """Start counting round trips for the request on this thread"""
+        self.ops.count = 0
+
+    def ops_count(self):
+        return getattr(self.ops, "count", 0)
+
+    @contextlib.contextmanager
+    def _op(self, name, command):
+        """Hold the store lock for one round trip, counting and timing it"""
+        if getattr(self.ops, "count", None) is not None:
+            self.ops.count += 1
+        pool = self.pool
+        started = time.perf_counter()
+        with self.metrics_lock:
+            pool["waiting"] += 1
+            pool["peakWaiting"] = max(pool["peakWaiting"], pool["waiting"])
+        with self.lock:
+            checked_out = time.perf_counter()
+            with self.metrics_lock:
+                pool["waiting"] -= 1
+                pool["inUse"] += 1
+                pool["peakInUse"] = max(pool["peakInUse"], pool["inUse"])
+                pool["checkouts"] += 1
+                self.checkout_wait.record((checked_out - started) * 1000)
+            failed = True
+            try:
+                yield
+                failed = False
+            finally:
+                ended = time.perf_counter()
+                key = f"{name}.{command}"
+                with self.metrics_lock:
+                    pool["inUse"] -= 1
+                    if key not in self.operations:
+                        self.operations[key] = LatencyStats()
+                    self.operations[key].record((ended - started) * 1000, failed)
+                trace = current_trace()
+                if trace is not None:
+                    trace.add(f"db {key}", started, ended)
+
+    def pool_stats(self):
+        with self.metrics_lock:
+            return {**self.pool, "checkoutFailures": dict(self.pool["checkoutFailures"]),
+                    "checkoutWaitMs": self.checkout_wait.to_dict()}
+
+    def operation_stats(self):
+        """Per `collection.command` latency, slowest p95 first"""
+        with self.metrics_lock:
+            stats = [(key, value.to_dict()) for key, value in self.operations.items()]
+        return dict(sorted(stats, key=lambda item: (-item[1]["p95"], -item[1]["count"])))
+
+    def insert(self, name, doc):
+        with self._op(name, "insert"):
+            self.collection(name)[doc["id"]] = doc
+            return doc
+
+    def insert_if_absent(self, name, doc):
+        """Like updateOne(..., {$setOnInsert}, {upsert: true}): one round trip, keeps an existing doc"""
+        with self._op(name, "update"):
+            return self.collection(name).setdefault(doc["id"], doc)
+
+    def get(self, name, doc_id):
+        with self._op(name, "find"):
+            return self.collection(name).get(doc_id)
+
+    def find(self, name, predicate=None):
+        with self._op(name, "find"):
+            return [doc for doc in self.collection(name).values() if predicate is None or predicate(doc)]
+
+    def find_one(self, name, predicate):
+        with self._op(name, "find"):
+            return next((doc for doc in self.collection(name).values() if predicate(doc)), None)
+
+    def update(self, name, doc_id, changes):
+        with self._op(name, "update"):
+            doc = self.collection(name).get(doc_id)
+            if doc is None:
+                return None
+            doc.update(changes)
+            return doc
+
+    def find_one_and_update(self, name, doc_id, apply):
+        """Atomically run `apply(doc)` and return a copy of the document as it was before"""
+        with self._op(name, "findAndModify"):
+            doc = self.collection(name).get(doc_id)
+            if doc is None:
+                return None
+            before = dict(doc)
+            apply(doc)
+            return before
+
+    def delete(self, name, doc_id):
+        with self._op(name, "delete"):
+            return self.collection(name).pop(doc_id, None) is not None
+
+    def bulk_increment(self, name, updates):
+        """Like bulkWrite of upserting $inc updates: [(id, {field: delta}, {field: value to set})]"""
+        with self._op(name, "update"):
+            collection = self.collection(name)
+            for doc_id, inc, fields in updates:
+                doc = collection.setdefault(doc_id, {"id": doc_id})
+                for field, delta in inc.items():
+                    doc[field] = doc.get(field, 0) + delta
+                doc.update(fields)
+
+    def bulk_upsert(self, name, entries):
+        """Like bulkWrite of upserting updateOnes: [(id, {$set fields}, {$setOnInsert fields})] -> (inserted, matched)
+
+        Dotted keys ("specs.movement") set one nested field, as they do in MongoDB.
+        """
+        def apply(doc, fields):
+            for key, value in fields.items():
+                target = doc
+                *parents, leaf = key.split(".")
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[leaf] = value
+
+        inserted = matched = 0
+        with self._op(name, "update"):
+            collection = self.collection(name)
+            for doc_id, fields, on_insert in entries:
+                doc = collection.get(doc_id)
+                if doc is None:
+                    doc = collection[doc_id] = {}
+                    apply(doc, on_insert)
+                    inserted += 1
+                else:
+                    matched += 1
+                apply(doc, fields)
+        return inserted, matched
+
+    def replace_all(self, name, docs):
+        """Like renaming a freshly built collection over the old one"""
+        with self._op(name, "insert"):
+            self.collections[name] = {doc["id"]: doc for doc in docs}
+
+
+class FakeResend:
+    """Records invoice emails instead of calling the Resend API"""
+
+    def __init__(self, delay=0.0, failure_rate=0.0):
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.lock = threading.Lock()
+        self.sent = []
+
+    def send(self, sender, to, subject, html):
+        if self.delay:
+            time.sleep(self.delay)
+        if random.random() < self.failure_rate:
+            return None, {"message": "Simulated Resend failure"}
+        email_id = str(uuid.uuid4())
+        with self.lock:
+            self.sent.append({"id": email_id, "from": sender, "to": to, "subject": subject,
+                              "size": len(html), "sentAt": now_iso()})
+        return {"id": email_id}, None
+
+    def send_batch(self, emails):
+        """Like resend.batch.send: one call, all-or-nothing, ids in request order"""
+        if self.delay:
+            time.sleep(self.delay)
+        if random.random() < self.failure_rate:
+            return None, {"message": "Simulated Resend failure"}
+        sent = [{"id": str(uuid.uuid4()), "from": email["from"], "to": email["to"], "subject": email["subject"],
+                 "size": len(email["html"]), "sentAt": now_iso()} for email in emails]
+        with self.lock:
+            self.sent.extend(sent)
+        return {"data": [{"id": email["id"]} for email in sent]}, None
+
+
+class EmailOutbox:
+    """Mirror of lib/outbox.js: persistent jobs, batched delivery, retries with exponential backoff
+
+    `deliver(jobs)` returns one {"success", "emailId"/"error", "permanent"} dict per job.
+    The backoff base is much shorter than production so retries show up within a test run.
+    """
+
+    def __init__(self, store, deliver, batch_size=20, max_attempts=6, backoff_base=0.2, backoff_max=5.0,
+                 tracer=None):
+        self.store = store
+        self.deliver = deliver
+        self.tracer = tracer or Tracer()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def enqueue(self, job_type, order_id, dedupe_key=None):
+        job_id = dedupe_key or f"{job_type}:{order_id}"
+        self.store.insert_if_absent("emailOutbox", {
+            "id": job_id, "dedupeKey": job_id, "type": job_type, "orderId": order_id, "status": "pending",
+            "attempts": 0, "nextAttemptAt": time.time(), "createdAt": now_iso(),
+            # Links the delivery trace back to the request that queued the email
+            "requestId": current_trace().id if current_trace() else None
+        })
+        self.start()
+        self.wakeup.set()
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="email-outbox", daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def claim(self):
+        now = time.time()
+        with self.store.lock:
+            due = sorted(self.store.find("emailOutbox", lambda job: job["status"] == "pending"
+                                         and job["nextAttemptAt"] <= now),
+                         key=lambda job: job["nextAttemptAt"])[:self.batch_size]
+            for job in due:
+                job["status"] = "sending"
+                job["attempts"] += 1
+        return due
+
+    def settle(self, jobs, results):
+        now = time.time()
+        with self.store.lock:
+            for job, result in zip(jobs, results):
+                if result.get("success"):
+                    job.update(status="sent", sentAt=now_iso(), emailId=result.get("emailId"))
+                    job.pop("lastError", None)
+                    continue
+                exhausted = result.get("permanent") or job["attempts"] >= self.max_attempts
+                delay = min(self.backoff_base * 2 ** (job["attempts"] - 1), self.backoff_max)
+                job.update(status="failed" if exhausted else "pending",
+                           nextAttemptAt=now + delay * (0.5 + random.random() / 2),
+                           lastError=str(result.get("error")))
+
+    def next_due_in(self):
+        with self.store.lock:
+            pending = [job["nextAttemptAt"] for job in self.store.find("emailOutbox")
+                       if job["status"] == "pending"]
+        return max(min(pending) - time.time(), 0.0) if pending else None
+
+    def run(self):
+        while not self.stopped.is_set():
+            jobs = self.claim()
+            if jobs:
+                with self.tracer.trace("outbox invoice", jobs=len(jobs),
+                                       requestIds=[job["requestId"] for job in jobs if job.get("requestId")]):
+                    try:
+                        results = self.deliver(jobs)
+                    except Exception as e:
+                        results = [{"success": False, "error": str(e)} for _ in jobs]
+                    self.settle(jobs, results)
+                continue
+            self.wakeup.wait(self.next_due_in())
+            self.wakeup.clear()
+
+
+class TokenSigner:
+    """HS256 JWTs compatible with jsonwebtoken's sign/verify"""
+
+    def __init__(self, secret):
+        self.secret = secret.encode()
+
+    @staticmethod
+    def _b64(data):
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    @staticmethod
+    def _unb64(data):
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+    def sign(self, payload, expires_in=30 * 24 * 3600):
+        issued = int(time.time())
+        header = self._b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+        body = self._b64(json.dumps({**payload, "iat": issued, "exp": issued + expires_in}).encode())
+        signature = hmac.new(self.secret, f"{header}.{body}".encode(), hashlib.sha256).digest()
+        return f"{header}.{body}.{self._b64(signature)}"
+
+    def verify(self, token):
+        try:
+            header, body, signature = token.split(".")
+            expected = hmac.new(self.secret, f"{header}.{body}".encode(), hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, self._unb64(signature)):
+                return None
+            payload = json.loads(self._unb64(body))
+            if payload.get("exp") and payload["exp"] < time.time():
+                return None
+            return payload
+        except (ValueError, json.JSONDecodeError):
+            return None
+
+
+def hash_password(password, rounds=1000):
+    # Stand-in for bcrypt: salted PBKDF2 keeps the work per login non-trivial (hashlib releases the GIL)
+    # Traced under the bcrypt span names so both servers report the same breakdown
+    salt = os.urandom(8).hex()
+    with span("bcrypt.hash", rounds=rounds):
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), rounds).hex()
+    return f"pbkdf2${rounds}${salt}${digest}"
+
+
+def check_password(password, stored):
+    try:
+        _, rounds, salt, digest = stored.split("$")
+    except (AttributeError, ValueError):
+        return False
+    with span("bcrypt.compare"):
+        candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(rounds)).hex()
+    return hmac.compare_digest(candidate, digest)
+
+
+def tune_password_rounds(target_ms=10.0, min_rounds=1000, max_rounds=1_000_000):
+    """Mirror of tunePasswordCost: time min_rounds once and scale to the target hash time"""
+    start = time.perf_counter()
+    hash_password("cost-calibration", min_rounds)
+    elapsed_ms = max((time.perf_counter() - start) * 1000, 0.01)
+    return int(min(max(min_rounds * target_ms / elapsed_ms, min_rounds), max_rounds))
+
+
+class RateLimiter:
+    """Mirror of lib/rateLimit.js: fixed window of `limit` hits per key"""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def check(self, key):
+        """(allowed, retry_after_seconds) without counting"""
+        now = time.time()
+        with self.lock:
+            window = self.windows.get(key)
+            if window and window[1] <= now:
+                del self.windows[key]
+                window = None
+            if window and window[0] >= self.limit:
+                return False, window[1] - now
+        return True, 0.0
+
+    def hit(self, key):
+        now = time.time()
+        with self.lock:
+            count, reset_at = self.windows.get(key, (0, now + self.window))
+            if reset_at <= now:
+                count, reset_at = 0, now + self.window
+            self.windows[key] = (count + 1, reset_at)
+
+    def reset(self, key):
+        with self.lock:
+            self.windows.pop(key, None)
+
+
+PRODUCT_CARD_FIELDS = ["id", "name", "description", "price", "image", "images", "stock",
+                       "category", "productType", "gender", "brand", "createdAt"]
+PROJECTABLE_FIELDS = set(PRODUCT_CARD_FIELDS) | {"specs", "ratingAverage", "ratingCount", "updatedAt"}
+PRODUCT_SORTS = {
+    "default": ("createdAt", 1),
+    "price-asc": ("price", 1),
+    "price-desc": ("price", -1),
+    "name-asc": ("name", 1),
+    "name-desc": ("name", -1),
+    "newest": ("createdAt", -1),
+}
+MAX_PAGE_SIZE = 100
+REVIEW_PAGE_SIZE = 20
+
+
+def encode_cursor(doc, sort_field):
+    return base64.urlsafe_b64encode(json.dumps([doc.get(sort_field), doc["id"]]).encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, doc_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Geçersiz cursor")
+    return value, doc_id
+
+
+def query_products(products, params):
+    """Mirror of lib/catalog.js: filter, sort, cursor-paginate and project a product list"""
+    def values(name):
+        return [v.strip() for v in (params.get(name) or "").split(",") if v.strip()]
+
+    for field in ("productType", "category", "gender", "brand"):
+        wanted = values(field)
+        if wanted:
+            products = [p for p in products if p.get(field) in wanted]
+    min_price = parse_float(params.get("minPrice"))
+    max_price = parse_float(params.get("maxPrice"))
+    if min_price is not None:
+        products = [p for p in products if (p.get("price") or 0) >= min_price]
+    if max_price is not None:
+        products = [p for p in products if (p.get("price") or 0) <= max_price]
+    search = (params.get("search") or "").strip().lower()
+    if search:
+        products = [p for p in products
+                    if any(search in str(p.get(f) or "").lower() for f in ("name", "brand", "description", "category"))]
+
+    sort_key = params.get("sort") if params.get("sort") in PRODUCT_SORTS else "default"
+    sort_field, direction = PRODUCT_SORTS[sort_key]
+    paginate = "limit" in params or "cursor" in params
+    if paginate or sort_key != "default":
+        products = sorted(products, key=lambda p: (p.get(sort_field) is not None, p.get(sort_field) or 0, p["id"]),
+                          reverse=direction == -1)
+
+    if params.get("cursor"):
+        value, last_id = decode_cursor(params["cursor"])
+        if direction == 1:
+            products = [p for p in products if (p.get(sort_field), p["id"]) > (value, last_id)]
+        else:
+            products = [p for p in products if (p.get(sort_field), p["id"]) < (value, last_id)]
+
+    fields = [f for f in values("fields") if f in PROJECTABLE_FIELDS]
+    if fields:
+        keep = set(fields) | {"id", sort_field}
+        project = lambda p: {k: v for k, v in p.items() if k in keep}
+    else:
+        project = without_rating_sum
+
+    if not paginate:
+        return [project(p) for p in products]
+    limit = min(max(parse_int(params.get("limit")) or 24, 1), MAX_PAGE_SIZE)
+    page = products[:limit]
+    next_cursor = encode_cursor(page[-1], sort_field) if len(products) > limit else None
+    return {"items": [project(p) for p in page], "nextCursor": next_cursor}
+
+
+def without_rating_sum(product):
+    """Public product view: ratingSum only feeds ratingAverage and stays server-side"""
+    if product is None:
+        return None
+    return {k: v for k, v in product.items() if k != "ratingSum"}
+
+
+def query_reviews(reviews, params):
+    """Mirror of lib/reviews.js: newest first, cursor-paginated when limit or cursor is given"""
+    reviews = sorted(reviews, key=lambda r: (r["createdAt"], r["id"]), reverse=True)
+    if params.get("cursor"):
+        value, last_id = decode_cursor(params["cursor"])
+        reviews = [r for r in reviews if (r["createdAt"], r["id"]) < (value, last_id)]
+    paginate = "limit" in params or "cursor" in params
+    if not paginate:
+        return reviews[:MAX_PAGE_SIZE]
+    limit = min(max(parse_int(params.get("limit")) or REVIEW_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    page = reviews[:limit]
+    next_cursor = encode_cursor(page[-1], "createdAt") if len(reviews) > limit else None
+    return {"items": page, "nextCursor": next_cursor}
+
+
+def etag_matches(if_none_match, etag):
+    """Weak If-None-Match comparison, as in lib/images.js"""
+    if not if_none_match:
+        return False
+    return any(tag.strip() == "*" or re.sub(r"^W/", "", tag.strip()) == etag for tag in if_none_match.split(","))
+
+
+def parse_range(header, size):
+    """Single "bytes=start-end" range: None = whole file, False = unsatisfiable"""
+    match = re.match(r"^bytes=(\d*)-(\d*)$", (header or "").strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    if not match.group(1):
+        start, end = max(size - int(match.group(2)), 0), size - 1
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def parse_derivative_params(params, accept):
+    """Mirror of parseDerivativeParams in lib/images.js; None means the original file"""
+    width, quality, fmt = parse_int(params.get("w")), parse_int(params.get("q")), params.get("format")
+    if width is None and quality is None and not fmt:
+        return None
+    if width is not None:
+        width = next((w for w in DERIVATIVE_WIDTHS if w >= width), DERIVATIVE_WIDTHS[-1])
+    quality = 75 if quality is None else min(max(quality, 1), 100)
+    negotiated = not fmt or fmt == "auto"
+    if negotiated:
+        accept = accept or ""
+        # AVIF only on explicit request: it encodes far slower than WebP
+        fmt = "webp" if "image/webp" in accept else "jpeg"
+    if fmt not in DERIVATIVE_FORMATS:
+        raise ValueError("Geçersiz görsel formatı (webp, avif, jpeg, png, auto)")
+    return {"width": width, "quality": quality, "format": fmt, "negotiated": negotiated}
+
+
+class LRUCache:
+    """Byte-bounded LRU, as in lib/lruCache.js"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            if len(value) > self.max_bytes:
+                return
+            previous = self.entries.pop(key, None)
+            self.bytes += len(value) - (len(previous) if previous is not None else 0)
+            self.entries[key] = value
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+
+def render_derivative(data, params):
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    if params["width"] and image.width > params["width"]:
+        image = image.resize((params["width"], round(image.height * params["width"] / image.width)),
+                             Image.Resampling.LANCZOS)
+    if params["format"] == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    out = BytesIO()
+    image.save(out, format=params["format"].upper(), quality=params["quality"])
+    return out.getvalue()
+
+
+INVOICE_HEAD = ("<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head><body>"
+                "<h1>🕐 Cyprus Watch</h1><h2>Fatura</h2>")
+INVOICE_TABLE_HEAD = ("<h3>Sipariş Detayları</h3><table><thead><tr><th>Ürün</th><th>Adet</th>"
+                      "<th>Birim Fiyat</th><th>Toplam</th></tr></thead><tbody>")
+INVOICE_FOOT = "<p>Teşekkür ederiz! 🎉</p></body></html>"
+INVOICE_STATUS = {"paid": "✅ Ödendi", "awaiting_transfer": "⏳ Havale Bekleniyor"}
+
+
+def render_invoice(order, user):
+    """Mirror of lib/invoice.js renderInvoiceHTML: static shell, per-order rows only"""
+    customer = order.get("customerInfo") or {}
+    user = user or {}
+    parts = [INVOICE_HEAD, "<p><strong>Sipariş No:</strong> ", html.escape(order["id"]), "</p>"]
+    for label, field in (("Müşteri", "fullName"), ("E-posta", "email"), ("Telefon", "phone"), ("Adres", "address")):
+        value = customer.get(field) or user.get(field) or "N/A"
+        parts += ["<p><strong>", label, ":</strong> ", html.escape(str(value)), "</p>"]
+    parts += ["<p><strong>Durum:</strong> ", INVOICE_STATUS.get(order.get("status"), "📦 Beklemede"), "</p>",
+              INVOICE_TABLE_HEAD]
+    for item in order.get("items") or []:
+        price = parse_float(item.get("price")) or 0.0
+        quantity = parse_int(item.get("quantity")) or 0
+        parts += ["<tr><td>", html.escape(str(item.get("name"))), "</td><td>", str(quantity), "</td><td>",
+                  f"{price:.2f} ₺</td><td><strong>{price * quantity:.2f} ₺</strong></td></tr>"]
+    parts += ["</tbody></table><div>Toplam Tutar: ", f"{parse_float(order.get('totalAmount')) or 0.0:.2f} ₺</div>"]
+    if order.get("paymentMethod") == "transfer":
+        parts += ["<p><strong>IBAN:</strong> TR33 0006 1005 1978 6457 8413 26 (", html.escape(order["id"]), ")</p>"]
+    parts.append(INVOICE_FOOT)
+    return "".join(parts)
+
+
+ORDER_TRANSITIONS = {
+    "pending": ("awaiting_transfer", "paid", "shipped", "cancelled"),
+    "awaiting_transfer": ("paid", "shipped", "cancelled"),
+    "paid": ("shipped", "delivered", "cancelled"),
+    "shipped": ("delivered", "cancelled"),
+    "delivered": (),
+    "cancelled": (),
+}
+
+
+def transition_order(store, order_id, to, fields=None, condition=None):
+    """Mirror of lib/orders.js transitionOrder: (order, changed, from) in one atomic round trip
+
+    `condition(order)` is checked with the transition; when it fails the order counts as not found.
+    Releasing the stock of a cancelled order is CyprusWatchAPI.transition's job.
+    """
+    if to not in ORDER_TRANSITIONS:
+        raise ValueError("Geçersiz sipariş durumu")
+    changes = {**(fields or {}), "status": to, "updatedAt": now_iso()}
+    matched = True
+
+    def apply(order):
+        nonlocal matched
+        if condition is not None and not condition(order):
+            matched = False
+        elif to in ORDER_TRANSITIONS.get(order.get("status") or "pending", ()):
+            order.update(changes)
+
+    before = store.find_one_and_update("orders", order_id, apply)
+    if before is None or not matched:
+        return None, False, None
+    source = before.get("status") or "pending"
+    if to in ORDER_TRANSITIONS.get(source, ()):
+        order = {**before, **changes}
+        record_order_transition(store, order, source, to)
+        return order, True, source
+    return before, False, source
+
+
+REVENUE_STATUSES = ("paid", "shipped", "delivered")
+STATS_DAYS = 30
+TOP_PRODUCTS = 10
+
+
+def revenue_updates(order, sign):
+    """Mirror of lib/adminStats.js revenueUpdates: totals, order day and per-product sales"""
+    amount = sign * (order.get("totalAmount") or 0)
+    updates = [("totals", {"revenue": amount, "paidOrders": sign}, {}),
+               (f"day:{order['createdAt'][:10]}", {"revenue": amount}, {"kind": "day", "date": order["createdAt"][:10]})]
+    for item in order.get("items") or []:
+        if not isinstance(item, dict) or not item.get("id"):
+            continue
+        quantity = item.get("quantity") or 0
+        updates.append((f"product:{item['id']}",
+                        {"quantity": sign * quantity, "revenue": sign * (item.get("price") or 0) * quantity},
+                        {"kind": "product", "productId": item["id"], "name": item.get("name")}))
+    return updates
+
+
+def record_order_created(store, order):
+    status = order.get("status") or "pending"
+    updates = [("totals", {"orders": 1, f"byStatus.{status}": 1}, {}),
+               (f"day:{order['createdAt'][:10]}", {"orders": 1}, {"kind": "day", "date": order["createdAt"][:10]})]
+    if status in REVENUE_STATUSES:
+        updates += revenue_updates(order, 1)
+    store.bulk_increment("adminStats", updates)
+
+
+def record_order_transition(store, order, source, to):
+    updates = [("totals", {f"byStatus.{source}": -1, f"byStatus.{to}": 1}, {})]
+    if (source in REVENUE_STATUSES) != (to in REVENUE_STATUSES):
+        updates += revenue_updates(order, 1 if to in REVENUE_STATUSES else -1)
+    store.bulk_increment("adminStats", updates)
+
+
+def record_user_registered(store, user):
+    day = user["createdAt"][:10]
+    store.bulk_increment("adminStats", [("totals", {"users": 1}, {}),
+                                        (f"day:{day}", {"users": 1}, {"kind": "day", "date": day})])
+
+
+def get_admin_stats(store, days=STATS_DAYS, top=TOP_PRODUCTS):
+    """Mirror of lib/adminStats.js getAdminStats: last `days` days, status counts and best sellers"""
+    days = min(max(days, 1), 366)
+    today = datetime.now(timezone.utc).date()
+    dates = [(today - timedelta(days=days - 1 - i)).isoformat() for i in range(days)]
+    wanted = {"totals", *(f"day:{date}" for date in dates)}
+    docs = {doc["id"]: doc for doc in store.find("adminStats", lambda d: d["id"] in wanted)}
+    products = store.find("adminStats", lambda d: d.get("kind") == "product" and d.get("quantity", 0) > 0)
+    totals = docs.get("totals", {})
+    return {
+        "totals": {field: totals.get(field, 0) for field in ("orders", "revenue", "paidOrders", "users")},
+        "ordersByStatus": {status: totals.get(f"byStatus.{status}", 0) for status in ORDER_TRANSITIONS},
+        "daily": [{"date": date, **{field: docs.get(f"day:{date}", {}).get(field, 0)
+                                    for field in ("orders", "revenue", "users")}} for date in dates],
+        "topProducts": [{key: p[key] for key in ("productId", "name", "quantity", "revenue")}
+                        for p in sorted(products, key=lambda p: p["quantity"], reverse=True)[:top]],
+    }
+
+
+def rebuild_admin_stats(store):
+    """Mirror of lib/adminStats.js rebuildAdminStats: recompute every aggregate from orders and users"""
+    docs = {}
+
+    def add(doc_id, inc, fields):
+        doc = docs.setdefault(doc_id, {"id": doc_id, **fields})
+        for field, delta in inc.items():
+            doc[field] = doc.get(field, 0) + delta
+
+    orders = store.find("orders")
+    users = store.find("users")
+    for order in orders:
+        status = order.get("status") or "pending"
+        day = order["createdAt"][:10]
+        add("totals", {"orders": 1, f"byStatus.{status}": 1}, {})
+        add(f"day:{day}", {"orders": 1, "revenue": 0, "users": 0}, {"kind": "day", "date": day})
+        if status in REVENUE_STATUSES:
+            for doc_id, inc, fields in revenue_updates(order, 1):
+                add(doc_id, inc, fields)
+    for user in users:
+        day = user["createdAt"][:10]
+        add("totals", {"users": 1}, {})
+        add(f"day:{day}", {"orders": 0, "revenue": 0, "users": 1}, {"kind": "day", "date": day})
+    store.replace_all("adminStats", docs.values())
+    return {"orders": len(orders), "users": len(users),
+            "days": sum(1 for d in docs.values() if d.get("kind") == "day"),
+            "products": sum(1 for d in docs.values() if d.get("kind") == "product")}
+
+
+ADMIN_PAGE_SIZE = 50
+ORDER_HISTORY_PAGE_SIZE = 20
+DATE_ONLY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def date_bound(value, is_end):
+    """createdAt bound for a from/to query value; a date-only `to` covers that whole day"""
+    try:
+        date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("Geçersiz tarih")
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    whole_day = is_end and DATE_ONLY.match(value)
+    if whole_day:
+        date += timedelta(days=1)
+    iso = date.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    if whole_day:
+        return lambda created: created < iso
+    return (lambda created: created <= iso) if is_end else (lambda created: created >= iso)
+
+
+def query_admin_list(docs, params, statuses=None, page_size=ADMIN_PAGE_SIZE, always_paginate=False):
+    """Mirror of lib/adminLists.js: newest first, status/date filters, cursor-paginated when limit or cursor is given"""
+    status_param = params.get("status") if statuses else None
+    if status_param and status_param != "all":
+        values = [v.strip() for v in status_param.split(",") if v.strip()]
+        if any(v not in statuses for v in values):
+            raise ValueError("Geçersiz sipariş durumu")
+        docs = [d for d in docs if (d.get("status") or "pending") in values]
+    for name, is_end in (("from", False), ("to", True)):
+        if params.get(name):
+            matches = date_bound(params[name], is_end)
+            docs = [d for d in docs if matches(d["createdAt"])]
+    docs = sorted(docs, key=lambda d: (d["createdAt"], d["id"]), reverse=True)
+    if params.get("cursor"):
+        value, last_id = decode_cursor(params["cursor"])
+        docs = [d for d in docs if (d["createdAt"], d["id"]) < (value, last_id)]
+    paginate = always_paginate or "limit" in params or "cursor" in params
+    if not paginate:
+        return docs[:MAX_PAGE_SIZE]
+    limit = min(max(parse_int(params.get("limit")) or page_size, 1), MAX_PAGE_SIZE)
+    page = docs[:limit]
+    next_cursor = encode_cursor(page[-1], "createdAt") if len(docs) > limit else None
+    return {"items": page, "nextCursor": next_cursor}
+
+
+class UserCache:
+    """Mirror of lib/userCache.js: per-process profile and favorite summaries with a TTL"""
+
+    def __init__(self, store, ttl=30.0):
+        self.store = store
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.favorites = {}
+
+    def _get(self, cache, key):
+        with self.lock:
+            entry = cache.get(key)
+            if entry and entry[1] > time.time():
+                return entry[0]
+        return None
+
+    def _set(self, cache, key, value):
+        with self.lock:
+            if len(cache) > 5000:
+                cache.clear()
+            cache[key] = (value, time.time() + self.ttl)
+
+    def profile(self, user_id):
+        cached = self._get(self.profiles, user_id)
+        if cached is not None:
+            return cached
+        user = self.store.get("users", user_id)
+        if user is None:
+            return None
+        profile = without_password(user)
+        profile["favoriteProducts"] = list(profile.get("favoriteProducts") or [])
+        self._set(self.profiles, user_id, profile)
+        return profile
+
+    def favorite_products(self, user_id):
+        cached = self._get(self.favorites, user_id)
+        if cached is not None:
+            return cached
+        user = self.profile(user_id)
+        if user is None:
+            return None
+        favorite_ids = set(user["favoriteProducts"])
+        products = ([{field: p.get(field) for field in PRODUCT_CARD_FIELDS if field in p}
+                     for p in self.store.find("products", lambda p: p["id"] in favorite_ids)]
+                    if favorite_ids else [])
+        self._set(self.favorites, user_id, products)
+        return products
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.profiles.pop(user_id, None)
+            self.favorites.pop(user_id, None)
+
+    def invalidate_favorites(self):
+        with self.lock:
+            self.favorites.clear()
+
+
+CATALOG_CACHE_CONTROL = "public, max-age=5, stale-while-revalidate=60"
+PRODUCT_LIST_SCOPES = ("catalog", "products")
+
+
+def product_scopes(product_id):
+    return ("catalog", f"product:{product_id}")
+
+
+class ResponseCache:
+    """Mirror of lib/responseCache.js: versioned catalog responses with strong ETags and stale-while-revalidate"""
+
+    def __init__(self, fresh=30.0, stale=300.0, max_bytes=64 * 1024 * 1024):
+        self.fresh = fresh
+        self.stale = stale
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.versions = {}
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.refreshing = set()
+        self.counters = {"hits": 0, "stale": 0, "misses": 0, "bypassed": 0, "coalesced": 0, "notModified": 0}
+
+    def invalidate_product(self, product_id):
+        self._bump(("products", f"product:{product_id}"))
+
+    def invalidate_catalog(self):
+        self._bump(("catalog",))
+
+    def _bump(self, scopes):
+        with self.lock:
+            for scope in scopes:
+                self.versions[scope] = self.versions.get(scope, 0) + 1
+
+    def _key(self, path, query, scopes):
+        with self.lock:
+            versions = ",".join(f"{scope}@{self.versions.get(scope, 0)}" for scope in scopes)
+        return f"{versions} {path}?{sorted(query.items())}"
+
+    def _load(self, key, loader, not_found):
+        value = loader()
+        body = json.dumps(value if value is not None else {"error": not_found}, ensure_ascii=False).encode()
+        entry = {
+            "status": 200 if value is not None else 404,
+            "body": body,
+            "etag": '"' + base64.urlsafe_b64encode(hashlib.sha256(body).digest()).decode().rstrip("=") + '"',
+            "stored_at": time.time(),
+        }
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            self.bytes += len(body) - (len(previous["body"]) if previous else 0)
+            self.entries[key] = entry
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted["body"])
+        return entry
+
+    def _refresh(self, key, loader, not_found):
+        try:
+            self._load(key, loader, not_found)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def respond(self, request, entry, state):
+        headers = {"X-Cache": state}
+        if entry["status"] != 200:
+            return Response(entry["status"], entry["body"], "application/json", headers)
+        headers.update({"ETag": entry["etag"], "Cache-Control": CATALOG_CACHE_CONTROL})
+        if etag_matches(request.headers.get("If-None-Match"), entry["etag"]):
+            with self.lock:
+                self.counters["notModified"] += 1
+            return Response(304, b"", "application/json", headers)
+        return Response(200, entry["body"], "application/json", headers)
+
+    def cached_json(self, request, path, scopes, loader, not_found="Bulunamadı"):
+        key = self._key(path, request.query, scopes)
+        if "no-cache" in (request.headers.get("Cache-Control") or ""):
+            with self.lock:
+                self.counters["bypassed"] += 1
+            return self.respond(request, self._load(key, loader, not_found), "BYPASS")
+
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and now - entry["stored_at"] >= self.fresh + self.stale:
+                self.bytes -= len(self.entries.pop(key)["body"])
+                entry = None
+            if entry:
+                self.entries.move_to_end(key)
+            state = "MISS" if not entry else "HIT" if now - entry["stored_at"] < self.fresh else "STALE"
+            self.counters[{"MISS": "misses", "HIT": "hits", "STALE": "stale"}[state]] += 1
+            refresh = state == "STALE" and key not in self.refreshing
+            if refresh:
+                self.refreshing.add(key)
+        if refresh:
+            threading.Thread(target=self._refresh, args=(key, loader, not_found), daemon=True).start()
+        return self.respond(request, entry or self._load(key, loader, not_found), state)
+
+    def stats(self):
+        with self.lock:
+            served = self.counters["hits"] + self.counters["stale"] + self.counters["misses"]
+            return {"entries": len(self.entries), "bytes": self.bytes, **self.counters,
+                    "hitRatio": (self.counters["hits"] + self.counters["stale"]) / served if served else 0.0,
+                    "shared": False}
+
+
+SEARCH_FIELD_WEIGHTS = {"name": 4, "brand": 4, "category": 2, "productType": 2, "gender": 2, "specs": 1.5,
+                        "description": 1}
+SEARCH_SPEC_FIELDS = ["glassType", "machineType", "dialColor", "strapType", "caseMaterial"]
+SEARCH_SORTS = ("relevance", "default", "price-asc", "price-desc", "name-asc", "name-desc", "newest")
+SEARCH_FACET_FIELDS = ("productType", "brand", "gender", "category")
+PRICE_BUCKETS = [0, 1000, 5000, 10000, 25000, 50000, 100000]
+MAX_QUERY_TERMS = 10
+MIN_FUZZY_LENGTH = 4
+MAX_PREFIX_TERMS = 50
+FACET_LIMIT = 20
+MATCH_EXACT, MATCH_SYNONYM, MATCH_PREFIX, MATCH_FUZZY = 1.0, 0.9, 0.7, 0.5
+SYNONYM_GROUPS = [
+    ["saat", "watch"], ["gozluk", "eyewear", "glass", "sunglass"], ["gunes", "sun"],
+    ["erkek", "male", "men", "man"], ["kadin", "female", "women", "woman", "bayan"],
+    ["celik", "steel"], ["altin", "gold"], ["gumus", "silver"], ["deri", "leather"], ["siyah", "black"],
+    ["beyaz", "white"], ["mavi", "blue"], ["yesil", "green"], ["kirmizi", "red"], ["otomatik", "automatic"],
+    ["kuvars", "quartz"], ["safir", "sapphire"], ["kayis", "strap"], ["kadran", "dial"],
+    ["dalgic", "diver", "dive"], ["kronograf", "chronograph"],
+]
+SYNONYMS = {term: [other for other in group if other != term] for group in SYNONYM_GROUPS for term in group}
+
+
+def normalize_text(text):
+    """Fold case and Turkish/Latin diacritics: "İSTANBUL" -> "istanbul", "Gözlük" -> "gozluk\""""
+    text = re.sub("[İI]", "i", str(text or "")).lower()
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+    return text.replace("ı", "i")
+
+
+def stem(term):
+    """Strip Turkish (-lar/-ler) and English (-s/-es/-ies) plural endings"""
+    if len(term) >= 6 and term.endswith(("lar", "ler")):
+        return term[:-3]
+    if len(term) >= 5 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) >= 5 and re.search("(s|x|z|ch|sh)es$", term):
+        return term[:-2]
+    if len(term) >= 4 and term.endswith("s") and not term.endswith(("ss", "us", "is")):
+        return term[:-1]
+    return term
+
+
+def tokenize(text):
+    return [stem(term) for term in re.split("[^a-z0-9]+", normalize_text(text)) if term]
+
+
+def deletions(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def within_one_edit(a, b):
+    """Optimal string alignment distance is at most 1"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 1] == b[i + 1:i + 2] and a[i + 1:i + 2] == b[i:i + 1]
+                                          and a[i + 2:] == b[i + 2:])
+    return a[i + 1:] == b[i:] if len(a) > len(b) else a[i:] == b[i + 1:]
+
+
+def parse_search_query(params):
+    """Mirror of parseSearchQuery in lib/search.js; raises ValueError on a bad sort"""
+    filters = {}
+    for field in SEARCH_FACET_FIELDS:
+        values = {v.strip() for v in (params.get(field) or "").split(",") if v.strip()}
+        if values:
+            filters[field] = values
+    sort = params.get("sort") or "relevance"
+    if sort not in SEARCH_SORTS:
+        raise ValueError("Geçersiz sıralama")
+    limit = parse_int(params.get("limit"))
+    page = parse_int(params.get("page"))
+    return {"q": (params.get("q") or "")[:200], "filters": filters,
+            "minPrice": parse_float(params.get("minPrice")), "maxPrice": parse_float(params.get("maxPrice")),
+            "sort": sort, "limit": min(max(24 if limit is None else limit, 1), MAX_PAGE_SIZE),
+            "page": max(1 if page is None else page, 1)}
+
+
+class SearchIndex:
+    """Mirror of lib/search.js: inverted index with prefix, synonym and one-edit typo matching
+
+    Products written through this API are re-read on the next search; an import
+    rebuilds the whole index.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.docs = {}
+        self.postings = {}
+        self.sorted_terms = []
+        self.deletes = {}
+        self.built = False
+        self.pending = set()
+        self.counters = {"builds": 0, "incrementalUpdates": 0, "searches": 0}
+
+    def mark_product_changed(self, product_id):
+        with self.lock:
+            self.pending.add(product_id)
+
+    def mark_catalog_changed(self):
+        with self.lock:
+            self.built = False
+
+    def _add_term(self, term):
+        self.postings[term] = {}
+        bisect.insort(self.sorted_terms, term)
+        if len(term) >= MIN_FUZZY_LENGTH:
+            for deleted in deletions(term):
+                self.deletes.setdefault(deleted, set()).add(term)
+
+    def _drop_term(self, term):
+        del self.postings[term]
+        del self.sorted_terms[bisect.bisect_left(self.sorted_terms, term)]
+        if len(term) >= MIN_FUZZY_LENGTH:
+            for deleted in deletions(term):
+                self.deletes[deleted].discard(term)
+                if not self.deletes[deleted]:
+                    del self.deletes[deleted]
+
+    def _remove(self, product_id):
+        doc = self.docs.pop(product_id, None)
+        for term in doc["terms"] if doc else ():
+            postings = self.postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                self._drop_term(term)
+
+    def _add(self, product):
+        self._remove(product["id"])
+        weights = {}
+        specs = product.get("specs") or {}
+        product_type = product_type_of(product)
+        fields = [(product.get(field), SEARCH_FIELD_WEIGHTS[field])
+                  for field in ("name", "brand", "category", "gender", "description")]
+        fields.append((product_type, SEARCH_FIELD_WEIGHTS["productType"]))
+        fields.append((" ".join(specs.get(field) or "" for field in SEARCH_SPEC_FIELDS), SEARCH_FIELD_WEIGHTS["specs"]))
+        for text, weight in fields:
+            for term in tokenize(text):
+                weights[term] = max(weights.get(term, 0), weight)
+        price = product.get("price")
+        self.docs[product["id"]] = {
+            "id": product["id"], "productType": product_type,
+            "brand": product.get("brand") or "", "gender": product.get("gender") or "unisex",
+            "category": product.get("category") or "", "price": price if isinstance(price, (int, float)) else 0,
+            "name": product.get("name") or "", "createdAt": product.get("createdAt") or "", "terms": list(weights),
+        }
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self._add_term(term)
+            self.postings[term][product["id"]] = weight
+
+    def _refresh(self):
+        if not self.built:
+            self.pending.clear()
+            self.docs, self.postings, self.sorted_terms, self.deletes = {}, {}, [], {}
+            for product in self.store.find("products"):
+                self._add(product)
+            self.built = True
+            self.counters["builds"] += 1
+        elif self.pending:
+            ids = set(self.pending)
+            self.pending.clear()
+            for product_id in ids:
+                product = self.store.get("products", product_id)
+                if product:
+                    self._add(product)
+                else:
+                    self._remove(product_id)
+            self.counters["incrementalUpdates"] += len(ids)
+
+    def _expand(self, term, is_last):
+        matches = {}
+
+        def offer(candidate, quality):
+            if candidate in self.postings and matches.get(candidate, 0) < quality:
+                matches[candidate] = quality
+
+        offer(term, MATCH_EXACT)
+        for synonym in SYNONYMS.get(term, ()):
+            offer(synonym, MATCH_SYNONYM)
+        if is_last and len(term) >= 2:
+            start = bisect.bisect_left(self.sorted_terms, term)
+            for candidate in self.sorted_terms[start:start + MAX_PREFIX_TERMS]:
+                if not candidate.startswith(term):
+                    break
+                offer(candidate, MATCH_PREFIX)
+        corrected = None
+        if not matches and len(term) >= MIN_FUZZY_LENGTH:
+            candidates = set(self.deletes.get(term, ()))
+            for deleted in deletions(term):
+                candidates.add(deleted)
+                candidates.update(self.deletes.get(deleted, ()))
+            for candidate in candidates:
+                if within_one_edit(term, candidate):
+                    offer(candidate, MATCH_FUZZY)
+            corrected = sorted(matches)
+        return matches, corrected
+
+    def _match(self, query):
+        terms = list(dict.fromkeys(tokenize(query["q"])))[:MAX_QUERY_TERMS]
+        corrections = {}
+        expanded = []
+        for i, term in enumerate(terms):
+            matches, corrected = self._expand(term, i == len(terms) - 1)
+            if corrected:
+                corrections[term] = corrected
+            expanded.append(matches)
+        if not terms:
+            return {product_id: 0.0 for product_id in self.docs}, corrections, False
+        scores = None
+        for matches in sorted(expanded, key=lambda m: sum(len(self.postings[t]) for t in m)):
+            current = {}
+            for product_id in (scores if scores is not None else
+                               {pid for t in matches for pid in self.postings[t]}):
+                best = max((self.postings[t].get(product_id, 0) * q for t, q in matches.items()), default=0)
+                if best > 0:
+                    current[product_id] = (scores or {}).get(product_id, 0) + best
+            scores = current
+            if not scores:
+                break
+        return scores, corrections, True
+
+    def search(self, query):
+        """Ranked page with total, disjunctive facet counts and typo corrections"""
+        with self.lock:
+            self._refresh()
+            self.counters["searches"] += 1
+            scores, corrections, has_terms = self._match(query)
+            filters, min_price, max_price = query["filters"], query["minPrice"], query["maxPrice"]
+            counts = {field: {} for field in SEARCH_FACET_FIELDS}
+            price_counts = [0] * len(PRICE_BUCKETS)
+            hits = []
+            for product_id, score in scores.items():
+                doc = self.docs[product_id]
+                failed = [field for field in SEARCH_FACET_FIELDS if field in filters and doc[field] not in filters[field]]
+                if (min_price is not None and doc["price"] < min_price) or \
+                        (max_price is not None and doc["price"] > max_price):
+                    failed.append("price")
+                if len(failed) > 1:
+                    continue
+                for field in SEARCH_FACET_FIELDS:
+                    if (not failed or failed[0] == field) and doc[field]:
+                        counts[field][doc[field]] = counts[field].get(doc[field], 0) + 1
+                if not failed or failed[0] == "price":
+                    price_counts[max(bisect.bisect_right(PRICE_BUCKETS, doc["price"]) - 1, 0)] += 1
+                if not failed:
+                    hits.append((score, doc))
+
+        sort = "default" if query["sort"] == "relevance" and not has_terms else query["sort"]
+        if sort == "relevance":
+            hits.sort(key=lambda hit: (hit[0], hit[1]["createdAt"], hit[1]["id"]), reverse=True)
+        else:
+            field, direction = PRODUCT_SORTS[sort]
+            hits.sort(key=lambda hit: (hit[1][field], hit[1]["id"]), reverse=direction == -1)
+        start = (query["page"] - 1) * query["limit"]
+        ids = [doc["id"] for _, doc in hits[start:start + query["limit"]]]
+        items = []
+        for product_id in ids:
+            product = self.store.get("products", product_id)
+            if product:
+                items.append({k: v for k, v in product.items()
+                              if k in PRODUCT_CARD_FIELDS or k in ("ratingAverage", "ratingCount")})
+        facets = {field: [{"value": value, "count": count} for value, count in
+                          sorted(counts[field].items(), key=lambda kv: (-kv[1], kv[0]))[:FACET_LIMIT]]
+                  for field in SEARCH_FACET_FIELDS}
+        facets["price"] = [{"min": low, "max": PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None,
+                            "count": price_counts[i]} for i, low in enumerate(PRICE_BUCKETS) if price_counts[i]]
+        return {"items": items, "total": len(hits), "page": query["page"],
+                "pages": -(-len(hits) // query["limit"]), "facets": facets, "corrections": corrections}
+
+    def stats(self):
+        with self.lock:
+            return {"products": len(self.docs), "terms": len(self.postings), "pending": len(self.pending),
+                    **self.counters}
+
+
+ORDER_RESERVATION_TTL = 30 * 60.0
+TRANSFER_RESERVATION_TTL = 3 * 24 * 60 * 60.0
+MAX_ORDER_LINES = 100
+LOW_STOCK = 10
+EXPIRABLE_STATUSES = ("pending", "awaiting_transfer")
+
+
+def reservation_deadline(seconds):
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat(
+        timespec="milliseconds").replace("+00:00", "Z")
+
+
+def parse_order_items(items):
+    """Mirror of lib/inventory.js parseOrderItems: [(id, quantity)] with repeated products merged"""
+    if not isinstance(items, list) or not items:
+        raise ValueError("Sepet boş")
+    if len(items) > MAX_ORDER_LINES:
+        raise ValueError(f"Sepette en fazla {MAX_ORDER_LINES} satır olabilir")
+    quantities = {}
+    for item in items:
+        quantity = item.get("quantity", 1) if isinstance(item, dict) else None
+        if isinstance(quantity, float) and quantity.is_integer():
+            quantity = int(quantity)
+        if (not isinstance(item, dict) or not isinstance(item.get("id"), str) or not item["id"]
+                or not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1):
+            raise ValueError("Geçersiz sepet satırı")
+        quantities[item["id"]] = quantities.get(item["id"], 0) + quantity
+    return list(quantities.items())
+
+
+class StockReservations:
+    """Mirror of lib/inventory.js: all-or-nothing stock reservation, release on cancel and an expiry sweeper
+
+    Production reserves each line with a conditional $inc and compensates on failure; here the whole
+    cart is checked and decremented under the store lock, which has the same observable outcome.
+    """
+
+    def __init__(self, store, responses, order_ttl=ORDER_RESERVATION_TTL, transfer_ttl=TRANSFER_RESERVATION_TTL,
+                 sweep_interval=1.0):
+        self.store = store
+        self.responses = responses
+        self.order_ttl = order_ttl
+        self.transfer_ttl = transfer_ttl
+        self.sweep_interval = sweep_interval
+        self.stopped = threading.Event()
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def reserve(self, lines):
+        """(items, total, None) priced from the catalog, or (None, None, unavailable) with nothing reserved"""
+        with self.store.lock:
+            products = [self.store.get("products", product_id) for product_id, _ in lines]
+            unavailable = [{"id": product_id, "name": product.get("name") if product else None,
+                            "requested": quantity, "available": max((product or {}).get("stock") or 0, 0)}
+                           for (product_id, quantity), product in zip(lines, products)
+                           if product is None or (product.get("stock") or 0) < quantity]
+            if unavailable:
+                return None, None, unavailable
+            for (_, quantity), product in zip(lines, products):
+                product["stock"] -= quantity
+            items = [{"id": product["id"], "name": product.get("name"), "price": product.get("price"),
+                      "image": product.get("image"), "quantity": quantity}
+                     for (_, quantity), product in zip(lines, products)]
+            low = [product["id"] for product in products if product["stock"] < LOW_STOCK]
+        for product_id in low:
+            self.responses.invalidate_product(product_id)
+        total = round(sum(item["price"] * item["quantity"] for item in items), 2)
+        return items, total, None
+
+    def restock(self, items):
+        with self.store.lock:
+            for item in items:
+                product = self.store.get("products", item["id"])
+                if product is not None:
+                    product["stock"] = (product.get("stock") or 0) + item["quantity"]
+
+    def release(self, order_id):
+        """Put a cancelled order's stock back once; stockReserved guards against a double release"""
+        with self.store.lock:
+            order = self.store.get("orders", order_id)
+            if not order or not order.get("stockReserved"):
+                return False
+            order.update(stockReserved=False, reservedUntil=None)
+            items = [item for item in order.get("items") or []
+                     if isinstance(item, dict) and item.get("id") and (item.get("quantity") or 0) > 0]
+            self.restock(items)
+        for item in items:
+            self.responses.invalidate_product(item["id"])
+        return True
+
+    def expire(self, transition):
+        """Cancel every unpaid order whose reservation has run out; returns how many were cancelled"""
+        now = now_iso()
+
+        def due(order):
+            return isinstance(order.get("reservedUntil"), str) and order["reservedUntil"] <= now
+
+        orders = self.store.find("orders", lambda order: due(order) and order.get("status") in EXPIRABLE_STATUSES)
+        expired = 0
+        for order in sorted(orders, key=lambda order: order["reservedUntil"]):
+            _, changed, _ = transition(order["id"], "cancelled", {"cancelReason": "reservation_expired"}, due)
+            expired += changed
+        return expired
+
+    def start(self, transition):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, args=(transition,), name="reservation-sweeper",
+                                               daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self, transition):
+        while not self.stopped.wait(self.sweep_interval):
+            self.expire(transition)
+
+
+def without_password(user):
+    return {key: value for key, value in user.items() if key != "password"}
+
+
+def product_type_of(product):
+    """lib/catalog.js productTypeOf: legacy products without productType are eyewear in 'Gözlük', else watches"""
+    return product.get("productType") or ("eyewear" if product.get("category") == "Gözlük" else "watch")
+
+
+def build_specs(specs):
+    specs = specs or {}
+    return {field: specs.get(field) or "" for field in SPEC_FIELDS}
+
+
+PRODUCT_FILE_TYPES = {"ndjson": "application/x-ndjson; charset=utf-8", "csv": "text/csv; charset=utf-8"}
+EXPORT_COLUMNS = ["id", "name", "description", "price", "stock", "category", "productType", "gender", "brand",
+                  "image", "images"] + [f"specs.{field}" for field in SPEC_FIELDS]
+IMPORT_CHUNK = 500
+MAX_ROW_ERRORS = 100
+
+
+def product_file_format(params, content_type=""):
+    file_format = params.get("format") or ("csv" if "csv" in (content_type or "") else "ndjson")
+    if file_format not in PRODUCT_FILE_TYPES:
+        raise ValueError("Desteklenmeyen format (ndjson veya csv)")
+    return file_format
+
+
+def product_rows(body, file_format):
+    """Mirror of lib/productImport.js productRows: (line, row, error) per non-empty record"""
+    text = body.decode("utf-8")
+    if file_format == "ndjson":
+        for line, entry in enumerate(text.split("\n"), 1):
+            if not entry.strip():
+                continue
+            try:
+                yield line, json.loads(entry), None
+            except ValueError:
+                yield line, None, "Geçersiz JSON"
+        return
+    reader = csv.reader(io.StringIO(text, newline=""))
+    columns = None
+    for values in reader:
+        if not values or values == [""]:
+            continue
+        if columns is None:
+            columns = [value.strip() for value in values]
+            continue
+        row = {"specs": {}}
+        for column, value in zip(columns, values + [""] * (len(columns) - len(values))):
+            if column.startswith("specs."):
+                row["specs"][column[len("specs."):]] = value
+            elif column == "images":
+                row["images"] = value.split("|") if value else None
+            else:
+                row[column] = value
+        # csv.reader counts physical lines, so quoted newlines keep numbers in step with the JS parser
+        yield reader.line_num, row, None
+
+
+def given(value):
+    """A column counts as given when present and not empty (an empty CSV cell is not a value)"""
+    return value not in (None, "")
+
+
+def normalize_product_row(row):
+    """Mirror of lib/productImport.js normalizeProductRow: (id, fields, defaults) or raises ValueError
+
+    `fields` are only the columns the row gives; `defaults` fill the missing ones when the product is created.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("Satır bir nesne olmalı")
+    name = row.get("name").strip() if isinstance(row.get("name"), str) else ""
+    if not name:
+        raise ValueError("Ürün adı zorunlu")
+    price = row.get("price") if isinstance(row.get("price"), (int, float)) else parse_float(row.get("price"))
+    if price is None or price != price or price in (float("inf"), float("-inf")) or price < 0:
+        raise ValueError("Geçersiz fiyat")
+    fields, defaults = {"name": name, "price": price}, {}
+
+    if given(row.get("stock")):
+        try:
+            stock = float(row["stock"])
+        except (TypeError, ValueError):
+            raise ValueError("Geçersiz stok")
+        if stock != int(stock) or stock < 0:
+            raise ValueError("Geçersiz stok")
+        fields["stock"] = int(stock)
+    else:
+        defaults["stock"] = 100
+    for column, allowed, fallback, message in (
+            ("productType", ("watch", "eyewear", "eta"), "watch", "Geçersiz ürün tipi"),
+            ("gender", ("male", "female", "unisex"), "unisex", "Geçersiz cinsiyet")):
+        if not given(row.get(column)):
+            defaults[column] = fallback
+        elif row[column] in allowed:
+            fields[column] = row[column]
+        else:
+            raise ValueError(message)
+    product_id = str(row["id"]) if given(row.get("id")) else str(uuid.uuid4())
+    if len(product_id) > 100:
+        raise ValueError("Geçersiz id")
+
+    for column, fallback in (("description", ""), ("category", "Genel"), ("brand", "")):
+        if given(row.get(column)):
+            fields[column] = str(row[column])
+        else:
+            defaults[column] = fallback
+    if isinstance(row.get("images"), list):
+        fields["images"] = [image for image in row["images"] if isinstance(image, str) and image]
+    if given(row.get("image")):
+        fields["image"] = str(row["image"])
+    # A new product's images are derived from each other, as in POST /api/products
+    if "images" not in fields:
+        defaults["images"] = [fields["image"]] if fields.get("image") else []
+    if not fields.get("image"):
+        defaults["image"] = ((fields.get("images") or defaults.get("images") or [None])[0]
+                             or "https://via.placeholder.com/400x300?text=Ürün+Görseli")
+    specs = row.get("specs") if isinstance(row.get("specs"), dict) else {}
+    for field in SPEC_FIELDS:
+        if given(specs.get(field)):
+            fields[f"specs.{field}"] = str(specs[field])
+        else:
+            defaults[f"specs.{field}"] = ""
+    return product_id, fields, defaults
+
+
+def import_products(store, rows):
+    """Mirror of lib/productImport.js importProducts: validate and upsert by id in IMPORT_CHUNK batches"""
+    summary = {"received": 0, "valid": 0, "inserted": 0, "updated": 0, "failed": 0, "chunks": 0, "errors": []}
+    chunk = {}
+
+    def fail(line, message):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_ROW_ERRORS:
+            summary["errors"].append({"line": line, "error": message})
+
+    def flush():
+        if not chunk:
+            return
+        now = now_iso()
+        inserted, matched = store.bulk_upsert("products", [
+            (product_id, {**fields, "updatedAt": now},
+             {**defaults, "id": product_id, "createdAt": now, "ratingCount": 0, "ratingSum": 0, "ratingAverage": 0})
+            for product_id, fields, defaults in chunk.values()])
+        chunk.clear()
+        summary["inserted"] += inserted
+        summary["updated"] += matched
+        summary["chunks"] += 1
+
+    for line, row, parse_error in rows:
+        summary["received"] += 1
+        try:
+            if parse_error:
+                raise ValueError(parse_error)
+            product_id, fields, defaults = normalize_product_row(row)
+        except ValueError as e:
+            fail(line, str(e))
+            continue
+        summary["valid"] += 1
+        chunk[product_id] = (product_id, fields, defaults)
+        if len(chunk) >= IMPORT_CHUNK:
+            flush()
+    flush()
+    return summary
+
+
+def export_products(products, file_format):
+    """Mirror of lib/productImport.js exportProducts: id order, NDJSON lines or CSV with a header"""
+    fields = EXPORT_COLUMNS[:11] + ["specs"]
+    products = sorted(products, key=lambda p: p["id"])
+    if file_format == "ndjson":
+        return "".join(json.dumps({field: p[field] for field in fields if field in p}, ensure_ascii=False) + "\n"
+                       for p in products).encode()
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for p in products:
+        writer.writerow([(p.get("specs") or {}).get(column[len("specs."):], "") if column.startswith("specs.")
+                         else "|".join(p.get("images") or []) if column == "images"
+                         else "" if p.get(column) is None else p[column] for column in EXPORT_COLUMNS])
+    return out.getvalue().encode()
+
+
+class Response:
+    def __init__(self, status=200, body=None, content_type="application/json", headers=None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+def json_response(data, status=200):
+    return Response(status, json.dumps(data, ensure_ascii=False).encode(), "application/json")
+
+
+def error(message, status):
+    return json_response({"error": message}, status)
+
+
+# Routing, like lib/router.js: a segment trie per method, compiled once
+
+PARAM_TYPES = {
+    "string": lambda value: value,
+    "int": lambda value: int(value) if re.fullmatch(r"-?\d+", value) else None,
+}
+PARAM_PATTERN = re.compile(r"^:(\w+)(?:\((\w+)\))?$")
+
+
+def split_path(path):
+    # Trailing and doubled slashes are ignored: "products/" and "products" are one route
+    return [segment for segment in path.split("/") if segment]
+
+
+class RouteNode:
+    __slots__ = ("children", "params", "route")
+
+    def __init__(self):
+        self.children = {}
+        self.params = []  # [(name, parse, node)], tried in registration order
+        self.route = None
+
+
+class Route:
+    __slots__ = ("name", "middleware", "handler")
+
+    def __init__(self, name, middleware, handler):
+        self.name = name
+        self.middleware = middleware
+        self.handler = handler
+
+
+class RequestContext:
+    """What a route handler sees: the request, typed path params and the caller set by middleware"""
+
+    def __init__(self, request, params):
+        self.request = request
+        self.params = params
+        self.query = request.query
+        self.headers = request.headers
+        self.user = None
+        self._json = None
+
+    def json(self):
+        # Parsed on first use only; routes that never read the body never decode it
+        if self._json is None:
+            with span("body.parse"):
+                self._json = self.request.json()
+        return self._json
+
+
+class Router:
+    """Static segments are tried before params; an unmatched request gets a 404 without its body being read"""
+
+    def __init__(self, base=""):
+        self.base_segments = len(split_path(base))
+        self.trees = {}
+
+    def add(self, method, pattern, handler, middleware=()):
+        node = self.trees.setdefault(method, RouteNode())
+        for segment in split_path(pattern):
+            param = PARAM_PATTERN.match(segment)
+            if not param:
+                node = node.children.setdefault(segment, RouteNode())
+                continue
+            name, type_name = param.group(1), param.group(2) or "string"
+            if type_name not in PARAM_TYPES:
+                raise ValueError(f'Bilinmeyen parametre tipi "{type_name}": {pattern}')
+            existing = next((child for n, parse, child in node.params
+                             if n == name and parse is PARAM_TYPES[type_name]), None)
+            if existing is None:
+                existing = RouteNode()
+                node.params.append((name, PARAM_TYPES[type_name], existing))
+            node = existing
+        if node.route is not None:
+            raise ValueError(f"Rota iki kez tanımlandı: {method} {pattern}")
+        node.route = Route(f"{method} {'/'.join(split_path(pattern))}", list(middleware), handler)
+
+    def match(self, method, path):
+        root = self.trees.get(method)
+        if root is None:
+            return None, None
+        params = {}
+        route = self._match(root, split_path(path)[self.base_segments:], 0, params)
+        return route, params
+
+    def _match(self, node, segments, index, params):
+        if index == len(segments):
+            return node.route
+        child = node.children.get(segments[index])
+        if child is not None:
+            route = self._match(child, segments, index + 1, params)
+            if route is not None:
+                return route
+        if node.params:
+            try:
+                raw = unquote(segments[index], errors="strict")
+            except UnicodeDecodeError:
+                return None
+            for name, parse, param_node in node.params:
+                value = parse(raw)
+                if value is None:
+                    continue
+                route = self._match(param_node, segments, index + 1, params)
+                if route is not None:
+                    params[name] = value
+                    return route
+        return None
+
+    def handle(self, method, path, request):
+        started = time.perf_counter()
+        route, params = self.match(method, path)
+        if route is None:
+            dispatched = time.perf_counter()
+            return with_dispatch_timing(error("Endpoint bulunamadı", 404), "unmatched", started, dispatched)
+        ctx = RequestContext(request, params)
+        dispatched = None
+        try:
+            for middleware in route.middleware:
+                response = middleware(ctx)
+                if response is not None:
+                    return with_dispatch_timing(response, route.name, started, time.perf_counter())
+            dispatched = time.perf_counter()
+            response = route.handler(ctx)
+        except Exception as e:
+            dispatched = dispatched or time.perf_counter()
+            response = error(str(e), 500)
+        return with_dispatch_timing(response, route.name, started, dispatched)
+
+
+def with_dispatch_timing(response, name, started, dispatched):
+    """Server-Timing: route;desc="GET products/:id";dur=0.012 - match + middleware time in ms, handler excluded
+
+    The same interval goes into the request's trace as its `route` span.
+    """
+    record_span("route", started, dispatched, route=name)
+    timing = f'route;desc="{name}";dur={(dispatched - started) * 1000:.3f}'
+    existing = response.headers.get("Server-Timing")
+    response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+    return response
+
+
+def route(method, pattern, *middleware):
+    """Registers a CyprusWatchAPI method in the route table; middleware are called as fn(api, ctx)"""
+    def register(handler):
+        handler.__dict__.setdefault("routes", []).append((method, pattern, middleware))
+        return handler
+    return register
+
+
+def require_user(message="Unauthorized"):
+    def middleware(api, ctx):
+        ctx.user = api.verify_token(ctx.request)
+        if not ctx.user:
+            return error(message, 401)
+    return middleware
+
+
+def optional_user(api, ctx):
+    ctx.user = api.verify_token(ctx.request)
+
+
+def require_admin(api, ctx):
+    """Admin token from POST /api/login/login; a customer token is 403, a bad one 401, none only if enforced"""
+    if not ctx.headers.get("Authorization"):
+        return error("Unauthorized", 401) if api.admin_auth_required else None
+    payload = api.verify_token(ctx.request)
+    if not payload:
+        return error("Unauthorized", 401)
+    if payload.get("role") != "admin":
+        return error("Bu işlem için yetkiniz yok", 403)
+    ctx.admin = payload
+
+
+def require_operator(api, ctx):
+    """lib/auth.js requireOperator: metrics and traces always need an admin token or METRICS_TOKEN"""
+    header = ctx.headers.get("Authorization")
+    if not header:
+        return error("Unauthorized", 401)
+    if METRICS_TOKEN and header.startswith("Bearer ") and hmac.compare_digest(
+            header[len("Bearer "):].encode(), METRICS_TOKEN.encode()):
+        return None
+    return require_admin(api, ctx)
+
+
+class CyprusWatchAPI:
+    """The route handlers of app/api/[[...path]]/route.js over an InMemoryStore"""
+
+    def __init__(self, store=None, mailer=None, jwt_secret="local-standin-secret",
+                 sender_email="Cyprus Watch <noreply@cypruswatch.com>", payment_decline_rate=0.2,
+                 reservation_ttl=ORDER_RESERVATION_TTL):
+        self.store = store or InMemoryStore()
+        self.mailer = mailer or FakeResend()
+        self.tokens = TokenSigner(jwt_secret)
+        self.sender_email = sender_email
+        self.payment_decline_rate = payment_decline_rate
+        self.tracer = Tracer()
+        self.outbox = EmailOutbox(self.store, self.deliver_invoice_emails, tracer=self.tracer)
+        self.reviews_by_product = {}
+        self.blobs = {}
+        self.derivatives = LRUCache(64 * 1024 * 1024)
+        self.password_rounds = tune_password_rounds()
+        self.account_failures = RateLimiter(5, 15 * 60)
+        self.ip_failures = RateLimiter(50, 15 * 60)
+        self.sessions = {}
+        self.users = UserCache(self.store)
+        self.responses = ResponseCache()
+        self.search_index = SearchIndex(self.store)
+        self.inventory = StockReservations(self.store, self.responses, order_ttl=reservation_ttl)
+        self.session_ttl = 60.0
+        self.admin_auth_required = ADMIN_AUTH_REQUIRED
+        self.started_at = time.monotonic()
+        self.router = Router("/api")
+        for name, handler in vars(CyprusWatchAPI).items():
+            for method, pattern, middleware in getattr(handler, "routes", ()):
+                self.router.add(method, pattern, getattr(self, name),
+                                [functools.partial(fn, self) for fn in middleware])
+
+    # Helpers
+
+    def verify_token(self, request):
+        auth = request.headers.get("Authorization", "")
+        if not auth.startswith("Bearer "):
+            return None
+        token = auth.split(" ", 1)[1]
+        # Short-lived verified-session cache, like lib/auth.js
+        cached = self.sessions.get(token)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        with span("jwt.verify"):
+            payload = self.tokens.verify(token)
+        if payload:
+            if len(self.sessions) > 10000:
+                self.sessions.clear()
+            expires_at = min(time.time() + self.session_ttl, payload.get("exp") or float("inf"))
+            self.sessions[token] = (payload, expires_at)
+        return payload
+
+    def transition(self, order_id, to, fields=None, condition=None):
+        """transition_order plus lib/orders.js's release of a cancelled order's reserved stock"""
+        order, changed, source = transition_order(self.store, order_id, to, fields, condition)
+        if changed and to == "cancelled":
+            self.inventory.release(order_id)
+        return order, changed, source
+
+    def get_invoice(self, order):
+        """Stored invoice for the order, rendered on first use and again once the order's status changes"""
+        with self.store.lock:
+            invoice = self.store.get("invoices", order["id"])
+            if invoice is None or invoice.get("orderStatus") != order.get("status"):
+                user = self.store.get("users", order["userId"]) if order.get("userId") else None
+                invoice = self.store.insert("invoices", {
+                    "id": order["id"], "orderId": order["id"], "html": render_invoice(order, user),
+                    "orderStatus": order.get("status"), "createdAt": now_iso()
+                })
+        return invoice
+
+    def deliver_invoice_emails(self, jobs):
+        """Outbox handler: one batch send for every deliverable invoice, then mark the orders"""
+        results = [None] * len(jobs)
+        emails, email_jobs = [], []
+        for index, job in enumerate(jobs):
+            order = self.store.get("orders", job["orderId"])
+            if not order:
+                results[index] = {"success": False, "permanent": True, "error": "Order not found"}
+                continue
+            user = self.store.get("users", order["userId"]) if order.get("userId") else None
+            recipient = (order.get("customerInfo") or {}).get("email") or (user or {}).get("email")
+            if not recipient:
+                results[index] = {"success": False, "permanent": True, "error": "No recipient email"}
+                continue
+            emails.append({
+                "from": self.sender_email,
+                "to": [recipient],
+                "subject": f"🎉 Cyprus Watch - Siparişiniz Alındı! ({order['id']})",
+                "html": self.get_invoice(order)["html"],
+            })
+            email_jobs.append(index)
+
+        if emails:
+            with span("email.send", count=len(emails)):
+                data, failure = self.mailer.send_batch(emails)
+            for i, index in enumerate(email_jobs):
+                results[index] = ({"success": False, "error": failure} if failure
+                                  else {"success": True, "emailId": data["data"][i]["id"]})
+        for job, result in zip(jobs, results):
+            if result["success"]:
+                self.store.update("orders", job["orderId"], {"emailSent": True, "invoiceEmailId": result["emailId"]})
+        return results
+
+    # GET
+
+    @route("GET", "health")
+    def health(self, ctx):
+        pool = self.store.pool_stats()
+        started = time.perf_counter()
+        with self.store.lock:
+            ping_ms = round((time.perf_counter() - started) * 1000, 3)
+        return json_response({"status": "ok", "uptimeS": round(time.monotonic() - self.started_at),
+                              "db": {"ok": True, "pingMs": ping_ms},
+                              "pool": {"open": pool["open"], "inUse": pool["inUse"], "waiting": pool["waiting"],
+                                       "max": 1}})
+
+    @route("GET", "metrics", require_operator)
+    def metrics(self, ctx):
+        # ru_maxrss is the peak RSS, in KiB on Linux
+        rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+        with self.users.lock:
+            users = {"profiles": len(self.users.profiles), "favorites": len(self.users.favorites)}
+        with self.derivatives.lock:
+            images = {"entries": len(self.derivatives.entries), "bytes": self.derivatives.bytes}
+        return json_response({
+            "uptimeS": round(time.monotonic() - self.started_at),
+            "process": {"rssMb": rss_mb},
+            "pool": {"options": {"maxPoolSize": 1}, **self.store.pool_stats()},
+            "operations": self.store.operation_stats(),
+            "caches": {"response": self.responses.stats(), "users": users,
+                       "sessions": {"entries": len(self.sessions)}, "images": images,
+                       "search": self.search_index.stats(), "passwords": {"rounds": self.password_rounds}},
+        })
+
+    @route("GET", "traces", require_operator)
+    def traces(self, ctx):
+        min_ms = parse_float(ctx.query.get("minMs")) or 0.0
+        response = json_response(chrome_trace_events(self.tracer.recent(min_ms)))
+        response.headers["Content-Disposition"] = 'attachment; filename="traces.json"'
+        return response
+
+    @route("GET", "traces/:id", require_operator)
+    def trace(self, ctx):
+        trace = self.tracer.find(ctx.params["id"])
+        if not trace:
+            return error("İz bulunamadı", 404)
+        return json_response(trace.to_dict())
+
+    @route("GET", "images/:id")
+    def image(self, ctx):
+        image = self.store.get("images", ctx.params["id"])
+        if not image:
+            return Response(404, b"Image not found", "text/plain")
+        try:
+            params = parse_derivative_params(ctx.query, ctx.headers.get("Accept"))
+        except ValueError as e:
+            return error(str(e), 400)
+        if params and Image is not None:
+            return self.image_derivative(image["sha256"], params, ctx.request)
+        blob = memoryview(self.blobs[image["sha256"]])
+        mime_type = image.get("mimeType") or "image/jpeg"
+        headers = {
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{image["sha256"]}"',
+            "Accept-Ranges": "bytes",
+        }
+        if etag_matches(ctx.headers.get("If-None-Match"), headers["ETag"]):
+            return Response(304, b"", mime_type, headers)
+        if_range = ctx.headers.get("If-Range")
+        byte_range = parse_range(ctx.headers.get("Range"), len(blob)) \
+            if not if_range or if_range == headers["ETag"] else None
+        if byte_range is False:
+            return Response(416, b"", mime_type, {**headers, "Content-Range": f"bytes */{len(blob)}"})
+        if byte_range:
+            start, end = byte_range
+            return Response(206, blob[start:end + 1], mime_type,
+                            {**headers, "Content-Range": f"bytes {start}-{end}/{len(blob)}"})
+        return Response(200, blob, mime_type, headers)
+
+    def image_derivative(self, sha256, params, request):
+        etag = f'"{sha256}-w{params["width"] or 0}-q{params["quality"]}-{params["format"]}"'
+        mime_type = DERIVATIVE_FORMATS[params["format"]]
+        headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": etag}
+        if params["negotiated"]:
+            headers["Vary"] = "Accept"
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(304, b"", mime_type, headers)
+        data = self.derivatives.get(etag)
+        if data is None:
+            data = render_derivative(self.blobs[sha256], params)
+            self.derivatives.set(etag, data)
+        return Response(200, data, mime_type, headers)
+
+    @route("GET", "products")
+    def list_products(self, ctx):
+        try:
+            return self.responses.cached_json(ctx.request, "products", PRODUCT_LIST_SCOPES,
+                                              lambda: query_products(self.store.find("products"), ctx.query))
+        except ValueError as e:
+            return error(str(e), 400)
+
+    @route("GET", "search")
+    def search_products(self, ctx):
+        try:
+            query = parse_search_query(ctx.query)
+        except ValueError as e:
+            return error(str(e), 400)
+        return self.responses.cached_json(ctx.request, "search", PRODUCT_LIST_SCOPES,
+                                          lambda: self.search_index.search(query))
+
+    @route("GET", "products/export", require_admin)
+    def export_catalog(self, ctx):
+        try:
+            file_format = product_file_format(ctx.query)
+            products = query_products(self.store.find("products"),
+                                      {k: v for k, v in ctx.query.items() if k not in ("limit", "cursor", "fields")})
+        except ValueError as e:
+            return error(str(e), 400)
+        return Response(200, export_products(products, file_format), PRODUCT_FILE_TYPES[file_format],
+                        {"Content-Disposition": f'attachment; filename="products.{file_format}"'})
+
+    @route("GET", "products/:id")
+    def get_product(self, ctx):
+        product_id = ctx.params["id"]
+        return self.responses.cached_json(ctx.request, f"products/{product_id}", product_scopes(product_id),
+                                          lambda: without_rating_sum(self.store.get("products", product_id)),
+                                          "Ürün bulunamadı")
+
+    @route("GET", "orders", require_admin)
+    def list_orders(self, ctx):
+        return json_response(self.store.find("orders"))
+
+    @route("GET", "auth/me", require_user())
+    def me(self, ctx):
+        user = self.users.profile(ctx.user["userId"])
+        if not user:
+            return error("User not found", 404)
+        return json_response(user)
+
+    @route("GET", "favorites", require_user())
+    def favorites(self, ctx):
+        products = self.users.favorite_products(ctx.user["userId"])
+        if products is None:
+            return error("User not found", 404)
+        return json_response(products)
+
+    @route("GET", "orders/my", require_user())
+    def my_orders(self, ctx):
+        orders = self.store.find("orders", lambda o: o.get("userId") == ctx.user["userId"])
+        return json_response(sorted(orders, key=lambda o: o["createdAt"], reverse=True))
+
+    @route("GET", "admin/orders/:id/invoice", require_admin)
+    def download_invoice(self, ctx):
+        order = self.store.get("orders", ctx.params["id"])
+        if not order:
+            return error("Sipariş bulunamadı", 404)
+        return Response(200, self.get_invoice(order)["html"].encode(), "text/html; charset=utf-8",
+                        {"Content-Disposition": f'attachment; filename="fatura-{order["id"]}.html"'})
+
+    @route("GET", "admin/stats", require_admin)
+    def admin_stats(self, ctx):
+        days = parse_int(ctx.query.get("days"))
+        top = parse_int(ctx.query.get("top"))
+        return json_response(get_admin_stats(self.store, STATS_DAYS if days is None else days,
+                                             TOP_PRODUCTS if top is None else min(max(top, 1), MAX_PAGE_SIZE)))
+
+    @route("GET", "admin/orders", require_admin)
+    def admin_orders(self, ctx):
+        try:
+            return json_response(query_admin_list(self.store.find("orders"), ctx.query, ORDER_TRANSITIONS))
+        except ValueError as e:
+            return error(str(e), 400)
+
+    @route("GET", "users", require_admin)
+    def list_users(self, ctx):
+        users = [without_password(u) for u in self.store.find("users")]
+        try:
+            return json_response(query_admin_list(users, ctx.query))
+        except ValueError as e:
+            return error(str(e), 400)
+
+    @route("GET", "users/:id/orders", require_admin)
+    def user_orders(self, ctx):
+        user_id = ctx.params["id"]
+        orders = self.store.find("orders", lambda o: o.get("userId") == user_id)
+        try:
+            return json_response(query_admin_list(orders, ctx.query, ORDER_TRANSITIONS,
+                                                  ORDER_HISTORY_PAGE_SIZE, always_paginate=True))
+        except ValueError as e:
+            return error(str(e), 400)
+
+    @route("GET", "users/:id", require_admin)
+    def user_detail(self, ctx):
+        user_id = ctx.params["id"]
+        user = self.store.get("users", user_id)
+        if not user:
+            return error("Kullanıcı bulunamadı", 404)
+        orders = self.store.find("orders", lambda o: o.get("userId") == user_id)
+        try:
+            page = query_admin_list(orders, ctx.query, ORDER_TRANSITIONS,
+                                    ORDER_HISTORY_PAGE_SIZE, always_paginate=True)
+        except ValueError as e:
+            return error(str(e), 400)
+        return json_response({**without_password(user), "orders": page["items"],
+                              "ordersNextCursor": page["nextCursor"]})
+
+    @route("GET", "reviews/:productId")
+    def list_reviews(self, ctx):
+        product_id = ctx.params["productId"]
+
+        def load_reviews():
+            if not self.store.get("products", product_id):
+                return None
+            with self.store.lock:
+                reviews = list(self.reviews_by_product.get(product_id, ()))
+            return query_reviews(reviews, ctx.query)
+
+        try:
+            return self.responses.cached_json(ctx.request, f"reviews/{product_id}", product_scopes(product_id),
+                                              load_reviews, "Ürün bulunamadı")
+        except ValueError as e:
+            return error(str(e), 400)
+
+    # POST
+
+    @route("POST", "upload", require_admin)
+    def upload(self, ctx):
+        content_type = ctx.headers.get("Content-Type", "")
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + ctx.request.read_body())
+        file_part = next((part for part in message.iter_parts()
+                          if part.get_param("name", header="content-disposition") == "file"), None)
+        if file_part is None:
+            return error("Dosya bulunamadı", 400)
+        mime_type = file_part.get_content_type()
+        if mime_type not in ALLOWED_IMAGE_TYPES:
+            return error("Sadece resim dosyaları yüklenebilir (jpg, png, webp, gif)", 400)
+        data = file_part.get_payload(decode=True) or b""
+        if len(data) > MAX_UPLOAD_BYTES:
+            return error("Dosya boyutu 5MB'dan küçük olmalıdır", 400)
+        # Content-addressed like the GridFS store: identical uploads share one blob and URL
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self.store.lock:
+            deduplicated = sha256 in self.blobs
+            if not deduplicated:
+                self.blobs[sha256] = data
+                self.store.insert("images", {
+                    "id": sha256,
+                    "sha256": sha256,
+                    "filename": file_part.get_filename(),
+                    "mimeType": mime_type,
+                    "size": len(data),
+                    "createdAt": now_iso()
+                })
+        return json_response({"url": f"/api/images/{sha256}", "success": True, "id": sha256,
+                              "deduplicated": deduplicated})
+
+    @route("POST", "products/import", require_admin)
+    def import_catalog(self, ctx):
+        try:
+            file_format = product_file_format(ctx.query, ctx.headers.get("Content-Type"))
+            summary = import_products(self.store, product_rows(ctx.request.read_body(), file_format))
+        except (ValueError, UnicodeDecodeError) as e:
+            return error(str(e), 400)
+        if summary["valid"]:
+            self.users.invalidate_favorites()
+            self.search_index.mark_catalog_changed()
+            self.responses.invalidate_catalog()
+        return json_response(summary)
+
+    @route("POST", "auth/register")
+    def register(self, ctx):
+        body = ctx.json()
+        email = body.get("email")
+        if self.store.find_one("users", lambda u: u["email"] == email):
+            return error("Bu email zaten kayıtlı", 400)
+        user = {
+            "id": str(uuid.uuid4()),
+            "email": email,
+            "password": hash_password(body.get("password") or "", self.password_rounds),
+            "fullName": body.get("fullName"),
+            "phone": body.get("phone") or "",
+            "address": body.get("address") or "",
+            "favoriteProducts": [],
+            "createdAt": now_iso()
+        }
+        self.store.insert("users", user)
+        record_user_registered(self.store, user)
+        token = self.tokens.sign({"userId": user["id"], "email": email})
+        return json_response({"success": True, "token": token, "user": without_password(user)})
+
+    @route("POST", "auth/login")
+    def login(self, ctx):
+        body = ctx.json()
+        email = body.get("email")
+        ip = client_ip(ctx.headers, ctx.request.client_address[0])
+        account_ok, account_retry = self.account_failures.check(f"{email}|{ip}")
+        ip_ok, ip_retry = self.ip_failures.check(ip)
+        if not (account_ok and ip_ok):
+            response = error("Çok fazla hatalı giriş denemesi, lütfen daha sonra tekrar deneyin", 429)
+            response.headers["Retry-After"] = str(int(max(account_retry, ip_retry)) + 1)
+            return response
+        user = self.store.find_one("users", lambda u: u["email"] == email)
+        if not user or not check_password(body.get("password") or "", user["password"]):
+            self.account_failures.hit(f"{email}|{ip}")
+            self.ip_failures.hit(ip)
+            return error("Email veya şifre hatalı", 401)
+        self.account_failures.reset(f"{email}|{ip}")
+        if int(user["password"].split("$")[1]) < self.password_rounds:
+            self.store.update("users", user["id"], {
+                "password": hash_password(body.get("password") or "", self.password_rounds)})
+        token = self.tokens.sign({"userId": user["id"], "email": user["email"]})
+        return json_response({"success": True, "token": token, "user": without_password(user)})
+
+    @route("POST", "login/login")
+    def admin_login(self, ctx):
+        body = ctx.json()
+        if body.get("username") == ADMIN_USERNAME and body.get("password") == ADMIN_PASSWORD:
+            token = self.tokens.sign({"role": "admin", "username": ADMIN_USERNAME}, ADMIN_TOKEN_TTL)
+            return json_response({"success": True, "message": "Giriş başarılı", "token": token})
+        return error("Kullanıcı adı veya şifre hatalı", 401)
+
+    @route("POST", "products", require_admin)
+    def create_product(self, ctx):
+        body = ctx.json()
+        images = body.get("images") or []
+        if not images and body.get("image"):
+            images = [body["image"]]
+        product = {
+            "id": str(uuid.uuid4()),
+            "name": body.get("name"),
+            "description": body.get("description"),
+            "price": parse_float(body.get("price")),
+            "image": body.get("image") or (images[0] if images else "https://via.placeholder.com/400x300?text=Ürün+Görseli"),
+            "images": images,
+            "stock": parse_int(body.get("stock")) or 100,
+            "category": body.get("category") or "Genel",
+            "productType": body.get("productType") or "watch",
+            "gender": body.get("gender") or "unisex",
+            "brand": body.get("brand") or "",
+            "specs": build_specs(body.get("specs")),
+            "ratingCount": 0,
+            "ratingSum": 0,
+            "ratingAverage": 0,
+            "createdAt": now_iso()
+        }
+        self.store.insert("products", product)
+        self.search_index.mark_product_changed(product["id"])
+        self.responses.invalidate_product(product["id"])
+        return json_response(product)
+
+    @route("POST", "orders", optional_user)
+    def create_order(self, ctx):
+        body = ctx.json()
+        try:
+            lines = parse_order_items(body.get("items"))
+        except ValueError as e:
+            return error(str(e), 400)
+        items, total, unavailable = self.inventory.reserve(lines)
+        if unavailable:
+            return json_response({"error": "Yetersiz stok", "unavailable": unavailable}, 409)
+        order = {
+            "id": str(uuid.uuid4()),
+            "userId": ctx.user["userId"] if ctx.user else None,
+            "items": items,
+            "totalAmount": total,
+            "customerInfo": body.get("customerInfo"),
+            "paymentMethod": body.get("paymentMethod"),
+            "status": "pending",
+            "emailSent": False,
+            "stockReserved": True,
+            "reservedUntil": reservation_deadline(self.inventory.order_ttl),
+            "createdAt": now_iso()
+        }
+        self.inventory.start(self.transition)
+        self.store.insert("orders", order)
+        record_order_created(self.store, order)
+        return json_response(order)
+
+    @route("POST", "payment/bank")
+    def pay_bank(self, ctx):
+        order_id = ctx.json().get("orderId")
+        if random.random() < self.payment_decline_rate:
+            order = self.store.get("orders", order_id)
+            if order and order.get("status") == "paid":
+                return json_response({"success": True, "transactionId": order.get("transactionId"),
+                                      "alreadyProcessed": True, "message": "Bu sipariş zaten ödendi."})
+            return json_response({"success": False, "message": "Ödeme reddedildi (Demo)"}, 400)
+        order, changed, _ = self.transition(order_id, "paid", {"paidAt": now_iso(), "transactionId": str(uuid.uuid4()),
+                                                               "reservedUntil": None})
+        if order is None:
+            return json_response({"success": False, "message": "Sipariş bulunamadı"}, 404)
+        if changed:
+            # The key carries the target status so a transfer-time invoice does not block the paid one
+            self.outbox.enqueue("invoice", order_id, f"invoice:{order_id}:paid")
+        elif order.get("status") != "paid":
+            return json_response({"success": False, "message": "Bu sipariş için ödeme alınamaz"}, 409)
+        return json_response({
+            "success": True,
+            "transactionId": order.get("transactionId"),
+            "alreadyProcessed": not changed,
+            "message": ("Ödeme başarılı! Fatura email adresinize gönderilecek." if changed
+                        else "Bu sipariş zaten ödendi.")
+        })
+
+    @route("POST", "payment/transfer")
+    def pay_transfer(self, ctx):
+        order_id = ctx.json().get("orderId")
+        order, changed, _ = self.transition(order_id, "awaiting_transfer", {
+            "requestedAt": now_iso(), "reservedUntil": reservation_deadline(self.inventory.transfer_ttl)})
+        if order is None:
+            return json_response({"success": False, "message": "Sipariş bulunamadı"}, 404)
+        if changed:
+            self.outbox.enqueue("invoice", order_id, f"invoice:{order_id}:awaiting_transfer")
+        elif order.get("status") != "awaiting_transfer":
+            return json_response({"success": False, "message": "Bu sipariş için havale başlatılamaz"}, 409)
+        return json_response({
+            "success": True,
+            "iban": "TR33 0006 1005 1978 6457 8413 26",
+            "accountName": "E-Ticaret Şirketi A.Ş.",
+            "message": "Havale bilgileri email adresinize gönderildi."
+        })
+
+    @route("POST", "admin/stats/rebuild", require_admin)
+    def rebuild_stats(self, ctx):
+        return json_response({"success": True, **rebuild_admin_stats(self.store)})
+
+    @route("POST", "admin/reservations/expire", require_admin)
+    def expire_reservations(self, ctx):
+        return json_response({"success": True, "expired": self.inventory.expire(self.transition)})
+
+    @route("POST", "admin/orders/:id/invoice/resend", require_admin)
+    def resend_invoice(self, ctx):
+        order_id = ctx.params["id"]
+        if not self.store.get("orders", order_id):
+            return error("Sipariş bulunamadı", 404)
+        self.outbox.enqueue("invoice", order_id, f"invoice:{order_id}:resend:{uuid.uuid4()}")
+        return json_response({"success": True, "message": "Fatura tekrar gönderim kuyruğuna alındı"})
+
+    @route("POST", "favorites/add", require_user())
+    def add_favorite(self, ctx):
+        product_id = ctx.json().get("productId")
+        with self.store.lock:
+            user = self.store.get("users", ctx.user["userId"])
+            if user is not None and product_id not in user["favoriteProducts"]:
+                user["favoriteProducts"].append(product_id)
+        self.users.invalidate(ctx.user["userId"])
+        return json_response({"success": True, "message": "Favorilere eklendi"})
+
+    @route("POST", "reviews/:productId", require_user("Değerlendirme yapmak için giriş yapmalısınız"))
+    def add_review(self, ctx):
+        product_id = ctx.params["productId"]
+        body = ctx.json()
+        rating = parse_int(body.get("rating"))
+        if not rating or rating < 1 or rating > 5:
+            return error("Geçersiz puan (1-5 arası)", 400)
+        user = self.store.get("users", ctx.user["userId"])
+        if not user:
+            return error("Kullanıcı bulunamadı", 404)
+        review = {
+            "id": str(uuid.uuid4()),
+            "productId": product_id,
+            "userId": ctx.user["userId"],
+            "userName": user.get("fullName") or user.get("email"),
+            "rating": rating,
+            "comment": body.get("comment") or "",
+            "createdAt": now_iso()
+        }
+        with self.store.lock:
+            # Same order as the route: the review is written first and the rating aggregates follow it
+            self.store.insert("reviews", review)
+            product = self.store.get("products", product_id)
+            if product is None:
+                self.store.delete("reviews", review["id"])
+                return error("Ürün bulunamadı", 404)
+            product["ratingCount"] = product.get("ratingCount", 0) + 1
+            product["ratingSum"] = product.get("ratingSum", 0) + rating
+            product["ratingAverage"] = round(product["ratingSum"] / product["ratingCount"], 2)
+            # Stands in for the { productId, createdAt } index
+            self.reviews_by_product.setdefault(product_id, []).append(review)
+        self.responses.invalidate_product(product_id)
+        return json_response({"success": True, "review": review})
+
+    # PUT
+
+    @route("PUT", "auth/profile", require_user())
+    def update_profile(self, ctx):
+        body = ctx.json()
+        self.store.update("users", ctx.user["userId"], {
+            "fullName": body.get("fullName"),
+            "phone": body.get("phone"),
+            "address": body.get("address"),
+            "updatedAt": now_iso()
+        })
+        self.users.invalidate(ctx.user["userId"])
+        return json_response({"success": True, "message": "Profil güncellendi"})
+
+    @route("PUT", "products/:id", require_admin)
+    def update_product(self, ctx):
+        product_id = ctx.params["id"]
+        body = ctx.json()
+        # A missing stock keeps the current one; an invalid one would break reservations
+        stock_given = given(body.get("stock"))
+        stock = parse_float(body.get("stock")) if stock_given else None
+        if stock_given and not (stock is not None and stock.is_integer() and stock >= 0):
+            return error("Geçersiz stok", 400)
+        images = body.get("images") or []
+        if not images and body.get("image"):
+            images = [body["image"]]
+        updated = self.store.update("products", product_id, {
+            **({"stock": int(stock)} if stock_given else {}),
+            "name": body.get("name"),
+            "description": body.get("description"),
+            "price": parse_float(body.get("price")),
+            "image": body.get("image") or (images[0] if images else ""),
+            "images": images,
+            "category": body.get("category"),
+            "productType": body.get("productType") or "watch",
+            "gender": body.get("gender") or "unisex",
+            "brand": body.get("brand") or "",
+            "specs": build_specs(body.get("specs")),
+            "updatedAt": now_iso()
+        })
+        if updated is None:
+            return error("Ürün bulunamadı", 404)
+        self.users.invalidate_favorites()
+        self.search_index.mark_product_changed(product_id)
+        self.responses.invalidate_product(product_id)
+        return json_response({"success": True, "message": "Ürün güncellendi"})
+
+    @route("PUT", "admin/orders/:id", require_admin)
+    def update_order_status(self, ctx):
+        status = ctx.json().get("status")
+        if status not in ORDER_TRANSITIONS:
+            return error("Geçersiz sipariş durumu", 400)
+        order, changed, source = self.transition(ctx.params["id"], status)
+        if order is None:
+            return error("Sipariş bulunamadı", 404)
+        if not changed and order.get("status") != status:
+            return error(f"Sipariş durumu {source} -> {status} olarak değiştirilemez", 409)
+        return json_response({"success": True, "message": "Sipariş durumu güncellendi"})
+
+    # DELETE
+
+    @route("DELETE", "products/:id", require_admin)
+    def delete_product(self, ctx):
+        product_id = ctx.params["id"]
+        if not self.store.delete("products", product_id):
+            return error("Ürün bulunamadı", 404)
+        with self.store.lock:
+            for review in self.reviews_by_product.pop(product_id, ()):
+                self.store.delete("reviews", review["id"])
+        self.users.invalidate_favorites()
+        self.search_index.mark_product_changed(product_id)
+        self.responses.invalidate_product(product_id)
+        return json_response({"success": True, "message": "Ürün silindi"})
+
+    @route("DELETE", "favorites/remove", require_user())
+    def remove_favorite(self, ctx):
+        product_id = ctx.json().get("productId")
+        with self.store.lock:
+            user = self.store.get("users", ctx.user["userId"])
+            if user is not None and product_id in user["favoriteProducts"]:
+                user["favoriteProducts"].remove(product_id)
+        self.users.invalidate(ctx.user["userId"])
+        return json_response({"success": True, "message": "Favorilerden çıkarıldı"})
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this delayed ACKs add ~40ms per request
+    disable_nagle_algorithm = True
+    api = None  # set by LocalCyprusWatchServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        # Handler instances are reused across keep-alive requests
+        if self._body is None:
+            length = int(self.headers.get("Content-Length") or 0)
+            self._body = self.rfile.read(length) if length else b""
+        return self._body
+
+    def json(self):
+        body = self.read_body()
+        return json.loads(body) if body else {}
+
+    def dispatch(self, method):
+        self._body = None
+        url = urlsplit(self.path)
+        self.query = dict(parse_qsl(url.query))
+        if not url.path.startswith("/api/"):
+            response = error("Endpoint bulunamadı", 404)
+        else:
+            request_id = self.headers.get("X-Request-Id")
+            if not (request_id and REQUEST_ID_PATTERN.match(request_id)):
+                request_id = None
+            with self.api.tracer.trace(method, request_id, method=method, path=url.path) as trace:
+                self.api.store.track_ops()
+                response = self.api.router.handle(method, url.path, self)
+                response.headers["X-DB-Ops"] = str(self.api.store.ops_count())
+                trace.attrs["status"] = response.status
+            # Like withTracing: span totals per kind next to the router's route entry
+            timings = [f'{kind};desc="{data["count"]}";dur={data["ms"]:.3f}'
+                       for kind, data in trace.breakdown().items() if kind != "route"]
+            timings.append(f"total;dur={trace.duration:.3f}")
+            existing = response.headers.get("Server-Timing")
+            response.headers["Server-Timing"] = ", ".join([existing, *timings] if existing else timings)
+            response.headers["X-Request-Id"] = trace.id
+        # Drain unread request bodies so keep-alive connections stay usable
+        self.read_body()
+        self.send_response(response.status)
+        self.send_header("Content-Type", response.content_type)
+        self.send_header("Content-Length", str(len(response.body)))
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+
+class APIServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 resets bursts of concurrent connections (e.g. 500 racing buyers)
+    request_queue_size = 512
+    daemon_threads = True
+
+
+class LocalCyprusWatchServer:
+    """Run the stand-in API on a background thread
+
+        with LocalCyprusWatchServer() as server:
+            tester = CyprusWatchAPITester(server.base_url)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, email_delay=0.0, email_failure_rate=0.0,
+                 payment_decline_rate=0.2, reservation_ttl=ORDER_RESERVATION_TTL):
+        self.mailer = FakeResend(delay=email_delay, failure_rate=email_failure_rate)
+        self.api = CyprusWatchAPI(mailer=self.mailer, payment_decline_rate=payment_decline_rate,
+                                  reservation_ttl=reservation_ttl)
+        handler = type("BoundAPIRequestHandler", (APIRequestHandler,), {"api": self.api})
+        self.httpd = APIServer((host, port), handler)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def store(self):
+        return self.api.store
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="local-api", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.api.outbox.stop()
+        self.api.inventory.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local in-memory stand-in for the Cyprus Watch API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--email-delay", type=float, default=0.0,
+                        help="Seconds each fake Resend send takes")
+    parser.add_argument("--email-failure-rate", type=float, default=0.0,
+                        help="Fraction of fake Resend calls that fail (exercises outbox retries)")
+    parser.add_argument("--payment-decline-rate", type=float, default=0.2)
+    parser.add_argument("--reservation-ttl", type=float, default=ORDER_RESERVATION_TTL,
+                        help="Seconds an unpaid order holds its stock before the sweeper cancels it")
+    args = parser.parse_args()
+
+    server = LocalCyprusWatchServer(args.host, args.port, email_delay=args.email_delay,
+                                    email_failure_rate=args.email_failure_rate,
+                                    payment_decline_rate=args.payment_decline_rate,
+                                    reservation_ttl=args.reservation_ttl)
+    print(f"🧪 Local Cyprus Watch API listening on {server.base_url}/api")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
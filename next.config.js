@@ -2,8 +2,8 @@ const nextConfig = {
   // Turbopack aktif (Next.js 16 default)
   turbopack: {},
   
-  // MongoDB ve diğer external packages
-  serverExternalPackages: ['mongodb'],
+  // MongoDB ve diğer external packages (sharp native modül içerir)
+  serverExternalPackages: ['mongodb', 'sharp'],
   
   // Diğer ayarlar
   reactStrictMode: true,